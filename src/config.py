@@ -10,6 +10,70 @@ DATABASE_PATH = r"C:\Users\Gregg\Documents\tax_db_tables\duckdb\20250701\tax_rat
 JOB_FOLDER = os.path.join(BASE_DIR, "job")
 OUTPUT_FOLDER = os.path.join(BASE_DIR, "output")
 
+# --- DuckDB Resources ---
+# Applied to every DuckDB connection (src/duckdb_resources.py). None keeps DuckDB's default.
+# Environment variables of the same name, and --threads/--memory-limit/--temp-directory/
+# --no-insertion-order on the command line, take precedence.
+DUCKDB_THREADS = None                   # e.g. 4 on a shared laptop; DuckDB uses all cores by default
+DUCKDB_MEMORY_LIMIT = None              # e.g. "8GB"; DuckDB's default is 80% of RAM
+DUCKDB_TEMP_DIRECTORY = None            # Where queries over the memory limit spill; default <database>.tmp
+DUCKDB_PRESERVE_INSERTION_ORDER = None  # False uses less memory, but unordered results may come in any order
+
+# --- Row Result Cache ---
+# Reruns of a job file reuse per-row results for rows that are unchanged,
+# as long as the database file has not been modified since they were cached.
+ROW_CACHE_ENABLED = True
+ROW_CACHE_PATH = os.path.join(OUTPUT_FOLDER, "row_cache.sqlite")
+ROW_CACHE_MAX_BYTES = 256 * 1024 * 1024  # Least recently used rows are evicted beyond this size
+
+# --- Run History ---
+# Every job run appends its counts, stage timings, throughput and peak memory here
+# (`python src/metrics.py history` / `trend`).
+METRICS_ENABLED = True
+METRICS_DB_PATH = os.path.join(OUTPUT_FOLDER, "run_history.sqlite")
+
+# --- Profiling ---
+# `--profile` writes a collapsed-stack file (flamegraph-ready) and a hotspot summary
+# next to the job output. 'sampling' mode samples the stack every PROFILE_SAMPLE_INTERVAL seconds.
+PROFILE_TOP_N = 25
+PROFILE_SAMPLE_INTERVAL = 0.005
+
+# --- SQL Statement Log ---
+# `--sql-log` writes sql_log.json: each statement shape with its count, latency and rows,
+# and the plans of the SQL_LOG_EXPLAIN_TOP slowest shapes.
+SQL_LOG_EXPLAIN_TOP = 5
+
+# --- Memory Report ---
+# `--memory-report` writes memory_report.json: traced peak and retained memory and RSS per stage,
+# with the MEMORY_TOP_N project lines that retained the most. Tracebacks keep MEMORY_TRACE_FRAMES
+# frames so allocations made deep inside pandas still reach a project line; every traced
+# frame makes allocations slower, so the job runs several times slower with the report.
+MEMORY_TOP_N = 10
+MEMORY_TRACE_FRAMES = 30
+MEMORY_SAMPLE_INTERVAL = 0.05  # Seconds between RSS samples
+
+# --- Rate Update Configuration ---
+# What to do with output rows whose new rate and fee equal the current detail row:
+# 'keep' them as is, 'flag' them with a status warning, or 'drop' them from the output.
+# 'keep' leaves the output as it always was; flagging or dropping is opt-in with --unchanged-rows.
+RATE_UPDATE_UNCHANGED_ROWS = "keep"
+# What to do when several job rows update the same tax (DETAIL_VERSION_KEY), like a city row
+# and a county row covering it: 'report' them and keep every row, keep the 'first' row, the most
+# 'specific' row, or drop all as an 'error'. 'report' never changes the output; the rules that
+# drop rows are opt-in with --conflicts.
+RATE_UPDATE_CONFLICTS = "report"
+
+# --- Job Service ---
+# Localhost port of `python src/job_service.py serve`
+JOB_SERVICE_PORT = 8765
+
+# --- Folder Watch ---
+# `python src/folder_watcher.py` polls job/ and table_updates/ every WATCH_POLL_SECONDS.
+# A new file or update folder is queued once it has not changed for WATCH_SETTLE_SECONDS.
+WATCH_POLL_SECONDS = 2
+WATCH_SETTLE_SECONDS = 5
+WATCH_QUEUE_SIZE = 10  # Jobs waiting to run; further jobs stay pending until a slot frees up
+
 # --- Job Configuration ---
 JOB_TYPE_MAPPING = {
     "1": {
@@ -41,6 +105,49 @@ DETAIL_TABLE_SCHEMA = [
     'max_tax_base', 'fee', 'min_unit_base', 'max_unit_base'
 ]
 
+# Fields that identify one tax in the detail table; its versions differ only by 'effective'
+DETAIL_VERSION_KEY = ['geocode', 'tax_type', 'tax_cat', 'tax_auth_id', 'description', 'tier']
+
+# --- Lookup Indexes ---
+# Per-row lookups made by db_handler, in addition to the filter_fields in
+# table_updates/filtering_criteria.json. The table updater's index builder
+# indexes the most selective column of each pattern.
+LOOKUP_ACCESS_PATTERNS = {
+    "detail": ["geocode", "tax_type", "tax_cat", "description"],
+    "geocode": ["state", "county", "city", "tax_district"]
+}
+
+# --- Jurisdiction Matching ---
+# Job rows whose state, county, city or tax_district match no geocode as written are matched
+# by normalized name (case, punctuation, affixes like COUNTY and CITY OF) and then by edit
+# distance. A unique match is used with a warning status; otherwise the row is skipped and
+# the closest names are suggested. False requires names exactly as in the geocode table.
+JURISDICTION_MATCHING = True
+JURISDICTION_MATCH_MAX_EDITS = 2  # And at most one edit per 4 characters of the name
+JURISDICTION_MATCH_SUGGESTIONS = 3
+
+# --- Table Checksums ---
+# Partitions of the per-table checksums in the table updater's tables_changed.json
+# ('state' is derived from the geocode prefix for tables without a state column).
+# None checksums whole tables only.
+CHECKSUM_PARTITION_BY = 'state'
+
+# --- Parquet Export ---
+# Tables of the table updater's Parquet export with at least this many rows are split into
+# one directory per value of --export-partition-by; smaller tables are written as one file.
+PARQUET_EXPORT_PARTITION_MIN_ROWS = 100000
+PARQUET_EXPORT_WORKERS = None  # Tables exported at once; None uses all CPU cores
+
+# --- Output ---
+# Output columns with few distinct values, stored as categorical codes while rows are collected
+OUTPUT_CATEGORICAL_COLUMNS = ['status', 'tax_type', 'tax_cat', 'effective']
+
+# Also write the output split into one file per value of this column (default for --partition-by).
+# 'state' is derived from the geocode prefix for detail outputs. None writes only the single file.
+OUTPUT_PARTITION_BY = None
+OUTPUT_PARTITION_WORKERS = None  # Processes writing partition files; None uses all CPU cores
+OUTPUT_PARTITION_PARALLEL_MIN_ROWS = 100000  # Smaller outputs are written in-process
+
 # --- New Tax Job Configuration ---
 NEW_TAX_DEFAULTS = {
     'tax_cat': '01',
@@ -90,4 +197,9 @@ AUTHORITY_NAME_FORMATS = {
 # Tax authority table schema for output
 TAX_AUTHORITY_SCHEMA = [
     'status', 'tax_auth_id', 'country', 'state', 'authority_name', 'tax_auth_type'
+]
+
+# Geocode table schema for output (Jurisdiction Update)
+GEOCODE_TABLE_SCHEMA = [
+    'status', 'country', 'state', 'county', 'city', 'tax_district', 'geocode', 'gnis'
 ] 
\ No newline at end of file
@@ -1,16 +1,26 @@
 # src/db_handler.py
-import duckdb
+import datetime
 import pandas as pd
+import pyarrow as pa
+from src import config, duckdb_resources
 from src.logger import log_error
 
-def connect_to_duckdb(path: str):
+# Results of geocode lookups, kept between jobs by the job service.
+# None (the default) disables caching; see set_lookup_cache().
+LOOKUP_CACHE = None
+
+def set_lookup_cache(enabled: bool):
+    """Enable (and empty) or disable the in-memory geocode lookup cache."""
+    global LOOKUP_CACHE
+    LOOKUP_CACHE = {} if enabled else None
+
+def connect_to_duckdb(path: str, read_only: bool = False):
     """
-    Connect to the DuckDB database at the given path.
+    Connect to the DuckDB database at the given path, with the resource settings of config.py.
     Handle connection errors and log them as critical.
     """
     try:
-        conn = duckdb.connect(path)
-        return conn
+        return duckdb_resources.connect(path, read_only=read_only)
     except Exception as e:
         log_error(f"Failed to connect to DuckDB at '{path}': {str(e)}", is_critical=True)
         return None
@@ -41,36 +51,52 @@ def get_geocodes_from_db(conn, criteria: pd.Series) -> list[str]:
         else:
             query = base_query
         
+        cache_key = (query, tuple(params))
+        if LOOKUP_CACHE is not None and cache_key in LOOKUP_CACHE:
+            return list(LOOKUP_CACHE[cache_key])
+        
         # Execute query with parameters
         result = conn.execute(query, params).fetchall()
         
         # Extract geocodes from result tuples
         geocodes = [row[0] for row in result if row[0]]
         
+        if LOOKUP_CACHE is not None:
+            LOOKUP_CACHE[cache_key] = list(geocodes)
+        
         return geocodes
         
     except Exception as e:
         log_error(f"Error querying geocodes from database: {str(e)}")
         return []
 
-def get_detail_rows_from_db(conn, geocodes: list, tax_type: str, tax_cat: str, description: str | None) -> pd.DataFrame:
+def get_detail_rows_from_db(conn, geocodes: list, tax_type: str, tax_cat: str, description: str | None,
+                            as_of: datetime.date | None = None) -> pa.Table:
     """
     Build a "SELECT * FROM detail" query.
-    Filter using "WHERE geocode IN (...) AND tax_type = ? AND tax_cat = ?".
+    Filter using "WHERE geocode IN (...)", then "tax_type = ? AND tax_cat = ?".
     If `description` is not null/empty, add "AND description = ?".
+    If `as_of` is given, return only the version of each tax (config.DETAIL_VERSION_KEY)
+    in force on that date: its latest row with effective <= as_of.
     Use parameterized queries to prevent SQL injection.
-    Return a pandas DataFrame of the results.
+    Return a pyarrow Table of the results in table order; string columns stay in Arrow
+    buffers instead of becoming object arrays. Convert to pandas only when writing output.
     """
     try:
         if not geocodes:
-            return pd.DataFrame()
+            return pa.table({})
         
-        # Build the base query
-        base_query = "SELECT * FROM detail"
-        
-        # Build the WHERE clause for geocodes, tax_type, and tax_cat
+        # Narrow by geocode first: DuckDB only uses an index on detail(geocode)
+        # when the geocode filter is the only filter on the table
         geocode_placeholders = ','.join(['?' for _ in geocodes])
-        where_clause = f"geocode IN ({geocode_placeholders}) AND tax_type = ? AND tax_cat = ?"
+        base_query = f"""
+            WITH candidates AS MATERIALIZED (
+                SELECT rowid AS detail_rowid, * FROM detail WHERE geocode IN ({geocode_placeholders})
+            )
+            SELECT * EXCLUDE (detail_rowid) FROM candidates"""
+        
+        # Build the WHERE clause for tax_type and tax_cat
+        where_clause = "tax_type = ? AND tax_cat = ?"
         
         params = geocodes + [tax_type, tax_cat]
         
@@ -81,14 +107,36 @@ def get_detail_rows_from_db(conn, geocodes: list, tax_type: str, tax_cat: str, d
         
         query = f"{base_query} WHERE {where_clause}"
         
-        # Execute query and return as DataFrame
-        result = conn.execute(query, params).fetchdf()
+        # Keep only the latest version of each tax that is effective on the as-of date
+        if as_of is not None:
+            query += " AND effective <= ?"
+            params.append(as_of.date() if isinstance(as_of, datetime.datetime) else as_of)
+            version_key = ', '.join(f'"{field}"' for field in config.DETAIL_VERSION_KEY)
+            query += f" QUALIFY ROW_NUMBER() OVER (PARTITION BY {version_key} ORDER BY effective DESC, detail_rowid DESC) = 1"
         
-        return result
+        query += " ORDER BY detail_rowid"
+        
+        # Execute query and return as an Arrow table
+        result = conn.execute(query, params).to_arrow_table()
+        
+        return decimals_to_float(result)
         
     except Exception as e:
         log_error(f"Error querying detail rows from database: {str(e)}")
-        return pd.DataFrame()
+        return pa.table({})
+
+def decimals_to_float(table: pa.Table) -> pa.Table:
+    """
+    Cast DECIMAL columns to float64, matching the values fetchdf() produced,
+    so output rows keep the same numeric formatting.
+    """
+    schema = pa.schema([
+        field.with_type(pa.float64()) if pa.types.is_decimal(field.type) else field
+        for field in table.schema
+    ])
+    if schema.equals(table.schema):
+        return table
+    return table.cast(schema)
 
 def get_geocodes_for_new_tax(conn, criteria: pd.Series) -> list[str]:
     """
@@ -99,6 +147,13 @@ def get_geocodes_for_new_tax(conn, criteria: pd.Series) -> list[str]:
     - Dynamic criteria (state, county, city, tax_district)
     """
     try:
+        cache_key = ('new_tax',) + tuple(
+            str(criteria.get(field)).strip() if pd.notna(criteria.get(field)) else None
+            for field in ['geocode', 'state', 'county', 'city', 'tax_district']
+        )
+        if LOOKUP_CACHE is not None and cache_key in LOOKUP_CACHE:
+            return list(LOOKUP_CACHE[cache_key])
+        
         geocodes = []
         
         # 1. Handle direct geocode list from CSV
@@ -127,12 +182,28 @@ def get_geocodes_for_new_tax(conn, criteria: pd.Series) -> list[str]:
             geocodes.extend([row[0] for row in result])
         
         # Remove duplicates and return
-        return list(set(geocodes))
+        geocodes = list(set(geocodes))
+        if LOOKUP_CACHE is not None:
+            LOOKUP_CACHE[cache_key] = list(geocodes)
+        return geocodes
         
     except Exception as e:
         log_error(f"Error querying geocodes for new tax from database: {str(e)}")
         return []
 
+def get_jurisdiction_names(conn) -> list[tuple]:
+    """
+    Every distinct (state, county, city, tax_district) of the geocode table, for the
+    jurisdiction_matcher index. One scan, made only when a job row matches no geocode as written.
+    """
+    try:
+        return conn.execute(
+            "SELECT DISTINCT state, county, city, tax_district FROM geocode"
+        ).fetchall()
+    except Exception as e:
+        log_error(f"Error querying jurisdiction names from database: {str(e)}")
+        return []
+
 def get_next_tax_auth_id(conn) -> int:
     """
     Get the next sequential tax_auth_id by finding the maximum existing ID.
@@ -157,4 +228,414 @@ def get_next_tax_auth_id(conn) -> int:
             
     except Exception as e:
         log_error(f"Error getting next tax authority ID: {str(e)}", is_critical=True)
-        return None 
\ No newline at end of file
+        return None 
+
+def get_states_for_geocode_prefixes(conn, prefixes: list) -> dict:
+    """
+    Map geocode prefixes (country + state code, e.g. 'US06') to the state of the
+    geocode table (e.g. 'CA'). Prefixes not found in the table are left out.
+    """
+    if not prefixes:
+        return {}
+    try:
+        placeholders = ', '.join(['?'] * len(prefixes))
+        query = f"""
+        SELECT substr(geocode, 1, 4) AS prefix, MIN(state) AS state
+        FROM geocode
+        WHERE substr(geocode, 1, 4) IN ({placeholders}) AND state IS NOT NULL
+        GROUP BY prefix
+        """
+        return dict(conn.execute(query, list(prefixes)).fetchall())
+    except Exception as e:
+        log_error(f"Error looking up states for geocodes: {str(e)}")
+        return {}
+
+def get_output_diff(conn, output_df: pd.DataFrame, table_name: str, key_fields: list,
+                    version_field: str | None = None) -> pd.DataFrame:
+    """
+    Compare generated output rows with the current rows of `table_name` in one set-based query.
+    Each output row is joined to its matching table row on `key_fields`. When `version_field`
+    is given, the match is the latest version at or before the output row's version.
+    Returns one row per changed column (old -> new), plus one 'added' row for each output
+    row that has no match in the database.
+    """
+    try:
+        table_schema = conn.execute(f'DESCRIBE "{table_name}"').fetchall()
+        column_types = {col[0]: col[1] for col in table_schema}
+        
+        compare_columns = [col for col in output_df.columns
+                           if col in column_types and col not in key_fields]
+        output_columns = key_fields + compare_columns
+        
+        diff_input = output_df[output_columns].copy()
+        diff_input.insert(0, 'output_row', range(1, len(diff_input) + 1))
+        conn.register('diff_output_rows', diff_input)
+        
+        def typed(alias: str, col: str) -> str:
+            # Cast output values to the table's types so 0.06 matches DECIMAL 0.060000000000;
+            # empty strings and NULLs are equivalent once written to CSV.
+            col_type = column_types[col]
+            expression = f'TRY_CAST({alias}."{col}" AS {col_type})'
+            if 'VARCHAR' in col_type.upper():
+                expression = f"NULLIF({expression}, '')"
+            return expression
+        
+        join_conditions = [f'{typed("d", col)} IS NOT DISTINCT FROM {typed("o", col)}' for col in key_fields]
+        if version_field:
+            join_conditions.append(f'd."{version_field}" <= {typed("o", version_field)}')
+            match_order = f'ORDER BY d."{version_field}" DESC'
+        else:
+            match_order = ''
+        
+        key_select = ', '.join(f'o."{col}"' for col in key_fields)
+        matched_select = ', '.join(
+            [f'{typed("o", col)} AS "new_{col}"' for col in compare_columns] +
+            [f'{typed("d", col)} AS "old_{col}"' for col in compare_columns]
+        )
+        
+        column_diffs = [
+            f"""SELECT output_row, {', '.join(f'"{col}"' for col in key_fields)}, 'modified' AS change_type,
+                       '{col}' AS column_name, {position} AS column_position,
+                       CAST("old_{col}" AS VARCHAR) AS old_value, CAST("new_{col}" AS VARCHAR) AS new_value
+                FROM paired
+                WHERE matched AND "old_{col}" IS DISTINCT FROM "new_{col}\""""
+            for position, col in enumerate(compare_columns)
+        ]
+        column_diffs.append(
+            f"""SELECT output_row, {', '.join(f'"{col}"' for col in key_fields)}, 'added' AS change_type,
+                       NULL AS column_name, -1 AS column_position, NULL AS old_value, NULL AS new_value
+                FROM paired
+                WHERE NOT matched"""
+        )
+        
+        query = f"""
+            WITH paired AS (
+                SELECT o.output_row, {key_select}, {matched_select},
+                       d."{key_fields[0]}" IS NOT NULL AS matched
+                FROM diff_output_rows o
+                LEFT JOIN "{table_name}" d ON {' AND '.join(join_conditions)}
+                QUALIFY ROW_NUMBER() OVER (PARTITION BY o.output_row {match_order}) = 1
+            )
+            SELECT * EXCLUDE (column_position) FROM (
+                {' UNION ALL '.join(column_diffs)}
+            )
+            ORDER BY output_row, column_position
+        """
+        
+        return conn.execute(query).fetchdf()
+        
+    except Exception as e:
+        log_error(f"Error computing output diff against '{table_name}': {str(e)}")
+        return pd.DataFrame()
+    finally:
+        try:
+            conn.unregister('diff_output_rows')
+        except Exception:
+            pass
+
+# Jurisdiction levels of the geocode table, from the top
+JURISDICTION_LEVELS = ['state', 'county', 'city', 'tax_district']
+
+def _authority_name_sql(level: str, state: str, county: str, city: str, district: str) -> str:
+    """
+    SQL expression for the authority name of a jurisdiction, from the given column expressions.
+    Same names as main.generate_authority_name() gives New Authority jobs.
+    """
+    if level == 'state':
+        return f"{state} || ', STATE OF'"
+    if level == 'county':
+        return f"{county} || ', COUNTY OF'"
+    if level == 'city':
+        return f"{city} || ', CITY OF'"
+    return f"""CASE WHEN {city} IS NOT NULL THEN 'CITY OF ' || {city} || ', ' || {district}
+                    WHEN {county} IS NOT NULL THEN
+                        CASE WHEN {county} LIKE '%COUNTY%' THEN {county} ELSE {county} || ' COUNTY' END || ', ' || {district}
+                    ELSE {district} END"""
+
+def get_jurisdiction_update_rows(conn, changes: list, effective_date: datetime.date) -> dict:
+    """
+    Apply jurisdiction changes (renames and re-parentings on the geocode table) with set-based
+    joins instead of per-geocode lookups. Each change is a dict of job_row, level (the jurisdiction
+    changed), its current state/county/city/tax_district, new_name and the new parents new_county
+    (cities and tax districts) and new_city (tax districts); empty values are None.
+    Returns a dict of:
+    - 'geocode': the changed geocode rows with their new names, a status and '_job_row'.
+      Geocodes changed differently by several job rows are left out.
+    - 'tax_authority': authorities named after a renamed or moved jurisdiction, with their new name
+    - 'detail': for geocodes moved to another county or city, new versions (effective on
+      effective_date) that end the taxes of the former parent and add those of the new parent
+    - 'unmatched': job rows whose jurisdiction has no geocodes
+    - 'warnings': (job_row, status) of changes that merge jurisdictions or lack a new parent
+    - 'conflicts': (job rows, number of geocodes) of the geocodes left out
+    """
+    result = {"geocode": pa.table({}), "tax_authority": pa.table({}), "detail": pa.table({}),
+              "unmatched": [], "warnings": [], "conflicts": []}
+    if not changes:
+        return result
+    
+    fields = ['level'] + JURISDICTION_LEVELS + ['new_name', 'new_county', 'new_city']
+    changes_table = pa.table(
+        {'job_row': pa.array([change['job_row'] for change in changes], pa.int64()),
+         **{field: pa.array([change.get(field) for change in changes], pa.string()) for field in fields}}
+    )
+    effective = effective_date.strftime('%Y-%m-%d')
+    version_key = ', '.join(f'd."{field}"' for field in config.DETAIL_VERSION_KEY)
+    
+    try:
+        conn.register('jurisdiction_changes', changes_table)
+        
+        # Every geocode of each changed jurisdiction, with its names after the change
+        conn.execute("""
+            CREATE OR REPLACE TEMP TABLE jurisdiction_geocodes AS
+            SELECT c.job_row, c.level, c.new_name IS NOT NULL AS renamed,
+                   c.new_county IS NOT NULL AS moved_county, c.new_city IS NOT NULL AS moved_city,
+                   g.country, g.state, g.county, g.city, g.tax_district, g.geocode, g.gnis,
+                   CASE WHEN c.level = 'state' THEN coalesce(c.new_name, g.state) ELSE g.state END AS new_state,
+                   CASE WHEN c.level = 'county' THEN coalesce(c.new_name, g.county)
+                        ELSE coalesce(c.new_county, g.county) END AS new_county,
+                   CASE WHEN c.level = 'city' THEN coalesce(c.new_name, g.city)
+                        ELSE coalesce(c.new_city, g.city) END AS new_city,
+                   CASE WHEN c.level = 'tax_district' THEN coalesce(c.new_name, g.tax_district)
+                        ELSE g.tax_district END AS new_tax_district
+            FROM jurisdiction_changes c
+            JOIN geocode g ON g.state = c.state
+                AND (c.county IS NULL OR g.county = c.county)
+                AND (c.city IS NULL OR g.city = c.city)
+                AND (c.tax_district IS NULL OR g.tax_district = c.tax_district)
+        """)
+        result["unmatched"] = [row[0] for row in conn.execute("""
+            SELECT job_row FROM jurisdiction_changes
+            WHERE job_row NOT IN (SELECT job_row FROM jurisdiction_geocodes)
+            ORDER BY job_row
+        """).fetchall()]
+        
+        # Checks per change: does the jurisdiction it becomes already exist (a merge),
+        # and do its new parent and the parent's authority exist
+        conn.execute(f"""
+            CREATE OR REPLACE TEMP TABLE jurisdiction_warnings AS
+            WITH target AS (
+                SELECT *,
+                       CASE WHEN level = 'state' THEN coalesce(new_name, state) ELSE state END AS t_state,
+                       CASE WHEN level = 'county' THEN coalesce(new_name, county)
+                            ELSE coalesce(new_county, county) END AS t_county,
+                       CASE WHEN level = 'city' THEN coalesce(new_name, city) ELSE coalesce(new_city, city) END AS t_city,
+                       CASE WHEN level = 'tax_district' THEN coalesce(new_name, tax_district) END AS t_district,
+                       replace(level, '_', ' ') AS level_label
+                FROM jurisdiction_changes
+                WHERE job_row IN (SELECT job_row FROM jurisdiction_geocodes)
+            )
+            SELECT job_row, 'Warning: ' || level_label || ' ' ||
+                   CASE level WHEN 'state' THEN t_state WHEN 'county' THEN t_county
+                              WHEN 'city' THEN t_city ELSE t_district END ||
+                   ' already exists, jurisdictions are merged' AS warning
+            FROM target t
+            WHERE EXISTS (
+                SELECT 1 FROM geocode e
+                WHERE e.state = t.t_state
+                  AND (t.t_county IS NULL OR e.county = t.t_county)
+                  AND (t.t_city IS NULL OR e.city = t.t_city)
+                  AND (t.t_district IS NULL OR e.tax_district = t.t_district)
+                  AND (t.level <> 'tax_district' OR e.tax_district IS NOT NULL)
+            )
+            UNION ALL
+            SELECT job_row, 'Warning: new county ' || new_county || ' not found' FROM target t
+            WHERE new_county IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM geocode e WHERE e.state = t.state AND e.county = t.new_county)
+            UNION ALL
+            SELECT job_row, 'Warning: new city ' || new_city || ' not found' FROM target t
+            WHERE new_city IS NOT NULL AND NOT EXISTS (
+                SELECT 1 FROM geocode e
+                WHERE e.state = t.state AND e.city = t.new_city AND (t.t_county IS NULL OR e.county = t.t_county)
+            )
+            UNION ALL
+            SELECT job_row, 'Warning: no authority for county ' || new_county || ', its taxes are not added'
+            FROM target t
+            WHERE new_county IS NOT NULL AND NOT EXISTS (
+                SELECT 1 FROM tax_authority a
+                WHERE a.state = t.state AND a.authority_name = {_authority_name_sql('county', '', 't.new_county', '', '')}
+            )
+            UNION ALL
+            SELECT job_row, 'Warning: no authority for city ' || new_city || ', its taxes are not added'
+            FROM target t
+            WHERE new_city IS NOT NULL AND NOT EXISTS (
+                SELECT 1 FROM tax_authority a
+                WHERE a.state = t.state AND a.authority_name = {_authority_name_sql('city', '', '', 't.new_city', '')}
+            )
+        """)
+        result["warnings"] = conn.execute(
+            "SELECT job_row, warning FROM jurisdiction_warnings ORDER BY job_row, warning"
+        ).fetchall()
+        
+        # One output row per geocode: the changes of all its job rows, unless two of them
+        # change the same field differently
+        changed_fields = {'state': 'new_state', 'county': 'new_county', 'city': 'new_city',
+                          'tax_district': 'new_tax_district'}
+        change_lists = ',\n'.join(
+            f'list(DISTINCT {new}) FILTER (WHERE {new} IS DISTINCT FROM {field}) AS {field}_changes'
+            for field, new in changed_fields.items()
+        )
+        change_counts = ', '.join(f'coalesce(len({field}_changes), 0)' for field in changed_fields)
+        conn.execute(f"""
+            CREATE OR REPLACE TEMP TABLE jurisdiction_output AS
+            WITH per_geocode AS (
+                SELECT country, state, county, city, tax_district, geocode, gnis,
+                       list_sort(list(DISTINCT job_row)) AS job_rows,
+                       {change_lists}
+                FROM jurisdiction_geocodes
+                GROUP BY ALL
+            ),
+            geocode_warnings AS (
+                SELECT j.geocode, string_agg(DISTINCT w.warning, chr(10) ORDER BY w.warning) AS warnings
+                FROM jurisdiction_geocodes j JOIN jurisdiction_warnings w USING (job_row)
+                GROUP BY j.geocode
+            )
+            SELECT coalesce(w.warnings, 'Success') AS status, p.country,
+                   {', '.join(f'coalesce(p.{field}_changes[1], p.{field}) AS {field}' for field in changed_fields)},
+                   p.geocode, p.gnis, p.job_rows[1] AS _job_row, p.job_rows AS _job_rows,
+                   greatest({change_counts}) > 1 AS _conflict,
+                   {', '.join(f'p.{field} AS _old_{field}' for field in changed_fields)}
+            FROM per_geocode p
+            LEFT JOIN geocode_warnings w USING (geocode)
+            WHERE greatest({change_counts}) > 0
+        """)
+        result["conflicts"] = conn.execute("""
+            SELECT _job_rows, count(*) FROM jurisdiction_output WHERE _conflict
+            GROUP BY _job_rows ORDER BY _job_rows
+        """).fetchall()
+        result["geocode"] = conn.execute("""
+            SELECT * EXCLUDE (_job_rows, _conflict, _old_state, _old_county, _old_city, _old_tax_district)
+            FROM jurisdiction_output
+            WHERE NOT _conflict ORDER BY _job_row, geocode
+        """).to_arrow_table()
+        
+        # The job rows of geocodes that are changed, for the authorities and taxes
+        applied = """(SELECT * FROM jurisdiction_geocodes
+                      WHERE geocode IN (SELECT geocode FROM jurisdiction_output WHERE NOT _conflict))"""
+        
+        # Authorities named after a renamed jurisdiction; tax district authorities, which are
+        # named after their city or county too, after all changes of their geocodes;
+        # and all authorities of a renamed state
+        renames = '\nUNION ALL\n'.join(
+            f"""SELECT job_row, state AS old_state,
+                       {_authority_name_sql(level, 'state', 'county', 'city', 'tax_district')} AS old_name,
+                       new_state,
+                       {_authority_name_sql(level, 'new_state', 'new_county', 'new_city', 'new_tax_district')} AS new_name
+                FROM {applied}
+                WHERE renamed AND level = '{level}'"""
+            for level in ['state', 'county', 'city']
+        )
+        old_district_name = _authority_name_sql('tax_district', '_old_state', '_old_county', '_old_city',
+                                                '_old_tax_district')
+        new_district_name = _authority_name_sql('tax_district', 'state', 'county', 'city', 'tax_district')
+        result["tax_authority"] = conn.execute(f"""
+            WITH renames AS (
+                SELECT DISTINCT * FROM (
+                    {renames}
+                    UNION ALL
+                    SELECT _job_row, _old_state, {old_district_name}, state, {new_district_name}
+                    FROM jurisdiction_output
+                    WHERE NOT _conflict AND _old_tax_district IS NOT NULL
+                )
+                WHERE old_name IS DISTINCT FROM new_name OR old_state IS DISTINCT FROM new_state
+            ),
+            matched AS (
+                SELECT a.*, r.new_state, r.new_name, r.job_row
+                FROM tax_authority a JOIN renames r ON a.state = r.old_state AND a.authority_name = r.old_name
+                UNION ALL
+                SELECT a.*, s.new_state, a.authority_name, s.job_row
+                FROM tax_authority a
+                JOIN (SELECT DISTINCT job_row, state, new_state FROM {applied}
+                      WHERE level = 'state' AND renamed) s ON a.state = s.state
+            ),
+            per_authority AS (
+                SELECT tax_auth_id, country, state, authority_name, tax_auth_type,
+                       list(DISTINCT new_name) FILTER (WHERE new_name IS DISTINCT FROM authority_name) AS names,
+                       max(new_state) AS new_state, min(job_row) AS _job_row
+                FROM matched
+                GROUP BY ALL
+            )
+            SELECT CASE
+                       WHEN len(names) > 1 THEN 'Warning: several new names (' || array_to_string(names, '; ') || ')'
+                       WHEN EXISTS (SELECT 1 FROM tax_authority b
+                                    WHERE b.state = p.new_state AND b.authority_name = p.names[1]
+                                      AND b.tax_auth_id IS DISTINCT FROM p.tax_auth_id)
+                           THEN 'Warning: authority ' || p.names[1] || ' already exists'
+                       ELSE 'Success'
+                   END AS status,
+                   tax_auth_id, country, new_state AS state, coalesce(names[1], authority_name) AS authority_name,
+                   tax_auth_type, _job_row
+            FROM per_authority p
+            ORDER BY _job_row, tax_auth_id
+        """).to_arrow_table()
+        
+        # Geocodes moved to another county or city: end the taxes of the former parent's
+        # authority and copy those of the new parent's authority, as in force on the effective date
+        moves = '\nUNION ALL\n'.join(
+            f"""SELECT DISTINCT job_row, geocode, state, '{level}' AS parent_level,
+                       {level} AS old_parent, new_{level} AS new_parent,
+                       {_authority_name_sql(level, '', level, level, '')} AS old_authority_name,
+                       {_authority_name_sql(level, '', f'new_{level}', f'new_{level}', '')} AS new_authority_name
+                FROM {applied}
+                WHERE moved_{level} AND {level} IS DISTINCT FROM new_{level}"""
+            for level in ['county', 'city']
+        )
+        detail = conn.execute(f"""
+            WITH moves AS ({moves}),
+            former AS (
+                SELECT 'Warning: tax of former ' || m.parent_level || ' ' || m.old_parent || ' ended' AS status,
+                       d.*, m.job_row AS _job_row
+                FROM detail d
+                JOIN moves m ON d.geocode = m.geocode
+                JOIN tax_authority a ON a.tax_auth_id = d.tax_auth_id AND a.state = m.state
+                    AND a.authority_name = m.old_authority_name
+                WHERE d.effective <= CAST(? AS TIMESTAMP)
+                QUALIFY ROW_NUMBER() OVER (PARTITION BY {version_key} ORDER BY d.effective DESC, d.rowid DESC) = 1
+            ),
+            templates AS (
+                SELECT p.state, p.new_authority_name, d.* EXCLUDE (geocode)
+                FROM (SELECT DISTINCT state, new_authority_name FROM moves) p
+                JOIN tax_authority a ON a.state = p.state AND a.authority_name = p.new_authority_name
+                JOIN detail d ON d.tax_auth_id = a.tax_auth_id
+                WHERE d.effective <= CAST(? AS TIMESTAMP) AND d.geocode NOT IN (SELECT geocode FROM moves)
+                QUALIFY ROW_NUMBER() OVER (
+                    PARTITION BY p.state, p.new_authority_name, d.tax_type, d.tax_cat, d.tax_auth_id, d.description, d.tier
+                    ORDER BY d.effective DESC, d.geocode
+                ) = 1
+            ),
+            added AS (
+                SELECT 'Success' AS status, m.geocode, t.* EXCLUDE (state, new_authority_name), m.job_row AS _job_row
+                FROM moves m
+                JOIN templates t ON t.state = m.state AND t.new_authority_name = m.new_authority_name
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM detail d
+                    WHERE d.geocode = m.geocode AND d.tax_type = t.tax_type AND d.tax_cat = t.tax_cat
+                      AND d.tax_auth_id = t.tax_auth_id AND d.description IS NOT DISTINCT FROM t.description
+                      AND d.tier IS NOT DISTINCT FROM t.tier
+                )
+            )
+            SELECT * REPLACE (CAST(? AS VARCHAR) AS effective) FROM (
+                SELECT * REPLACE (CAST(0 AS DECIMAL(13,12)) AS tax_rate, CAST(0 AS DECIMAL(11,8)) AS fee)
+                FROM former
+                WHERE tax_rate <> 0 OR fee <> 0  -- Already ended
+                UNION ALL BY NAME
+                SELECT * FROM added
+            )
+            ORDER BY _job_row, geocode, tax_type, tax_cat, tax_auth_id
+        """, [effective, effective, effective]).to_arrow_table()
+        result["detail"] = decimals_to_float(detail)
+        return result
+    
+    except Exception as e:
+        log_error(f"Error computing jurisdiction changes: {str(e)}")
+        return result
+    finally:
+        for statement in ["DROP TABLE IF EXISTS jurisdiction_geocodes", "DROP TABLE IF EXISTS jurisdiction_warnings",
+                          "DROP TABLE IF EXISTS jurisdiction_output"]:
+            try:
+                conn.execute(statement)
+            except Exception:
+                pass
+        try:
+            conn.unregister('jurisdiction_changes')
+        except Exception:
+            pass
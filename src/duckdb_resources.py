@@ -0,0 +1,121 @@
+# src/duckdb_resources.py
+# The one place DuckDB connections are opened, with the resource settings of config.py applied:
+# threads, memory_limit, temp_directory (where big queries spill when they exceed the memory
+# limit) and preserve_insertion_order. Each setting is looked up, first found wins, in
+#   1. the command line (--threads, --memory-limit, --temp-directory, --no-insertion-order)
+#   2. the environment (DUCKDB_THREADS, DUCKDB_MEMORY_LIMIT, DUCKDB_TEMP_DIRECTORY,
+#      DUCKDB_PRESERVE_INSERTION_ORDER)
+#   3. config.py (same names)
+# A setting that is None everywhere keeps DuckDB's default.
+
+import argparse
+import os
+import sys
+
+import duckdb
+
+# Add the project root to Python path to handle imports when running directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import config
+
+# DuckDB setting -> config.py name and environment variable
+SETTINGS = {
+    "threads": "DUCKDB_THREADS",
+    "memory_limit": "DUCKDB_MEMORY_LIMIT",
+    "temp_directory": "DUCKDB_TEMP_DIRECTORY",
+    "preserve_insertion_order": "DUCKDB_PRESERVE_INSERTION_ORDER",
+}
+
+# Settings given on the command line; see set_resource_limits()
+_overrides = {}
+
+
+def set_resource_limits(threads: int = None, memory_limit: str = None, temp_directory: str = None,
+                        preserve_insertion_order: bool = None):
+    """Override the settings of config.py and the environment for the connections opened from now on."""
+    _overrides.clear()
+    _overrides.update({
+        "threads": threads,
+        "memory_limit": memory_limit,
+        "temp_directory": temp_directory,
+        "preserve_insertion_order": preserve_insertion_order,
+    })
+
+def _parse_setting(name: str, value):
+    if name == "threads":
+        threads = int(value)
+        if threads < 1:
+            raise ValueError(f"threads must be at least 1, got {threads}")
+        return threads
+    if name == "preserve_insertion_order" and isinstance(value, str):
+        if value.strip().lower() in ("1", "true", "yes", "on"):
+            return True
+        if value.strip().lower() in ("0", "false", "no", "off"):
+            return False
+        raise ValueError(f"preserve_insertion_order must be true or false, got '{value}'")
+    if name == "temp_directory":
+        # Relative to where the job is started would differ between runs
+        return os.path.abspath(value)
+    return value
+
+def connection_settings() -> dict:
+    """The DuckDB settings to apply, {setting: value}; empty when everything keeps DuckDB's default."""
+    settings = {}
+    for name, config_name in SETTINGS.items():
+        value = _overrides.get(name)
+        if value is None:
+            value = os.environ.get(config_name) or None
+        if value is None:
+            value = getattr(config, config_name, None)
+        if value is not None:
+            try:
+                settings[name] = _parse_setting(name, value)
+            except ValueError as e:
+                raise ValueError(f"Invalid DuckDB setting {config_name}: {e}") from None
+    return settings
+
+def connect(path: str, read_only: bool = False):
+    """Open a DuckDB connection to path with the configured resource settings."""
+    kwargs = {}
+    if read_only:
+        kwargs["read_only"] = True
+    settings = connection_settings()
+    if settings:
+        kwargs["config"] = settings
+    return duckdb.connect(path, **kwargs)
+
+def describe_settings() -> str:
+    """The settings in effect, for the start of a run ('DuckDB defaults' when there are none)."""
+    settings = connection_settings()
+    if not settings:
+        return "DuckDB defaults"
+    return ", ".join(f"{name}={value}" for name, value in settings.items())
+
+
+def _positive_int(value: str) -> int:
+    try:
+        threads = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid thread count '{value}'")
+    if threads < 1:
+        raise argparse.ArgumentTypeError("thread count must be at least 1")
+    return threads
+
+def add_resource_arguments(parser: argparse.ArgumentParser):
+    """Add the DuckDB resource options to a command line parser; see apply_resource_arguments()."""
+    group = parser.add_argument_group('DuckDB resources',
+                                      'Override DUCKDB_* of src/config.py and the environment for this run')
+    group.add_argument('--threads', type=_positive_int, metavar='N',
+                       help='Threads per DuckDB connection (default: all cores)')
+    group.add_argument('--memory-limit', metavar='SIZE',
+                       help="DuckDB memory limit, e.g. '4GB' (default: 80%% of RAM); "
+                            "larger queries spill to the temp directory")
+    group.add_argument('--temp-directory', metavar='DIR',
+                       help='Directory DuckDB spills to (default: next to the database file)')
+    group.add_argument('--no-insertion-order', dest='preserve_insertion_order', action='store_false', default=None,
+                       help='Let DuckDB return rows of unordered queries in any order, which uses less memory')
+
+def apply_resource_arguments(args: argparse.Namespace):
+    """Apply the options added by add_resource_arguments() to all connections opened from now on."""
+    set_resource_limits(args.threads, args.memory_limit, args.temp_directory, args.preserve_insertion_order)
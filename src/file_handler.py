@@ -4,6 +4,7 @@ import re
 import json
 import datetime
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from src.logger import log_error
 
 def find_latest_job_file(folder: str, prefix: str) -> str | None:
@@ -62,9 +63,10 @@ def read_csv_to_dataframe(file_path: str) -> pd.DataFrame | None:
         log_error(f"Error reading CSV file '{file_path}': {str(e)}", is_critical=True)
         return None
 
-def create_output_directory(base_folder: str) -> str:
+def create_output_directory(base_folder: str, suffix: str = "job") -> str:
     """
     Create a timestamped subfolder (e.g., '250627-115530_job').
+    Jobs started within the same second get '250627-115530_job_2', '_3', ...
     Return the path to this new directory.
     """
     try:
@@ -72,9 +74,17 @@ def create_output_directory(base_folder: str) -> str:
         now = datetime.datetime.now()
         timestamp = now.strftime("%y%m%d-%H%M%S")
         
-        output_dir = os.path.join(base_folder, f"{timestamp}_job")
+        output_dir = os.path.join(base_folder, f"{timestamp}_{suffix}")
         
-        os.makedirs(output_dir, exist_ok=True)
+        os.makedirs(base_folder, exist_ok=True)
+        attempt = 1
+        while True:
+            try:
+                os.mkdir(output_dir)
+                break
+            except FileExistsError:
+                attempt += 1
+                output_dir = os.path.join(base_folder, f"{timestamp}_{suffix}_{attempt}")
         
         return output_dir
         
@@ -103,6 +113,32 @@ def write_dataframe_to_csv(path: str, df: pd.DataFrame, columns: list):
     except Exception as e:
         log_error(f"Error writing CSV file '{path}': {str(e)}", is_critical=True)
 
+def _write_csv_partition(path: str, df: pd.DataFrame) -> int:
+    df.to_csv(path, index=False)
+    return len(df)
+
+def write_dataframes_to_csv(partitions: list, columns: list, max_workers: int | None = None,
+                            parallel_min_rows: int = 0) -> list:
+    """
+    Write several DataFrames to their own CSV files, with the columns in the order of `columns`.
+    `partitions` is a list of (path, DataFrame). When they hold at least `parallel_min_rows` rows
+    together, the files are written by a pool of `max_workers` processes (default: CPU count).
+    Returns the number of rows written to each file.
+    """
+    try:
+        ordered = [(path, df[columns]) for path, df in partitions]
+        total_rows = sum(len(df) for _, df in ordered)
+        
+        if len(ordered) > 1 and total_rows >= parallel_min_rows and (max_workers or os.cpu_count() or 1) > 1:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                return list(executor.map(_write_csv_partition, *zip(*ordered)))
+        
+        return [_write_csv_partition(path, df) for path, df in ordered]
+        
+    except Exception as e:
+        log_error(f"Error writing partitioned CSV files: {str(e)}", is_critical=True)
+        return []
+
 def write_logs_to_json(path: str, logs: list):
     """
     Write the list of log dictionaries to a JSON file.
@@ -0,0 +1,214 @@
+# src/folder_watcher.py
+# Watch mode: picks up new job files in job/ and new YYMMDD_update folders in
+# table_updates/ and runs them in this process, through a warm JobService.
+#
+#   python src/folder_watcher.py --effective-date 07/01/2025 [--diff-report] [--skip-preflight]
+
+import argparse
+import datetime
+import os
+import queue
+import re
+import sys
+import threading
+import time
+
+# Add the project root to Python path to handle imports when running directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import config, main
+from src.job_service import JobService, DETAIL_JOB_TYPES, TABLE_UPDATE_JOB_TYPE
+
+JOB_FILE_PATTERN = re.compile(rf"^({'|'.join(DETAIL_JOB_TYPES)})_(\d{{6}})\.csv$")
+UPDATE_FOLDER_PATTERN = re.compile(r"^(\d{6})_update$")
+
+
+class FolderWatcher:
+    """
+    Polls the job and table update folders and queues jobs once their files stop changing.
+
+    A file or folder is queued when its signature (sizes and modification times of
+    its CSV files) is unchanged for `settle_seconds`, so partially copied files are
+    not picked up. Jobs wait in a bounded queue and run one at a time on a worker
+    thread; when the queue is full, new jobs stay pending until the next poll.
+    """
+
+    def __init__(self, service: JobService, request_options: dict = None, process_existing: bool = False,
+                 poll_seconds: float = None, settle_seconds: float = None, queue_size: int = None):
+        self.service = service
+        self.request_options = request_options or {}
+        self.poll_seconds = poll_seconds if poll_seconds is not None else config.WATCH_POLL_SECONDS
+        self.settle_seconds = settle_seconds if settle_seconds is not None else config.WATCH_SETTLE_SECONDS
+        self.jobs = queue.Queue(maxsize=queue_size or config.WATCH_QUEUE_SIZE)
+        self.job_folder = config.JOB_FOLDER
+        self.table_updates_folder = service.table_updater.table_updates_folder
+        self.pending = {}    # path -> (signature, time the signature was first seen)
+        self.processed = {}  # path -> signature when queued
+        self.results = []
+        self._stop = threading.Event()
+
+        if not process_existing:
+            # Only files and folders that appear or change from now on are processed
+            for path, _ in self._candidates():
+                self.processed[path] = self._signature(path)
+
+    def _candidates(self):
+        """Yield (path, job request) for every job file and update folder currently present."""
+        if os.path.isdir(self.job_folder):
+            for filename in sorted(os.listdir(self.job_folder)):
+                match = JOB_FILE_PATTERN.match(filename)
+                if match:
+                    path = os.path.join(self.job_folder, filename)
+                    yield path, {"job_type": match.group(1), "job_file": path}
+
+        if os.path.isdir(self.table_updates_folder):
+            for folder in sorted(os.listdir(self.table_updates_folder)):
+                path = os.path.join(self.table_updates_folder, folder)
+                if UPDATE_FOLDER_PATTERN.match(folder) and os.path.isdir(path):
+                    yield path, {"job_type": TABLE_UPDATE_JOB_TYPE, "job_folder": path}
+
+    def _signature(self, path: str):
+        """Sizes and modification times of a job file, or of the CSV files in an update folder."""
+        try:
+            if os.path.isdir(path):
+                files = [os.path.join(path, f) for f in sorted(os.listdir(path)) if f.lower().endswith('.csv')]
+            else:
+                files = [path]
+            signature = []
+            for file_path in files:
+                stat = os.stat(file_path)
+                signature.append((os.path.basename(file_path), stat.st_size, stat.st_mtime_ns))
+            return tuple(signature)
+        except OSError:
+            return None  # Removed or being replaced; look again on the next poll
+
+    def poll(self) -> int:
+        """Check the folders once and queue settled jobs. Returns the number of jobs queued."""
+        queued = 0
+        now = time.monotonic()
+        for path, request in self._candidates():
+            signature = self._signature(path)
+            if not signature or signature == self.processed.get(path):
+                self.pending.pop(path, None)
+                continue
+
+            pending = self.pending.get(path)
+            if pending is None or pending[0] != signature:
+                self.pending[path] = (signature, now)  # New or still being written
+                continue
+            if now - pending[1] < self.settle_seconds:
+                continue
+
+            try:
+                self.jobs.put_nowait((path, {**self.request_options, **request}))
+            except queue.Full:
+                continue  # Stays pending until a worker frees a slot
+
+            print(f"Queued {request['job_type']} job: {path}")
+            self.processed[path] = signature
+            del self.pending[path]
+            queued += 1
+        return queued
+
+    def _worker(self):
+        while True:
+            item = self.jobs.get()
+            if item is None:
+                break
+            path, request = item
+            try:
+                self.results.append(self.run_job(path, request))
+            finally:
+                self.jobs.task_done()
+
+    def run_job(self, path: str, request: dict) -> dict:
+        """Run one queued job through the job service and report its result."""
+        print(f"\n{'='*50}")
+        print(f"Running {request['job_type']} job: {path}")
+        print(f"{'='*50}")
+        if request.get("effective_date") == 'today':
+            request = {**request, "effective_date": datetime.datetime.now().strftime('%m/%d/%Y')}
+        try:
+            result = self.service.submit(request)
+        except ValueError as e:
+            result = {"status": "rejected", "error": str(e), "job_type": request["job_type"]}
+
+        result["path"] = path
+        summary = result.get("summary") or {}
+        location = summary.get("output_dir") or summary.get("database") or result.get("error")
+        print(f"Watch: {os.path.basename(path)} {result['status']} in {result.get('elapsed_seconds', 0)}s: {location}")
+        return result
+
+    def run(self):
+        """Poll until interrupted, running jobs on a worker thread."""
+        worker = threading.Thread(target=self._worker, name="watch-worker", daemon=True)
+        worker.start()
+        print(f"Watching {self.job_folder} and {self.table_updates_folder} "
+              f"(every {self.poll_seconds}s, files settle after {self.settle_seconds}s). Press Ctrl+C to stop.")
+        try:
+            while not self._stop.is_set():
+                self.poll()
+                self._stop.wait(self.poll_seconds)
+        except KeyboardInterrupt:
+            print("\nStopping watch mode after the running job...")
+        finally:
+            self.stop()
+            self.jobs.put(None)
+            worker.join()
+            self.service.close()
+
+    def stop(self):
+        self._stop.set()
+
+
+def parse_args(argv: list = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Process new job files and table update folders as they appear')
+    parser.add_argument('--effective-date', metavar='MM/DD/YYYY',
+                        help="Effective date for rate_update and new_tax jobs, or 'today'. "
+                             'Without it, these job files are rejected')
+    parser.add_argument('--process-existing', action='store_true',
+                        help='Also process the job files and update folders already present at startup')
+    parser.add_argument('--diff-report', action='store_true')
+    parser.add_argument('--unchanged-rows', choices=['keep', 'flag', 'drop'])
+    parser.add_argument('--conflicts', choices=main.CONFLICT_RULES)
+    parser.add_argument('--as-of', nargs='?', const='effective', type=main.parse_as_of_date, metavar='MM/DD/YYYY')
+    parser.add_argument('--partition-by', nargs='?', const='state', metavar='COLUMN')
+    parser.add_argument('--export-parquet', nargs='?', const='all', choices=['all', 'changed'])
+    parser.add_argument('--export-partition-by', nargs='?', const='state', metavar='COLUMN')
+    for flag in ('--dry-run', '--skip-preflight', '--build-indexes', '--drop-indexes', '--verify-copy'):
+        parser.add_argument(flag, action='store_true', help='Table updates: as for table_updater.py')
+    return parser.parse_args(argv)
+
+def build_request_options(args: argparse.Namespace) -> dict:
+    """Turn the command line options into the job service request fields shared by all jobs."""
+    options = {}
+    if args.effective_date:
+        if args.effective_date.lower() == 'today':
+            options["effective_date"] = 'today'  # Resolved when each job runs
+        else:
+            datetime.datetime.strptime(args.effective_date, '%m/%d/%Y')  # Fail at startup, not per job
+            options["effective_date"] = args.effective_date
+    if args.as_of:
+        options["as_of"] = args.as_of if args.as_of == 'effective' else args.as_of.strftime('%m/%d/%Y')
+    if args.unchanged_rows:
+        options["unchanged_rows"] = args.unchanged_rows
+    if args.conflicts:
+        options["conflicts"] = args.conflicts
+    if args.partition_by:
+        options["partition_by"] = args.partition_by
+    if args.export_parquet:
+        options["export_parquet"] = args.export_parquet
+        options["export_partition_by"] = args.export_partition_by
+    for key in ('diff_report', 'dry_run', 'skip_preflight', 'build_indexes', 'drop_indexes', 'verify_copy'):
+        if getattr(args, key):
+            options[key] = True
+    return options
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        request_options = build_request_options(args)
+    except ValueError:
+        print(f"Error: invalid effective date '{args.effective_date}', expected MM/DD/YYYY or 'today'")
+        sys.exit(1)
+    FolderWatcher(JobService(), request_options, process_existing=args.process_existing).run()
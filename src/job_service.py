@@ -0,0 +1,302 @@
+# src/job_service.py
+# Long-running local job service: keeps the database connection, geocode lookups
+# and table schemas warm between jobs, and accepts jobs over localhost HTTP.
+#
+#   python src/job_service.py serve [--port PORT]
+#   python src/job_service.py submit rate_update --effective-date 07/01/2025 [--job-file PATH]
+#   python src/job_service.py submit table_update [--job-folder FOLDER] [--dry-run]
+
+import argparse
+import datetime
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add the project root to Python path to handle imports when running directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import config, db_handler, file_handler, logger, main
+from src.row_cache import get_database_fingerprint
+from table_updates.table_updater import TableUpdater
+
+DETAIL_JOB_TYPES = ["rate_update", "new_tax", "new_authority", "jurisdiction_update"]
+TABLE_UPDATE_JOB_TYPE = "table_update"
+
+
+class JobService:
+    """
+    Runs submitted jobs one at a time against warm, in-memory state.
+
+    The source database stays open read-only between jobs and is reopened
+    (with the lookup and schema caches emptied) when its file changes.
+    """
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or config.DATABASE_PATH
+        self.connection = None
+        self.db_fingerprint = None
+        self.table_updater = TableUpdater()
+        self.table_updater.schema_cache = {}
+        self.started = time.time()
+        self.jobs_run = 0
+        self.current_job = None
+        self.last_job = None
+        self._lock = threading.Lock()  # Jobs share the connection and the module-level logs
+
+    def status(self) -> dict:
+        """Return the service state, for GET /status."""
+        return {
+            "database": self.db_path,
+            "connected": self.connection is not None,
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "jobs_run": self.jobs_run,
+            "current_job": self.current_job,
+            "last_job": self.last_job
+        }
+
+    def _ensure_connection(self):
+        """Open the database read-only, or reopen it if the file changed since the last job."""
+        fingerprint = get_database_fingerprint(self.db_path)
+        if self.connection is not None and fingerprint == self.db_fingerprint:
+            return
+
+        self.close()
+        print(f"Connecting to database: {self.db_path}")
+        self.connection = db_handler.connect_to_duckdb(self.db_path, read_only=True)
+        self.db_fingerprint = fingerprint
+        db_handler.set_lookup_cache(True)
+        self.table_updater.schema_cache = {}
+
+    def close(self):
+        """Close the held database connection."""
+        if self.connection:
+            try:
+                self.connection.close()
+            except Exception:
+                pass  # Don't let connection close errors fail the cleanup
+        self.connection = None
+        self.db_fingerprint = None
+
+    def submit(self, request: dict) -> dict:
+        """
+        Run one job request and return its result.
+        Raises ValueError for invalid requests; job failures are reported in the result.
+        """
+        job_type = request.get("job_type")
+        if job_type not in DETAIL_JOB_TYPES + [TABLE_UPDATE_JOB_TYPE]:
+            raise ValueError(f"job_type must be one of: {', '.join(DETAIL_JOB_TYPES + [TABLE_UPDATE_JOB_TYPE])}")
+
+        if job_type == TABLE_UPDATE_JOB_TYPE:
+            job = self._table_update_job(request)
+        else:
+            job = self._detail_job(job_type, request)
+
+        with self._lock:
+            self.current_job = {"job_type": job_type, "started": datetime.datetime.now().isoformat()}
+            start_time = time.time()
+            logger.clear_logs()
+            try:
+                summary = job()
+                failed = summary.get("status") == "preflight_failed"
+                result = {"status": "failed" if failed else "completed", "summary": summary}
+            except SystemExit as e:
+                # Raised by log_error(is_critical=True), or a job that stopped early
+                print(f"\nA critical error occurred: {e}")
+                result = {"status": "failed", "error": str(e), "errors_file": main.save_critical_error_log()}
+            except Exception as e:
+                print(f"\nAn unexpected error occurred: {e}")
+                result = {"status": "failed", "error": str(e)}
+            finally:
+                logger.clear_logs()
+                self.current_job = None
+
+            result["job_type"] = job_type
+            result["elapsed_seconds"] = round(time.time() - start_time, 3)
+            self.jobs_run += 1
+            self.last_job = {key: result[key] for key in ("job_type", "status", "elapsed_seconds")}
+            return result
+
+    def _detail_job(self, job_prefix: str, request: dict):
+        """Validate a rate_update/new_tax/new_authority/jurisdiction_update request and return the callable that runs it."""
+        job_file_path = request.get("job_file")
+        if job_file_path and not os.path.isabs(job_file_path):
+            job_file_path = os.path.join(config.JOB_FOLDER, job_file_path)
+        if job_file_path and not os.path.exists(job_file_path):
+            raise ValueError(f"Job file not found: {job_file_path}")
+
+        effective_date = None
+        if job_prefix != "new_authority":
+            try:
+                effective_date = datetime.datetime.strptime(request.get("effective_date") or "", '%m/%d/%Y')
+            except ValueError:
+                raise ValueError("effective_date is required, in MM/DD/YYYY format")
+
+        options = main.parse_args([])
+        options.diff_report = bool(request.get("diff_report", False))
+        options.partition_by = request.get("partition_by", options.partition_by)
+        options.unchanged_rows = request.get("unchanged_rows", options.unchanged_rows)
+        if options.unchanged_rows not in ('keep', 'flag', 'drop'):
+            raise ValueError("unchanged_rows must be one of: keep, flag, drop")
+        options.conflicts = request.get("conflicts", options.conflicts)
+        if options.conflicts not in main.CONFLICT_RULES:
+            raise ValueError(f"conflicts must be one of: {', '.join(main.CONFLICT_RULES)}")
+        if request.get("as_of"):
+            try:
+                options.as_of = main.parse_as_of_date(request["as_of"])
+            except argparse.ArgumentTypeError as e:
+                raise ValueError(f"as_of: {e}")
+
+        def run_job():
+            path = job_file_path or file_handler.find_latest_job_file(config.JOB_FOLDER, job_prefix)
+            if not path:
+                logger.log_error(f"CRITICAL: No job file found for type '{job_prefix}'.", is_critical=True)
+            print(f"Found job file: {os.path.basename(path)}")
+            self._ensure_connection()
+            if not self.connection:
+                raise SystemExit("Could not connect to the database")
+            summary = main.execute_job(self.connection, job_prefix, path, effective_date, options)
+            if summary is None:
+                raise SystemExit("Job stopped before writing its output")
+            return summary
+
+        return run_job
+
+    def _table_update_job(self, request: dict):
+        """Validate a table_update request and return the callable that runs it."""
+        updater = self.table_updater
+        job_folder = request.get("job_folder")
+        if job_folder and not os.path.isabs(job_folder):
+            job_folder = os.path.join(updater.base_dir, job_folder)
+        if job_folder and not os.path.exists(job_folder):
+            raise ValueError(f"Job folder not found: {job_folder}")
+
+        flags = {flag: bool(request.get(flag, False))
+                 for flag in ("dry_run", "skip_preflight", "preflight_only", "build_indexes", "drop_indexes",
+                              "verify_copy")}
+        if request.get("export_parquet") not in (None, "all", "changed"):
+            raise ValueError("export_parquet must be one of: all, changed")
+        flags["export_parquet"] = request.get("export_parquet")
+        flags["export_partition_by"] = request.get("export_partition_by")
+
+        def run_job():
+            # Keeps the schemas cached for the source database; the copy is made from it
+            self._ensure_connection()
+            return updater.run_job_folder(job_folder or updater.find_latest_update_folder(), self.db_path, **flags)
+
+        return run_job
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """HTTP interface of the job service: GET /status and POST /jobs."""
+
+    service = None  # Set by serve()
+
+    def do_GET(self):
+        if self.path.rstrip('/') == "/status":
+            self._send_json(200, self.service.status())
+        else:
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+
+    def do_POST(self):
+        if self.path.rstrip('/') != "/jobs":
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("Request body must be a JSON object")
+            result = self.service.submit(request)
+        except (ValueError, json.JSONDecodeError) as e:
+            self._send_json(400, {"status": "rejected", "error": str(e)})
+            return
+
+        self._send_json(200 if result["status"] == "completed" else 500, result)
+
+    def _send_json(self, code: int, body: dict):
+        data = json.dumps(body, indent=2, default=str).encode('utf-8')
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        print(f"[{self.log_date_time_string()}] {format % args}")
+
+
+def serve(port: int = None):
+    """Run the job service on localhost until interrupted."""
+    port = port or config.JOB_SERVICE_PORT
+    service = JobService()
+    JobRequestHandler.service = service
+    server = ThreadingHTTPServer(("127.0.0.1", port), JobRequestHandler)
+    print(f"Job service listening on http://127.0.0.1:{port} (database: {service.db_path})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping job service...")
+    finally:
+        server.server_close()
+        service.close()
+
+def submit(request: dict, port: int = None) -> dict:
+    """Submit a job to a running service and return its result."""
+    port = port or config.JOB_SERVICE_PORT
+    http_request = urllib.request.Request(
+        f"http://127.0.0.1:{port}/jobs",
+        data=json.dumps(request).encode('utf-8'),
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+    try:
+        with urllib.request.urlopen(http_request) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return json.loads(e.read())
+
+def parse_args(argv: list = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Local job service with a warm database connection')
+    parser.add_argument('--port', type=int, default=config.JOB_SERVICE_PORT,
+                        help=f'Localhost port of the service (default: {config.JOB_SERVICE_PORT})')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('serve', help='Start the job service')
+
+    submit_parser = commands.add_parser('submit', help='Submit a job to the running service')
+    submit_parser.add_argument('job_type', choices=DETAIL_JOB_TYPES + [TABLE_UPDATE_JOB_TYPE])
+    submit_parser.add_argument('--job-file', help='Job CSV (default: latest in the job folder)')
+    submit_parser.add_argument('--effective-date', metavar='MM/DD/YYYY', help='Effective date of rate_update and new_tax jobs')
+    submit_parser.add_argument('--diff-report', action='store_true')
+    submit_parser.add_argument('--unchanged-rows', choices=['keep', 'flag', 'drop'])
+    submit_parser.add_argument('--conflicts', choices=main.CONFLICT_RULES)
+    submit_parser.add_argument('--as-of', nargs='?', const='effective', metavar='MM/DD/YYYY')
+    submit_parser.add_argument('--partition-by', nargs='?', const='state', metavar='COLUMN')
+    submit_parser.add_argument('--job-folder', help='table_update: job folder (default: latest)')
+    submit_parser.add_argument('--export-parquet', nargs='?', const='all', choices=['all', 'changed'])
+    submit_parser.add_argument('--export-partition-by', nargs='?', const='state', metavar='COLUMN')
+    for flag in ('--dry-run', '--skip-preflight', '--preflight-only', '--build-indexes', '--drop-indexes',
+                 '--verify-copy'):
+        submit_parser.add_argument(flag, action='store_true', help='table_update: as for table_updater.py')
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == 'serve':
+        serve(args.port)
+    else:
+        request = {key: value for key, value in vars(args).items()
+                   if key not in ('command', 'port') and value not in (None, False)}
+        try:
+            result = submit(request, args.port)
+        except urllib.error.URLError as e:
+            print(f"Error: Job service not reachable on port {args.port}: {e.reason}")
+            sys.exit(1)
+        print(json.dumps(result, indent=2))
+        sys.exit(0 if result.get("status") == "completed" else 1)
@@ -0,0 +1,198 @@
+# src/jurisdiction_matcher.py
+# Matching of the state, county, city and tax_district of job rows that find no geocode as
+# written ("Harris County", "santa monica", "Los Angles") to the names in the geocode table.
+# A name is compared by its key - upper case, punctuation removed, affixes like COUNTY and
+# CITY OF stripped - and failing that by edit distance to the names sharing trigrams with it.
+# The names are read with one query when the first row needs them; every later row is
+# matched in memory, within the names of its parent jurisdictions (the counties of its state).
+
+import os
+import re
+import sys
+from collections import Counter, defaultdict
+
+import pandas as pd
+
+# Add the project root to Python path to handle imports when running directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import config, db_handler
+
+LEVELS = ['state', 'county', 'city', 'tax_district']
+
+# Words around a name that the geocode table leaves out: level -> (prefixes, suffixes)
+_AFFIXES = {
+    'county': (['COUNTY OF '], [' COUNTY OF', ' COUNTY', ' PARISH', ' BOROUGH']),
+    'city': (['CITY OF ', 'TOWN OF ', 'VILLAGE OF '], [' CITY OF', ' TOWN OF', ' CITY']),
+}
+
+# Words written both ways in job files
+_ABBREVIATIONS = {'SAINT': 'ST', 'SAINTE': 'STE', 'FORT': 'FT', 'MOUNT': 'MT'}
+
+# Names sharing fewer trigrams with a value (of the trigrams of both) are never suggested
+_MIN_SIMILARITY = 0.3
+
+_APOSTROPHES = re.compile(r"['’]")
+_PUNCTUATION = re.compile(r"[^\w\s]|_")
+
+
+def normalize_name(value: str, level: str) -> str:
+    """The key of a name: 'Harris County' and 'HARRIS' have the same key for level 'county'."""
+    key = _PUNCTUATION.sub(" ", _APOSTROPHES.sub("", str(value).upper()))
+    key = " ".join(_ABBREVIATIONS.get(word, word) for word in key.split())
+    prefixes, suffixes = _AFFIXES.get(level, ([], []))
+    for prefix in prefixes:
+        if key.startswith(prefix) and len(key) > len(prefix):
+            key = key[len(prefix):]
+            break
+    for suffix in suffixes:
+        if key.endswith(suffix) and len(key) > len(suffix):
+            key = key[:-len(suffix)]
+            break
+    return key
+
+def trigrams(key: str) -> set:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance: the insertions, deletions and substitutions turning a into b."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+def allowed_edits(key: str) -> int:
+    """Edits a near-miss may have: at most one per 4 characters, so 'CA' never becomes 'LA'."""
+    return min(config.JURISDICTION_MATCH_MAX_EDITS, len(key.replace(" ", "")) // 4)
+
+
+class NameIndex:
+    """The names of one level within one parent jurisdiction, e.g. the counties of TX."""
+
+    def __init__(self, level: str, names: set):
+        self.level = level
+        self.names = names
+        self.by_key = defaultdict(set)
+        for name in names:
+            self.by_key[normalize_name(name, level)].add(name)
+        self._postings = None
+        self._trigram_counts = None
+        self._matches = {}  # Job rows repeat the same names
+
+    def _similar_keys(self, key: str, limit: int) -> list:
+        """The keys sharing the most trigrams with key, most similar first; none below _MIN_SIMILARITY."""
+        if self._postings is None:
+            self._postings = defaultdict(list)
+            self._trigram_counts = {}
+            for indexed_key in self.by_key:
+                key_trigrams = trigrams(indexed_key)
+                self._trigram_counts[indexed_key] = len(key_trigrams)
+                for trigram in key_trigrams:
+                    self._postings[trigram].append(indexed_key)
+        query = trigrams(key)
+        shared = Counter()
+        for trigram in query:
+            shared.update(self._postings.get(trigram, ()))
+        similarity = {}
+        for indexed_key, count in shared.items():
+            value = count / (len(query) + self._trigram_counts[indexed_key] - count)
+            if value >= _MIN_SIMILARITY:
+                similarity[indexed_key] = value
+        return sorted(similarity, key=lambda indexed_key: (-similarity[indexed_key], indexed_key))[:limit]
+
+    def match(self, value: str) -> tuple[str | None, bool, list]:
+        """
+        Match a job file value to one of the names.
+        Returns (name, near_miss, suggestions): the name (None if there is no unique match),
+        whether it differs from the value by more than case and spacing, and otherwise the
+        closest names.
+        """
+        if value not in self._matches:
+            self._matches[value] = self._match(value)
+        return self._matches[value]
+
+    def _match(self, value: str) -> tuple[str | None, bool, list]:
+        written = " ".join(str(value).split()).upper()
+        if written in self.names:
+            return written, False, []
+
+        key = normalize_name(value, self.level)
+        names = self.by_key.get(key, set())
+        if len(names) == 1:
+            return next(iter(names)), True, []
+        if names:
+            return None, False, sorted(names)
+
+        candidates = self._similar_keys(key, max(10, config.JURISDICTION_MATCH_SUGGESTIONS))
+        distances = {candidate: edit_distance(key, candidate) for candidate in candidates}
+        ranked = sorted(candidates, key=lambda candidate: distances[candidate])
+        if ranked and distances[ranked[0]] <= allowed_edits(key) and len(self.by_key[ranked[0]]) == 1 and \
+                (len(ranked) == 1 or distances[ranked[1]] > distances[ranked[0]]):
+            return next(iter(self.by_key[ranked[0]])), True, []
+        suggestions = [name for candidate in ranked for name in sorted(self.by_key[candidate])]
+        return None, False, suggestions[:config.JURISDICTION_MATCH_SUGGESTIONS]
+
+
+class JurisdictionMatcher:
+    """
+    Matches the jurisdiction names of job rows to the geocode table.
+    Create one per job; the names are read from the database on the first call to resolve().
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._rows = None
+        self._indexes = {}  # (level, parent levels) -> {parent names: NameIndex}
+
+    def _index(self, level: str, parents: dict) -> NameIndex | None:
+        """The names of level within the given parent jurisdictions ({level: name})."""
+        if self._rows is None:
+            self._rows = db_handler.get_jurisdiction_names(self.conn)
+        parent_levels = tuple(parents)
+        if (level, parent_levels) not in self._indexes:
+            names = defaultdict(set)
+            position = LEVELS.index(level)
+            parent_positions = [LEVELS.index(parent) for parent in parent_levels]
+            for row in self._rows:
+                if row[position]:
+                    names[tuple(row[i] for i in parent_positions)].add(row[position])
+            self._indexes[(level, parent_levels)] = {
+                parent_names: NameIndex(level, level_names) for parent_names, level_names in names.items()
+            }
+        return self._indexes[(level, parent_levels)].get(tuple(parents.values()))
+
+    def resolve(self, criteria: pd.Series, levels: list = LEVELS) -> tuple[pd.Series | None, list, str | None]:
+        """
+        Replace the names of the given levels in a job row with the names in the geocode table.
+        Returns (criteria, warnings, problem):
+        - criteria: a copy of the row with the matched names, None if a name has no unique match
+        - warnings: one status warning per near-miss that was matched
+        - problem: for an unmatched name, what was not found and the closest names
+        """
+        resolved = criteria.copy()
+        parents = {}
+        warnings = []
+        for level in levels:
+            value = criteria.get(level)
+            if value is None or pd.isna(value) or not str(value).strip():
+                continue
+            index = self._index(level, parents)
+            name, near_miss, suggestions = index.match(value) if index else (None, False, [])
+            if name is None:
+                problem = f"{level} '{value}' not found"
+                if parents:
+                    problem += f" in {', '.join(parents.values())}"
+                if suggestions:
+                    problem += f" (did you mean {', '.join(repr(suggestion) for suggestion in suggestions)}?)"
+                return None, warnings, problem
+            if near_miss:
+                warnings.append(f"Warning: matched {level} '{value}' to '{name}'")
+            resolved[level] = name
+            parents[level] = name
+        return resolved, warnings, None
@@ -25,6 +25,10 @@ def log_error(message: str, context: dict = None, is_critical: bool = False):
         # The main script will handle saving logs and exiting
         raise SystemExit(message)
 
+def clear_logs():
+    """Removes all collected logs, e.g. between jobs run by one long-lived process."""
+    LOGS.clear()
+
 def get_logs():
     """Returns all collected logs."""
     return LOGS
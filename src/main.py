@@ -2,16 +2,27 @@
 # This file ties everything together.
 
 # --- Imports ---
+import argparse
 import datetime
 import pandas as pd
+import pyarrow as pa
 import os
+import re
+import json
 import sys
 from decimal import Decimal
 
 # Add the project root to Python path to handle imports when running directly
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src import config, db_handler, file_handler, logger
+from src import config, db_handler, duckdb_resources, file_handler, logger
+from src.row_cache import RowCache
+from src.output_builder import OutputBuilder
+from src.metrics import RunMetrics
+from src.profiler import PROFILE_MODES, start_profiler
+from src.sql_log import LoggedConnection, StatementLog
+from src.memory_tracker import start_memory_tracker
+from src.jurisdiction_matcher import JurisdictionMatcher
 
 # --- Helper Functions ---
 def get_effective_date_from_user():
@@ -50,12 +61,16 @@ def get_effective_date_from_user():
     return None
 
 # --- Processing Functions ---
-def process_rate_update_job(db_connection, job_df: pd.DataFrame, effective_date: datetime.datetime) -> list:
+def process_job_rows(job_df: pd.DataFrame, process_row, row_cache=None, cache_scope: dict = None) -> OutputBuilder:
     """
-    Process rate update job with existing logic.
-    Returns list of output rows with status tracking.
+    Run `process_row(job_row, row_number)` for every job row and collect the output rows.
+    When a row cache is provided, unchanged rows reuse their cached output and log entries
+    instead of repeating the database lookups.
+    `process_row` returns the output rows of a job row as a list of row dicts or as an Arrow table.
+    Each output row records the job row it came from in the hidden '_job_row' field.
+    Returns the output rows collected column by column in an OutputBuilder.
     """
-    output_rows = []
+    output_rows = OutputBuilder(config.OUTPUT_CATEGORICAL_COLUMNS)
     
     print("\nProcessing rows...")
     
@@ -63,302 +78,428 @@ def process_rate_update_job(db_connection, job_df: pd.DataFrame, effective_date:
         row_number = index + 1
         print(f"Processing row {row_number}/{len(job_df)}", end="\r")
         
-        # Validate required fields
-        if pd.isna(job_row.get('tax_type')):
-            logger.log_error(f"Row {row_number}: Missing required field 'tax_type'. Skipping.", 
-                            {"row_number": row_number, "row_data": job_row.to_dict()})
-            continue
-        
-        if pd.isna(job_row.get('tax_cat')):
-            logger.log_error(f"Row {row_number}: Missing required field 'tax_cat'. Skipping.", 
-                            {"row_number": row_number, "row_data": job_row.to_dict()})
-            continue
+        cache_key = None
+        if row_cache is not None:
+            cache_key = row_cache.make_key(cache_scope or {}, job_row)
+            cached = row_cache.get(cache_key, row_number)
+            if cached is not None:
+                cached_rows, cached_logs = cached
+                output_rows.extend(set_job_row(cached_rows, row_number))
+                logger.LOGS.extend(cached_logs)
+                continue
         
-        if pd.isna(job_row.get('new_rate')):
-            logger.log_error(f"Row {row_number}: Missing required field 'new_rate'. Skipping.", 
-                            {"row_number": row_number, "row_data": job_row.to_dict()})
-            continue
+        log_start = len(logger.LOGS)
+        row_output = set_job_row(process_row(job_row, row_number), row_number)
+        output_rows.extend(row_output)
         
-        if pd.isna(job_row.get('old_fee')):
-            logger.log_error(f"Row {row_number}: Missing required field 'old_fee'. Skipping.", 
-                            {"row_number": row_number, "row_data": job_row.to_dict()})
-            continue
+        if cache_key is not None:
+            row_cache.put(cache_key, row_output, logger.LOGS[log_start:])
+    
+    return output_rows
 
-        if pd.isna(job_row.get('new_fee')):
-            logger.log_error(f"Row {row_number}: Missing required field 'new_fee'. Skipping.", 
-                            {"row_number": row_number, "row_data": job_row.to_dict()})
-            continue
-        
-        # Get list of geocodes from db_handler.
-        geocodes = db_handler.get_geocodes_from_db(db_connection, job_row)
-        
-        # If no geocodes, log an error and continue to next row.
-        if not geocodes:
-            logger.log_error(f"Row {row_number}: No geocodes found for criteria. Skipping.", 
-                            {"row_number": row_number, "criteria": job_row.to_dict()})
-            continue
-        
-        # Get matching detail rows from db_handler.
-        # Ensure tax_type and tax_cat are formatted as 2-digit strings (e.g., 4 -> "04")
-        tax_type_raw = job_row['tax_type']
-        tax_cat_raw = job_row['tax_cat']
-        
-        if pd.notna(tax_type_raw):
-            # Handle both numeric and alphanumeric tax_type values
-            try:
-                # Try converting to int first (for numeric values like 4 -> "04")
-                tax_type_formatted = str(int(tax_type_raw)).zfill(2)
-            except (ValueError, TypeError):
-                # For non-numeric values (like 'FF'), use as string and ensure 2 characters
-                tax_type_str = str(tax_type_raw).strip().upper()
-                tax_type_formatted = tax_type_str.zfill(2)[:2]  # Pad if needed, truncate if too long
-        else:
-            tax_type_formatted = ""
+def get_row_settings(job_type: str) -> dict:
+    """
+    Return the settings that change the output rows of a job, for the row cache scope.
+    config.py is part of the code fingerprint, but settings changed at runtime only show up here.
+    """
+    settings = {"jurisdiction_matching": config.JURISDICTION_MATCHING,
+                "jurisdiction_match_max_edits": config.JURISDICTION_MATCH_MAX_EDITS,
+                "jurisdiction_match_suggestions": config.JURISDICTION_MATCH_SUGGESTIONS}
+    if job_type == "new_tax":
+        settings.update({"required_fields": config.NEW_TAX_REQUIRED_FIELDS, "defaults": config.NEW_TAX_DEFAULTS,
+                         "detail_schema": config.DETAIL_TABLE_SCHEMA})
+    return settings
+
+def set_job_row(rows, row_number: int):
+    """Set the hidden '_job_row' field of output rows given as row dicts or as an Arrow table."""
+    if isinstance(rows, pa.Table):
+        return set_table_column(rows, '_job_row', pa.repeat(pa.scalar(row_number, pa.int64()), rows.num_rows))
+    for output_row in rows:
+        output_row['_job_row'] = row_number
+    return rows
+
+def set_table_column(table: pa.Table, name: str, values) -> pa.Table:
+    """Replace the column `name` of an Arrow table, or add it as the last column."""
+    index = table.schema.get_field_index(name)
+    if index < 0:
+        return table.append_column(name, values)
+    return table.set_column(index, name, values)
+
+def find_geocodes(db_connection, job_row: pd.Series, row_number: int, lookup, matcher: JurisdictionMatcher | None,
+                  levels: list) -> tuple[list, list]:
+    """
+    Find the geocodes of a job row with `lookup` (a db_handler geocode lookup).
+    A row matching no geocode as written is looked up again with the names of `levels`
+    matched by `matcher` ("Harris County" -> "HARRIS"), which is built once per job.
+    Returns (geocodes, status warnings of the names matched); when no geocodes are found,
+    the error is logged with the closest names.
+    """
+    geocodes = lookup(db_connection, job_row)
+    warnings = []
+    problem = None
+    if not geocodes and matcher is not None:
+        resolved, warnings, problem = matcher.resolve(job_row, levels)
+        if resolved is not None and not resolved.equals(job_row):
+            geocodes = lookup(db_connection, resolved)
+    
+    if not geocodes:
+        message = f"No geocodes found for criteria: {problem}" if problem else "No geocodes found for criteria"
+        logger.log_error(f"Row {row_number}: {message}. Skipping.", 
+                        {"row_number": row_number, "criteria": job_row.to_dict()})
+        return [], []
+    
+    for warning in warnings:
+        logger.log_warning(f"Row {row_number}: {warning.removeprefix('Warning: ')}", {"row_number": row_number})
+    return geocodes, warnings
+
+def process_rate_update_job(db_connection, job_df: pd.DataFrame, effective_date: datetime.datetime, row_cache=None,
+                            as_of: datetime.datetime = None) -> OutputBuilder:
+    """
+    Process rate update job with existing logic.
+    With `as_of`, only the detail version in force on that date is updated, instead of every version.
+    Returns the output rows with status tracking.
+    """
+    cache_scope = {"job_type": "rate_update", "effective_date": effective_date.strftime('%Y-%m-%d'),
+                   "as_of": as_of.strftime('%Y-%m-%d') if as_of else None, "settings": get_row_settings("rate_update")}
+    matcher = JurisdictionMatcher(db_connection) if config.JURISDICTION_MATCHING else None
+    
+    return process_job_rows(
+        job_df,
+        lambda job_row, row_number: process_rate_update_row(db_connection, job_row, row_number, effective_date, as_of,
+                                                            matcher),
+        row_cache,
+        cache_scope
+    )
+
+def process_rate_update_row(db_connection, job_row: pd.Series, row_number: int, effective_date: datetime.datetime,
+                            as_of: datetime.datetime = None, matcher: JurisdictionMatcher = None) -> list:
+    """
+    Process a single rate update job row.
+    Returns the output rows generated for it as an Arrow table built from the detail rows
+    (an empty list if the row was skipped).
+    """
+    output_rows = []
+    
+    # Validate required fields
+    if pd.isna(job_row.get('tax_type')):
+        logger.log_error(f"Row {row_number}: Missing required field 'tax_type'. Skipping.", 
+                        {"row_number": row_number, "row_data": job_row.to_dict()})
+        return output_rows
+    
+    if pd.isna(job_row.get('tax_cat')):
+        logger.log_error(f"Row {row_number}: Missing required field 'tax_cat'. Skipping.", 
+                        {"row_number": row_number, "row_data": job_row.to_dict()})
+        return output_rows
+    
+    if pd.isna(job_row.get('new_rate')):
+        logger.log_error(f"Row {row_number}: Missing required field 'new_rate'. Skipping.", 
+                        {"row_number": row_number, "row_data": job_row.to_dict()})
+        return output_rows
+    
+    if pd.isna(job_row.get('old_fee')):
+        logger.log_error(f"Row {row_number}: Missing required field 'old_fee'. Skipping.", 
+                        {"row_number": row_number, "row_data": job_row.to_dict()})
+        return output_rows
+
+    if pd.isna(job_row.get('new_fee')):
+        logger.log_error(f"Row {row_number}: Missing required field 'new_fee'. Skipping.", 
+                        {"row_number": row_number, "row_data": job_row.to_dict()})
+        return output_rows
+    
+    # Get list of geocodes from db_handler; if none are found, the error is logged and we continue to next row.
+    geocodes, match_warnings = find_geocodes(db_connection, job_row, row_number, db_handler.get_geocodes_from_db,
+                                             matcher, ['state', 'county', 'city'])
+    if not geocodes:
+        return output_rows
+    
+    # Get matching detail rows from db_handler.
+    # Ensure tax_type and tax_cat are formatted as 2-digit strings (e.g., 4 -> "04")
+    tax_type_raw = job_row['tax_type']
+    tax_cat_raw = job_row['tax_cat']
+    
+    if pd.notna(tax_type_raw):
+        # Handle both numeric and alphanumeric tax_type values
+        try:
+            # Try converting to int first (for numeric values like 4 -> "04")
+            tax_type_formatted = str(int(tax_type_raw)).zfill(2)
+        except (ValueError, TypeError):
+            # For non-numeric values (like 'FF'), use as string and ensure 2 characters
+            tax_type_str = str(tax_type_raw).strip().upper()
+            tax_type_formatted = tax_type_str.zfill(2)[:2]  # Pad if needed, truncate if too long
+    else:
+        tax_type_formatted = ""
+    
+    if pd.notna(tax_cat_raw):
+        # Handle both numeric and alphanumeric tax_cat values
+        try:
+            # Try converting to int first (for numeric values like 1 -> "01")
+            tax_cat_formatted = str(int(tax_cat_raw)).zfill(2)
+        except (ValueError, TypeError):
+            # For non-numeric values (like 'FF'), use as string and ensure 2 characters
+            tax_cat_str = str(tax_cat_raw).strip().upper()
+            tax_cat_formatted = tax_cat_str.zfill(2)[:2]  # Pad if needed, truncate if too long
+    else:
+        tax_cat_formatted = ""
+    
+    detail_rows = db_handler.get_detail_rows_from_db(
+        db_connection, 
+        geocodes, 
+        tax_type_formatted,
+        tax_cat_formatted,
+        job_row.get('description'),
+        as_of
+    )
+    
+    if detail_rows.num_rows == 0:
+        logger.log_error(f"Row {row_number}: No detail rows found for geocodes, tax_type, and tax_cat. Skipping.", 
+                         {"row_number": row_number, "geocodes": geocodes, 
+                          "tax_type_raw": job_row['tax_type'], "tax_type_formatted": tax_type_formatted,
+                          "tax_cat_raw": job_row['tax_cat'], "tax_cat_formatted": tax_cat_formatted})
+        return output_rows
+    
+    # The new rate and fee are the same for every detail row of the job row
+    # Note: new_rate and new_fee are already validated as non-null in the required fields check
+    new_rate_error = new_fee_error = None
+    try:
+        new_rate = float(Decimal(str(job_row['new_rate'])) / 100)
+    except (ValueError, TypeError, ArithmeticError) as e:
+        new_rate_error = e
+    try:
+        new_fee_decimal = Decimal(str(job_row['new_fee']))
+        new_fee = float(new_fee_decimal)
+    except (ValueError, TypeError, ArithmeticError) as e:
+        new_fee_error = e
+    
+    # Only the columns validated here become Python values; the other columns stay in Arrow buffers
+    geocode_column = detail_rows.column('geocode').to_pylist()
+    rate_column = detail_rows.column('tax_rate').to_pylist()
+    fee_column = detail_rows.column('fee').to_pylist()
+    emitted_rows = []
+    statuses = []
+    
+    # Process each detail row
+    for i in range(detail_rows.num_rows):
+        # Initialize status tracking for this output row, starting with the jurisdiction names matched
+        status_issues = list(match_warnings)
         
-        if pd.notna(tax_cat_raw):
-            # Handle both numeric and alphanumeric tax_cat values
+        # Rate Validation: Compare job_row['old_rate'] / 100 with the detail row's tax_rate
+        if pd.notna(job_row.get('old_rate')):
             try:
-                # Try converting to int first (for numeric values like 1 -> "01")
-                tax_cat_formatted = str(int(tax_cat_raw)).zfill(2)
-            except (ValueError, TypeError):
-                # For non-numeric values (like 'FF'), use as string and ensure 2 characters
-                tax_cat_str = str(tax_cat_raw).strip().upper()
-                tax_cat_formatted = tax_cat_str.zfill(2)[:2]  # Pad if needed, truncate if too long
-        else:
-            tax_cat_formatted = ""
-        
-        detail_df = db_handler.get_detail_rows_from_db(
-            db_connection, 
-            geocodes, 
-            tax_type_formatted,
-            tax_cat_formatted,
-            job_row.get('description')
-        )
-        
-        if detail_df.empty:
-            logger.log_error(f"Row {row_number}: No detail rows found for geocodes, tax_type, and tax_cat. Skipping.", 
-                             {"row_number": row_number, "geocodes": geocodes, 
-                              "tax_type_raw": job_row['tax_type'], "tax_type_formatted": tax_type_formatted,
-                              "tax_cat_raw": job_row['tax_cat'], "tax_cat_formatted": tax_cat_formatted})
-            continue
-        
-        # Process each detail row
-        for _, detail_row in detail_df.iterrows():
-            # Initialize status tracking for this output row
-            status_issues = []
-            
-            # Rate Validation: Compare job_row['old_rate'] / 100 with detail_row['tax_rate']
-            if pd.notna(job_row.get('old_rate')):
-                try:
-                    csv_old_rate = Decimal(str(job_row['old_rate'])) / 100
-                    db_tax_rate = Decimal(str(detail_row['tax_rate']))
-                    
-                    if csv_old_rate != db_tax_rate:
-                        # Log to errors.json as before
-                        logger.log_warning(
-                            f"Row {row_number}: Rate mismatch for geocode {detail_row['geocode']}. "
-                            f"CSV old_rate: {csv_old_rate}, DB tax_rate: {db_tax_rate}",
-                            {
-                                "row_number": row_number,
-                                "geocode": detail_row['geocode'],
-                                "csv_old_rate": float(csv_old_rate),
-                                "db_tax_rate": float(db_tax_rate)
-                            }
-                        )
-                        # Add to status for this output row
-                        status_issues.append("Warning: rate mismatch")
-                        
-                except (ValueError, TypeError) as e:
+                csv_old_rate = Decimal(str(job_row['old_rate'])) / 100
+                db_tax_rate = Decimal(str(rate_column[i]))
+                
+                if csv_old_rate != db_tax_rate:
                     # Log to errors.json as before
-                    logger.log_warning(f"Row {row_number}: Error when comparing rates: {str(e)}", 
-                                       {"row_number": row_number, "error": str(e)})
+                    logger.log_warning(
+                        f"Row {row_number}: Rate mismatch for geocode {geocode_column[i]}. "
+                        f"CSV old_rate: {csv_old_rate}, DB tax_rate: {db_tax_rate}",
+                        {
+                            "row_number": row_number,
+                            "geocode": geocode_column[i],
+                            "csv_old_rate": float(csv_old_rate),
+                            "db_tax_rate": float(db_tax_rate)
+                        }
+                    )
                     # Add to status for this output row
-                    status_issues.append("Warning: failed to compare rates")
-            
-            # Fee Validation: Compare job_row['old_fee'] with detail_row['fee']
-            if pd.notna(job_row.get('old_fee')):
-                try:
-                    csv_old_fee = Decimal(str(job_row['old_fee']))
-                    db_fee = Decimal(str(detail_row['fee']))
+                    status_issues.append("Warning: rate mismatch")
                     
-                    if csv_old_fee != db_fee:
-                        # Log to errors.json as before
-                        logger.log_warning(
-                            f"Row {row_number}: Fee mismatch for geocode {detail_row['geocode']}. "
-                            f"CSV old_fee: {csv_old_fee}, DB fee: {db_fee}",
-                            {
-                                "row_number": row_number,
-                                "geocode": detail_row['geocode'],
-                                "csv_old_fee": float(csv_old_fee),
-                                "db_fee": float(db_fee)
-                            }
-                        )
-                        # Add to status for this output row
-                        status_issues.append("Warning: fee mismatch")
-                        
-                except (ValueError, TypeError) as e:
-                    # Log to errors.json as before
-                    logger.log_warning(f"Row {row_number}: Error when comparing fees: {str(e)}", 
-                                       {"row_number": row_number, "error": str(e)})
-                    # Add to status for this output row
-                    status_issues.append("Warning: failed to compare fees")
-            
-            # Create a copy of the detail_row and update fields
-            new_row = detail_row.copy()
-            
-            # Set 'effective' to the user-specified date in the correct format: 'YYYY-MM-DD'
-            new_row['effective'] = effective_date.strftime('%Y-%m-%d')
-            
-            # Set 'tax_rate' to job_row['new_rate'] / 100
-            # Note: new_rate is already validated as non-null in the required fields check
-            try:
-                new_rate_decimal = Decimal(str(job_row['new_rate'])) / 100
-                new_row['tax_rate'] = float(new_rate_decimal)
             except (ValueError, TypeError) as e:
                 # Log to errors.json as before
-                logger.log_error(f"Row {row_number}: Invalid new_rate value: {job_row.get('new_rate')}", 
-                                 {"row_number": row_number, "new_rate": job_row.get('new_rate'), "error": str(e)})
+                logger.log_warning(f"Row {row_number}: Error when comparing rates: {str(e)}", 
+                                   {"row_number": row_number, "error": str(e)})
                 # Add to status for this output row
-                status_issues.append("Error: invalid new_rate")
-                continue
-            
-            # Set 'fee' to job_row['new_fee']
-            # Note: new_fee is already validated as non-null in the required fields check
+                status_issues.append("Warning: failed to compare rates")
+        
+        # Fee Validation: Compare job_row['old_fee'] with the detail row's fee
+        if pd.notna(job_row.get('old_fee')):
             try:
-                new_fee_decimal = Decimal(str(job_row['new_fee']))
-                
-                # Validate fee is non-negative
-                if new_fee_decimal < 0:
-                    logger.log_error(f"Row {row_number}: Fee cannot be negative: {job_row.get('new_fee')}", 
-                                     {"row_number": row_number, "new_fee": job_row.get('new_fee')})
-                    status_issues.append("Error: negative fee not allowed")
-                    continue
+                csv_old_fee = Decimal(str(job_row['old_fee']))
+                db_fee = Decimal(str(fee_column[i]))
                 
-                new_row['fee'] = float(new_fee_decimal)
+                if csv_old_fee != db_fee:
+                    # Log to errors.json as before
+                    logger.log_warning(
+                        f"Row {row_number}: Fee mismatch for geocode {geocode_column[i]}. "
+                        f"CSV old_fee: {csv_old_fee}, DB fee: {db_fee}",
+                        {
+                            "row_number": row_number,
+                            "geocode": geocode_column[i],
+                            "csv_old_fee": float(csv_old_fee),
+                            "db_fee": float(db_fee)
+                        }
+                    )
+                    # Add to status for this output row
+                    status_issues.append("Warning: fee mismatch")
+                    
             except (ValueError, TypeError) as e:
-                logger.log_error(f"Row {row_number}: Invalid new_fee value: {job_row.get('new_fee')}", 
-                                 {"row_number": row_number, "new_fee": job_row.get('new_fee'), "error": str(e)})
-                status_issues.append("Error: invalid new_fee")
-                continue
-            
-            # Set status based on issues encountered
-            if status_issues:
-                new_row['status'] = '\n'.join(status_issues)
-            else:
-                new_row['status'] = 'Success'
-            
-            # Append the new, updated row to the output list
-            output_rows.append(new_row)
+                # Log to errors.json as before
+                logger.log_warning(f"Row {row_number}: Error when comparing fees: {str(e)}", 
+                                   {"row_number": row_number, "error": str(e)})
+                # Add to status for this output row
+                status_issues.append("Warning: failed to compare fees")
+        
+        # Set 'tax_rate' to job_row['new_rate'] / 100
+        if new_rate_error is not None:
+            # Log to errors.json as before
+            logger.log_error(f"Row {row_number}: Invalid new_rate value: {job_row.get('new_rate')}", 
+                             {"row_number": row_number, "new_rate": job_row.get('new_rate'), "error": str(new_rate_error)})
+            # Add to status for this output row
+            status_issues.append("Error: invalid new_rate")
+            continue
+        
+        # Set 'fee' to job_row['new_fee']
+        if new_fee_error is not None:
+            logger.log_error(f"Row {row_number}: Invalid new_fee value: {job_row.get('new_fee')}", 
+                             {"row_number": row_number, "new_fee": job_row.get('new_fee'), "error": str(new_fee_error)})
+            status_issues.append("Error: invalid new_fee")
+            continue
+        
+        # Validate fee is non-negative
+        if new_fee_decimal < 0:
+            logger.log_error(f"Row {row_number}: Fee cannot be negative: {job_row.get('new_fee')}", 
+                             {"row_number": row_number, "new_fee": job_row.get('new_fee')})
+            status_issues.append("Error: negative fee not allowed")
+            continue
+        
+        # Set status based on issues encountered
+        emitted_rows.append(i)
+        statuses.append('\n'.join(status_issues) if status_issues else 'Success')
     
-    return output_rows
+    if not emitted_rows:
+        return output_rows
+    
+    # Build the output rows from the detail rows kept, replacing the updated columns
+    output_table = detail_rows if len(emitted_rows) == detail_rows.num_rows else detail_rows.take(emitted_rows)
+    row_count = output_table.num_rows
+    
+    # Keep the current values for the unchanged-row check (hidden, not written to the output CSV)
+    output_table = output_table.append_column('_old_tax_rate', output_table.column('tax_rate'))
+    output_table = output_table.append_column('_old_fee', output_table.column('fee'))
+    
+    # Set 'effective' to the user-specified date in the correct format: 'YYYY-MM-DD'
+    output_table = set_table_column(output_table, 'effective',
+                                    pa.repeat(pa.scalar(effective_date.strftime('%Y-%m-%d')), row_count))
+    output_table = set_table_column(output_table, 'tax_rate', pa.repeat(pa.scalar(new_rate), row_count))
+    output_table = set_table_column(output_table, 'fee', pa.repeat(pa.scalar(new_fee), row_count))
+    output_table = set_table_column(output_table, 'status', pa.array(statuses, pa.string()))
+    
+    return output_table
 
-def process_new_tax_job(db_connection, job_df: pd.DataFrame, effective_date: datetime.datetime) -> list:
+def process_new_tax_job(db_connection, job_df: pd.DataFrame, effective_date: datetime.datetime, row_cache=None) -> OutputBuilder:
     """
     Process new tax job with field defaulting and multiple geocode handling.
-    Returns list of output rows with status tracking.
+    Returns the output rows with status tracking.
+    """
+    cache_scope = {"job_type": "new_tax", "effective_date": effective_date.strftime('%Y-%m-%d'),
+                   "settings": get_row_settings("new_tax")}
+    matcher = JurisdictionMatcher(db_connection) if config.JURISDICTION_MATCHING else None
+    
+    return process_job_rows(
+        job_df,
+        lambda job_row, row_number: process_new_tax_row(db_connection, job_row, row_number, effective_date, matcher),
+        row_cache,
+        cache_scope
+    )
+
+def process_new_tax_row(db_connection, job_row: pd.Series, row_number: int, effective_date: datetime.datetime,
+                        matcher: JurisdictionMatcher = None) -> list:
+    """
+    Process a single new tax job row.
+    Returns one output row per matching geocode (empty if the row was skipped).
     """
     output_rows = []
     
-    print("\nProcessing rows...")
+    # Validate required fields for new tax job
+    required_fields_valid = True
+    for field in config.NEW_TAX_REQUIRED_FIELDS:
+        if pd.isna(job_row.get(field)):
+            logger.log_error(f"Row {row_number}: Missing required field '{field}'. Skipping.", 
+                           {"row_number": row_number, "row_data": job_row.to_dict()})
+            required_fields_valid = False
+            break
     
-    for index, job_row in job_df.iterrows():
-        row_number = index + 1
-        print(f"Processing row {row_number}/{len(job_df)}", end="\r")
-        
-        # Validate required fields for new tax job
-        required_fields_valid = True
-        for field in config.NEW_TAX_REQUIRED_FIELDS:
-            if pd.isna(job_row.get(field)):
-                logger.log_error(f"Row {row_number}: Missing required field '{field}'. Skipping.", 
-                               {"row_number": row_number, "row_data": job_row.to_dict()})
-                required_fields_valid = False
-                break
-        
-        if not required_fields_valid:
-            continue
+    if not required_fields_valid:
+        return output_rows
+    
+    # Get list of geocodes using enhanced lookup for new tax; if none are found, the error is logged
+    geocodes, match_warnings = find_geocodes(db_connection, job_row, row_number, db_handler.get_geocodes_for_new_tax,
+                                             matcher, ['state', 'county', 'city', 'tax_district'])
+    if not geocodes:
+        return output_rows
+    
+    # Process each geocode found - create one output row per geocode
+    for geocode in geocodes:
+        # Initialize status tracking for this output row, starting with the jurisdiction names matched
+        status_issues = list(match_warnings)
         
-        # Get list of geocodes using enhanced lookup for new tax
-        geocodes = db_handler.get_geocodes_for_new_tax(db_connection, job_row)
+        # Create new detail row from scratch
+        new_row = {}
         
-        # If no geocodes found, log error and continue
-        if not geocodes:
-            logger.log_error(f"Row {row_number}: No geocodes found for criteria. Skipping.", 
-                           {"row_number": row_number, "criteria": job_row.to_dict()})
-            continue
+        # Set geocode
+        new_row['geocode'] = geocode
         
-        # Process each geocode found - create one output row per geocode
-        for geocode in geocodes:
-            # Initialize status tracking for this output row
-            status_issues = []
-            
-            # Create new detail row from scratch
-            new_row = {}
-            
-            # Set geocode
-            new_row['geocode'] = geocode
-            
-            # Set values from job CSV or apply defaults
-            for field in config.DETAIL_TABLE_SCHEMA:
-                if field == 'status':
-                    continue  # Handle status separately
-                elif field == 'geocode':
-                    continue  # Already set above
-                elif field == 'effective':
-                    # Handle effective date precedence
-                    if pd.notna(job_row.get('effective')) and str(job_row.get('effective')).strip():
-                        try:
-                            # Parse CSV date - assume MM/DD/YYYY format like user input
-                            csv_date_str = str(job_row['effective']).strip()
-                            parsed_date = datetime.datetime.strptime(csv_date_str, '%m/%d/%Y')
-                            new_row['effective'] = parsed_date.strftime('%Y-%m-%d')
-                        except ValueError:
-                            # If can't parse CSV date, use user provided date and add warning
-                            new_row['effective'] = effective_date.strftime('%Y-%m-%d')
-                            status_issues.append("Warning: invalid effective date format")
-                    else:
-                        # Use user provided effective date (no warning per user request)
+        # Set values from job CSV or apply defaults
+        for field in config.DETAIL_TABLE_SCHEMA:
+            if field == 'status':
+                continue  # Handle status separately
+            elif field == 'geocode':
+                continue  # Already set above
+            elif field == 'effective':
+                # Handle effective date precedence
+                if pd.notna(job_row.get('effective')) and str(job_row.get('effective')).strip():
+                    try:
+                        # Parse CSV date - assume MM/DD/YYYY format like user input
+                        csv_date_str = str(job_row['effective']).strip()
+                        parsed_date = datetime.datetime.strptime(csv_date_str, '%m/%d/%Y')
+                        new_row['effective'] = parsed_date.strftime('%Y-%m-%d')
+                    except ValueError:
+                        # If can't parse CSV date, use user provided date and add warning
                         new_row['effective'] = effective_date.strftime('%Y-%m-%d')
-                elif field in job_row and pd.notna(job_row[field]):
-                    # Use value from job CSV
-                    value = job_row[field]
-                    
-                    # Apply 2-digit formatting for specific fields
-                    if field in ['tax_type', 'tax_cat', 'pass_flag', 'base_type', 'date_flag', 
-                                'rounding', 'unit_type', 'max_type', 'thresh_type', 'formula']:
-                        try:
-                            # Try converting to int first (for numeric values like 4 -> "04")
-                            new_row[field] = str(int(value)).zfill(2)
-                        except (ValueError, TypeError):
-                            # For non-numeric values (like 'FF'), use as string and ensure 2 characters
-                            field_str = str(value).strip().upper()
-                            new_row[field] = field_str.zfill(2)[:2]  # Pad if needed, truncate if too long
-                    elif field == 'tax_rate':
-                        # Convert percentage to decimal
-                        try:
-                            tax_rate_decimal = Decimal(str(value)) / 100
-                            new_row[field] = float(tax_rate_decimal)
-                        except (ValueError, TypeError) as e:
-                            logger.log_warning(f"Row {row_number}: Invalid tax_rate value: {value}", 
-                                             {"row_number": row_number, "tax_rate": value, "error": str(e)})
-                            status_issues.append("Warning: invalid tax_rate")
-                            new_row[field] = 0  # Default fallback
-                    else:
-                        new_row[field] = value
+                        status_issues.append("Warning: invalid effective date format")
                 else:
-                    # Apply default value
-                    if field in config.NEW_TAX_DEFAULTS:
-                        new_row[field] = config.NEW_TAX_DEFAULTS[field]
-                    else:
-                        new_row[field] = None  # For fields not in defaults
-            
-            # Set status based on issues encountered
-            if status_issues:
-                new_row['status'] = '\n'.join(status_issues)
+                    # Use user provided effective date (no warning per user request)
+                    new_row['effective'] = effective_date.strftime('%Y-%m-%d')
+            elif field in job_row and pd.notna(job_row[field]):
+                # Use value from job CSV
+                value = job_row[field]
+                
+                # Apply 2-digit formatting for specific fields
+                if field in ['tax_type', 'tax_cat', 'pass_flag', 'base_type', 'date_flag', 
+                            'rounding', 'unit_type', 'max_type', 'thresh_type', 'formula']:
+                    try:
+                        # Try converting to int first (for numeric values like 4 -> "04")
+                        new_row[field] = str(int(value)).zfill(2)
+                    except (ValueError, TypeError):
+                        # For non-numeric values (like 'FF'), use as string and ensure 2 characters
+                        field_str = str(value).strip().upper()
+                        new_row[field] = field_str.zfill(2)[:2]  # Pad if needed, truncate if too long
+                elif field == 'tax_rate':
+                    # Convert percentage to decimal
+                    try:
+                        tax_rate_decimal = Decimal(str(value)) / 100
+                        new_row[field] = float(tax_rate_decimal)
+                    except (ValueError, TypeError) as e:
+                        logger.log_warning(f"Row {row_number}: Invalid tax_rate value: {value}", 
+                                         {"row_number": row_number, "tax_rate": value, "error": str(e)})
+                        status_issues.append("Warning: invalid tax_rate")
+                        new_row[field] = 0  # Default fallback
+                else:
+                    new_row[field] = value
             else:
-                new_row['status'] = 'Success'
-            
-            # Append the new row to output list
-            output_rows.append(new_row)
+                # Apply default value
+                if field in config.NEW_TAX_DEFAULTS:
+                    new_row[field] = config.NEW_TAX_DEFAULTS[field]
+                else:
+                    new_row[field] = None  # For fields not in defaults
+        
+        # Set status based on issues encountered
+        if status_issues:
+            new_row['status'] = '\n'.join(status_issues)
+        else:
+            new_row['status'] = 'Success'
+        
+        # Append the new row to output list
+        output_rows.append(new_row)
     
     return output_rows
 
@@ -459,12 +600,12 @@ def validate_authority_fields(row: pd.Series, auth_level: str) -> list:
     
     return warnings
 
-def process_new_authority_job(db_connection, job_df: pd.DataFrame) -> list:
+def process_new_authority_job(db_connection, job_df: pd.DataFrame) -> OutputBuilder:
     """
     Process new authority job with authority level detection and sequential ID assignment.
-    Returns list of output rows with status tracking.
+    Returns the output rows with status tracking.
     """
-    output_rows = []
+    output_rows = OutputBuilder(config.OUTPUT_CATEGORICAL_COLUMNS)
     
     print("\nProcessing rows...")
     
@@ -523,8 +664,564 @@ def process_new_authority_job(db_connection, job_df: pd.DataFrame) -> list:
     
     return output_rows
 
+# --- Jurisdiction Update Processing ---
+def parse_jurisdiction_change(job_row: pd.Series, row_number: int) -> dict | None:
+    """
+    Read one jurisdiction_update job row: the jurisdiction (its lowest level given of state,
+    county, city and tax_district) and its new_name, new_county and new_city.
+    Values are converted to uppercase and trimmed of whitespace.
+    Returns the change, or None (logged as an error) if the row can't be applied.
+    """
+    fields = db_handler.JURISDICTION_LEVELS + ['new_name', 'new_county', 'new_city']
+    change = {"job_row": row_number}
+    for field in fields:
+        value = job_row.get(field)
+        change[field] = str(value).upper().strip() if pd.notna(value) and str(value).strip() else None
+    
+    if change['state'] is None:
+        logger.log_error(f"Row {row_number}: Missing required field 'state'. Skipping.",
+                         {"row_number": row_number, "row_data": job_row.to_dict()})
+        return None
+    
+    level = [level for level in db_handler.JURISDICTION_LEVELS if change[level] is not None][-1]
+    change['level'] = level
+    if change['new_name'] == change[level]:
+        change['new_name'] = None
+    
+    if change['new_county'] is not None and level not in ('city', 'tax_district'):
+        logger.log_error(f"Row {row_number}: new_county only applies to a city or tax_district. Skipping.",
+                         {"row_number": row_number, "level": level})
+        return None
+    if change['new_city'] is not None and level != 'tax_district':
+        logger.log_error(f"Row {row_number}: new_city only applies to a tax_district. Skipping.",
+                         {"row_number": row_number, "level": level})
+        return None
+    if change['new_name'] is None and change['new_county'] is None and change['new_city'] is None:
+        logger.log_error(f"Row {row_number}: Nothing to change, new_name, new_county and new_city are empty. Skipping.",
+                         {"row_number": row_number, "row_data": job_row.to_dict()})
+        return None
+    
+    return change
+
+def process_jurisdiction_update_job(db_connection, job_df: pd.DataFrame,
+                                    effective_date: datetime.datetime) -> tuple[OutputBuilder, dict]:
+    """
+    Process a jurisdiction update job: renames and re-parentings of jurisdictions on the geocode table.
+    The job rows are only read here; the affected geocodes, authorities and detail rows are
+    found with set-based queries (db_handler.get_jurisdiction_update_rows), since one change
+    can touch thousands of geocodes.
+    Returns the changed geocode rows, and the related tax_authority and detail rows by table.
+    """
+    output_rows = OutputBuilder(config.OUTPUT_CATEGORICAL_COLUMNS)
+    related_rows = {"tax_authority": OutputBuilder(config.OUTPUT_CATEGORICAL_COLUMNS),
+                    "detail": OutputBuilder(config.OUTPUT_CATEGORICAL_COLUMNS)}
+    
+    print("\nProcessing rows...")
+    
+    changes = []
+    for index, job_row in job_df.iterrows():
+        change = parse_jurisdiction_change(job_row, index + 1)
+        if change is not None:
+            changes.append(change)
+    
+    print(f"Applying {len(changes)} jurisdiction changes...")
+    result = db_handler.get_jurisdiction_update_rows(db_connection, changes, effective_date)
+    
+    for row_number in result["unmatched"]:
+        logger.log_error(f"Row {row_number}: No geocodes found for jurisdiction. Skipping.",
+                         {"row_number": row_number})
+    for row_number, warning in result["warnings"]:
+        logger.log_warning(f"Row {row_number}: {warning.removeprefix('Warning: ')}", {"row_number": row_number})
+    conflicts = {}  # Job row -> [geocodes skipped, other job rows changing them]
+    for job_rows, geocode_count in result["conflicts"]:
+        for row_number in job_rows:
+            conflict = conflicts.setdefault(row_number, [0, set()])
+            conflict[0] += geocode_count
+            conflict[1].update(row for row in job_rows if row != row_number)
+    for row_number, (geocode_count, other_rows) in sorted(conflicts.items()):
+        logger.log_error(
+            f"Row {row_number}: {geocode_count} geocodes are changed differently by row(s) "
+            f"{', '.join(str(row) for row in sorted(other_rows))}. Skipped these geocodes.",
+            {"row_number": row_number, "conflicts_with": sorted(other_rows), "geocodes": geocode_count}
+        )
+    
+    output_rows.extend(result["geocode"].to_pylist())
+    for table, rows in related_rows.items():
+        rows.extend(result[table].to_pylist())
+    
+    return output_rows, related_rows
+
+# Schemas of the related outputs of jurisdiction updates
+RELATED_OUTPUT_SCHEMAS = {
+    "tax_authority": config.TAX_AUTHORITY_SCHEMA,
+    "detail": config.DETAIL_TABLE_SCHEMA
+}
+
+CONFLICT_RULES = ('report', 'first', 'specific', 'error')
+
+# Job file criteria from least to most specific; a row's specificity is its most specific non-empty field
+CRITERIA_SPECIFICITY = ['state', 'county', 'city', 'geocode']
+
+def criteria_specificity(job_row: pd.Series) -> int:
+    """0 for a row without criteria, up to len(CRITERIA_SPECIFICITY) for a row with a geocode."""
+    for rank in range(len(CRITERIA_SPECIFICITY), 0, -1):
+        value = job_row.get(CRITERIA_SPECIFICITY[rank - 1])
+        if pd.notna(value) and str(value).strip():
+            return rank
+    return 0
+
+def resolve_conflicting_rows(output_df: pd.DataFrame, job_df: pd.DataFrame, rule: str) -> pd.DataFrame:
+    """
+    Find rate update output rows that two or more job rows made for the same tax
+    (config.DETAIL_VERSION_KEY), e.g. a city row and a county row covering it, or duplicate lines.
+    One pass over the output keyed by the tax decides which job row keeps it:
+    rule 'report' keeps every row, 'first' keeps the rows of the first job row, 'specific' those
+    of the job row with the most specific criteria (geocode, city, county, state; the first one
+    on a tie), and 'error' drops the rows of every job row involved. Each job row that lost rows,
+    or with 'report' every job row in a conflict, is logged with the job rows it conflicts with.
+    """
+    if output_df.empty:
+        return output_df
+    
+    keys = output_df[config.DETAIL_VERSION_KEY].astype(object)
+    keys = keys.where(keys.notna(), None)
+    job_rows = output_df['_job_row'].tolist()
+    
+    # Job rows per tax, in the order of the output (job row order)
+    job_rows_by_key = {}
+    for key, job_row in zip(keys.itertuples(index=False, name=None), job_rows):
+        rows = job_rows_by_key.setdefault(key, [])
+        if not rows or rows[-1] != job_row:
+            rows.append(job_row)
+    
+    specificity = {}  # Job row number -> criteria_specificity, for the job rows in conflicts
+    
+    def most_specific(rows: list) -> int:
+        for row in rows:
+            if row not in specificity:
+                specificity[row] = criteria_specificity(job_df.loc[row - 1])
+        return max(rows, key=specificity.get)  # max() keeps the first of equally specific rows
+    
+    winners = {}  # Tax -> job row that keeps it (None: nobody, all job rows with 'report')
+    for key, rows in job_rows_by_key.items():
+        if len(rows) < 2:
+            continue
+        if rule == 'first':
+            winners[key] = rows[0]
+        elif rule == 'specific':
+            winners[key] = most_specific(rows)
+        else:
+            winners[key] = None
+    
+    if not winners:
+        return output_df
+    
+    # Dropped (with 'report': conflicting) output rows and the job rows they conflict with, per job row
+    dropped = {}
+    keep = []
+    for key, job_row in zip(keys.itertuples(index=False, name=None), job_rows):
+        if key not in winners or winners[key] == job_row:
+            keep.append(True)
+            continue
+        keep.append(rule == 'report')
+        conflict = dropped.setdefault(job_row, {"rows": 0, "conflicts_with": set()})
+        conflict["rows"] += 1
+        conflict["conflicts_with"].update(row for row in job_rows_by_key[key] if row != job_row)
+    
+    for job_row, conflict in sorted(dropped.items()):
+        conflicts_with = sorted(int(row) for row in conflict["conflicts_with"])
+        rows_text = ", ".join(str(row) for row in conflicts_with)
+        if rule == 'report':
+            context = {"row_number": int(job_row), "conflicts_with": conflicts_with,
+                       "conflicting_rows": conflict["rows"], "rule": rule}
+            logger.log_warning(f"Row {job_row}: {conflict['rows']} output rows update the same taxes as row(s) "
+                               f"{rows_text}. Kept; choose the row to keep with --conflicts.", context)
+            continue
+        context = {"row_number": int(job_row), "conflicts_with": conflicts_with,
+                   "dropped_rows": conflict["rows"], "rule": rule}
+        if rule == 'error':
+            logger.log_error(f"Row {job_row}: {conflict['rows']} output rows update the same taxes as row(s) "
+                             f"{rows_text}. Dropped as conflicting.", context)
+        else:
+            kept_by = "the first row" if rule == 'first' else "the row with the most specific criteria"
+            logger.log_warning(f"Row {job_row}: {conflict['rows']} output rows update the same taxes as row(s) "
+                               f"{rows_text}. Dropped, {kept_by} wins.", context)
+    
+    if rule == 'report':
+        print(f"Conflicting rows: {sum(conflict['rows'] for conflict in dropped.values())} output rows of "
+              f"{len(dropped)} job rows update the same taxes, all kept (rule: report)")
+        return output_df
+    
+    print(f"Conflicting rows: {len(output_df) - sum(keep)} output rows of {len(dropped)} job rows dropped "
+          f"(rule: {rule})")
+    return output_df[keep].reset_index(drop=True)
+
+def suppress_unchanged_rows(output_df: pd.DataFrame, mode: str) -> pd.DataFrame:
+    """
+    Find rate update output rows whose new tax_rate and fee equal the detail row they were
+    copied from, in one vectorized comparison over the whole output.
+    mode 'flag' adds a status warning to these rows, 'drop' removes them, 'keep' does nothing.
+    The number of unchanged rows is logged per job row.
+    """
+    if mode == 'keep' or output_df.empty:
+        return output_df
+    
+    # detail stores tax_rate with 12 and fee with 8 decimal places
+    unchanged = (
+        (output_df['tax_rate'].astype(float).round(12) == output_df['_old_tax_rate'].astype(float).round(12)) &
+        (output_df['fee'].astype(float).round(8) == output_df['_old_fee'].astype(float).round(8))
+    )
+    
+    if not unchanged.any():
+        return output_df
+    
+    action = "Dropped" if mode == 'drop' else "Flagged"
+    output_counts = output_df['_job_row'].value_counts()
+    for job_row, unchanged_count in output_df.loc[unchanged, '_job_row'].value_counts().sort_index().items():
+        logger.log_warning(
+            f"Row {job_row}: {unchanged_count} of {output_counts[job_row]} output rows already have the new rate and fee. "
+            f"{action} as unchanged.",
+            {"row_number": int(job_row), "unchanged_rows": int(unchanged_count)}
+        )
+    
+    print(f"Unchanged rows: {int(unchanged.sum())} of {len(output_df)} {action.lower()}")
+    
+    if mode == 'drop':
+        return output_df[~unchanged].reset_index(drop=True)
+    
+    flag = "Warning: rate and fee unchanged"
+    output_df = output_df.copy()
+    output_df['status'] = output_df['status'].astype(object)  # New status values aren't in its categories
+    status = output_df.loc[unchanged, 'status']
+    output_df.loc[unchanged, 'status'] = (status + '\n' + flag).where(status != 'Success', flag)
+    return output_df
+
+def write_diff_report(db_connection, output_df: pd.DataFrame, output_dir: str, job_prefix: str) -> str | None:
+    """
+    Write '{job_prefix}_diff.csv' listing only the columns of each output row whose values
+    differ from the matching row currently in the database.
+    Returns the path of the diff file, or None if it could not be generated.
+    """
+    if job_prefix == "new_authority":
+        diff_df = db_handler.get_output_diff(db_connection, output_df, 'tax_authority', ['tax_auth_id'])
+    elif job_prefix == "jurisdiction_update":
+        diff_df = db_handler.get_output_diff(db_connection, output_df, 'geocode', ['geocode'])
+    else:
+        diff_df = db_handler.get_output_diff(db_connection, output_df, 'detail',
+                                             config.DETAIL_VERSION_KEY, version_field='effective')
+    
+    if diff_df.columns.empty:
+        print("Diff report could not be generated. See errors.json for details.")
+        return None
+    
+    diff_file_path = os.path.join(output_dir, f"{job_prefix}_diff.csv")
+    file_handler.write_dataframe_to_csv(diff_file_path, diff_df, list(diff_df.columns))
+    
+    modified = diff_df[diff_df['change_type'] == 'modified']
+    added_rows = int((diff_df['change_type'] == 'added').sum())
+    print(f"Diff report saved to: {diff_file_path}")
+    print(f"  {len(modified)} changed values in {modified['output_row'].nunique()} rows, {added_rows} rows not in database")
+    return diff_file_path
+
+def write_partitioned_output(db_connection, output_df: pd.DataFrame, schema: list, output_dir: str,
+                             job_prefix: str, partition_by: str) -> str | None:
+    """
+    Write the output split by `partition_by` to '{job_prefix}_output_by_{partition_by}/', one
+    '{job_prefix}_output_{value}.csv' per value, plus manifest.json with the row count of each file.
+    Detail outputs have no state column; their state is derived from the geocode prefix.
+    Returns the path of the manifest, or None if the output can't be partitioned by that column.
+    """
+    if partition_by in output_df.columns:
+        values = output_df[partition_by].astype(object)
+    elif partition_by == 'state' and 'geocode' in output_df.columns:
+        prefixes = output_df['geocode'].astype(object).str[:4]
+        states = db_handler.get_states_for_geocode_prefixes(db_connection, sorted(prefixes.dropna().unique()))
+        values = prefixes.map(lambda prefix: states.get(prefix, prefix))
+    else:
+        print(f"Warning: Output has no '{partition_by}' column, partitioned output not written.")
+        return None
+    
+    values = values.where(values.notna() & (values.astype(str).str.strip() != ''), 'UNKNOWN').astype(str)
+    
+    partition_dir = os.path.join(output_dir, f"{job_prefix}_output_by_{partition_by}")
+    os.makedirs(partition_dir, exist_ok=True)
+    
+    partitions = []
+    file_names = {}
+    for value, partition_df in output_df.groupby(values, sort=True):
+        file_name = f"{job_prefix}_output_{re.sub(r'[^A-Za-z0-9._-]+', '_', value)}.csv"
+        if file_name in file_names.values():
+            file_name = f"{file_name[:-4]}_{len(file_names) + 1}.csv"
+        file_names[value] = file_name
+        partitions.append((os.path.join(partition_dir, file_name), partition_df))
+    
+    row_counts = file_handler.write_dataframes_to_csv(
+        partitions, schema, config.OUTPUT_PARTITION_WORKERS, config.OUTPUT_PARTITION_PARALLEL_MIN_ROWS
+    )
+    
+    manifest = {
+        "job_type": job_prefix,
+        "partition_by": partition_by,
+        "total_rows": len(output_df),
+        "partitions": [
+            {"value": value, "file": file_name, "rows": rows}
+            for (value, file_name), rows in zip(file_names.items(), row_counts)
+        ]
+    }
+    manifest_path = os.path.join(partition_dir, "manifest.json")
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    
+    print(f"Partitioned output saved to: {partition_dir} ({len(partitions)} files by {partition_by})")
+    return manifest_path
+
+def open_row_cache(db_path: str):
+    """
+    Open the persistent row result cache for the given database.
+    Returns None if the cache can't be used; the job then runs uncached.
+    """
+    try:
+        return RowCache(config.ROW_CACHE_PATH, db_path, config.ROW_CACHE_MAX_BYTES)
+    except Exception as e:
+        print(f"Warning: Row cache unavailable, processing all rows: {e}")
+        return None
+
 # --- Main Application Logic ---
-def run():
+def parse_args(argv: list = None) -> argparse.Namespace:
+    """Parse command line options. Job selection itself stays interactive."""
+    parser = argparse.ArgumentParser(description='Generate tax table update files from job CSVs')
+    parser.add_argument('--diff-report', action='store_true',
+                        help='Also write {job_type}_diff.csv with the changed columns (old -> new) of each output row')
+    parser.add_argument('--unchanged-rows', choices=['keep', 'flag', 'drop'], default=config.RATE_UPDATE_UNCHANGED_ROWS,
+                        help='Rate updates: keep, flag or drop output rows whose rate and fee are already current '
+                             f'(default: {config.RATE_UPDATE_UNCHANGED_ROWS})')
+    parser.add_argument('--conflicts', choices=CONFLICT_RULES, default=config.RATE_UPDATE_CONFLICTS,
+                        help='Rate updates: when several job rows update the same tax, only report it, keep the '
+                             'first row, the row with the most specific criteria, or drop them all as errors '
+                             f'(default: {config.RATE_UPDATE_CONFLICTS})')
+    parser.add_argument('--as-of', nargs='?', const='effective', type=parse_as_of_date, metavar='MM/DD/YYYY',
+                        help='Rate updates: only update the detail version in force on this date '
+                             '(default when given without a date: the job effective date)')
+    parser.add_argument('--partition-by', nargs='?', const='state', default=config.OUTPUT_PARTITION_BY, metavar='COLUMN',
+                        help='Also write the output as one file per value of COLUMN, with a manifest '
+                             '(default when given without a column: state)')
+    parser.add_argument('--profile', nargs='?', const='deterministic', choices=PROFILE_MODES,
+                        help='Profile the job and write a flamegraph-ready profile.collapsed and '
+                             'profile_hotspots.txt to the output directory (default mode: deterministic)')
+    parser.add_argument('--sql-log', action='store_true',
+                        help='Write sql_log.json with the count, latency and rows of each SQL statement shape '
+                             'and the plans of the slowest ones')
+    parser.add_argument('--memory-report', action='store_true',
+                        help='Write memory_report.json with the peak and retained memory of each stage '
+                             'and the lines that retained the most')
+    duckdb_resources.add_resource_arguments(parser)
+    return parser.parse_args(argv)
+
+def parse_as_of_date(value: str):
+    """Parse the --as-of option: a MM/DD/YYYY date, or 'effective' for the job effective date."""
+    if value == 'effective':
+        return value
+    try:
+        return datetime.datetime.strptime(value, '%m/%d/%Y')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date '{value}', expected MM/DD/YYYY")
+
+def execute_job(db_connection, job_prefix: str, job_file_path: str, effective_date: datetime.datetime,
+                options: argparse.Namespace) -> dict:
+    """
+    Run one job file without prompting: process its rows, then write the output CSV, the
+    optional diff report and errors.json to a new output directory and print the summary.
+    Critical errors raise SystemExit, as raised by log_error.
+    Every run, completed or not, is recorded in the run history (src/metrics.py).
+    With --profile, the profile is written to the output directory (src/profiler.py),
+    with --sql-log the SQL statement log (src/sql_log.py) and with --memory-report the
+    memory use of each stage (src/memory_tracker.py).
+    Returns a summary of the job, including the paths of the files written.
+    """
+    row_cache = None
+    memory_tracker = start_memory_tracker(options.memory_report)
+    metrics = RunMetrics(job_prefix, job_file_path, config.DATABASE_PATH, memory_tracker=memory_tracker)
+    status = "failed"
+    job_df = None
+    added_rows = None
+    output_dir = None
+    related_rows = {}  # Jurisdiction updates: rows of the other tables changed, by table
+    profiler = start_profiler(options.profile)
+    statement_log = StatementLog() if options.sql_log else None
+    if statement_log:
+        db_connection = LoggedConnection(db_connection, statement_log)
+    
+    try:
+        # Resolve the as-of date for detail lookups (rate updates only)
+        as_of = None
+        if options.as_of and job_prefix == "rate_update":
+            as_of = effective_date if options.as_of == 'effective' else options.as_of
+            print(f"Using detail versions in force on: {as_of.strftime('%m/%d/%Y')}")
+        
+        # Create the timestamped output directory using file_handler.
+        output_dir = file_handler.create_output_directory(config.OUTPUT_FOLDER)
+        if not output_dir:
+            return None  # Error already logged as critical
+        
+        print(f"Output directory created: {output_dir}")
+        
+        # Read the job CSV into a DataFrame.
+        with metrics.stage("read"):
+            job_df = file_handler.read_csv_to_dataframe(job_file_path)
+        if job_df is None:
+            return None  # Error already logged as critical
+        
+        print(f"Job file loaded: {len(job_df)} rows to process")
+        
+        # Open the row result cache for job types whose rows are independent of each other.
+        if config.ROW_CACHE_ENABLED and job_prefix in ("rate_update", "new_tax"):
+            row_cache = open_row_cache(config.DATABASE_PATH)
+        
+        # Route to appropriate processing function based on job type
+        print("\nProcessing job...")
+        
+        with metrics.stage("process"):
+            if job_prefix == "rate_update":
+                output_rows = process_rate_update_job(db_connection, job_df, effective_date, row_cache, as_of)
+            elif job_prefix == "new_tax":
+                output_rows = process_new_tax_job(db_connection, job_df, effective_date, row_cache)
+            elif job_prefix == "new_authority":
+                output_rows = process_new_authority_job(db_connection, job_df)
+            elif job_prefix == "jurisdiction_update":
+                output_rows, related_rows = process_jurisdiction_update_job(db_connection, job_df, effective_date)
+            else:
+                logger.log_error(f"Unsupported job type: {job_prefix}", is_critical=True)
+                return None
+        
+        print(f"\nProcessing complete. Generated {len(output_rows)} output rows.")
+        
+        if row_cache:
+            print(f"Row cache: {row_cache.hits} rows reused, {row_cache.misses} rows computed")
+        
+        summary = {
+            "job_type": job_prefix,
+            "job_file": job_file_path,
+            "effective_date": effective_date.strftime('%Y-%m-%d') if effective_date else None,
+            "output_dir": output_dir,
+            "output_file": None,
+            "partition_manifest": None,
+            "diff_file": None,
+            "related_files": {},
+            "errors_file": None
+        }
+        
+        # Finalize:
+        added_rows = len(output_rows)
+        if output_rows:
+            # Build the pandas DataFrame from the collected output columns
+            with metrics.stage("output"):
+                output_df = output_rows.to_dataframe()
+                
+                if job_prefix == "rate_update":
+                    output_df = resolve_conflicting_rows(output_df, job_df, options.conflicts)
+                    output_df = suppress_unchanged_rows(output_df, options.unchanged_rows)
+                    added_rows = len(output_df)
+            
+            # Use appropriate schema for CSV output
+            if job_prefix == "new_authority":
+                schema = config.TAX_AUTHORITY_SCHEMA
+            elif job_prefix == "jurisdiction_update":
+                schema = config.GEOCODE_TABLE_SCHEMA
+            else:
+                schema = config.DETAIL_TABLE_SCHEMA
+            
+            # Write it to CSV using file_handler
+            output_file_path = os.path.join(output_dir, f"{job_prefix}_output.csv")
+            with metrics.stage("write"):
+                file_handler.write_dataframe_to_csv(output_file_path, output_df, schema)
+            print(f"Output saved to: {output_file_path}")
+            summary["output_file"] = output_file_path
+            
+            # Rows of other tables that change with the output rows
+            for table, rows in related_rows.items():
+                if not rows:
+                    continue
+                related_file_path = os.path.join(output_dir, f"{job_prefix}_{table}_output.csv")
+                with metrics.stage("write"):
+                    file_handler.write_dataframe_to_csv(related_file_path, rows.to_dataframe(),
+                                                        RELATED_OUTPUT_SCHEMAS[table])
+                print(f"{table} output saved to: {related_file_path} ({len(rows)} rows)")
+                summary["related_files"][table] = related_file_path
+            
+            if options.partition_by:
+                with metrics.stage("partition"):
+                    summary["partition_manifest"] = write_partitioned_output(
+                        db_connection, output_df, schema, output_dir, job_prefix, options.partition_by
+                    )
+            
+            if options.diff_report:
+                with metrics.stage("diff"):
+                    summary["diff_file"] = write_diff_report(db_connection, output_df, output_dir, job_prefix)
+        
+        # If any logs were generated, write them to errors.json
+        if logger.get_logs():
+            errors_file_path = os.path.join(output_dir, "errors.json")
+            with metrics.stage("errors"):
+                structured_logs = logger.get_structured_logs(len(job_df))
+                file_handler.write_structured_logs_to_json(errors_file_path, structured_logs)
+            print(f"Errors/warnings saved to: {errors_file_path}")
+            summary["errors_file"] = errors_file_path
+        
+        # Report to User: Print a summary of the job completion
+        print_summary(output_dir, len(job_df), added_rows, 
+                     logger.count_rows_with_warnings(), logger.count_rows_with_errors(),
+                     logger.count_warnings(), logger.count_errors(), effective_date, job_prefix)
+        
+        summary.update({
+            "rows_processed": len(job_df),
+            "rows_added": added_rows,
+            "rows_with_warnings": logger.count_rows_with_warnings(),
+            "rows_with_errors": logger.count_rows_with_errors(),
+            "total_warnings": logger.count_warnings(),
+            "total_errors": logger.count_errors()
+        })
+        status = "completed"
+        return summary
+    
+    finally:
+        metrics.finish(status, input_rows=len(job_df) if job_df is not None else None, output_rows=added_rows,
+                       warnings=logger.count_warnings(), errors=logger.count_errors())
+        if profiler:
+            profiler.finish(output_dir or config.OUTPUT_FOLDER)
+        if statement_log:
+            statement_log.write_report(os.path.join(output_dir or config.OUTPUT_FOLDER, "sql_log.json"),
+                                       db_connection, config.SQL_LOG_EXPLAIN_TOP)
+        if memory_tracker:
+            memory_tracker.finish(output_dir or config.OUTPUT_FOLDER)
+        if row_cache:
+            try:
+                row_cache.close()
+            except Exception:
+                pass  # A cache write failure must not fail the job
+
+def save_critical_error_log() -> str | None:
+    """
+    Save the logs collected before a critical error to errors.json in a new output directory.
+    Returns the path of the file, or None if there was nothing to save or saving failed.
+    """
+    if not logger.get_logs():
+        return None
+    try:
+        emergency_output_dir = file_handler.create_output_directory(config.OUTPUT_FOLDER)
+        if emergency_output_dir:
+            errors_file_path = os.path.join(emergency_output_dir, "errors.json")
+            structured_logs = logger.get_structured_logs(0)  # Unknown total rows at this point
+            file_handler.write_structured_logs_to_json(errors_file_path, structured_logs)
+            print(f"Error log saved to: {errors_file_path}")
+            return errors_file_path
+    except BaseException:
+        pass  # Don't let error saving fail the error handling
+    return None
+
+def run(options: argparse.Namespace = None):
+    if options is None:
+        options = parse_args([])
+    
     db_connection = None
     
     try:
@@ -580,85 +1277,21 @@ def run():
         # 4. Setup:
         # Connect to DuckDB using db_handler.
         print(f"Connecting to database: {config.DATABASE_PATH}")
+        duckdb_resources.apply_resource_arguments(options)
         db_connection = db_handler.connect_to_duckdb(config.DATABASE_PATH)
         
         if not db_connection:
             return  # Error already logged as critical
+        print(f"DuckDB settings: {duckdb_resources.describe_settings()}")
         
-        # Create the timestamped output directory using file_handler.
-        output_dir = file_handler.create_output_directory(config.OUTPUT_FOLDER)
-        if not output_dir:
-            return  # Error already logged as critical
-        
-        print(f"Output directory created: {output_dir}")
-        
-        # Read the job CSV into a DataFrame.
-        job_df = file_handler.read_csv_to_dataframe(job_file_path)
-        if job_df is None:
-            return  # Error already logged as critical
-        
-        print(f"Job file loaded: {len(job_df)} rows to process")
-        
-        # Initialize an empty list for the final output rows.
-        output_rows = []
-        
-        # 5. Route to appropriate processing function based on job type
-        print("\nProcessing job...")
-        
-        if job_prefix == "rate_update":
-            output_rows = process_rate_update_job(db_connection, job_df, effective_date)
-        elif job_prefix == "new_tax":
-            output_rows = process_new_tax_job(db_connection, job_df, effective_date)
-        elif job_prefix == "new_authority":
-            output_rows = process_new_authority_job(db_connection, job_df)
-        else:
-            logger.log_error(f"Unsupported job type: {job_prefix}", is_critical=True)
-            return
-        
-        print(f"\nProcessing complete. Generated {len(output_rows)} output rows.")
-        
-        # 6. Finalize:
-        if output_rows:
-            # Convert the list of output rows into a pandas DataFrame
-            output_df = pd.DataFrame(output_rows)
-            
-            # Use appropriate schema for CSV output
-            if job_prefix == "new_authority":
-                schema = config.TAX_AUTHORITY_SCHEMA
-            else:
-                schema = config.DETAIL_TABLE_SCHEMA
-            
-            # Write it to CSV using file_handler
-            output_file_path = os.path.join(output_dir, f"{job_prefix}_output.csv")
-            file_handler.write_dataframe_to_csv(output_file_path, output_df, schema)
-            print(f"Output saved to: {output_file_path}")
-        
-        # If any logs were generated, write them to errors.json
-        if logger.get_logs():
-            errors_file_path = os.path.join(output_dir, "errors.json")
-            structured_logs = logger.get_structured_logs(len(job_df))
-            file_handler.write_structured_logs_to_json(errors_file_path, structured_logs)
-            print(f"Errors/warnings saved to: {errors_file_path}")
-        
-        # 7. Report to User: Print a summary of the job completion
-        print_summary(output_dir, len(job_df), len(output_rows), 
-                     logger.count_rows_with_warnings(), logger.count_rows_with_errors(),
-                     logger.count_warnings(), logger.count_errors(), effective_date, job_prefix)
+        # 5.-7. Process the job file, write the output files and print the summary
+        execute_job(db_connection, job_prefix, job_file_path, effective_date, options)
         
     except SystemExit as e:
         # This is raised by log_error(is_critical=True)
         print(f"\nA critical error occurred: {e}")
         # Save any logs that were generated before the exit
-        if logger.get_logs():
-            try:
-                emergency_output_dir = file_handler.create_output_directory(config.OUTPUT_FOLDER)
-                if emergency_output_dir:
-                    errors_file_path = os.path.join(emergency_output_dir, "errors.json")
-                    structured_logs = logger.get_structured_logs(0)  # Unknown total rows at this point
-                    file_handler.write_structured_logs_to_json(errors_file_path, structured_logs)
-                    print(f"Error log saved to: {errors_file_path}")
-            except Exception:
-                pass  # Don't let error saving fail the error handling
+        save_critical_error_log()
     
     except Exception as e:
         logger.log_error(f"Unexpected error in main application: {str(e)}", {"error": str(e)})
@@ -706,4 +1339,4 @@ def print_summary(output_path: str, processed_rows: int, added_rows: int,
     print("=" * 50)
 
 if __name__ == "__main__":
-    run() 
\ No newline at end of file
+    run(parse_args()) 
\ No newline at end of file
@@ -0,0 +1,243 @@
+# src/memory_tracker.py
+# Memory use per stage of a job (`--memory-report` on src/main.py and table_updates/table_updater.py).
+# Python allocations are traced with tracemalloc and the process RSS is sampled in a background
+# thread. For every stage the report has the peak above the memory at its start, the memory it
+# retained at its end, and the lines of this project that retained the most, with the library
+# line that made the allocation. Stages can be nested; an outer stage's peak includes its inner stages.
+
+import contextlib
+import datetime
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource  # Not available on Windows
+except ImportError:
+    resource = None
+
+# Add the project root to Python path to handle imports when running directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import config
+
+MB = 1024 * 1024
+
+
+def get_rss_mb() -> float | None:
+    """Current resident memory of this process in MB (None where it can't be read)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / MB
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is not None:
+        # Peak rather than current memory outside Linux; macOS reports bytes
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (MB if sys.platform == "darwin" else 1024)
+    return None
+
+def _site_key(traceback: tracemalloc.Traceback) -> tuple | None:
+    """
+    (innermost line of this project's code, line that made the allocation) of a traceback,
+    or None for allocations of the tracker itself.
+    """
+    project_line = "(outside the project)"
+    for frame in reversed(traceback):  # Most recent call last
+        filename = frame.filename
+        if filename == __file__:
+            return None
+        if filename.startswith(config.BASE_DIR) and "site-packages" not in filename:
+            project_line = _frame_label(filename, frame.lineno)
+            break
+    return project_line, _frame_label(traceback[-1].filename, traceback[-1].lineno)
+
+@functools.lru_cache(maxsize=None)
+def _frame_label(filename: str, lineno: int) -> str:
+    if filename.startswith(config.BASE_DIR):
+        filename = os.path.relpath(filename, config.BASE_DIR)
+    return f"{filename}:{lineno}"
+
+
+class MemoryTracker:
+    """
+    Traces memory from `start()` until `finish()` writes the report. Time stages with
+    `with tracker.stage("process"):`. Writing never fails the job: errors are printed as warnings.
+    """
+
+    def __init__(self, top_n: int = None, frames: int = None, interval: float = None):
+        self.top_n = top_n or config.MEMORY_TOP_N
+        self.frames = frames or config.MEMORY_TRACE_FRAMES
+        self.interval = interval or config.MEMORY_SAMPLE_INTERVAL
+        self.stages = []  # Stages, in the order they started
+        self.traced_peak = 0
+        self._open_stages = []  # Running stages, outermost first
+        self._started_tracing = False
+        self._rss_peak = None
+        self._stop_event = threading.Event()
+        self._sampler = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        self._start_rss = get_rss_mb()
+        self._rss_peak = self._start_rss
+        self._sampler = threading.Thread(target=self._sample_rss, name="memory-tracker", daemon=True)
+        self._sampler.start()
+
+    def _sample_rss(self):
+        while not self._stop_event.wait(self.interval):
+            self._update_rss_peak(get_rss_mb())
+
+    def _update_rss_peak(self, rss: float | None):
+        if rss is None:
+            return
+        with self._lock:
+            self._rss_peak = rss if self._rss_peak is None else max(self._rss_peak, rss)
+            for open_stage in self._open_stages:
+                open_stage["rss_peak"] = rss if open_stage["rss_peak"] is None else max(open_stage["rss_peak"], rss)
+
+    def _carry_peaks(self):
+        """Fold the traced peak since the last reset into every running stage, then reset it."""
+        peak = tracemalloc.get_traced_memory()[1]
+        for open_stage in self._open_stages:
+            open_stage["traced_peak"] = max(open_stage["traced_peak"], peak)
+        self.traced_peak = max(self.traced_peak, peak)
+        tracemalloc.reset_peak()
+
+    def _traced_sites(self) -> dict:
+        """
+        Traced memory now, grouped by (project line, library line that allocated it): [bytes, blocks].
+        Kept per running stage instead of the snapshot, which is much larger.
+        """
+        sites = {}
+        for statistic in tracemalloc.take_snapshot().statistics("traceback"):
+            key = _site_key(statistic.traceback)
+            if key is None:
+                continue
+            site = sites.setdefault(key, [0, 0])
+            site[0] += statistic.size
+            site[1] += statistic.count
+        return sites
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        rss = get_rss_mb()
+        self._update_rss_peak(rss)
+        self._carry_peaks()
+        current = tracemalloc.get_traced_memory()[0]
+        record = {"stage": name, "depth": len(self._open_stages)}
+        self.stages.append(record)
+        open_stage = {"traced_start": current, "traced_peak": current, "rss_start": rss, "rss_peak": rss,
+                      "sites": self._traced_sites(), "start": time.perf_counter()}
+        with self._lock:
+            self._open_stages.append(open_stage)
+        try:
+            yield
+        finally:
+            self._carry_peaks()
+            rss = get_rss_mb()
+            self._update_rss_peak(rss)
+            with self._lock:
+                self._open_stages.remove(open_stage)
+            traced_end = tracemalloc.get_traced_memory()[0]
+            record.update({
+                "seconds": round(time.perf_counter() - open_stage["start"], 3),
+                "traced_start_mb": round(open_stage["traced_start"] / MB, 2),
+                "traced_peak_increase_mb": round((open_stage["traced_peak"] - open_stage["traced_start"]) / MB, 2),
+                "traced_retained_mb": round((traced_end - open_stage["traced_start"]) / MB, 2),
+                "rss_start_mb": _round(open_stage["rss_start"]),
+                "rss_peak_mb": _round(open_stage["rss_peak"]),
+                "rss_end_mb": _round(rss),
+                "retained_by": self._top_sites(self._traced_sites(), open_stage["sites"])
+            })
+
+    def _top_sites(self, sites: dict, before: dict = None) -> list:
+        """
+        Memory by project line, largest first, with the library line that allocated most of it.
+        With the sites at the start of a stage, the memory retained since then.
+        """
+        before = before or {}
+        by_project_line = {}
+        for key in set(sites) | set(before):
+            size, blocks = sites.get(key, (0, 0))
+            size_before, blocks_before = before.get(key, (0, 0))
+            if size == size_before:
+                continue
+            project_line, allocated_in = key
+            site = by_project_line.setdefault(project_line, {"site": project_line, "size_mb": 0.0, "blocks": 0,
+                                                             "allocated_in": {}})
+            site["size_mb"] += (size - size_before) / MB
+            site["blocks"] += blocks - blocks_before
+            site["allocated_in"][allocated_in] = size - size_before
+        top = sorted(by_project_line.values(), key=lambda site: abs(site["size_mb"]), reverse=True)[:self.top_n]
+        for site in top:
+            site["size_mb"] = round(site["size_mb"], 3)
+            # The library line with the largest share of the site's allocations
+            site["allocated_in"] = max(site["allocated_in"], key=lambda label: abs(site["allocated_in"][label]))
+        return top
+
+    def report(self) -> dict:
+        self._carry_peaks()
+        return {
+            "generated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "traced_peak_mb": round(self.traced_peak / MB, 2),
+            "rss_start_mb": _round(self._start_rss),
+            "rss_peak_mb": _round(self._rss_peak),
+            "stages": self.stages,
+            "retained_at_end_by": self._top_sites(self._traced_sites())
+        }
+
+    def stop(self):
+        if self._sampler:
+            self._stop_event.set()
+            self._sampler.join()
+            self._sampler = None
+
+    def finish(self, output_dir: str, filename: str = "memory_report.json") -> dict | None:
+        """Write the report to output_dir, print the stages and stop tracing (None if writing failed)."""
+        self.stop()
+        try:
+            report = self.report()
+            os.makedirs(output_dir, exist_ok=True)
+            report_path = os.path.join(output_dir, filename)
+            with open(report_path, 'w') as f:
+                json.dump(report, f, indent=2)
+        except Exception as e:
+            print(f"Warning: Memory report not written: {e}")
+            return None
+        finally:
+            if self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+
+        print(f"Memory report saved to: {report_path} (traced peak {report['traced_peak_mb']} MB, "
+              f"RSS peak {_format_mb(report['rss_peak_mb'])})")
+        print(f"  {'Stage':<36} {'Peak +MB':>9} {'Retained MB':>12} {'RSS peak MB':>12}  Retained most by")
+        for stage in report["stages"]:
+            label = ("  " * stage["depth"] + stage["stage"])[:36]
+            retained_by = stage["retained_by"][0]["site"] if stage["retained_by"] else "-"
+            print(f"  {label:<36} {stage['traced_peak_increase_mb']:>9} {stage['traced_retained_mb']:>12} "
+                  f"{'-' if stage['rss_peak_mb'] is None else stage['rss_peak_mb']:>12}  {retained_by}")
+        return report
+
+
+def _round(value: float | None) -> float | None:
+    return None if value is None else round(value, 1)
+
+def _format_mb(value: float | None) -> str:
+    return "-" if value is None else f"{value} MB"
+
+def start_memory_tracker(enabled: bool = False) -> MemoryTracker | None:
+    """Start tracing memory when enabled; None (no tracing, no overhead) otherwise."""
+    if not enabled:
+        return None
+    tracker = MemoryTracker()
+    tracker.start()
+    return tracker
@@ -0,0 +1,252 @@
+# src/metrics.py
+# Run history: every job run (rate update, new tax, new authority and table update)
+# appends one record with its counts, wall time per stage, throughput and peak memory
+# to a local SQLite database, and a small CLI shows the history and monthly trends.
+#
+#   python src/metrics.py history [--job-type TYPE] [--limit N] [--stages]
+#   python src/metrics.py trend [--job-type TYPE] [--period month|week|day]
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import time
+
+try:
+    import resource  # Not available on Windows
+except ImportError:
+    resource = None
+
+# Add the project root to Python path to handle imports when running directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import config
+
+PERIOD_FORMATS = {"month": "%Y-%m", "week": "%Y-W%W", "day": "%Y-%m-%d"}
+
+
+def get_peak_rss_mb() -> float | None:
+    """Peak resident memory of this process so far, in MB (None where it can't be measured)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def _connect(metrics_path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(metrics_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(metrics_path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS runs (
+            run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at TEXT NOT NULL,
+            job_type TEXT NOT NULL,
+            job_input TEXT,
+            status TEXT NOT NULL,
+            database TEXT,
+            database_mb REAL,
+            input_rows INTEGER,
+            output_rows INTEGER,
+            warnings INTEGER,
+            errors INTEGER,
+            wall_seconds REAL NOT NULL,
+            rows_per_second REAL,
+            peak_rss_mb REAL,
+            stages TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_runs_job_type ON runs (job_type, started_at)")
+    return conn
+
+
+class RunMetrics:
+    """
+    Collects the wall time per stage and the counts of one run.
+
+    Time stages with `with metrics.stage("process"):`, then call `finish()` once to
+    append the record to the run history. Recording never fails the run: errors are
+    printed as warnings. With a memory tracker (src/memory_tracker.py), its stages
+    follow the same names.
+    """
+
+    def __init__(self, job_type: str, job_input: str = None, database: str = None, metrics_path: str = None,
+                 memory_tracker=None):
+        self.job_type = job_type
+        self.job_input = job_input
+        self.database = database
+        self.metrics_path = metrics_path or config.METRICS_DB_PATH
+        self.started_at = datetime.datetime.now()
+        self.stages = {}  # stage name -> seconds, in the order the stages ran
+        self._start = time.perf_counter()
+        self.record = None
+        self.memory_tracker = memory_tracker
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        memory_stage = self.memory_tracker.stage(name) if self.memory_tracker else contextlib.nullcontext()
+        start = time.perf_counter()
+        try:
+            with memory_stage:
+                yield
+        finally:
+            self.stages[name] = round(self.stages.get(name, 0) + time.perf_counter() - start, 3)
+
+    def finish(self, status: str, input_rows: int = None, output_rows: int = None,
+               warnings: int = None, errors: int = None) -> dict | None:
+        """Append this run to the run history and return its record (None if already finished or disabled)."""
+        if self.record is not None or not config.METRICS_ENABLED:
+            return None
+
+        wall_seconds = round(time.perf_counter() - self._start, 3)
+        database_mb = None
+        if self.database and os.path.exists(self.database):
+            database_mb = round(os.path.getsize(self.database) / 1024 / 1024, 1)
+        self.record = {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "job_type": self.job_type,
+            "job_input": self.job_input,
+            "status": status,
+            "database": self.database,
+            "database_mb": database_mb,
+            "input_rows": input_rows,
+            "output_rows": output_rows,
+            "warnings": warnings,
+            "errors": errors,
+            "wall_seconds": wall_seconds,
+            "rows_per_second": round(input_rows / wall_seconds, 1) if input_rows and wall_seconds else None,
+            "peak_rss_mb": get_peak_rss_mb(),
+            "stages": self.stages
+        }
+
+        try:
+            conn = _connect(self.metrics_path)
+            try:
+                columns = list(self.record)
+                values = [json.dumps(value) if key == "stages" else value for key, value in self.record.items()]
+                conn.execute(f"INSERT INTO runs ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                             values)
+                conn.commit()
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"Warning: Run metrics not recorded: {e}")
+        return self.record
+
+
+def load_runs(job_type: str = None, limit: int = None, metrics_path: str = None) -> list:
+    """Return recorded runs as dicts, most recent first."""
+    metrics_path = metrics_path or config.METRICS_DB_PATH
+    if not os.path.exists(metrics_path):
+        return []
+    conn = _connect(metrics_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        query = "SELECT * FROM runs"
+        params = []
+        if job_type:
+            query += " WHERE job_type = ?"
+            params.append(job_type)
+        query += " ORDER BY started_at DESC, run_id DESC"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        runs = [dict(row) for row in conn.execute(query, params).fetchall()]
+    finally:
+        conn.close()
+    for run in runs:
+        run["stages"] = json.loads(run["stages"]) if run["stages"] else {}
+    return runs
+
+def summarize_trend(runs: list, period: str = "month") -> list:
+    """
+    Group completed runs by job type and period (month, week or day).
+    Returns one row per group with the run count, median throughput and wall time,
+    mean wall time per stage, mean database size and the highest peak RSS.
+    """
+    groups = {}
+    for run in runs:
+        if run["status"] != "completed":
+            continue
+        started = datetime.datetime.fromisoformat(run["started_at"])
+        groups.setdefault((run["job_type"], started.strftime(PERIOD_FORMATS[period])), []).append(run)
+
+    def median(values):
+        values = [value for value in values if value is not None]
+        return round(statistics.median(values), 3) if values else None
+
+    def mean(values):
+        values = [value for value in values if value is not None]
+        return round(statistics.fmean(values), 3) if values else None
+
+    trend = []
+    for (job_type, period_label), group in sorted(groups.items()):
+        stage_names = list(dict.fromkeys(name for run in group for name in run["stages"]))
+        trend.append({
+            "job_type": job_type,
+            "period": period_label,
+            "runs": len(group),
+            "input_rows": median(run["input_rows"] for run in group),
+            "rows_per_second": median(run["rows_per_second"] for run in group),
+            "wall_seconds": median(run["wall_seconds"] for run in group),
+            "stages": {name: mean(run["stages"].get(name) for run in group) for name in stage_names},
+            "database_mb": mean(run["database_mb"] for run in group),
+            "peak_rss_mb": max((run["peak_rss_mb"] for run in group if run["peak_rss_mb"] is not None), default=None)
+        })
+    return trend
+
+def _format(value) -> str:
+    return "-" if value is None else f"{value:,}" if isinstance(value, (int, float)) else str(value)
+
+def print_history(runs: list, show_stages: bool = False):
+    print(f"{'Started':<20} {'Job type':<14} {'Status':<17} {'Input':>9} {'Output':>9} {'Errors':>7} "
+          f"{'Wall s':>8} {'Rows/s':>10} {'Peak MB':>8} {'DB MB':>8}")
+    for run in runs:
+        print(f"{run['started_at']:<20} {run['job_type']:<14} {run['status']:<17} {_format(run['input_rows']):>9} "
+              f"{_format(run['output_rows']):>9} {_format(run['errors']):>7} {_format(run['wall_seconds']):>8} "
+              f"{_format(run['rows_per_second']):>10} {_format(run['peak_rss_mb']):>8} {_format(run['database_mb']):>8}")
+        if show_stages and run["stages"]:
+            print("    " + ", ".join(f"{name} {seconds}s" for name, seconds in run["stages"].items()))
+
+def print_trend(trend: list):
+    print(f"{'Job type':<14} {'Period':<10} {'Runs':>5} {'Input':>9} {'Rows/s':>10} {'Wall s':>8} "
+          f"{'DB MB':>8} {'Peak MB':>8}  Stages (mean s)")
+    for row in trend:
+        stages = ", ".join(f"{name} {seconds}" for name, seconds in row["stages"].items())
+        print(f"{row['job_type']:<14} {row['period']:<10} {row['runs']:>5} {_format(row['input_rows']):>9} "
+              f"{_format(row['rows_per_second']):>10} {_format(row['wall_seconds']):>8} "
+              f"{_format(row['database_mb']):>8} {_format(row['peak_rss_mb']):>8}  {stages}")
+
+def parse_args(argv: list = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=f'Show the run history recorded in {config.METRICS_DB_PATH}')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    history_parser = commands.add_parser('history', help='List recent runs')
+    history_parser.add_argument('--limit', type=int, default=20)
+    history_parser.add_argument('--stages', action='store_true', help='Also show the wall time of each stage')
+
+    trend_parser = commands.add_parser('trend', help='Median throughput and wall time per period')
+    trend_parser.add_argument('--period', choices=list(PERIOD_FORMATS), default='month')
+
+    for command_parser in (history_parser, trend_parser):
+        command_parser.add_argument('--job-type', help='Only runs of this job type (e.g. rate_update, table_update)')
+        command_parser.add_argument('--json', action='store_true', help='Print the records as JSON')
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == 'history':
+        result = load_runs(args.job_type, args.limit)
+    else:
+        result = summarize_trend(load_runs(args.job_type), args.period)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    elif not result:
+        print("No runs recorded yet.")
+    elif args.command == 'history':
+        print_history(result, args.stages)
+    else:
+        print_trend(result)
@@ -0,0 +1,106 @@
+# src/output_builder.py
+from array import array
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+
+class OutputBuilder:
+    """
+    Accumulates output rows column by column instead of as a list of row dicts.
+
+    Each column is one list of values, with equal strings sharing one object.
+    Categorical columns (repeated values like 'status' or 'effective') store a
+    4-byte code per row plus one copy of each distinct value. The DataFrame is
+    built once in `to_dataframe()`, with the categorical columns as pandas
+    categoricals.
+
+    Output rows can also be added as Arrow tables, which stay in Arrow buffers
+    until `to_dataframe()`. A builder holds either row dicts or Arrow tables.
+    """
+
+    def __init__(self, categorical_columns: list = None):
+        self._categorical = set(categorical_columns or [])
+        self._columns = {}      # column name -> list of values, or array of category codes
+        self._categories = {}   # categorical column name -> {value: code}
+        self._strings = {}      # shared string objects of the other columns
+        self._tables = []       # Arrow tables of output rows, in the order added
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def append(self, row: dict):
+        """Append one output row. Columns missing from the row are None."""
+        if self._tables:
+            raise ValueError("Can't append row dicts to output rows collected as Arrow tables")
+        for column in row:
+            if column not in self._columns:
+                self._add_column(column)
+
+        for column, values in self._columns.items():
+            value = row.get(column)
+            if column in self._categorical:
+                values.append(self._encode(column, value))
+            elif isinstance(value, str):
+                values.append(self._strings.setdefault(value, value))
+            else:
+                values.append(value)
+
+        self._length += 1
+
+    def extend(self, rows):
+        """Append several output rows, given as a list of row dicts or as an Arrow table."""
+        if isinstance(rows, pa.Table):
+            self.append_table(rows)
+            return
+        for row in rows:
+            self.append(row)
+
+    def append_table(self, table: pa.Table):
+        """Append the rows of an Arrow table. Columns missing from some tables are null."""
+        if self._columns:
+            raise ValueError("Can't append Arrow tables to output rows collected as row dicts")
+        if table.num_rows:
+            self._tables.append(table)
+            self._length += table.num_rows
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Build the output DataFrame, in the order columns were first seen."""
+        if self._tables:
+            return self._tables_to_dataframe()
+        data = {}
+        for column, values in self._columns.items():
+            if column in self._categorical:
+                data[column] = pd.Categorical.from_codes(
+                    np.asarray(values), categories=list(self._categories[column])
+                )
+            else:
+                data[column] = values
+        return pd.DataFrame(data, index=pd.RangeIndex(self._length))
+
+    def _tables_to_dataframe(self) -> pd.DataFrame:
+        # The only conversion of Arrow output rows to pandas
+        table = pa.concat_tables(self._tables, promote_options="default").combine_chunks()
+        for column in self._categorical:
+            index = table.schema.get_field_index(column)
+            if index >= 0:
+                table = table.set_column(index, column, table.column(index).dictionary_encode())
+        return table.to_pandas()
+
+    def _add_column(self, column: str):
+        # Rows appended before the column first appeared get None
+        if column in self._categorical:
+            self._columns[column] = array('i', [-1]) * self._length
+            self._categories[column] = {}
+        else:
+            self._columns[column] = [None] * self._length
+
+    def _encode(self, column: str, value) -> int:
+        if value is None or (not isinstance(value, str) and pd.isna(value)):
+            return -1  # pandas' code for a missing categorical value
+        categories = self._categories[column]
+        code = categories.get(value)
+        if code is None:
+            code = categories[value] = len(categories)
+        return code
@@ -0,0 +1,203 @@
+# src/profiler.py
+# Profiling of a single job run (`--profile` on src/main.py and table_updates/table_updater.py).
+# Writes a collapsed-stack file that flamegraph.pl, speedscope or inferno read directly,
+# and a summary of the functions with the most own and total time.
+#
+#   deterministic  cProfile: exact call counts and times, also saved as {name}.prof for pstats/snakeviz.
+#                  Its collapsed stacks are rebuilt from the caller graph, so they are approximate.
+#   sampling       The stack of the job thread is sampled every PROFILE_SAMPLE_INTERVAL seconds.
+#                  Much lower overhead and exact stacks, but no call counts.
+#
+# Without --profile nothing is started, so there is no overhead.
+
+import collections
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+
+# Add the project root to Python path to handle imports when running directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import config
+
+PROFILE_MODES = ("deterministic", "sampling")
+MAX_STACK_DEPTH = 64  # Caller graph levels followed when rebuilding deterministic stacks
+
+
+def _function_label(filename: str, line: int, name: str) -> str:
+    """Frame name in the collapsed file; ';' separates frames there, so it can't appear in one."""
+    if filename == "~":
+        return name.replace(";", ",")  # Built-in, e.g. <method 'iterrows' ...>
+    return f"{name} ({os.path.basename(filename)}:{line})".replace(";", ",")
+
+def _collapse_call_graph(stats: dict) -> collections.Counter:
+    """
+    Rebuild call stacks from cProfile's caller graph: the own time of each function is split
+    over its callers in proportion to the time spent under each of them, up to the roots.
+    Shares below 0.01% of the total stop at the function itself. Returns stack -> seconds.
+    """
+    min_seconds = sum(entry[2] for entry in stats.values()) / 10000
+    stacks = collections.Counter()
+
+    def caller_paths(func, seconds, seen):
+        callers = {caller: entry for caller, entry in stats[func][4].items() if caller in stats and caller not in seen}
+        caller_seconds = sum(entry[3] for entry in callers.values())
+        if not callers or caller_seconds <= 0 or len(seen) >= MAX_STACK_DEPTH:
+            yield (func,), seconds
+            return
+        truncated = 0.0
+        for caller, entry in callers.items():
+            share = seconds * entry[3] / caller_seconds
+            if share < min_seconds:
+                truncated += share
+                continue
+            for path, path_seconds in caller_paths(caller, share, seen | {caller}):
+                yield path + (func,), path_seconds
+        if truncated:
+            yield (func,), truncated
+
+    for func, entry in stats.items():
+        if entry[2] > 0:
+            for path, seconds in caller_paths(func, entry[2], {func}):
+                stacks[tuple(_function_label(*frame) for frame in path)] += seconds
+    return stacks
+
+
+class JobProfiler:
+    """
+    Profiles the thread that calls `start()` until `finish()` writes the results.
+    Writing never fails the job: errors are printed as warnings.
+    """
+
+    def __init__(self, mode: str = "deterministic", interval: float = None, top_n: int = None):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode '{mode}', expected one of: {', '.join(PROFILE_MODES)}")
+        self.mode = mode
+        self.interval = interval or config.PROFILE_SAMPLE_INTERVAL
+        self.top_n = top_n or config.PROFILE_TOP_N
+        self.wall_seconds = None
+        self._profile = None
+        self._samples = collections.Counter()  # stack of frame labels, outermost first -> samples
+        self._stop_event = threading.Event()
+        self._sampler = None
+
+    def start(self):
+        self._start = time.perf_counter()
+        if self.mode == "deterministic":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = threading.Thread(target=self._sample, args=(threading.get_ident(),),
+                                             name="job-profiler", daemon=True)
+            self._sampler.start()
+
+    def stop(self):
+        if self.wall_seconds is not None:
+            return
+        if self._profile:
+            self._profile.disable()
+        if self._sampler:
+            self._stop_event.set()
+            self._sampler.join()
+        self.wall_seconds = round(time.perf_counter() - self._start, 3)
+
+    def _sample(self, thread_id: int):
+        labels = {}  # code object -> frame label
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                if code not in labels:
+                    labels[code] = _function_label(code.co_filename, code.co_firstlineno, code.co_name)
+                stack.append(labels[code])
+                frame = frame.f_back
+            if stack:
+                self._samples[tuple(reversed(stack))] += 1
+
+    def collapsed_stacks(self) -> collections.Counter:
+        """Stack -> weight: microseconds (deterministic) or samples (sampling)."""
+        if self.mode == "sampling":
+            return collections.Counter(self._samples)
+        seconds = _collapse_call_graph(pstats.Stats(self._profile).stats)
+        return collections.Counter({stack: round(value * 1_000_000) for stack, value in seconds.items()
+                                    if round(value * 1_000_000) > 0})
+
+    def hotspots(self) -> list:
+        """Functions with the most own time first: function, calls (None when sampled), own and total seconds."""
+        if self.mode == "deterministic":
+            rows = [
+                {"function": _function_label(*func), "calls": nc, "own_seconds": tt, "total_seconds": ct}
+                for func, (cc, nc, tt, ct, callers) in pstats.Stats(self._profile).stats.items()
+            ]
+        else:
+            own = collections.Counter()
+            total = collections.Counter()
+            for stack, samples in self._samples.items():
+                own[stack[-1]] += samples
+                for label in set(stack):
+                    total[label] += samples
+            rows = [
+                {"function": label, "calls": None, "own_seconds": own[label] * self.interval,
+                 "total_seconds": samples * self.interval}
+                for label, samples in total.items()
+            ]
+        rows.sort(key=lambda row: (row["own_seconds"], row["total_seconds"]), reverse=True)
+        return rows
+
+    def write(self, output_dir: str, name: str = "profile") -> dict:
+        """Write {name}.collapsed, {name}_hotspots.txt and, for deterministic mode, {name}.prof."""
+        os.makedirs(output_dir, exist_ok=True)
+        paths = {
+            "collapsed": os.path.join(output_dir, f"{name}.collapsed"),
+            "hotspots": os.path.join(output_dir, f"{name}_hotspots.txt")
+        }
+        with open(paths["collapsed"], 'w', encoding='utf-8') as f:
+            for stack, weight in sorted(self.collapsed_stacks().items()):
+                f.write(f"{';'.join(stack)} {weight}\n")
+
+        hotspots = self.hotspots()
+        weight_unit = "microseconds" if self.mode == "deterministic" else f"samples of {self.interval}s"
+        lines = [
+            f"Profile: {self.mode}, {self.wall_seconds}s wall time ({paths['collapsed']} weights are {weight_unit})",
+            "",
+            f"Top {self.top_n} functions by own time:",
+            f"{'Own s':>10} {'Total s':>10} {'Calls':>10}  Function"
+        ]
+        for row in hotspots[:self.top_n]:
+            calls = "-" if row["calls"] is None else f"{row['calls']:,}"
+            lines.append(f"{row['own_seconds']:>10.3f} {row['total_seconds']:>10.3f} {calls:>10}  {row['function']}")
+        lines += ["", f"Top {self.top_n} functions by total time:", f"{'Total s':>10} {'Own s':>10}  Function"]
+        for row in sorted(hotspots, key=lambda row: row["total_seconds"], reverse=True)[:self.top_n]:
+            lines.append(f"{row['total_seconds']:>10.3f} {row['own_seconds']:>10.3f}  {row['function']}")
+        with open(paths["hotspots"], 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+
+        if self._profile:
+            paths["pstats"] = os.path.join(output_dir, f"{name}.prof")
+            self._profile.dump_stats(paths["pstats"])
+        return paths
+
+    def finish(self, output_dir: str, name: str = "profile") -> dict | None:
+        """Stop profiling, write the results and print where they are (None if writing failed)."""
+        self.stop()
+        try:
+            paths = self.write(output_dir, name)
+        except Exception as e:
+            print(f"Warning: Profile not written: {e}")
+            return None
+        print(f"Profile ({self.mode}) saved to: {paths['collapsed']}")
+        print(f"Hotspots saved to: {paths['hotspots']}")
+        return paths
+
+
+def start_profiler(mode: str = None) -> JobProfiler | None:
+    """Start profiling the calling thread in the given mode; None (no profiling) when mode is empty."""
+    if not mode:
+        return None
+    profiler = JobProfiler(mode)
+    profiler.start()
+    return profiler
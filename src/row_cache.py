@@ -0,0 +1,163 @@
+# src/row_cache.py
+import os
+import re
+import json
+import time
+import pickle
+import sqlite3
+import hashlib
+import pandas as pd
+
+# Bump when the shape of cached rows or log entries changes.
+CACHE_FORMAT_VERSION = 4
+
+# Source files whose logic determines a row's output. Editing any of them
+# invalidates previously cached rows.
+_CODE_FILES = ['main.py', 'db_handler.py', 'config.py', 'jurisdiction_matcher.py']
+
+_ROW_PREFIX_PATTERN = re.compile(r'^Row \d+:')
+
+
+def get_database_fingerprint(db_path: str) -> str:
+    """
+    Fingerprint a database file by its absolute path, size and modification time.
+    Any write to the database changes the fingerprint and invalidates cached rows.
+    """
+    stat = os.stat(db_path)
+    return f"{os.path.abspath(db_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+
+def _get_code_fingerprint() -> str:
+    """Hash the source files that produce output rows."""
+    digest = hashlib.sha256()
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    for filename in _CODE_FILES:
+        try:
+            with open(os.path.join(src_dir, filename), 'rb') as f:
+                digest.update(f.read())
+        except OSError:
+            digest.update(filename.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _normalize_value(value):
+    """Normalize a job row value so cosmetic differences don't miss the cache."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    return str(value).strip()
+
+
+class RowCache:
+    """
+    Persistent cache of per-row job results.
+
+    Each entry maps a normalized job row plus a database fingerprint to the
+    output rows and log entries that row produced. Entries are evicted least
+    recently used first once the total payload size exceeds `max_bytes`.
+    """
+
+    def __init__(self, cache_path: str, db_path: str, max_bytes: int):
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        self.cache_path = cache_path
+        self.max_bytes = max_bytes
+        self.db_fingerprint = get_database_fingerprint(db_path)
+        self.code_fingerprint = _get_code_fingerprint()
+        self.hits = 0
+        self.misses = 0
+
+        self.conn = sqlite3.connect(cache_path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS row_cache (
+                cache_key TEXT PRIMARY KEY,
+                payload BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_row_cache_last_used ON row_cache (last_used)")
+        self.conn.commit()
+
+    def make_key(self, scope: dict, job_row: pd.Series) -> str:
+        """
+        Build the cache key for a job row.
+        `scope` holds run-level inputs that affect output (job type, effective date, settings).
+        """
+        key_data = {
+            "version": CACHE_FORMAT_VERSION,
+            "code": self.code_fingerprint,
+            "database": self.db_fingerprint,
+            "scope": scope,
+            "row": {str(field): _normalize_value(value) for field, value in job_row.items()}
+        }
+        encoded = json.dumps(key_data, sort_keys=True, default=str)
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+    def get(self, cache_key: str, row_number: int) -> tuple[list, list] | None:
+        """
+        Return (output_rows, log_entries) for a cached row, or None on a miss.
+        Log entries are renumbered to `row_number`, since the same job row may
+        sit at a different position in the rerun file.
+        """
+        result = self.conn.execute(
+            "SELECT payload FROM row_cache WHERE cache_key = ?", (cache_key,)
+        ).fetchone()
+
+        if result is None:
+            self.misses += 1
+            return None
+
+        try:
+            output_rows, log_entries = pickle.loads(result[0])
+        except Exception:
+            # Unreadable entry - drop it and recompute the row
+            self.conn.execute("DELETE FROM row_cache WHERE cache_key = ?", (cache_key,))
+            self.misses += 1
+            return None
+
+        self.conn.execute(
+            "UPDATE row_cache SET last_used = ? WHERE cache_key = ?", (time.time(), cache_key)
+        )
+        self.hits += 1
+        return output_rows, [self._renumber_log_entry(entry, row_number) for entry in log_entries]
+
+    def put(self, cache_key: str, output_rows: list, log_entries: list):
+        """Store the output rows and log entries produced by one job row."""
+        payload = pickle.dumps((output_rows, log_entries), protocol=pickle.HIGHEST_PROTOCOL)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO row_cache (cache_key, payload, size, last_used) VALUES (?, ?, ?, ?)",
+            (cache_key, payload, len(payload), time.time())
+        )
+
+    def evict(self) -> int:
+        """
+        Remove least recently used entries until the cache fits in `max_bytes`.
+        Returns the number of entries removed.
+        """
+        cursor = self.conn.execute("""
+            DELETE FROM row_cache WHERE cache_key IN (
+                SELECT cache_key FROM (
+                    SELECT cache_key,
+                           SUM(size) OVER (ORDER BY last_used DESC, cache_key) AS running_size
+                    FROM row_cache
+                ) WHERE running_size > ?
+            )
+        """, (self.max_bytes,))
+        return cursor.rowcount
+
+    def close(self):
+        """Apply eviction, persist pending writes and close the cache file."""
+        try:
+            self.evict()
+            self.conn.commit()
+        finally:
+            self.conn.close()
+
+    @staticmethod
+    def _renumber_log_entry(entry: dict, row_number: int) -> dict:
+        entry = dict(entry)
+        context = dict(entry.get('context') or {})
+        if 'row_number' in context:
+            context['row_number'] = row_number
+        entry['context'] = context
+        entry['message'] = _ROW_PREFIX_PATTERN.sub(f"Row {row_number}:", entry['message'], count=1)
+        return entry
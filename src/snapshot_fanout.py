@@ -0,0 +1,298 @@
+# src/snapshot_fanout.py
+# Runs one job against several database snapshots at once and compares the results.
+#
+#   python src/snapshot_fanout.py rate_update --databases SNAPSHOT1 SNAPSHOT2 --effective-date 07/01/2025
+#   python src/snapshot_fanout.py table_update --databases SNAPSHOT1 SNAPSHOT2 [--job-folder FOLDER] [--dry-run]
+
+import argparse
+import contextlib
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Add the project root to Python path to handle imports when running directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import config, db_handler, file_handler, logger, main
+from src.job_service import DETAIL_JOB_TYPES, TABLE_UPDATE_JOB_TYPE
+
+TABLE_UPDATE_FLAGS = ("dry_run", "skip_preflight", "build_indexes", "drop_indexes", "verify_copy")
+
+
+def snapshot_labels(db_paths: list) -> list:
+    """
+    Name each snapshot after the folder holding its database file (e.g. '20250701'),
+    or after the file itself when the folder names don't tell the snapshots apart.
+    """
+    labels = [os.path.basename(os.path.dirname(os.path.abspath(path))) for path in db_paths]
+    if len(set(labels)) < len(labels):
+        labels = [os.path.splitext(os.path.basename(path))[0] for path in db_paths]
+    if len(set(labels)) < len(labels):
+        labels = [f"{label}_{i + 1}" for i, label in enumerate(labels)]
+    return labels
+
+def run_snapshot_job(task: dict) -> dict:
+    """
+    Run the job of `task` against one snapshot, in its own process.
+    Console output goes to run.log in the snapshot's output folder.
+    """
+    os.makedirs(task["output_folder"], exist_ok=True)
+    log_path = os.path.join(task["output_folder"], "run.log")
+    start_time = time.time()
+    result = {"label": task["label"], "database": task["db_path"], "log_file": log_path}
+
+    with open(log_path, 'w') as log_file, contextlib.redirect_stdout(log_file):
+        try:
+            if task["job_type"] == TABLE_UPDATE_JOB_TYPE:
+                summary = _run_table_update(task)
+            else:
+                summary = _run_detail_job(task)
+            failed = summary is None or summary.get("status") == "preflight_failed"
+            result.update({"status": "failed" if failed else "completed", "summary": summary})
+        except SystemExit as e:
+            # Raised by log_error(is_critical=True)
+            print(f"\nA critical error occurred: {e}")
+            result.update({"status": "failed", "error": str(e)})
+        except Exception as e:
+            print(f"\nAn unexpected error occurred: {e}")
+            result.update({"status": "failed", "error": str(e)})
+
+    result["elapsed_seconds"] = round(time.time() - start_time, 3)
+    return result
+
+def _run_detail_job(task: dict) -> dict:
+    # Each snapshot process writes its own output folder and row cache file
+    config.DATABASE_PATH = task["db_path"]
+    config.OUTPUT_FOLDER = task["output_folder"]
+    path_hash = hashlib.sha1(os.path.abspath(task["db_path"]).encode('utf-8')).hexdigest()[:8]
+    config.ROW_CACHE_PATH = os.path.join(os.path.dirname(config.ROW_CACHE_PATH), f"row_cache_{path_hash}.sqlite")
+
+    options = main.parse_args([])
+    options.diff_report = task["diff_report"]
+    options.unchanged_rows = task["unchanged_rows"] or options.unchanged_rows
+    options.conflicts = task["conflicts"] or options.conflicts
+    options.as_of = task["as_of"]
+    options.partition_by = task["partition_by"] or options.partition_by
+
+    logger.clear_logs()
+    print(f"Connecting to database: {task['db_path']}")
+    db_connection = db_handler.connect_to_duckdb(task["db_path"], read_only=True)
+    try:
+        return main.execute_job(db_connection, task["job_type"], task["job_file"], task["effective_date"], options)
+    finally:
+        db_connection.close()
+
+def _run_table_update(task: dict) -> dict:
+    from table_updates.table_updater import TableUpdater
+
+    # Work on a copy of the job folder, so the snapshots' database copies and error logs don't collide
+    work_folder = os.path.join(task["output_folder"], os.path.basename(task["job_folder"]))
+    os.makedirs(work_folder, exist_ok=True)
+    for filename in os.listdir(task["job_folder"]):
+        if filename.lower().endswith('.csv'):
+            shutil.copy2(os.path.join(task["job_folder"], filename), work_folder)
+
+    updater = TableUpdater()
+    return updater.run_job_folder(work_folder, task["db_path"], **{flag: task[flag] for flag in TABLE_UPDATE_FLAGS})
+
+def compare_outputs(results: list, job_type: str) -> pd.DataFrame | None:
+    """
+    Line up the output rows of all snapshots by their key fields.
+    Returns one row per key with each snapshot's status and the columns whose values differ.
+    """
+    if job_type == "new_authority":
+        key_fields = ['tax_auth_id']
+    elif job_type == "jurisdiction_update":
+        key_fields = ['geocode']
+    else:
+        key_fields = list(config.DETAIL_VERSION_KEY)
+
+    frames = {}
+    for result in results:
+        output_file = (result.get("summary") or {}).get("output_file")
+        if not output_file:
+            continue
+        df = pd.read_csv(output_file, dtype=str, keep_default_na=False)
+        # Number repeated keys so each occurrence is compared with the same occurrence elsewhere
+        df['occurrence'] = df.groupby(key_fields).cumcount() + 1
+        frames[result["label"]] = df.set_index(key_fields + ['occurrence'])
+
+    if not frames:
+        return None
+
+    keys = frames[next(iter(frames))].index
+    for df in list(frames.values())[1:]:
+        keys = keys.union(df.index, sort=False)
+    value_columns = list(frames[next(iter(frames))].columns)
+
+    # One row per key, with a (label, column) column for each snapshot's values
+    merged = pd.concat({label: df.assign(_present=True) for label, df in frames.items()},
+                       axis=1, join='outer').reindex(keys)
+    present = merged.xs('_present', axis=1, level=1).notna()
+
+    comparison = pd.DataFrame(index=keys)
+    notes = pd.Series("", index=keys, dtype=object)
+    for label in frames:
+        comparison[f"{label}_status"] = merged[(label, 'status')]
+        notes += pd.Series(np.where(present[label], "", f"missing in {label}; "), index=keys, dtype=object)
+    for col in value_columns:
+        # A column differs when a snapshot holding the key has another value than the first one holding it
+        values = merged.xs(col, axis=1, level=1)
+        first = values.iloc[:, 0]
+        for label in values.columns[1:]:
+            first = first.fillna(values[label])
+        changed = (values.notna() & values.ne(first, axis=0)).any(axis=1)
+        notes += pd.Series(np.where(changed, f"{col}; ", ""), index=keys, dtype=object)
+    comparison['differences'] = notes.str[:-2]
+
+    return comparison.reset_index()
+
+def run_fanout(job_type: str, db_paths: list, job_file: str = None, job_folder: str = None,
+               effective_date: datetime.datetime = None, options: dict = None, max_workers: int = None) -> dict:
+    """
+    Run one job against every database in `db_paths` concurrently, one process per snapshot.
+    Writes each snapshot's output to its own folder plus fanout_summary.json (and, for
+    detail jobs, comparison.csv) to a new `{timestamp}_fanout` output folder.
+    """
+    options = options or {}
+    if job_type in DETAIL_JOB_TYPES and job_type != "new_authority" and effective_date is None:
+        raise ValueError(f"An effective date is required for {job_type} jobs")
+    for db_path in db_paths:
+        if not os.path.exists(db_path):
+            raise ValueError(f"Database not found: {db_path}")
+
+    if job_type == TABLE_UPDATE_JOB_TYPE:
+        from table_updates.table_updater import TableUpdater
+        job_folder = job_folder or TableUpdater().find_latest_update_folder()
+        if not os.path.isdir(job_folder):
+            raise ValueError(f"Job folder not found: {job_folder}")
+    else:
+        job_file = job_file or file_handler.find_latest_job_file(config.JOB_FOLDER, job_type)
+        if not job_file or not os.path.exists(job_file):
+            raise ValueError(f"No job file found for type '{job_type}'")
+
+    fanout_dir = file_handler.create_output_directory(config.OUTPUT_FOLDER, "fanout")
+    if not fanout_dir:
+        return None  # Error already logged as critical
+    labels = snapshot_labels(db_paths)
+
+    tasks = []
+    for label, db_path in zip(labels, db_paths):
+        task = {
+            "label": label,
+            "db_path": db_path,
+            "job_type": job_type,
+            "job_file": job_file,
+            "job_folder": job_folder,
+            "effective_date": effective_date,
+            "output_folder": os.path.join(fanout_dir, label),
+            "diff_report": bool(options.get("diff_report")),
+            "unchanged_rows": options.get("unchanged_rows"),
+            "conflicts": options.get("conflicts"),
+            "as_of": options.get("as_of"),
+            "partition_by": options.get("partition_by")
+        }
+        task.update({flag: bool(options.get(flag)) for flag in TABLE_UPDATE_FLAGS})
+        tasks.append(task)
+
+    print(f"Running {job_type} against {len(tasks)} snapshots: {', '.join(labels)}")
+    with ProcessPoolExecutor(max_workers=min(len(tasks), max_workers or os.cpu_count() or 1)) as executor:
+        results = list(executor.map(run_snapshot_job, tasks))
+
+    summary = {
+        "job_type": job_type,
+        "job": job_folder if job_type == TABLE_UPDATE_JOB_TYPE else job_file,
+        "effective_date": effective_date.strftime('%Y-%m-%d') if effective_date else None,
+        "output_dir": fanout_dir,
+        "snapshots": results,
+        "comparison_file": None
+    }
+
+    if job_type != TABLE_UPDATE_JOB_TYPE:
+        comparison = compare_outputs(results, job_type)
+        if comparison is not None:
+            comparison_path = os.path.join(fanout_dir, "comparison.csv")
+            comparison.to_csv(comparison_path, index=False)
+            summary["comparison_file"] = comparison_path
+            summary["rows_compared"] = len(comparison)
+            summary["rows_differing"] = int((comparison['differences'] != "").sum())
+
+    with open(os.path.join(fanout_dir, "fanout_summary.json"), 'w') as f:
+        json.dump(summary, f, indent=2, default=str)
+
+    print_fanout_summary(summary)
+    return summary
+
+def print_fanout_summary(summary: dict):
+    print("\n" + "=" * 50)
+    print("FAN-OUT COMPLETE")
+    print("=" * 50)
+    print(f"Output Path: {summary['output_dir']}")
+    for result in summary["snapshots"]:
+        job_summary = result.get("summary") or {}
+        if result["status"] != "completed":
+            detail = result.get("error") or job_summary.get("status")
+        elif summary["job_type"] == TABLE_UPDATE_JOB_TYPE:
+            detail = f"{job_summary.get('total_errors', 0)} errors"
+        else:
+            detail = (f"{job_summary.get('rows_added', 0)} output rows, {job_summary.get('rows_with_warnings', 0)} rows with warnings, "
+                      f"{job_summary.get('rows_with_errors', 0)} rows with errors")
+        print(f"- {result['label']}: {result['status']} in {result['elapsed_seconds']}s ({detail})")
+    if summary["comparison_file"]:
+        print(f"- {summary['rows_differing']} of {summary['rows_compared']} output rows differ between snapshots: "
+              f"{summary['comparison_file']}")
+    print("=" * 50)
+
+def parse_args(argv: list = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Run one job against several database snapshots concurrently')
+    parser.add_argument('job_type', choices=DETAIL_JOB_TYPES + [TABLE_UPDATE_JOB_TYPE])
+    parser.add_argument('--databases', nargs='+', required=True, metavar='PATH',
+                        help='Database snapshots to run the job against')
+    parser.add_argument('--job-file', help='Job CSV (default: latest in the job folder)')
+    parser.add_argument('--effective-date', metavar='MM/DD/YYYY', help='Effective date of every job type except new_authority and table_update')
+    parser.add_argument('--diff-report', action='store_true')
+    parser.add_argument('--unchanged-rows', choices=['keep', 'flag', 'drop'])
+    parser.add_argument('--conflicts', choices=main.CONFLICT_RULES)
+    parser.add_argument('--as-of', nargs='?', const='effective', type=main.parse_as_of_date, metavar='MM/DD/YYYY')
+    parser.add_argument('--partition-by', nargs='?', const='state', metavar='COLUMN')
+    parser.add_argument('--job-folder', help='table_update: job folder (default: latest)')
+    for flag in ('--dry-run', '--skip-preflight', '--build-indexes', '--drop-indexes', '--verify-copy'):
+        parser.add_argument(flag, action='store_true', help='table_update: as for table_updater.py')
+    parser.add_argument('--workers', type=int, help='Snapshots run at the same time (default: all, up to the CPU count)')
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    effective_date = None
+    if args.job_type not in ("new_authority", TABLE_UPDATE_JOB_TYPE):
+        try:
+            effective_date = datetime.datetime.strptime(args.effective_date or "", '%m/%d/%Y')
+        except ValueError:
+            print(f"Error: --effective-date MM/DD/YYYY is required for {args.job_type} jobs")
+            sys.exit(1)
+
+    job_file = args.job_file
+    if job_file and not os.path.isabs(job_file) and not os.path.exists(job_file):
+        job_file = os.path.join(config.JOB_FOLDER, job_file)
+
+    options = {key: getattr(args, key)
+               for key in ('diff_report', 'unchanged_rows', 'conflicts', 'as_of', 'partition_by') + TABLE_UPDATE_FLAGS}
+    try:
+        summary = run_fanout(args.job_type, args.databases, job_file, args.job_folder, effective_date,
+                             options, args.workers)
+    except SystemExit as e:
+        print(f"\nA critical error occurred: {e}")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    sys.exit(0 if all(result["status"] == "completed" for result in summary["snapshots"]) else 1)
@@ -0,0 +1,221 @@
+# src/sql_log.py
+# SQL statement log (`--sql-log` on src/main.py and table_updates/table_updater.py).
+# A wrapped DuckDB connection records every statement by its shape - the SQL with literals
+# and IN lists normalized away - with its execution count, total and max latency (execute
+# plus fetch) and rows returned. The report lists the shapes by total time, with the
+# EXPLAIN ANALYZE plan of the slowest ones to show whether they use an index.
+
+import datetime
+import json
+import os
+import re
+import threading
+import time
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"(?<![\w\".$])-?\d+(?:\.\d+)?(?![\w\"])")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+_SCAN_TYPE = re.compile(r"Type: (Index Scan|Sequential Scan)")
+
+
+def normalize_statement(sql: str) -> str:
+    """The shape of a statement: literals become ?, IN lists of any length become IN (?...)."""
+    shape = _STRING_LITERAL.sub("?", sql)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _WHITESPACE.sub(" ", shape).strip().rstrip(";").strip()
+    return _IN_LIST.sub("IN (?...)", shape)
+
+
+class StatementLog:
+    """Statistics per statement shape, shared by all connections (and cursors) of a run."""
+
+    def __init__(self):
+        self.shapes = {}
+        self._lock = threading.Lock()
+
+    def record(self, sql: str, parameters, seconds: float, rows: int | None):
+        shape = normalize_statement(sql)
+        with self._lock:
+            entry = self.shapes.get(shape)
+            if entry is None:
+                entry = self.shapes[shape] = {
+                    "shape": shape, "count": 0, "total_seconds": 0.0, "max_seconds": 0.0, "rows": None,
+                    "example_sql": sql, "example_parameters": parameters
+                }
+            entry["count"] += 1
+            entry["total_seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            if rows is not None:
+                entry["rows"] = (entry["rows"] or 0) + rows
+
+    def report(self, conn=None, explain_top: int = 0) -> dict:
+        """
+        Shapes by total time. With a connection, the explain_top slowest shapes get their plan:
+        EXPLAIN ANALYZE for queries, EXPLAIN for statements that would change data.
+        """
+        with self._lock:
+            entries = sorted((dict(entry) for entry in self.shapes.values()),
+                             key=lambda entry: entry["total_seconds"], reverse=True)
+        total_seconds = sum(entry["total_seconds"] for entry in entries)
+        shapes = []
+        for rank, entry in enumerate(entries):
+            shape = {
+                "shape": entry["shape"],
+                "count": entry["count"],
+                "total_seconds": round(entry["total_seconds"], 6),
+                "share": round(entry["total_seconds"] / total_seconds, 4) if total_seconds else None,
+                "mean_ms": round(entry["total_seconds"] / entry["count"] * 1000, 3),
+                "max_ms": round(entry["max_seconds"] * 1000, 3),
+                "rows": entry["rows"]
+            }
+            if conn is not None and rank < explain_top:
+                shape["plan"] = explain_statement(conn, entry["example_sql"], entry["example_parameters"])
+            shapes.append(shape)
+        return {
+            "generated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "executions": sum(entry["count"] for entry in entries),
+            "total_seconds": round(total_seconds, 6),
+            "shapes": shapes
+        }
+
+    def write_report(self, path: str, conn=None, explain_top: int = 0) -> dict | None:
+        """Write the report as JSON and print the top shapes. Never fails the job: errors are printed as warnings."""
+        if isinstance(conn, LoggedConnection):
+            conn._flush()
+            conn = conn.unwrap()  # Don't log the EXPLAIN statements themselves
+        try:
+            report = self.report(conn, explain_top)
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2, default=str)
+        except Exception as e:
+            print(f"Warning: SQL statement log not written: {e}")
+            return None
+        print(f"SQL statement log saved to: {path} ({len(report['shapes'])} statement shapes, "
+              f"{report['executions']} executions, {report['total_seconds']:.3f}s)")
+        for shape in report["shapes"][:3]:
+            share = f"{shape['share']:.0%}" if shape["share"] is not None else "-"
+            print(f"  {share:>4} {shape['count']:>7}x {shape['mean_ms']:>9.3f} ms  {shape['shape'][:100]}")
+        return report
+
+
+def _scanned_tables(plan: str) -> list:
+    """Tables named by the scans of a rendered plan; a long name wraps to the next line of its box."""
+    lines = plan.splitlines()
+    tables = set()
+    for i, line in enumerate(lines):
+        for match in re.finditer("Table:", line):
+            box_start = line.rfind("│", 0, match.start()) + 1
+            box_end = line.find("│", match.end())
+            box_end = len(line) if box_end < 0 else box_end
+            name = line[match.end():box_end].strip()
+            if not name and i + 1 < len(lines):
+                name = lines[i + 1][box_start:box_end].strip()
+            if name:
+                tables.add(name)
+    return sorted(tables)
+
+def explain_statement(conn, sql: str, parameters=None) -> dict:
+    """The plan of one statement, its scan types and whether any scan uses an index."""
+    analyze = normalize_statement(sql).upper().startswith(("SELECT", "WITH", "FROM", "VALUES"))
+    try:
+        rows = conn.execute(f"EXPLAIN {'ANALYZE ' if analyze else ''}{sql}", parameters or None).fetchall()
+    except Exception as e:
+        return {"error": str(e)}
+    text = "\n".join(row[1] for row in rows)
+    scans = _SCAN_TYPE.findall(text)
+    return {
+        "mode": "explain_analyze" if analyze else "explain",
+        "tables": _scanned_tables(text),
+        "scans": scans,
+        "uses_index": "Index Scan" in scans,
+        "text": text
+    }
+
+
+class LoggedConnection:
+    """
+    DuckDB connection wrapper that records execute() and executemany() in a StatementLog.
+    The fetch that follows a statement adds its time and row count to the statement;
+    anything else is passed through to the connection.
+    """
+
+    def __init__(self, conn, log: StatementLog):
+        self._conn = conn
+        self._log = log
+        self._pending = None  # [sql, parameters, seconds] of the statement not yet fetched
+
+    def unwrap(self):
+        return self._conn
+
+    def _flush(self, rows: int | None = None, fetch_seconds: float = 0.0):
+        if self._pending is not None:
+            sql, parameters, seconds = self._pending
+            self._pending = None
+            self._log.record(sql, parameters, seconds + fetch_seconds, rows)
+
+    def _run(self, method, query, parameters):
+        self._flush()
+        start = time.perf_counter()
+        if parameters is None:
+            method(query)
+        else:
+            method(query, parameters)
+        self._pending = [query, parameters, time.perf_counter() - start]
+        return self
+
+    def execute(self, query, parameters=None):
+        return self._run(self._conn.execute, query, parameters)
+
+    def executemany(self, query, parameters=None):
+        return self._run(self._conn.executemany, query, parameters)
+
+    def _fetch(self, method, count_rows, *args):
+        start = time.perf_counter()
+        result = getattr(self._conn, method)(*args)
+        self._flush(count_rows(result), time.perf_counter() - start)
+        return result
+
+    def fetchone(self):
+        return self._fetch("fetchone", lambda row: 0 if row is None else 1)
+
+    def fetchall(self):
+        return self._fetch("fetchall", len)
+
+    def fetchmany(self, size=1):
+        return self._fetch("fetchmany", len, size)
+
+    def fetchdf(self, *args):
+        return self._fetch("fetchdf", len, *args)
+
+    def df(self, *args):
+        return self._fetch("df", len, *args)
+
+    def fetch_arrow_table(self, *args):
+        return self._fetch("fetch_arrow_table", lambda table: table.num_rows, *args)
+
+    def to_arrow_table(self, *args):
+        return self._fetch("to_arrow_table", lambda table: table.num_rows, *args)
+
+    def arrow(self, *args):
+        return self._fetch("arrow", lambda table: getattr(table, "num_rows", None), *args)
+
+    def fetchnumpy(self):
+        return self._fetch("fetchnumpy", lambda columns: len(next(iter(columns.values()))) if columns else 0)
+
+    def cursor(self):
+        return LoggedConnection(self._conn.cursor(), self._log)
+
+    def close(self):
+        self._flush()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
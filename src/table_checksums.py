@@ -0,0 +1,239 @@
+# src/table_checksums.py
+# Order-independent per-table checksums of a DuckDB database, cached next to the
+# database file, and a "tables changed" report comparing two databases (e.g. a
+# table update job's database copy with DATABASE_PATH).
+#
+#   python src/table_checksums.py compare COPY [--source PATH] [--partition-by [COLUMN]] [--full]
+#   python src/table_checksums.py checksum DATABASE [--partition-by [COLUMN]] [--full]
+
+import argparse
+import json
+import os
+import sys
+
+import duckdb
+
+# Add the project root to Python path to handle imports when running directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import config, duckdb_resources
+
+# Bump when the way checksums are computed changes.
+CHECKSUM_FORMAT_VERSION = 1
+
+CACHE_SUFFIX = ".checksums.json"
+UNKNOWN_PARTITION = "UNKNOWN"
+
+
+def get_cache_path(db_path: str) -> str:
+    """The checksum cache of a database: 'tax_rates.duckdb' -> 'tax_rates.duckdb.checksums.json'."""
+    return f"{db_path}{CACHE_SUFFIX}"
+
+def _load_cache(db_path: str) -> dict:
+    try:
+        with open(get_cache_path(db_path), 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    # DuckDB's hash() may change between versions, so checksums from another version are not comparable
+    if cache.get("format") != CHECKSUM_FORMAT_VERSION or cache.get("duckdb_version") != duckdb.__version__:
+        return {}
+    return cache.get("tables", {})
+
+def _save_cache(db_path: str, tables: dict):
+    cache = {"format": CHECKSUM_FORMAT_VERSION, "duckdb_version": duckdb.__version__, "tables": tables}
+    try:
+        with open(get_cache_path(db_path), 'w', encoding='utf-8') as f:
+            json.dump(cache, f, indent=2)
+    except OSError as e:
+        print(f"Warning: Could not save checksum cache for {db_path}: {e}")
+
+def _storage_marker(conn, table_name: str) -> str:
+    """
+    Fingerprint where and how a table's data is stored (blocks, offsets, counts, statistics).
+    Any write to the table changes it, so an unchanged marker means the cached checksum still holds.
+    """
+    return conn.execute("""
+        SELECT md5(string_agg(
+            concat_ws(':', row_group_id, column_id, segment_id, block_id, block_offset,
+                      count, has_updates, persistent, stats),
+            ',' ORDER BY row_group_id, column_id, segment_id))
+        FROM pragma_storage_info(?)
+    """, [table_name]).fetchone()[0] or ""
+
+def _format_checksum(value) -> str:
+    return f"{int(value or 0) % 2**64:016x}"
+
+def partition_expression(conn, columns: list, partition_by: str | None) -> tuple[str, str] | None:
+    """
+    Return (SQL expression, join clause) giving each row's partition, or None when the table has
+    no such column. 'state' also partitions tables with a geocode column, by the state of the
+    geocode table for the geocode's country + state prefix.
+    """
+    if not partition_by:
+        return None
+    if partition_by in columns:
+        return f'COALESCE(t."{partition_by}"::VARCHAR, \'{UNKNOWN_PARTITION}\')', ""
+    if partition_by == "state" and "geocode" in columns:
+        geocode_columns = [row[0] for row in conn.execute(
+            "SELECT column_name FROM duckdb_columns() WHERE table_name = 'geocode'"
+        ).fetchall()]
+        if "state" in geocode_columns:
+            join = """
+                LEFT JOIN (
+                    SELECT substr(geocode, 1, 4) AS prefix, MIN(state) AS state
+                    FROM geocode WHERE state IS NOT NULL GROUP BY prefix
+                ) s ON s.prefix = substr(t.geocode, 1, 4)
+            """
+            return f"COALESCE(s.state, '{UNKNOWN_PARTITION}')", join
+    return None
+
+def _compute_table_checksum(conn, table_name: str, partition_by: str | None) -> dict:
+    """Row count and sum of row hashes of a table, in total and per partition."""
+    columns = [row[0] for row in conn.execute(f'DESCRIBE "{table_name}"').fetchall()]
+    column_list = ', '.join(f't."{col}"' for col in columns)
+    row_hash = f"hash({column_list})"
+    partition = partition_expression(conn, columns, partition_by)
+
+    if partition is None:
+        row_count, total = conn.execute(f'SELECT COUNT(*), SUM({row_hash}) FROM "{table_name}" t').fetchone()
+        return {"row_count": row_count, "checksum": _format_checksum(total), "partition_by": partition_by}
+
+    expression, join = partition
+    rows = conn.execute(f"""
+        SELECT {expression} AS partition_value, COUNT(*), SUM({row_hash})
+        FROM "{table_name}" t {join}
+        GROUP BY partition_value
+    """).fetchall()
+    return {
+        "row_count": sum(row[1] for row in rows),
+        "checksum": _format_checksum(sum(int(row[2] or 0) for row in rows)),
+        "partition_by": partition_by,
+        "partitions": {row[0]: {"row_count": row[1], "checksum": _format_checksum(row[2])}
+                       for row in sorted(rows)}
+    }
+
+def compute_checksums(db_path: str, partition_by: str | None = None, full: bool = False) -> dict:
+    """
+    Checksum every table of a database: an order-independent sum of row hashes, computed in DuckDB.
+
+    Results are cached in get_cache_path(db_path). A table is only recomputed when its row count
+    or storage marker changed, when other partitions are asked for, or when `full` is set.
+    Returns {"tables": {table: checksum entry}, "recomputed": [tables]}.
+    """
+    cache = {} if full else _load_cache(db_path)
+    conn = duckdb_resources.connect(db_path, read_only=True)
+    try:
+        table_names = [row[0] for row in conn.execute("""
+            SELECT table_name FROM duckdb_tables()
+            WHERE NOT internal AND NOT temporary AND schema_name = 'main'
+            ORDER BY table_name
+        """).fetchall()]
+
+        tables = {}
+        recomputed = []
+        for table_name in table_names:
+            # Deleted rows only show in the row count; other writes change the storage marker
+            row_count = conn.execute(f'SELECT COUNT(*) FROM "{table_name}"').fetchone()[0]
+            marker = f"{row_count}|{_storage_marker(conn, table_name)}"
+            cached = cache.get(table_name)
+            if (cached and cached["marker"] == marker
+                    and (partition_by is None or cached["partition_by"] == partition_by)):
+                tables[table_name] = cached
+                continue
+
+            entry = _compute_table_checksum(conn, table_name, partition_by)
+            entry["marker"] = marker
+            tables[table_name] = entry
+            recomputed.append(table_name)
+    finally:
+        conn.close()
+
+    if recomputed or set(cache) != set(tables):
+        _save_cache(db_path, tables)
+    return {"tables": tables, "recomputed": recomputed}
+
+def compare_checksums(source_path: str, copy_path: str, partition_by: str | None = None,
+                      full: bool = False) -> dict:
+    """
+    Compare the per-table checksums of two databases.
+    Returns the "tables changed" report: one entry per table with its status
+    (unchanged, changed, added or removed), row counts and the partitions that differ.
+    """
+    source = compute_checksums(source_path, partition_by, full)
+    copy = compute_checksums(copy_path, partition_by, full)
+
+    report = {"source": source_path, "copy": copy_path, "partition_by": partition_by, "tables": []}
+    for table_name in sorted(set(source["tables"]) | set(copy["tables"])):
+        before = source["tables"].get(table_name)
+        after = copy["tables"].get(table_name)
+        entry = {
+            "table": table_name,
+            "source_rows": before["row_count"] if before else None,
+            "copy_rows": after["row_count"] if after else None
+        }
+        if before is None:
+            entry["status"] = "added"
+        elif after is None:
+            entry["status"] = "removed"
+        elif before["checksum"] == after["checksum"] and before["row_count"] == after["row_count"]:
+            entry["status"] = "unchanged"
+        else:
+            entry["status"] = "changed"
+            if "partitions" in before and "partitions" in after:
+                entry["changed_partitions"] = sorted(
+                    value for value in set(before["partitions"]) | set(after["partitions"])
+                    if before["partitions"].get(value) != after["partitions"].get(value)
+                )
+        report["tables"].append(entry)
+
+    report["tables_changed"] = sum(1 for entry in report["tables"] if entry["status"] != "unchanged")
+    report["recomputed"] = {"source": source["recomputed"], "copy": copy["recomputed"]}
+    return report
+
+def print_checksum_report(report: dict):
+    """Print a tables changed report."""
+    print(f"\nTables changed: {report['tables_changed']} of {len(report['tables'])} "
+          f"({os.path.basename(report['copy'])} vs {os.path.basename(report['source'])})")
+    for entry in report["tables"]:
+        line = f"  {entry['table']}: {entry['status']}"
+        if entry["source_rows"] != entry["copy_rows"] and entry["status"] == "changed":
+            line += f" ({entry['source_rows']} -> {entry['copy_rows']} rows)"
+        if entry.get("changed_partitions"):
+            line += f", {report['partition_by']}: {', '.join(entry['changed_partitions'])}"
+        print(line)
+
+def parse_args(argv: list = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Per-table checksums of DuckDB databases')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    compare_parser = commands.add_parser('compare', help='Report the tables that differ from the source database')
+    compare_parser.add_argument('copy', help='Database to verify, e.g. a job folder copy')
+    compare_parser.add_argument('--source', default=config.DATABASE_PATH,
+                                help=f'Database to compare with (default: {config.DATABASE_PATH})')
+    compare_parser.add_argument('--output', help='Also write the report to this JSON file')
+
+    checksum_parser = commands.add_parser('checksum', help='Print the table checksums of one database')
+    checksum_parser.add_argument('database')
+
+    for command_parser in (compare_parser, checksum_parser):
+        command_parser.add_argument('--partition-by', nargs='?', const='state', metavar='COLUMN',
+                                    help="Also checksum each value of COLUMN (default: 'state')")
+        command_parser.add_argument('--full', action='store_true',
+                                    help='Recompute every table instead of reusing cached checksums')
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == 'compare':
+        report = compare_checksums(args.source, args.copy, args.partition_by, args.full)
+        print_checksum_report(report)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+        sys.exit(1 if report["tables_changed"] else 0)
+    else:
+        result = compute_checksums(args.database, args.partition_by, args.full)
+        for table_name, entry in result["tables"].items():
+            cached = "" if table_name in result["recomputed"] else " (cached)"
+            print(f"{table_name}: {entry['row_count']} rows, checksum {entry['checksum']}{cached}")
@@ -7,18 +7,25 @@ based on specified filtering criteria. It supports schema validation, batch proc
 and comprehensive error logging.
 
 Usage:
-    python table_updates/table_updater.py [--dry-run] [--job-folder FOLDER]
+    python table_updates/table_updater.py [--dry-run] [--job-folder FOLDER] [--preflight-only] [--skip-preflight]
+                                          [--build-indexes] [--drop-indexes] [--index-database PATH]
+                                          [--no-change-log] [--rollback [FILE]] [--verify-copy]
+                                          [--export-parquet [{all,changed}]] [--export-partition-by [COLUMN]]
+                                          [--threads N] [--memory-limit SIZE] [--temp-directory DIR]
+                                          [--no-insertion-order]
 """
 
 import os
 import sys
 import json
 import argparse
+import contextlib
 import shutil
 import time
 from datetime import datetime
 from typing import Dict, List, Tuple, Optional
 import re
+from concurrent.futures import ThreadPoolExecutor
 
 # Add src directory to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
@@ -31,7 +38,16 @@ except ImportError as e:
     print("Please install requirements: pip install pandas duckdb")
     sys.exit(1)
 
-from config import DATABASE_PATH
+from config import (DATABASE_PATH, LOOKUP_ACCESS_PATTERNS, CHECKSUM_PARTITION_BY,
+                    PARQUET_EXPORT_PARTITION_MIN_ROWS, PARQUET_EXPORT_WORKERS, SQL_LOG_EXPLAIN_TOP)
+from table_checksums import (compare_checksums, compute_checksums, get_cache_path, partition_expression,
+                             print_checksum_report)
+from metrics import RunMetrics
+from profiler import PROFILE_MODES, start_profiler
+from sql_log import LoggedConnection, StatementLog
+from memory_tracker import start_memory_tracker
+from duckdb_resources import (add_resource_arguments, apply_resource_arguments, connect as connect_duckdb,
+                              describe_settings)
 
 
 class TableUpdater:
@@ -47,16 +63,63 @@ class TableUpdater:
         self.error_log_filename = "errors.json"
         self.supported_job_types = ["append", "update"]
         self.csv_filename_pattern = r"^(.+)_(append|update)_(\d+)\.csv$"
+        self.preflight_report_filename = "preflight_report.json"
+        self.preflight_max_reported_rows = 100  # Per check and file, to keep the report readable
+        self.lookup_index_prefix = "lookup_"
+        self.lookup_indexes = {}  # table name -> indexed column, used to narrow update lookups
+        self.schema_cache = None  # table name -> schema; set to {} to reuse schemas across files and jobs
+        self.change_log_enabled = True  # Record before/after images of every applied file
+        self.change_log_folder = "change_logs"
+        self.change_log_index_filename = "change_log.json"
+        self.tables_changed_filename = "tables_changed.json"
+        self.parquet_manifest_filename = "manifest.json"
+        self.run_counts = {"rows_read": 0, "rows_updated": 0, "rows_appended": 0}  # For the run history
+        self.sql_log = None  # StatementLog recording the statements of each run (--sql-log)
+        self.sql_log_filename = "sql_log.json"
+        self.memory_tracker = None  # MemoryTracker attributing memory to each stage (--memory-report)
         
         # Load filtering criteria
         self.load_filtering_criteria()
     
+    def _memory_stage(self, name: str):
+        """Stage of the memory report, when it is on"""
+        return self.memory_tracker.stage(name) if self.memory_tracker else contextlib.nullcontext()
+    
+    def _log_connection(self, conn):
+        """Wrap a connection so its statements are recorded in the SQL statement log, when it is on"""
+        return conn if self.sql_log is None else LoggedConnection(conn, self.sql_log)
+    
+    def write_sql_log(self, job_folder: str, db_path: Optional[str], filename: Optional[str] = None) -> Optional[str]:
+        """
+        Write the SQL statement log to the job folder, with the plans of the slowest statement
+        shapes taken on a read-only connection to db_path
+        Returns: the report path, or None if the log is off or could not be written
+        """
+        if self.sql_log is None:
+            return None
+        report_path = os.path.join(job_folder, filename or self.sql_log_filename)
+        conn = None
+        try:
+            if db_path and os.path.exists(db_path):
+                conn = connect_duckdb(db_path, read_only=True)
+        except Exception as e:
+            print(f"Warning: No plans in the SQL statement log, database not available: {e}")
+        try:
+            report = self.sql_log.write_report(report_path, conn, SQL_LOG_EXPLAIN_TOP)
+        finally:
+            if conn:
+                conn.close()
+        return report_path if report else None
+    
     def _get_table_schema(self, table_name: str, db_path: str) -> dict:
         """
         Get table schema from DuckDB database
         Returns: dict mapping column names to DuckDB data types
         """
-        conn = duckdb.connect(db_path)
+        if self.schema_cache is not None and table_name in self.schema_cache:
+            return dict(self.schema_cache[table_name])
+        
+        conn = self._log_connection(connect_duckdb(db_path))
         try:
             result = conn.execute(f'DESCRIBE "{table_name}"').fetchall()
             # Result format: [(column_name, column_type, null, key, default, extra), ...]
@@ -65,6 +128,8 @@ class TableUpdater:
                 col_name = row[0]
                 col_type = row[1].upper()  # Convert to uppercase for consistency
                 schema[col_name] = col_type
+            if self.schema_cache is not None:
+                self.schema_cache[table_name] = dict(schema)
             return schema
         except Exception as e:
             raise Exception(f"Failed to get schema for table {table_name}: {str(e)}")
@@ -278,6 +343,12 @@ class TableUpdater:
         
         print(f"Copying database from {source_path} to {target_path}")
         shutil.copy2(source_path, target_path)
+        
+        # The copy's tables are stored exactly as the source's, so its checksums still hold for them
+        if os.path.exists(get_cache_path(source_path)):
+            shutil.copy2(get_cache_path(source_path), get_cache_path(target_path))
+        elif os.path.exists(get_cache_path(target_path)):
+            os.remove(get_cache_path(target_path))
         return target_path
     
     def parse_csv_filename(self, filename: str) -> Tuple[str, str, str]:
@@ -296,14 +367,17 @@ class TableUpdater:
         
         return table_name, job_type, seq_num
     
-    def validate_csv_schema(self, csv_path: str, table_name: str, db_path: str) -> bool:
+    def validate_csv_schema(self, csv_path: str, table_name: str, db_path: str, conn=None) -> bool:
         """
         Validate that CSV field names match the target table schema
+        Uses `conn` when given (e.g. a read-only dry run connection), otherwise opens db_path
         Returns: True if schema matches, False otherwise
         """
         try:
             # Get table schema from database
-            conn = duckdb.connect(db_path)
+            owns_connection = conn is None
+            if owns_connection:
+                conn = self._log_connection(connect_duckdb(db_path))
             try:
                 table_columns = conn.execute(f'DESCRIBE "{table_name}"').fetchall()
                 db_field_names = {col[0].lower() for col in table_columns}
@@ -316,7 +390,8 @@ class TableUpdater:
                 self.log_error(error_data, os.path.dirname(csv_path))
                 return False
             finally:
-                conn.close()
+                if owns_connection:
+                    conn.close()
             
             # Get CSV field names
             df = pd.read_csv(csv_path, nrows=0)  # Read only headers
@@ -429,27 +504,520 @@ class TableUpdater:
         except Exception:
             return 0
     
+    def _sql_cast_expression(self, column_sql: str, column_type: str) -> str:
+        """
+        Build a SQL expression that converts a raw CSV string to the column's DuckDB type
+        DATE/TIMESTAMP values accept the same Excel formats as _convert_date_value
+        Returns NULL for values that can't be converted
+        """
+        column_type = column_type.upper()
+        
+        if 'DATE' in column_type or 'TIMESTAMP' in column_type:
+            trimmed = f"TRIM({column_sql})"
+            candidates = [f"TRY_CAST({trimmed} AS {column_type})"]
+            for date_format in ['%m/%d/%Y', '%m-%d-%Y', '%Y/%m/%d']:
+                candidates.append(f"TRY_CAST(TRY_STRPTIME({trimmed}, '{date_format}') AS {column_type})")
+            return f"COALESCE({', '.join(candidates)})"
+        
+        return f"TRY_CAST({column_sql} AS {column_type})"
+    
+    def _load_csv_into_temp_table(self, conn, csv_path: str, temp_table: str) -> List[str]:
+        """
+        Load a CSV file into a temp table with every value kept as a string
+        Adds a 1-based csv_row column in file order; empty values become NULL
+        Returns: the CSV column names
+        """
+        conn.execute(
+            f"CREATE OR REPLACE TEMP TABLE {temp_table} AS "
+            f"SELECT row_number() OVER () AS csv_row, * FROM read_csv(?, header=true, all_varchar=true)",
+            [csv_path]
+        )
+        columns = [col[0] for col in conn.execute(f"DESCRIBE {temp_table}").fetchall()]
+        return [col for col in columns if col != 'csv_row']
+    
+    def _filter_patterns(self, conn, rows_table: str, present_fields: List[str], table_schema: dict) -> List[Tuple]:
+        """
+        Rows only filter on their non-empty fields, so group the CSV rows of rows_table by which
+        filter fields are present; each pattern can then be matched with one hash join
+        Returns: list of (row conditions selecting the pattern, its filter fields, typed key expressions)
+        """
+        if present_fields:
+            pattern_select = ', '.join(f'"{field}" IS NOT NULL' for field in present_fields)
+            patterns = conn.execute(f"SELECT DISTINCT {pattern_select} FROM {rows_table}").fetchall()
+        else:
+            patterns = [()]
+        
+        result = []
+        for pattern in patterns:
+            active_fields = [field for field, present in zip(present_fields, pattern) if present]
+            pattern_conditions = [
+                f'r."{field}" IS {"NOT " if present else ""}NULL'
+                for field, present in zip(present_fields, pattern)
+            ] or ["TRUE"]
+            typed_keys = [
+                self._sql_cast_expression(f'r."{field}"', table_schema.get(field, 'VARCHAR'))
+                for field in active_fields
+            ]
+            result.append((pattern_conditions, active_fields, typed_keys))
+        return result
+    
+    def _record_dry_run_appends(self, conn, table_name: str, filter_fields: List[str], added_table: str,
+                                csv_columns: List[str], rows_condition: str = "TRUE"):
+        """
+        Add the filter keys of the dry_run_rows rows matching rows_condition to added_table,
+        the rows earlier files of the dry run would append to table_name
+        """
+        table_schema = {col[0]: col[1].upper() for col in conn.execute(f'DESCRIBE "{table_name}"').fetchall()}
+        key_fields = [field for field in filter_fields if field in table_schema]
+        if not key_fields:
+            return
+        conn.execute(f"""
+            CREATE TEMP TABLE IF NOT EXISTS {added_table} AS
+            SELECT {', '.join(f'"{field}"' for field in key_fields)} FROM "{table_name}" LIMIT 0
+        """)
+        key_values = [
+            self._sql_cast_expression(f'r."{field}"', table_schema[field]) if field in csv_columns else "NULL"
+            for field in key_fields
+        ]
+        conn.execute(f"INSERT INTO {added_table} SELECT {', '.join(key_values)} FROM dry_run_rows r "
+                     f"WHERE {rows_condition}")
+    
+    def predict_update_outcomes(self, conn, csv_path: str, table_name: str, filter_fields: List[str],
+                                added_table: str = None) -> Dict:
+        """
+        Predict how process_update_job would treat every row of an update CSV, using
+        set-based match-count queries instead of one COUNT(*) per row
+        Rows are compared with the database state before the file is applied, plus the filter
+        keys in added_table (the rows earlier files of the folder would append, see
+        predict_csv_files); a repeated filter key that matches nothing is appended once and
+        updated afterwards. The keys this file would append are added to added_table
+        Returns: counts of rows that would update, append or error, plus the error rows
+        """
+        table_schema = {col[0]: col[1].upper() for col in conn.execute(f'DESCRIBE "{table_name}"').fetchall()}
+        csv_columns = self._load_csv_into_temp_table(conn, csv_path, "dry_run_rows")
+        present_fields = [field for field in filter_fields if field in csv_columns]
+        
+        target = f'"{table_name}"'
+        if added_table and conn.execute(
+                "SELECT COUNT(*) FROM duckdb_tables() WHERE temporary AND table_name = ?", [added_table]
+        ).fetchone()[0]:
+            added_columns = ', '.join(f'"{col[0]}"' for col in conn.execute(f"DESCRIBE {added_table}").fetchall())
+            target = f'(SELECT {added_columns} FROM "{table_name}" UNION ALL SELECT {added_columns} FROM {added_table})'
+        
+        conn.execute(
+            "CREATE OR REPLACE TEMP TABLE dry_run_outcomes "
+            "(csv_row BIGINT, outcome VARCHAR, match_count BIGINT)"
+        )
+        
+        for pattern_conditions, active_fields, typed_keys in self._filter_patterns(
+                conn, "dry_run_rows", present_fields, table_schema):
+            if not active_fields:
+                conn.execute(f"""
+                    INSERT INTO dry_run_outcomes
+                    SELECT r.csv_row, 'no_filter', NULL FROM dry_run_rows r
+                    WHERE {' AND '.join(pattern_conditions)}
+                """)
+                continue
+            
+            join_conditions = [f't."{field}" = key_{i}' for i, field in enumerate(active_fields)]
+            key_columns = ', '.join(f'key_{i}' for i in range(len(active_fields)))
+            
+            conn.execute(f"""
+                INSERT INTO dry_run_outcomes
+                WITH keyed AS (
+                    SELECT r.csv_row, {', '.join(f'{expr} AS key_{i}' for i, expr in enumerate(typed_keys))}
+                    FROM dry_run_rows r
+                    WHERE {' AND '.join(pattern_conditions)}
+                ),
+                matches AS (
+                    SELECT k.csv_row, {', '.join(f'k.key_{i}' for i in range(len(active_fields)))},
+                           COUNT(t."{active_fields[0]}") AS match_count
+                    FROM keyed k
+                    LEFT JOIN {target} t ON {' AND '.join(join_conditions)}
+                    GROUP BY ALL
+                )
+                SELECT csv_row,
+                       CASE
+                           WHEN match_count > 1 THEN 'error'
+                           WHEN match_count = 1 THEN 'update'
+                           WHEN ROW_NUMBER() OVER (PARTITION BY {key_columns} ORDER BY csv_row) > 1 THEN 'update'
+                           ELSE 'append'
+                       END,
+                       match_count
+                FROM matches
+            """)
+        
+        counts = dict(conn.execute(
+            "SELECT outcome, COUNT(*) FROM dry_run_outcomes GROUP BY outcome"
+        ).fetchall())
+        
+        if added_table and counts.get('append'):
+            self._record_dry_run_appends(
+                conn, table_name, filter_fields, added_table, csv_columns,
+                "r.csv_row IN (SELECT csv_row FROM dry_run_outcomes WHERE outcome = 'append')"
+            )
+        
+        error_select = ', '.join([f'r."{field}"' for field in present_fields])
+        error_rows = conn.execute(f"""
+            SELECT o.csv_row, o.outcome, o.match_count{', ' + error_select if error_select else ''}
+            FROM dry_run_outcomes o JOIN dry_run_rows r USING (csv_row)
+            WHERE o.outcome IN ('error', 'no_filter')
+            ORDER BY o.csv_row
+        """).fetchall()
+        
+        errors = []
+        for error_row in error_rows:
+            csv_row, outcome, match_count = error_row[:3]
+            if outcome == 'no_filter':
+                errors.append({
+                    "file": os.path.basename(csv_path),
+                    "row": int(csv_row),
+                    "error": "No valid filter conditions found in row",
+                    "filter_fields": filter_fields
+                })
+            else:
+                filter_values = {field: value for field, value in zip(present_fields, error_row[3:])
+                                 if value is not None}
+                errors.append({
+                    "file": os.path.basename(csv_path),
+                    "row": int(csv_row),
+                    "error": "Multiple matching records found",
+                    "filter_fields": filter_fields,
+                    "filter_values": filter_values,
+                    "match_count": int(match_count)
+                })
+        
+        return {
+            "rows": sum(counts.values()),
+            "would_update": counts.get('update', 0),
+            "would_append": counts.get('append', 0),
+            "would_error": counts.get('error', 0) + counts.get('no_filter', 0),
+            "errors": errors
+        }
+    
+    def predict_csv_files(self, job_folder: str, db_path: str) -> Dict:
+        """
+        Dry run that predicts the outcome of every CSV file against the source database
+        The database is attached read-only and never copied, so no duplicate_database is needed
+        Files are predicted in processing order: an update file also matches the rows that the
+        files before it would append (kept as filter keys in temp tables). Updates never change
+        the filter fields they matched on, so they don't change later matches
+        Writes dry_run_report.json to the job folder
+        Returns: the report with per-file update/append/error counts and the rows that would error
+        """
+        if not os.path.exists(job_folder):
+            raise ValueError(f"Job folder not found: {job_folder}")
+        
+        csv_files = [f for f in os.listdir(job_folder) if f.endswith('.csv')]
+        
+        if not csv_files:
+            print("No CSV files found in job folder")
+            return {}
+        
+        print(f"Found {len(csv_files)} CSV files to process")
+        
+        report = {
+            "timestamp": datetime.now().isoformat(),
+            "database": db_path,
+            "files": []
+        }
+        
+        conn = self._log_connection(connect_duckdb(db_path, read_only=True))
+        added_tables = {}  # table -> temp table of the filter keys appended by earlier files
+        try:
+            for csv_file in csv_files:
+                print(f"\nProcessing: {csv_file}")
+                csv_path = os.path.join(job_folder, csv_file)
+                
+                try:
+                    table_name, job_type, seq_num = self.parse_csv_filename(csv_file)
+                    print(f"  Table: {table_name}, Job Type: {job_type}, Sequence: {seq_num}")
+                except ValueError as e:
+                    error_data = {
+                        "file": csv_file,
+                        "error": f"Invalid filename format: {str(e)}"
+                    }
+                    self.log_error(error_data, job_folder)
+                    report["files"].append({"file": csv_file, "skipped": str(e)})
+                    print(f"  SKIPPED: {e}")
+                    continue
+                
+                filter_fields = self.filtering_criteria.get(table_name, {}).get("filter_fields", [])
+                if job_type == "update" and not filter_fields:
+                    error_data = {
+                        "file": csv_file,
+                        "error": f"No filtering criteria found for table: {table_name}",
+                        "table": table_name
+                    }
+                    self.log_error(error_data, job_folder)
+                    report["files"].append({"file": csv_file, "skipped": "No filtering criteria"})
+                    print(f"  SKIPPED: No filtering criteria for table {table_name}")
+                    continue
+                
+                if not self.validate_csv_schema(csv_path, table_name, db_path, conn=conn):
+                    report["files"].append({"file": csv_file, "skipped": "Schema validation failed"})
+                    print(f"  SKIPPED: Schema validation failed")
+                    continue
+                
+                added_table = added_tables.setdefault(table_name, f"dry_run_added_{len(added_tables)}")
+                try:
+                    if job_type == "append":
+                        csv_columns = self._load_csv_into_temp_table(conn, csv_path, "dry_run_rows")
+                        row_count = conn.execute("SELECT COUNT(*) FROM dry_run_rows").fetchone()[0]
+                        if filter_fields:
+                            self._record_dry_run_appends(conn, table_name, filter_fields, added_table, csv_columns)
+                        outcome = {"rows": row_count, "would_update": 0, "would_append": row_count,
+                                   "would_error": 0, "errors": []}
+                        print(f"  DRY RUN: Would append {row_count} rows to {table_name}")
+                    else:
+                        outcome = self.predict_update_outcomes(conn, csv_path, table_name, filter_fields, added_table)
+                        print(f"  DRY RUN: Would update {outcome['would_update']} rows and append "
+                              f"{outcome['would_append']} rows in {table_name}")
+                        if outcome["errors"]:
+                            print(f"  DRY RUN: {outcome['would_error']} rows would fail:")
+                            for error in outcome["errors"]:
+                                details = f" (match_count {error['match_count']}) {error['filter_values']}" \
+                                    if "match_count" in error else ""
+                                print(f"    Row {error['row']}: {error['error']}{details}")
+                except Exception as e:
+                    error_data = {
+                        "file": csv_file,
+                        "error": f"Dry run prediction failed: {str(e)}",
+                        "table": table_name
+                    }
+                    self.log_error(error_data, job_folder)
+                    report["files"].append({"file": csv_file, "skipped": str(e)})
+                    print(f"  ERROR: Dry run prediction failed - {str(e)}")
+                    continue
+                
+                report["files"].append({"file": csv_file, "table": table_name, "job_type": job_type, **outcome})
+        finally:
+            conn.close()
+        
+        predicted = [f for f in report["files"] if "rows" in f]
+        report["totals"] = {
+            key: sum(f[key] for f in predicted)
+            for key in ["rows", "would_update", "would_append", "would_error"]
+        }
+        
+        report_path = os.path.join(job_folder, "dry_run_report.json")
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False, default=str)
+        
+        totals = report["totals"]
+        print(f"\nDRY RUN totals: {totals['would_update']} updates, {totals['would_append']} appends, "
+              f"{totals['would_error']} errors")
+        print(f"Dry run report saved to: {report_path}")
+        return report
+    
+    def preflight_job_folder(self, job_folder: str, db_path: str, max_workers: Optional[int] = None) -> Dict:
+        """
+        Validate every CSV file in the job folder concurrently before anything is written
+        Checks header/schema match, castability of every value, empty filter-field values
+        and duplicate filter-key tuples within each file
+        Writes one consolidated preflight_report.json to the job folder
+        Returns: the report; report["passed"] is False if any file has errors
+        """
+        if not os.path.exists(job_folder):
+            raise ValueError(f"Job folder not found: {job_folder}")
+        
+        csv_files = sorted(f for f in os.listdir(job_folder) if f.endswith('.csv'))
+        
+        report = {
+            "timestamp": datetime.now().isoformat(),
+            "database": db_path,
+            "files": [],
+            "total_errors": 0,
+            "total_warnings": 0,
+            "passed": True
+        }
+        
+        if csv_files:
+            workers = max_workers or min(len(csv_files), os.cpu_count() or 1)
+            conn = self._log_connection(connect_duckdb(db_path, read_only=True))
+            try:
+                # Each worker gets its own cursor, so temp tables don't collide between files
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    futures = [
+                        executor.submit(self._preflight_csv_file, conn.cursor(), os.path.join(job_folder, csv_file))
+                        for csv_file in csv_files
+                    ]
+                    report["files"] = [future.result() for future in futures]
+            finally:
+                conn.close()
+        
+        report["total_errors"] = sum(len(f["errors"]) for f in report["files"])
+        report["total_warnings"] = sum(len(f["warnings"]) for f in report["files"])
+        report["passed"] = report["total_errors"] == 0
+        
+        report_path = os.path.join(job_folder, self.preflight_report_filename)
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False, default=str)
+        
+        print(f"Preflight checked {len(csv_files)} CSV files")
+        for file_report in report["files"]:
+            status = "FAILED" if file_report["errors"] else "OK"
+            print(f"  {status}: {file_report['file']} ({file_report.get('rows', 0)} rows, "
+                  f"{len(file_report['errors'])} errors, {len(file_report['warnings'])} warnings)")
+            for issue in file_report["errors"] + file_report["warnings"]:
+                print(f"    {issue['message']}")
+        print(f"Preflight report saved to: {report_path}")
+        
+        return report
+    
+    def _preflight_csv_file(self, conn, csv_path: str) -> Dict:
+        """
+        Run all preflight checks for one CSV file on its own cursor
+        Returns: {"file", "table", "job_type", "rows", "errors": [...], "warnings": [...]}
+        """
+        csv_file = os.path.basename(csv_path)
+        result = {"file": csv_file, "errors": [], "warnings": []}
+        
+        def add_issue(level: str, check: str, message: str, **details):
+            result[level].append({"check": check, "message": message, **details})
+        
+        try:
+            try:
+                table_name, job_type, seq_num = self.parse_csv_filename(csv_file)
+            except ValueError as e:
+                add_issue("errors", "filename", f"Invalid filename format: {str(e)}")
+                return result
+            
+            result["table"] = table_name
+            result["job_type"] = job_type
+            
+            filter_fields = self.filtering_criteria.get(table_name, {}).get("filter_fields", [])
+            if job_type == "update" and not filter_fields:
+                add_issue("errors", "filter_criteria", f"No filtering criteria found for table: {table_name}")
+                return result
+            
+            # Header/schema match
+            try:
+                table_schema = {col[0]: col[1].upper() for col in conn.execute(f'DESCRIBE "{table_name}"').fetchall()}
+            except Exception as e:
+                add_issue("errors", "schema", f"Failed to get table schema: {str(e)}")
+                return result
+            
+            csv_columns = self._load_csv_into_temp_table(conn, csv_path, "preflight_rows")
+            result["rows"] = conn.execute("SELECT COUNT(*) FROM preflight_rows").fetchone()[0]
+            
+            table_columns_lower = {col.lower(): col for col in table_schema}
+            unknown_columns = [col for col in csv_columns if col.lower().strip() not in table_columns_lower]
+            if unknown_columns:
+                add_issue("errors", "schema", f"CSV columns not in table {table_name}: {unknown_columns}",
+                          columns=unknown_columns)
+            
+            # Type castability of every value
+            cast_checks = []
+            for col in csv_columns:
+                table_col = table_columns_lower.get(col.lower().strip())
+                if table_col is None or 'CHAR' in table_schema[table_col] or table_schema[table_col] == 'TEXT':
+                    continue  # Unknown column (reported above) or a string column that accepts any value
+                cast_expression = self._sql_cast_expression(f'"{col}"', table_schema[table_col])
+                cast_checks.append(
+                    f"""SELECT csv_row, '{col}' AS column_name, '{table_schema[table_col]}' AS column_type, "{col}" AS value
+                        FROM preflight_rows WHERE "{col}" IS NOT NULL AND {cast_expression} IS NULL"""
+                )
+            if cast_checks:
+                cast_failures = conn.execute(
+                    f"SELECT * FROM ({' UNION ALL '.join(cast_checks)}) ORDER BY csv_row"
+                ).fetchall()
+                for csv_row, column_name, column_type, value in cast_failures[:self.preflight_max_reported_rows]:
+                    add_issue("errors", "type", f"Row {csv_row}: '{value}' is not a valid {column_type} for column {column_name}",
+                              row=int(csv_row), column=column_name, value=value)
+                if len(cast_failures) > self.preflight_max_reported_rows:
+                    add_issue("errors", "type", f"{len(cast_failures) - self.preflight_max_reported_rows} more values "
+                              f"can't be converted to their column types", count=len(cast_failures))
+            
+            present_fields = [field for field in filter_fields if field in csv_columns]
+            missing_fields = [field for field in filter_fields if field not in csv_columns]
+            
+            # Empty filter-field values
+            if job_type == "update":
+                if missing_fields:
+                    add_issue("warnings", "filter_fields", f"Filter fields not in CSV, they won't be used for matching: {missing_fields}",
+                              columns=missing_fields)
+                
+                if present_fields:
+                    any_empty = ' OR '.join(f'"{field}" IS NULL' for field in present_fields)
+                    all_empty = ' AND '.join(f'"{field}" IS NULL' for field in present_fields)
+                    empty_field_names = " || ',' || ".join(
+                        f"CASE WHEN \"{field}\" IS NULL THEN '{field}' ELSE '' END" for field in present_fields
+                    )
+                    empty_rows = conn.execute(f"""
+                        SELECT csv_row, {all_empty} AS all_empty, {empty_field_names}
+                        FROM preflight_rows WHERE {any_empty} ORDER BY csv_row
+                    """).fetchall()
+                    for csv_row, is_all_empty, empty_list in empty_rows[:self.preflight_max_reported_rows]:
+                        empty_fields = [field for field in empty_list.split(',') if field]
+                        if is_all_empty:
+                            add_issue("errors", "empty_filter", f"Row {csv_row}: all filter fields are empty",
+                                      row=int(csv_row), columns=empty_fields)
+                        else:
+                            add_issue("warnings", "empty_filter", f"Row {csv_row}: empty filter fields {empty_fields} are ignored for matching",
+                                      row=int(csv_row), columns=empty_fields)
+                    if len(empty_rows) > self.preflight_max_reported_rows:
+                        add_issue("warnings", "empty_filter", f"{len(empty_rows) - self.preflight_max_reported_rows} more rows "
+                                  f"have empty filter fields", count=len(empty_rows))
+            
+            # Duplicate filter-key tuples; DuckDB's hash aggregate finds them in one pass
+            if present_fields:
+                key_columns = ', '.join(f'"{field}"' for field in present_fields)
+                not_all_empty = ' OR '.join(f'"{field}" IS NOT NULL' for field in present_fields)
+                duplicates = conn.execute(f"""
+                    SELECT list(csv_row ORDER BY csv_row) AS csv_rows, {key_columns}
+                    FROM preflight_rows
+                    WHERE {not_all_empty}
+                    GROUP BY {key_columns}
+                    HAVING COUNT(*) > 1
+                    ORDER BY csv_rows[1]
+                """).fetchall()
+                for duplicate in duplicates[:self.preflight_max_reported_rows]:
+                    rows = [int(row) for row in duplicate[0]]
+                    key_values = dict(zip(present_fields, duplicate[1:]))
+                    add_issue("warnings", "duplicate_key", f"Rows {rows} share the filter key {key_values}",
+                              rows=rows, filter_values=key_values)
+                if len(duplicates) > self.preflight_max_reported_rows:
+                    add_issue("warnings", "duplicate_key", f"{len(duplicates) - self.preflight_max_reported_rows} more "
+                              f"duplicate filter keys", count=len(duplicates))
+            
+        except Exception as e:
+            add_issue("errors", "read", f"Preflight failed: {str(e)}")
+        finally:
+            conn.close()
+        
+        return result
+    
     def process_append_job(self, csv_path: str, table_name: str, db_path: str):
         """
         Process append CSV files - consistent data type handling with date conversion
         """
-        conn = duckdb.connect(db_path)
+        conn = self._log_connection(connect_duckdb(db_path))
+        change_log = None
+        csv_file = os.path.basename(csv_path)
         
         try:
             print(f"  Reading CSV data with schema-based types...")
-            # Read CSV with database schema-based data types
-            df = self._read_csv_with_error_handling(csv_path, table_name, db_path)
+            with self._memory_stage(f"{csv_file}: read"):
+                # Read CSV with database schema-based data types
+                df = self._read_csv_with_error_handling(csv_path, table_name, db_path)
+                
+                # Get table schema for date preprocessing
+                table_schema = self._get_table_schema(table_name, db_path)
             
-            # Get table schema for date preprocessing
-            table_schema = self._get_table_schema(table_name, db_path)
+            with self._memory_stage(f"{csv_file}: change log before"):
+                change_log = self._start_change_log(conn, csv_path, table_name, "append")
             
             print(f"  Inserting {len(df)} rows into {table_name}...")
             
             # Insert rows using the same method as updates for consistency
-            for index, row in df.iterrows():
-                self._insert_row(conn, table_name, row, table_schema)
+            with self._memory_stage(f"{csv_file}: apply"):
+                for index, row in df.iterrows():
+                    self._insert_row(conn, table_name, row, table_schema)
             
             print(f"  SUCCESS: Appended {len(df)} rows to {table_name}")
+            self.run_counts["rows_read"] += len(df)
+            self.run_counts["rows_appended"] += len(df)
             
         except Exception as e:
             error_data = {
@@ -460,13 +1028,18 @@ class TableUpdater:
             self.log_error(error_data, os.path.dirname(csv_path))
             print(f"  ERROR: Append failed - {str(e)}")
         finally:
+            # Also records the rows applied before a failure
+            with self._memory_stage(f"{csv_file}: change log after"):
+                self._finish_change_log(conn, change_log)
             conn.close()
     
     def process_update_job(self, csv_path: str, table_name: str, db_path: str, filter_fields: List[str]):
         """
         Process update CSV files with filtering logic - optimized for batch processing
         """
-        conn = duckdb.connect(db_path)
+        conn = self._log_connection(connect_duckdb(db_path))
+        change_log = None
+        csv_file = os.path.basename(csv_path)
         
         try:
             print(f"  Reading CSV data...")
@@ -491,85 +1064,113 @@ class TableUpdater:
                 self.log_error(error_data, os.path.dirname(csv_path))
                 csv_reader = pd.read_csv(csv_path, chunksize=chunk_size, dtype=str, keep_default_na=False)
             
+            with self._memory_stage(f"{csv_file}: change log before"):
+                change_log = self._start_change_log(conn, csv_path, table_name, "update", filter_fields)
+            
             total_processed = 0
             total_updated = 0
             total_appended = 0
             total_errors = 0
+            total_index_lookups = 0
+            lookup_column = self.lookup_indexes.get(table_name)
             
-            for chunk_idx, df_chunk in enumerate(csv_reader):
-                print(f"  Processing chunk {chunk_idx + 1} ({len(df_chunk)} rows)...")
-                
-                for index, row in df_chunk.iterrows():
-                    total_processed += 1
-                    
-                    # Build WHERE clause from filter fields
-                    where_conditions = []
-                    param_values = []
-                    
-                    for field in filter_fields:
-                        if field in row:
-                            value = row[field]
-                            if pd.notna(value):
-                                # Only exclude empty strings for string values
-                                if isinstance(value, str) and value.strip() == '':
-                                    continue  # Skip empty strings in filter conditions
-                                else:
-                                    where_conditions.append(f'"{field}" = ?')
-                                    param_values.append(value)
+            with self._memory_stage(f"{csv_file}: apply"):
+                for chunk_idx, df_chunk in enumerate(csv_reader):
+                    print(f"  Processing chunk {chunk_idx + 1} ({len(df_chunk)} rows)...")
                     
-                    if not where_conditions:
-                        # No filter conditions - log error and skip
-                        error_data = {
-                            "file": os.path.basename(csv_path),
-                            "row": chunk_idx * chunk_size + index + 1,
-                            "error": "No valid filter conditions found in row",
-                            "filter_fields": filter_fields
-                        }
-                        self.log_error(error_data, os.path.dirname(csv_path))
-                        total_errors += 1
-                        continue
-                    
-                    where_clause = " AND ".join(where_conditions)
-                    
-                    # Check for existing records
-                    query = f"SELECT COUNT(*) as count FROM {table_name} WHERE {where_clause}"
-                    result = conn.execute(query, param_values).fetchone()
-                    
-                    if result[0] == 0:
-                        # No match found - append
-                        self._insert_row(conn, table_name, row, table_schema)
-                        total_appended += 1
-                    elif result[0] == 1:
-                        # Single match - update
-                        self._update_row(conn, table_name, row, where_clause, param_values, table_schema)
-                        total_updated += 1
-                    else:
-                        # Multiple matches - log error
-                        filter_values = {}
+                    for index, row in df_chunk.iterrows():
+                        total_processed += 1
+                        
+                        # Filter values get the same date conversion as the values written
+                        row = self._preprocess_row_data(row, table_schema)
+                        
+                        # Build WHERE clause from filter fields
+                        where_conditions = []
+                        where_fields = []
+                        param_values = []
+                        
                         for field in filter_fields:
                             if field in row:
                                 value = row[field]
-                                if pd.notna(value) and not (isinstance(value, str) and value.strip() == ''):
-                                    # Ensure JSON serializable values
-                                    if hasattr(value, 'item'):  # numpy types
-                                        value = value.item()
-                                    elif hasattr(value, 'isoformat'):  # datetime types
-                                        value = value.isoformat()
-                                    filter_values[field] = value
+                                if pd.notna(value):
+                                    # Only exclude empty strings for string values
+                                    if isinstance(value, str) and value.strip() == '':
+                                        continue  # Skip empty strings in filter conditions
+                                    else:
+                                        where_conditions.append(f'"{field}" = ?')
+                                        where_fields.append(field)
+                                        param_values.append(value)
+                        
+                        if not where_conditions:
+                            # No filter conditions - log error and skip
+                            error_data = {
+                                "file": os.path.basename(csv_path),
+                                "row": chunk_idx * chunk_size + index + 1,
+                                "error": "No valid filter conditions found in row",
+                                "filter_fields": filter_fields
+                            }
+                            self.log_error(error_data, os.path.dirname(csv_path))
+                            total_errors += 1
+                            continue
+                        
+                        where_clause = " AND ".join(where_conditions)
+                        
+                        # Check for existing records
+                        if lookup_column in where_fields:
+                            # Seek through the lookup index, then update the single match by rowid
+                            result = self._count_matches_by_index(conn, table_name, lookup_column,
+                                                                  where_fields, param_values)
+                            total_index_lookups += 1
+                        else:
+                            query = f"SELECT COUNT(*) as count FROM {table_name} WHERE {where_clause}"
+                            result = conn.execute(query, param_values).fetchone()
                         
-                        error_data = {
-                            "file": os.path.basename(csv_path),
-                            "row": chunk_idx * chunk_size + index + 1,  # 1-based indexing
-                            "error": "Multiple matching records found",
-                            "filter_fields": filter_fields,
-                            "filter_values": filter_values,
-                            "match_count": int(result[0])
-                        }
-                        self.log_error(error_data, os.path.dirname(csv_path))
-                        total_errors += 1
+                        if result[0] == 0:
+                            # No match found - append
+                            self._insert_row(conn, table_name, row, table_schema)
+                            total_appended += 1
+                        elif result[0] == 1:
+                            # Single match - update
+                            if lookup_column in where_fields:
+                                # The indexed column already equals its filter value; setting it would make
+                                # DuckDB rewrite the row as a delete and insert, moving it to a new rowid
+                                self._update_row(conn, table_name, row.drop(lookup_column), "rowid = ?",
+                                                 [result[1]], table_schema)
+                            else:
+                                self._update_row(conn, table_name, row, where_clause, param_values, table_schema)
+                            total_updated += 1
+                        else:
+                            # Multiple matches - log error
+                            filter_values = {}
+                            for field in filter_fields:
+                                if field in row:
+                                    value = row[field]
+                                    if pd.notna(value) and not (isinstance(value, str) and value.strip() == ''):
+                                        # Ensure JSON serializable values
+                                        if hasattr(value, 'item'):  # numpy types
+                                            value = value.item()
+                                        elif hasattr(value, 'isoformat'):  # datetime types
+                                            value = value.isoformat()
+                                        filter_values[field] = value
+                            
+                            error_data = {
+                                "file": os.path.basename(csv_path),
+                                "row": chunk_idx * chunk_size + index + 1,  # 1-based indexing
+                                "error": "Multiple matching records found",
+                                "filter_fields": filter_fields,
+                                "filter_values": filter_values,
+                                "match_count": int(result[0])
+                            }
+                            self.log_error(error_data, os.path.dirname(csv_path))
+                            total_errors += 1
             
             print(f"  SUCCESS: Processed {total_processed} rows")
             print(f"    Updated: {total_updated}, Appended: {total_appended}, Errors: {total_errors}")
+            self.run_counts["rows_read"] += total_processed
+            self.run_counts["rows_updated"] += total_updated
+            self.run_counts["rows_appended"] += total_appended
+            if total_index_lookups:
+                print(f"    Index lookups on {lookup_column}: {total_index_lookups}")
                 
         except Exception as e:
             error_data = {
@@ -579,8 +1180,444 @@ class TableUpdater:
             }
             self.log_error(error_data, os.path.dirname(csv_path))
             print(f"  ERROR: Update processing failed - {str(e)}")
+        finally:
+            # Also records the rows applied before a failure
+            with self._memory_stage(f"{csv_file}: change log after"):
+                self._finish_change_log(conn, change_log)
+            conn.close()
+    
+    def _start_change_log(self, conn, csv_path: str, table_name: str, job_type: str,
+                          filter_fields: List[str] = None) -> Optional[Dict]:
+        """
+        Capture the state needed for the change log of one CSV file, before it is applied
+        Update files: the rows each CSV row's filter key matches, found with one join per filter
+        pattern as in predict_update_outcomes. Append files: the highest rowid, since appended
+        rows get higher rowids
+        Returns: the change log state for _finish_change_log, or None if change logs are off or failed
+        """
+        if not self.change_log_enabled:
+            return None
+        
+        change_log = {"csv_path": csv_path, "table": table_name, "job_type": job_type,
+                      "filter_fields": filter_fields or []}
+        try:
+            if job_type == "append":
+                result = conn.execute(f'SELECT MAX(rowid) FROM "{table_name}"').fetchone()
+                change_log["max_rowid"] = result[0] if result and result[0] is not None else -1
+            else:
+                table_schema = {col[0]: col[1].upper() for col in conn.execute(f'DESCRIBE "{table_name}"').fetchall()}
+                csv_columns = self._load_csv_into_temp_table(conn, csv_path, "change_log_rows")
+                present_fields = [field for field in change_log["filter_fields"] if field in csv_columns]
+                change_log["columns"] = list(table_schema)
+                change_log["patterns"] = self._filter_patterns(conn, "change_log_rows", present_fields, table_schema)
+                self._capture_key_matches(conn, table_name, change_log["patterns"], "change_log_before")
+            return change_log
+        except Exception as e:
+            print(f"  Warning: Change log not recorded for {os.path.basename(csv_path)}: {e}")
+            return None
+    
+    def _capture_key_matches(self, conn, table_name: str, patterns: List[Tuple], target_table: str):
+        """
+        Store, for every CSV row of change_log_rows, the table rows its filter key matches now
+        Rows of target_table: csv_row, key_rank (occurrence of the key in the file), match_count
+        and the matching table row (NULL columns when nothing matches)
+        """
+        conn.execute(
+            f'CREATE OR REPLACE TEMP TABLE {target_table} AS SELECT NULL::BIGINT AS csv_row, '
+            f'NULL::BIGINT AS key_rank, NULL::BIGINT AS match_count, * FROM "{table_name}" LIMIT 0'
+        )
+        for pattern_conditions, active_fields, typed_keys in patterns:
+            if not active_fields:
+                continue  # Rows without filter values are skipped by process_update_job
+            
+            join_conditions = [f't."{field}" = k.key_{i}' for i, field in enumerate(active_fields)]
+            key_columns = ', '.join(f'key_{i}' for i in range(len(active_fields)))
+            conn.execute(f"""
+                INSERT INTO {target_table}
+                WITH keyed AS (
+                    SELECT r.csv_row, {', '.join(f'{expr} AS key_{i}' for i, expr in enumerate(typed_keys))}
+                    FROM change_log_rows r
+                    WHERE {' AND '.join(pattern_conditions)}
+                ),
+                ranked AS (
+                    SELECT *, ROW_NUMBER() OVER (PARTITION BY {key_columns} ORDER BY csv_row) AS key_rank
+                    FROM keyed
+                )
+                SELECT k.csv_row, k.key_rank,
+                       COUNT(t."{active_fields[0]}") OVER (PARTITION BY k.csv_row) AS match_count, t.*
+                FROM ranked k
+                LEFT JOIN "{table_name}" t ON {' AND '.join(join_conditions)}
+            """)
+    
+    def _finish_change_log(self, conn, change_log: Optional[Dict]):
+        """
+        Write the change log of an applied CSV file to change_logs/{file}.parquet in the job folder
+        Update files: 'before' and 'after' images of each updated row, and the rows appended for keys
+        that matched nothing; append files: every appended row. Only the first CSV row of a repeated
+        key is recorded, since the later ones change the same table row
+        The file is listed in change_logs/change_log.json, in the order files were applied
+        """
+        if change_log is None:
+            return
+        
+        csv_path = change_log["csv_path"]
+        table_name = change_log["table"]
+        job_folder = os.path.dirname(csv_path)
+        log_folder = os.path.join(job_folder, self.change_log_folder)
+        log_filename = f"{os.path.splitext(os.path.basename(csv_path))[0]}.parquet"
+        log_path = os.path.join(log_folder, log_filename)
+        
+        try:
+            os.makedirs(log_folder, exist_ok=True)
+            if change_log["job_type"] == "append":
+                changes_query = f"""
+                    SELECT 'insert' AS change_type, 'after' AS image,
+                           ROW_NUMBER() OVER (ORDER BY rowid) AS csv_row, *
+                    FROM "{table_name}" WHERE rowid > {int(change_log["max_rowid"])}
+                """
+            else:
+                self._capture_key_matches(conn, table_name, change_log["patterns"], "change_log_after")
+                image_columns = "* EXCLUDE (csv_row, key_rank, match_count)"
+                # Rows left as they were (same values, or not reached before a failure) are not changes
+                changed = " OR ".join(f'a."{col}" IS DISTINCT FROM b."{col}"' for col in change_log["columns"])
+                conn.execute(f"""
+                    CREATE OR REPLACE TEMP TABLE change_log_updated AS
+                    SELECT csv_row FROM change_log_after a JOIN change_log_before b USING (csv_row)
+                    WHERE b.match_count = 1 AND b.key_rank = 1 AND a.match_count = 1 AND ({changed})
+                """)
+                changes_query = f"""
+                    SELECT 'update' AS change_type, 'before' AS image, csv_row, {image_columns}
+                    FROM change_log_before WHERE csv_row IN (SELECT csv_row FROM change_log_updated)
+                    UNION ALL
+                    SELECT 'update', 'after', csv_row, {image_columns}
+                    FROM change_log_after WHERE csv_row IN (SELECT csv_row FROM change_log_updated)
+                    UNION ALL
+                    SELECT 'insert', 'after', a.csv_row, a.{image_columns}
+                    FROM change_log_after a JOIN change_log_before b USING (csv_row)
+                    WHERE b.match_count = 0 AND b.key_rank = 1 AND a.match_count >= 1
+                """
+            
+            conn.execute(f"CREATE OR REPLACE TEMP TABLE change_log_changes AS {changes_query}")
+            conn.execute("COPY (SELECT * FROM change_log_changes ORDER BY csv_row, change_type, image DESC) "
+                         f"TO '{log_path.replace(chr(39), chr(39) * 2)}' (FORMAT PARQUET)")
+            counts = dict(conn.execute(
+                "SELECT change_type, COUNT(*) FROM change_log_changes WHERE image = 'after' GROUP BY change_type"
+            ).fetchall())
+        except Exception as e:
+            print(f"  Warning: Change log not recorded for {os.path.basename(csv_path)}: {e}")
+            return
+        
+        if not os.path.exists(log_path):
+            return
+        
+        entry = {
+            "file": os.path.basename(csv_path),
+            "table": table_name,
+            "job_type": change_log["job_type"],
+            "filter_fields": change_log["filter_fields"],
+            "change_log": log_filename,
+            "rows_updated": int(counts.get('update', 0)),
+            "rows_inserted": int(counts.get('insert', 0)),
+            "applied_at": datetime.now().isoformat()
+        }
+        index = self._load_change_log_index(job_folder)
+        index["files"].append(entry)
+        self._save_change_log_index(job_folder, index)
+        
+        print(f"  Change log: {entry['rows_updated']} updated and {entry['rows_inserted']} inserted rows "
+              f"recorded in {self.change_log_folder}/{log_filename}")
+    
+    def reset_change_logs(self, job_folder: str):
+        """Remove the change logs of an earlier run, which belong to a replaced database copy"""
+        log_folder = os.path.join(job_folder, self.change_log_folder)
+        if os.path.isdir(log_folder):
+            shutil.rmtree(log_folder)
+    
+    def _load_change_log_index(self, job_folder: str) -> Dict:
+        index_path = os.path.join(job_folder, self.change_log_folder, self.change_log_index_filename)
+        if os.path.exists(index_path):
+            try:
+                with open(index_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (json.JSONDecodeError, FileNotFoundError):
+                pass
+        return {"files": []}
+    
+    def _save_change_log_index(self, job_folder: str, index: Dict):
+        index_path = os.path.join(job_folder, self.change_log_folder, self.change_log_index_filename)
+        with open(index_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=2, ensure_ascii=False)
+    
+    def rollback_job_folder(self, job_folder: str, csv_file: Optional[str] = None) -> Dict:
+        """
+        Revert applied CSV files on the job folder's database copy, using their change logs
+        Without csv_file, every file not yet rolled back is reverted, last applied first. The
+        rollback stops at the first file with conflicts, leaving it and earlier files applied
+        Writes rollback_report.json to the job folder
+        Returns: report dict with the status ("completed" or "conflicts") and one entry per file
+        """
+        folder_name = os.path.basename(os.path.normpath(job_folder))
+        db_path = os.path.join(job_folder, f"tax_db_{folder_name[:6]}.duckdb")
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"Database copy not found: {db_path}")
+        
+        index = self._load_change_log_index(job_folder)
+        entries = [entry for entry in index["files"] if not entry.get("rolled_back_at")]
+        if csv_file:
+            entries = [entry for entry in entries if entry["file"] == os.path.basename(csv_file)]
+            if not entries:
+                raise ValueError(f"No change log to roll back for {os.path.basename(csv_file)} "
+                                 f"in {self.change_log_folder}/{self.change_log_index_filename}")
+        
+        report = {
+            "timestamp": datetime.now().isoformat(),
+            "database": db_path,
+            "status": "completed",
+            "files": []
+        }
+        conn = self._log_connection(connect_duckdb(db_path))
+        try:
+            for entry in reversed(entries):
+                print(f"\nRolling back: {entry['file']}")
+                with self._memory_stage(f"{entry['file']}: rollback"):
+                    outcome = self._rollback_change_log(conn, job_folder, entry)
+                report["files"].append({"file": entry["file"], "table": entry["table"], **outcome})
+                
+                if outcome["conflicts"]:
+                    report["status"] = "conflicts"
+                    print(f"  ERROR: {outcome['conflicts']} rows changed since the file was applied; "
+                          f"{entry['file']} and earlier files were not rolled back")
+                    break
+                
+                entry["rolled_back_at"] = datetime.now().isoformat()
+                self._save_change_log_index(job_folder, index)
+                print(f"  Restored {outcome['rows_restored']} updated rows, deleted {outcome['rows_deleted']} inserted rows")
+        finally:
+            conn.close()
+            self.write_sql_log(job_folder, db_path, "rollback_sql_log.json")
+        
+        report_path = os.path.join(job_folder, "rollback_report.json")
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False, default=str)
+        print(f"Rollback report saved to: {report_path}")
+        return report
+    
+    def _rollback_change_log(self, conn, job_folder: str, entry: Dict) -> Dict:
+        """
+        Revert one applied file: delete its inserted rows and restore the before-images of its
+        updated rows, with one DELETE and one UPDATE in a single transaction
+        Current rows are found by their full after-image rather than by rowid, since rowids are not
+        stable across checkpoints. A recorded row with no identical current row is a conflict, and
+        nothing is changed
+        Returns: dict with rows_restored, rows_deleted, conflicts and the conflicting CSV rows
+        """
+        table_name = entry["table"]
+        log_path = os.path.join(job_folder, self.change_log_folder, entry["change_log"])
+        columns = [col[0] for col in conn.execute(f'DESCRIBE "{table_name}"').fetchall()]
+        column_list = ', '.join(f'"{col}"' for col in columns)
+        same_image = ' AND '.join(f'a."{col}" IS NOT DISTINCT FROM t."{col}"' for col in columns)
+        
+        conn.execute("CREATE OR REPLACE TEMP TABLE rollback_changes AS SELECT * FROM read_parquet(?)", [log_path])
+        # Identical after-images are paired with identical current rows one to one, in order
+        conn.execute(f"""
+            CREATE OR REPLACE TEMP TABLE rollback_targets AS
+            WITH after_images AS (
+                SELECT csv_row, change_type, {column_list},
+                       ROW_NUMBER() OVER (PARTITION BY {column_list} ORDER BY csv_row) AS image_rank
+                FROM rollback_changes WHERE image = 'after'
+            ),
+            current_rows AS (
+                SELECT t.rowid AS row_id, {', '.join(f't."{col}"' for col in columns)}
+                FROM "{table_name}" t SEMI JOIN after_images a ON {same_image}
+            ),
+            ranked_rows AS (
+                SELECT *, ROW_NUMBER() OVER (PARTITION BY {column_list} ORDER BY row_id) AS image_rank
+                FROM current_rows
+            )
+            SELECT a.csv_row, a.change_type, t.row_id
+            FROM after_images a
+            LEFT JOIN ranked_rows t ON {same_image} AND a.image_rank = t.image_rank
+        """)
+        
+        conflict_rows = [row[0] for row in conn.execute(
+            "SELECT csv_row FROM rollback_targets WHERE row_id IS NULL ORDER BY csv_row"
+        ).fetchall()]
+        outcome = {"rows_restored": 0, "rows_deleted": 0, "conflicts": len(conflict_rows),
+                   "conflict_csv_rows": conflict_rows[:self.preflight_max_reported_rows]}
+        if conflict_rows:
+            return outcome
+        
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            # Deleting first keeps the target rowids valid; an UPDATE may rewrite rows under new rowids
+            outcome["rows_deleted"] = conn.execute(f"""
+                DELETE FROM "{table_name}"
+                WHERE rowid IN (SELECT row_id FROM rollback_targets WHERE change_type = 'insert')
+            """).fetchone()[0]
+            outcome["rows_restored"] = conn.execute(f"""
+                UPDATE "{table_name}" AS t
+                SET {', '.join(f'"{col}" = b."{col}"' for col in columns)}
+                FROM rollback_targets r
+                JOIN rollback_changes b ON b.csv_row = r.csv_row AND b.change_type = 'update' AND b.image = 'before'
+                WHERE r.change_type = 'update' AND t.rowid = r.row_id
+            """).fetchone()[0]
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return outcome
+    
+    def _count_matches_by_index(self, conn, table_name: str, lookup_column: str,
+                                where_fields: List[str], param_values: List) -> Tuple:
+        """
+        Count the rows matching all filter fields, narrowing by the indexed lookup column first
+        DuckDB only uses an ART index when the indexed column is the table's sole filter, so the
+        candidates are materialized from an index seek and the other fields are filtered after
+        Returns: (match_count, rowid of the first match)
+        """
+        seek_position = where_fields.index(lookup_column)
+        other_fields = [field for field in where_fields if field != lookup_column]
+        other_params = [value for position, value in enumerate(param_values) if position != seek_position]
+        
+        candidate_columns = ''.join(f', "{field}"' for field in other_fields)
+        other_conditions = " AND ".join(f'"{field}" = ?' for field in other_fields)
+        query = f"""
+            WITH candidates AS MATERIALIZED (
+                SELECT rowid AS candidate_rowid{candidate_columns}
+                FROM {table_name} WHERE "{lookup_column}" = ?
+            )
+            SELECT COUNT(*) as count, MIN(candidate_rowid) FROM candidates
+            {f"WHERE {other_conditions}" if other_conditions else ""}
+        """
+        return conn.execute(query, [param_values[seek_position]] + other_params).fetchone()
+    
+    def _lookup_patterns(self) -> List[Tuple[str, List[str]]]:
+        """
+        Access patterns of the per-row lookups: update filter fields from filtering_criteria.json
+        first, then the db_handler patterns in LOOKUP_ACCESS_PATTERNS
+        Returns: list of (table_name, columns)
+        """
+        patterns = [(table_name, criteria.get("filter_fields", []))
+                    for table_name, criteria in self.filtering_criteria.items()]
+        patterns.extend(LOOKUP_ACCESS_PATTERNS.items())
+        return [(table_name, columns) for table_name, columns in patterns if columns]
+    
+    def _lookup_index_name(self, table_name: str, column: str) -> str:
+        return re.sub(r'\W', '_', f"{self.lookup_index_prefix}{table_name}_{column}")
+    
+    def build_lookup_indexes(self, db_path: str) -> List[Dict]:
+        """
+        Create a single-column index for every lookup pattern on the database at db_path
+        The column with the most distinct values in each pattern is indexed, since DuckDB
+        only uses an index for a single-column equality filter
+        Each index is probed with a sample lookup to report whether DuckDB actually uses it
+        Returns: one entry per pattern with the indexed column and whether it was used
+        """
+        report = []
+        conn = connect_duckdb(db_path)
+        try:
+            tables = {row[0] for row in conn.execute("SELECT table_name FROM duckdb_tables()").fetchall()}
+            
+            for table_name, fields in self._lookup_patterns():
+                if table_name not in tables:
+                    continue
+                
+                table_columns = {col[0] for col in conn.execute(f'DESCRIBE "{table_name}"').fetchall()}
+                fields = [field for field in fields if field in table_columns]
+                if not fields:
+                    continue
+                
+                distinct_expressions = ", ".join(f'approx_count_distinct("{field}")' for field in fields)
+                distinct_counts = conn.execute(f'SELECT {distinct_expressions} FROM "{table_name}"').fetchone()
+                column = max(zip(fields, distinct_counts), key=lambda item: item[1])[0]
+                if any(entry["table"] == table_name and entry["column"] == column for entry in report):
+                    continue
+                
+                index_name = self._lookup_index_name(table_name, column)
+                start_time = time.time()
+                conn.execute(f'CREATE INDEX IF NOT EXISTS "{index_name}" ON "{table_name}" ("{column}")')
+                self.lookup_indexes.setdefault(table_name, column)
+                
+                report.append({
+                    "table": table_name,
+                    "pattern": fields,
+                    "index": index_name,
+                    "column": column,
+                    "build_seconds": round(time.time() - start_time, 3),
+                    "used": self._probe_lookup_index(conn, table_name, column, fields)
+                })
+        finally:
+            conn.close()
+        
+        for entry in report:
+            usage = {True: "used", False: "NOT used", None: "not checked (empty table)"}[entry["used"]]
+            print(f"  Index {entry['index']} on {entry['table']}({entry['column']}): {usage}")
+        
+        return report
+    
+    def _probe_lookup_index(self, conn, table_name: str, column: str, fields: List[str]) -> Optional[bool]:
+        """
+        Run a lookup for one existing key through EXPLAIN ANALYZE and check for an index scan
+        Returns: True/False, or None when the table has no row to probe with
+        """
+        field_list = ", ".join(f'"{field}"' for field in fields)
+        sample = conn.execute(
+            f'SELECT {field_list} FROM "{table_name}" WHERE "{column}" IS NOT NULL LIMIT 1'
+        ).fetchone()
+        if sample is None:
+            return None
+        
+        where_fields = [field for field, value in zip(fields, sample) if value is not None]
+        param_values = [value for value in sample if value is not None]
+        seek_position = where_fields.index(column)
+        other_conditions = " AND ".join(f'"{field}" = ?' for field in where_fields if field != column)
+        plan = conn.execute(f"""
+            EXPLAIN ANALYZE
+            WITH candidates AS MATERIALIZED (
+                SELECT * FROM "{table_name}" WHERE "{column}" = ?
+            )
+            SELECT COUNT(*) FROM candidates {f"WHERE {other_conditions}" if other_conditions else ""}
+        """, [param_values[seek_position]] + [value for position, value in enumerate(param_values)
+                                              if position != seek_position]).fetchall()
+        return any("Index Scan" in str(row[1]) for row in plan)
+    
+    def load_lookup_indexes(self, db_path: str) -> Dict[str, str]:
+        """
+        Pick up lookup indexes that already exist in the database, e.g. built on the source
+        database before it was copied
+        Returns: table name -> indexed column
+        """
+        conn = connect_duckdb(db_path)
+        try:
+            indexes = conn.execute(
+                "SELECT index_name, table_name, expressions FROM duckdb_indexes()"
+            ).fetchall()
         finally:
             conn.close()
+        
+        for index_name, table_name, expressions in indexes:
+            if index_name.startswith(self.lookup_index_prefix):
+                column = str(expressions).strip('[]').strip('"')
+                self.lookup_indexes.setdefault(table_name, column)
+        return self.lookup_indexes
+    
+    def drop_lookup_indexes(self, db_path: str) -> int:
+        """
+        Drop every lookup index from the database at db_path
+        Returns: number of indexes dropped
+        """
+        conn = connect_duckdb(db_path)
+        try:
+            index_names = [row[0] for row in conn.execute("SELECT index_name FROM duckdb_indexes()").fetchall()
+                           if row[0].startswith(self.lookup_index_prefix)]
+            for index_name in index_names:
+                conn.execute(f'DROP INDEX IF EXISTS "{index_name}"')
+        finally:
+            conn.close()
+        
+        self.lookup_indexes = {}
+        print(f"  Dropped {len(index_names)} lookup indexes")
+        return len(index_names)
     
     def _insert_row(self, conn, table_name: str, row: pd.Series, table_schema: dict = None):
         """Insert a single row into the table with date preprocessing"""
@@ -672,6 +1709,248 @@ class TableUpdater:
         except Exception as e:
             print(f"Warning: Failed to write error log: {e}")
 
+    def verify_database_copy(self, source_db_path: str, db_path: str, job_folder: str) -> Dict:
+        """
+        Compare the per-table checksums of the database copy with the source database
+        Checksums are cached next to each database, so only tables written since are recomputed
+        Writes tables_changed.json to the job folder
+        Returns: the tables changed report
+        """
+        report = compare_checksums(source_db_path, db_path, CHECKSUM_PARTITION_BY)
+        print_checksum_report(report)
+        
+        report_path = os.path.join(job_folder, self.tables_changed_filename)
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Tables changed report saved to: {report_path}")
+        return report
+    
+    def export_parquet(self, db_path: str, job_folder: str, source_db_path: Optional[str] = None,
+                       partition_by: Optional[str] = None, max_workers: Optional[int] = None) -> Dict:
+        """
+        Export the tables of the database copy to {database}_parquet/ in the job folder
+        With source_db_path, only the tables that differ from the source database are exported
+        Tables are written concurrently, largest first; tables of at least
+        PARQUET_EXPORT_PARTITION_MIN_ROWS rows are split by partition_by into Hive-style
+        directories ({partition_by}=CA/)
+        Writes manifest.json with each table's files, row counts and checksums
+        Returns: the manifest
+        """
+        export_dir = os.path.join(job_folder, f"{os.path.splitext(os.path.basename(db_path))[0]}_parquet")
+        if os.path.exists(export_dir):
+            shutil.rmtree(export_dir)
+        os.makedirs(export_dir)
+        
+        checksums = compute_checksums(db_path, partition_by)["tables"]
+        if source_db_path:
+            report = compare_checksums(source_db_path, db_path, partition_by)
+            table_names = [entry["table"] for entry in report["tables"] if entry["status"] in ("changed", "added")]
+        else:
+            table_names = list(checksums)
+        table_names.sort(key=lambda name: checksums[name]["row_count"], reverse=True)
+        
+        manifest = {
+            "timestamp": datetime.now().isoformat(),
+            "database": db_path,
+            "source_database": source_db_path,
+            "partition_by": partition_by,
+            "tables": {}
+        }
+        start_time = time.time()
+        if table_names:
+            workers = max_workers or PARQUET_EXPORT_WORKERS or min(len(table_names), os.cpu_count() or 1)
+            conn = self._log_connection(connect_duckdb(db_path, read_only=True))
+            try:
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    futures = {
+                        table_name: executor.submit(self._export_table_parquet, conn.cursor(), table_name, export_dir,
+                                                    partition_by, checksums[table_name]["row_count"])
+                        for table_name in table_names
+                    }
+                    for table_name, future in futures.items():
+                        table = future.result()
+                        checksum = checksums[table_name]
+                        table.update({"rows": checksum["row_count"], "checksum": checksum["checksum"]})
+                        if table["partition_column"]:
+                            table["partitions"] = checksum.get("partitions", {})
+                        manifest["tables"][table_name] = table
+            finally:
+                conn.close()
+        
+        manifest_path = os.path.join(export_dir, self.parquet_manifest_filename)
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        
+        total_bytes = sum(table["bytes"] for table in manifest["tables"].values())
+        print(f"Exported {len(table_names)} tables ({total_bytes / 1024 / 1024:.1f} MB) to {export_dir} "
+              f"in {time.time() - start_time:.1f}s")
+        for table_name, table in manifest["tables"].items():
+            print(f"  {table_name}: {table['rows']} rows, {len(table['files'])} files")
+        return manifest
+    
+    def _export_table_parquet(self, conn, table_name: str, export_dir: str, partition_by: Optional[str],
+                              row_count: int) -> Dict:
+        """
+        Write one table to Parquet on its own cursor
+        Returns: {"path", "partition_column", "files", "bytes"} with paths relative to export_dir
+        """
+        columns = [col[0] for col in conn.execute(f'DESCRIBE "{table_name}"').fetchall()]
+        partition = None
+        if partition_by and row_count >= PARQUET_EXPORT_PARTITION_MIN_ROWS:
+            partition = partition_expression(conn, columns, partition_by)
+        
+        options = "FORMAT PARQUET, COMPRESSION ZSTD"
+        if partition is None:
+            target = os.path.join(export_dir, f"{table_name}.parquet")
+            query = f'SELECT * FROM "{table_name}"'
+        else:
+            target = os.path.join(export_dir, table_name)
+            if partition_by in columns:
+                # The files keep the column itself, so every table column is exported unchanged
+                query = f'SELECT * FROM "{table_name}"'
+                options += f', PARTITION_BY ("{partition_by}"), WRITE_PARTITION_COLUMNS true'
+            else:
+                # Derived partitions (e.g. the state of a geocode) are only in the directory names
+                expression, join = partition
+                query = f'SELECT t.*, {expression} AS "{partition_by}" FROM "{table_name}" t {join}'
+                options += f', PARTITION_BY ("{partition_by}")'
+        
+        conn.execute(f"COPY ({query}) TO '{target.replace(chr(39), chr(39) * 2)}' ({options})")
+        
+        if os.path.isdir(target):
+            files = sorted(os.path.relpath(os.path.join(folder, name), export_dir)
+                           for folder, _, names in os.walk(target) for name in names)
+        else:
+            files = [os.path.relpath(target, export_dir)]
+        return {
+            "path": os.path.relpath(target, export_dir),
+            "partition_column": partition_by if partition else None,
+            "files": files,
+            "bytes": sum(os.path.getsize(os.path.join(export_dir, file)) for file in files)
+        }
+    
+    def run_job_folder(self, job_folder: str, source_db_path: str = DATABASE_PATH, dry_run: bool = False,
+                       skip_preflight: bool = False, preflight_only: bool = False,
+                       build_indexes: bool = False, drop_indexes: bool = False, verify_copy: bool = False,
+                       export_parquet: Optional[str] = None, export_partition_by: Optional[str] = None) -> Dict:
+        """
+        Run one YYMMDD_update job folder: preflight, copy the source database, process the CSV files
+        The run is recorded in the run history (src/metrics.py) with the wall time of each stage,
+        and its SQL statements in sql_log.json when self.sql_log is set
+        Returns: summary dict with the status, database copy and error count
+        """
+        if not os.path.exists(job_folder):
+            raise FileNotFoundError(f"Job folder not found: {job_folder}")
+        
+        print(f"Processing job folder: {job_folder}")
+        
+        # Extract timestamp from folder name
+        folder_name = os.path.basename(job_folder)
+        if not folder_name.endswith('_update') or len(folder_name) != 13:
+            raise ValueError("Invalid folder name format. Expected: YYMMDD_update")
+        
+        timestamp = folder_name[:6]  # YYMMDD
+        summary = {
+            "job_folder": job_folder,
+            "status": "failed",
+            "database": None,
+            "error_file": None,
+            "total_errors": 0
+        }
+        metrics = RunMetrics("table_update", job_folder, source_db_path, memory_tracker=self.memory_tracker)
+        self.run_counts = dict.fromkeys(self.run_counts, 0)
+        
+        try:
+            # Check every file before anything is written
+            if preflight_only or not (dry_run or skip_preflight):
+                print(f"\n{'='*50}")
+                print("Preflight validation...")
+                print(f"{'='*50}")
+                with metrics.stage("preflight"):
+                    preflight = self.preflight_job_folder(job_folder, source_db_path)
+                summary["preflight_report"] = os.path.join(job_folder, self.preflight_report_filename)
+                if not preflight["passed"]:
+                    summary["status"] = "preflight_failed"
+                    summary["total_errors"] = preflight["total_errors"]
+                    return summary
+                if preflight_only:
+                    summary["status"] = "preflight_passed"
+                    return summary
+            
+            # Duplicate database
+            db_path = None
+            if not dry_run:
+                with metrics.stage("copy"):
+                    db_path = self.duplicate_database(source_db_path, job_folder, timestamp)
+                print(f"Created database copy: {os.path.basename(db_path)}")
+                summary["database"] = db_path
+                self.reset_change_logs(job_folder)
+                
+                with metrics.stage("indexes"):
+                    if build_indexes:
+                        print("Building lookup indexes...")
+                        self.build_lookup_indexes(db_path)
+                    else:
+                        self.load_lookup_indexes(db_path)
+            else:
+                print(f"DRY RUN: Would create database copy: tax_db_{timestamp}.duckdb")
+            
+            # Process CSV files
+            print(f"\n{'='*50}")
+            print(f"{'DRY RUN - ' if dry_run else ''}Processing CSV files...")
+            print(f"{'='*50}")
+            
+            with metrics.stage("process"):
+                if dry_run and os.path.exists(source_db_path):
+                    # Predict real outcomes against the source database, opened read-only
+                    print(f"DRY RUN: Predicting outcomes against {source_db_path} (read-only)")
+                    self.predict_csv_files(job_folder, source_db_path)
+                else:
+                    if dry_run:
+                        print(f"DRY RUN: Source database not found, checking file names only")
+                    self.process_csv_files(job_folder, db_path, dry_run=dry_run)
+            
+            if db_path and drop_indexes:
+                with metrics.stage("indexes"):
+                    self.drop_lookup_indexes(db_path)
+            
+            if db_path and verify_copy:
+                with metrics.stage("verify"):
+                    self.verify_database_copy(source_db_path, db_path, job_folder)
+                summary["tables_changed_report"] = os.path.join(job_folder, self.tables_changed_filename)
+            
+            if db_path and export_parquet:
+                print("\nExporting tables to Parquet...")
+                with metrics.stage("export"):
+                    self.export_parquet(db_path, job_folder, source_db_path if export_parquet == "changed" else None,
+                                        export_partition_by)
+                summary["parquet_export"] = os.path.join(
+                    job_folder, f"{os.path.splitext(os.path.basename(db_path))[0]}_parquet")
+            
+            print(f"\n{'='*50}")
+            print("Processing completed successfully")
+            print(f"{'='*50}")
+            
+            # Check for errors
+            error_file = os.path.join(job_folder, self.error_log_filename)
+            if os.path.exists(error_file):
+                with open(error_file, 'r') as f:
+                    error_data = json.load(f)
+                summary["error_file"] = error_file
+                summary["total_errors"] = error_data['total_errors']
+            
+            summary["status"] = "completed"
+            return summary
+        
+        finally:
+            # Dry runs are kept apart so they don't skew the throughput of applied runs
+            status = "dry_run" if dry_run and summary["status"] == "completed" else summary["status"]
+            counts = self.run_counts
+            metrics.finish(status, input_rows=counts["rows_read"] or None,
+                           output_rows=counts["rows_updated"] + counts["rows_appended"] if counts["rows_read"] else None,
+                           errors=summary["total_errors"])
+            if self.sql_log is not None:
+                summary["sql_log"] = self.write_sql_log(job_folder, summary["database"] or source_db_path)
 
 def main():
     """Main execution function"""
@@ -680,12 +1959,64 @@ def main():
                         help='Validate files and show operations without executing')
     parser.add_argument('--job-folder', type=str, 
                         help='Specific job folder to process (default: latest)')
+    parser.add_argument('--preflight-only', action='store_true',
+                        help='Only run preflight validation of all CSV files and write preflight_report.json')
+    parser.add_argument('--skip-preflight', action='store_true',
+                        help='Process files without the preflight validation stage')
+    parser.add_argument('--build-indexes', action='store_true',
+                        help='Create lookup indexes on the database copy before processing files')
+    parser.add_argument('--drop-indexes', action='store_true',
+                        help='Drop lookup indexes from the database copy after processing files')
+    parser.add_argument('--no-change-log', action='store_true',
+                        help='Do not record the before/after change log of each applied file')
+    parser.add_argument('--rollback', nargs='?', const=True, metavar='FILE',
+                        help='Revert FILE, or every applied file (last first), on the job folder\'s '
+                             'database copy using its change logs')
+    parser.add_argument('--verify-copy', action='store_true',
+                        help='Compare table checksums of the database copy with the source database '
+                             'and write tables_changed.json')
+    parser.add_argument('--export-parquet', nargs='?', const='all', choices=['all', 'changed'],
+                        help='After processing, export all tables (default) or only the tables that differ '
+                             'from the source database to Parquet files in the job folder')
+    parser.add_argument('--export-partition-by', nargs='?', const='state', metavar='COLUMN',
+                        help="Split large tables of the Parquet export by COLUMN (default: 'state')")
+    parser.add_argument('--index-database', type=str, metavar='PATH',
+                        help='Only build lookup indexes on PATH and report their use '
+                             '(or drop them, with --drop-indexes)')
+    parser.add_argument('--profile', nargs='?', const='deterministic', choices=PROFILE_MODES,
+                        help='Profile the run and write a flamegraph-ready profile.collapsed and '
+                             'profile_hotspots.txt to the job folder (default mode: deterministic)')
+    parser.add_argument('--sql-log', action='store_true',
+                        help='Write sql_log.json to the job folder with the count, latency and rows of each '
+                             'SQL statement shape and the plans of the slowest ones')
+    parser.add_argument('--memory-report', action='store_true',
+                        help='Write memory_report.json to the job folder with the peak and retained memory '
+                             'of each stage and file, and the lines that retained the most')
+    add_resource_arguments(parser)
     
     args = parser.parse_args()
     
     updater = TableUpdater()
+    updater.change_log_enabled = not args.no_change_log
+    if args.sql_log:
+        updater.sql_log = StatementLog()
+    apply_resource_arguments(args)
     
     try:
+        print(f"DuckDB settings: {describe_settings()}")
+        
+        # Standalone index command
+        if args.index_database:
+            if not os.path.exists(args.index_database):
+                print(f"Error: Database not found: {args.index_database}")
+                sys.exit(1)
+            if args.drop_indexes:
+                updater.drop_lookup_indexes(args.index_database)
+            else:
+                print(f"Building lookup indexes on {args.index_database}...")
+                updater.build_lookup_indexes(args.index_database)
+            return
+        
         # Find job folder
         if args.job_folder:
             if os.path.isabs(args.job_folder):
@@ -699,41 +2030,45 @@ def main():
             print(f"Error: Job folder not found: {job_folder}")
             sys.exit(1)
         
-        print(f"Processing job folder: {job_folder}")
-        
-        # Extract timestamp from folder name
-        folder_name = os.path.basename(job_folder)
-        if not folder_name.endswith('_update') or len(folder_name) != 13:
-            print(f"Error: Invalid folder name format. Expected: YYMMDD_update")
-            sys.exit(1)
-        
-        timestamp = folder_name[:6]  # YYMMDD
-        
-        # Duplicate database
-        db_path = None
-        if not args.dry_run:
-            db_path = updater.duplicate_database(DATABASE_PATH, job_folder, timestamp)
-            print(f"Created database copy: {os.path.basename(db_path)}")
-        else:
-            print(f"DRY RUN: Would create database copy: tax_db_{timestamp}.duckdb")
-        
-        # Process CSV files
-        print(f"\n{'='*50}")
-        print(f"{'DRY RUN - ' if args.dry_run else ''}Processing CSV files...")
-        print(f"{'='*50}")
+        profiler = start_profiler(args.profile)
+        updater.memory_tracker = start_memory_tracker(args.memory_report)
+        try:
+            if args.rollback:
+                report = updater.rollback_job_folder(job_folder, None if args.rollback is True else args.rollback)
+                if args.verify_copy:
+                    updater.verify_database_copy(DATABASE_PATH, report["database"], job_folder)
+            else:
+                summary = updater.run_job_folder(
+                    job_folder,
+                    DATABASE_PATH,
+                    dry_run=args.dry_run,
+                    skip_preflight=args.skip_preflight,
+                    preflight_only=args.preflight_only,
+                    build_indexes=args.build_indexes,
+                    drop_indexes=args.drop_indexes,
+                    verify_copy=args.verify_copy,
+                    export_parquet=args.export_parquet,
+                    export_partition_by=args.export_partition_by
+                )
+        finally:
+            if profiler:
+                profiler.finish(job_folder, "rollback_profile" if args.rollback else "profile")
+            if updater.memory_tracker:
+                updater.memory_tracker.finish(job_folder, "rollback_memory_report.json" if args.rollback
+                                              else "memory_report.json")
         
-        updater.process_csv_files(job_folder, db_path, dry_run=args.dry_run)
+        if args.rollback:
+            if report["status"] == "conflicts":
+                sys.exit(1)
+            return
         
-        print(f"\n{'='*50}")
-        print("Processing completed successfully")
-        print(f"{'='*50}")
+        if summary["status"] == "preflight_failed":
+            print(f"Error: Preflight found {summary['total_errors']} errors. No changes were made.")
+            print("Fix the files, or rerun with --skip-preflight to process them anyway.")
+            sys.exit(1)
         
-        # Check for errors
-        error_file = os.path.join(job_folder, updater.error_log_filename)
-        if os.path.exists(error_file):
-            with open(error_file, 'r') as f:
-                error_data = json.load(f)
-            print(f"Warning: {error_data['total_errors']} errors logged in {updater.error_log_filename}")
+        if summary["error_file"]:
+            print(f"Warning: {summary['total_errors']} errors logged in {updater.error_log_filename}")
         
     except Exception as e:
         print(f"Error: {e}")
@@ -0,0 +1,71 @@
+"""
+Test that rate updates with --as-of only update the version of each tax in force on the date
+"""
+
+import pytest
+import os
+import datetime
+import tempfile
+import shutil
+import sys
+import duckdb
+import pandas as pd
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src import logger
+from src.main import parse_args, process_rate_update_job
+
+
+class TestAsOf:
+    """Test class for the --as-of option"""
+
+    @pytest.fixture
+    def conn(self):
+        """Three versions of a city tax, one of them future, and one version of a county tax"""
+        temp_dir = tempfile.mkdtemp()
+        conn = duckdb.connect(os.path.join(temp_dir, "tax_rates.duckdb"))
+        conn.execute("CREATE TABLE geocode AS SELECT 'CA' AS state, 'KERN' AS county, 'US1' AS geocode")
+        conn.execute("""
+            CREATE TABLE detail AS SELECT * FROM (VALUES
+                ('US1', '04', '01', '300', DATE '2024-01-01', 'CITY SALES TAX', 0, 0.01),
+                ('US1', '04', '01', '300', DATE '2025-01-01', 'CITY SALES TAX', 0, 0.02),
+                ('US1', '04', '01', '300', DATE '2026-01-01', 'CITY SALES TAX', 0, 0.03),
+                ('US1', '04', '01', '200', DATE '2023-01-01', 'COUNTY SALES TAX', 0, 0.04)
+            ) t(geocode, tax_type, tax_cat, tax_auth_id, effective, description, tier, tax_rate)
+        """)
+        conn.execute("ALTER TABLE detail ADD COLUMN fee DECIMAL(11,8) DEFAULT 0")
+        logger.clear_logs()
+        yield conn
+        conn.close()
+        logger.clear_logs()
+        shutil.rmtree(temp_dir)
+
+    def run_job(self, conn, as_of):
+        job_df = pd.DataFrame({"state": ["CA"], "county": ["KERN"], "tax_type": ["04"], "tax_cat": ["01"],
+                               "new_rate": [5], "old_fee": [0], "new_fee": [0]})
+        output = process_rate_update_job(conn, job_df, datetime.datetime(2025, 7, 1), as_of=as_of).to_dataframe()
+        return sorted(zip(output["tax_auth_id"], output["_old_tax_rate"]))
+
+    def test_only_version_in_force_updated(self, conn):
+        """Test that earlier and later versions are left alone"""
+        assert self.run_job(conn, datetime.datetime(2025, 6, 1)) == [("200", 0.04), ("300", 0.02)]
+        # On the date a version starts, that version is in force
+        assert self.run_job(conn, datetime.datetime(2026, 1, 1)) == [("200", 0.04), ("300", 0.03)]
+        # Taxes with no version yet on the date are not updated
+        assert self.run_job(conn, datetime.datetime(2023, 6, 1)) == [("200", 0.04)]
+
+    def test_without_as_of_every_version_updated(self, conn):
+        """Test that without --as-of every version is updated, as before"""
+        assert self.run_job(conn, None) == [("200", 0.04), ("300", 0.01), ("300", 0.02), ("300", 0.03)]
+
+    def test_option(self):
+        """Test that --as-of without a date means the job's effective date"""
+        assert parse_args(["--as-of"]).as_of == "effective"
+        assert parse_args(["--as-of", "06/01/2025"]).as_of == datetime.datetime(2025, 6, 1)
+        assert parse_args([]).as_of is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,184 @@
+"""
+Test the before/after change log recorded for applied CSV files, and rollback from it
+"""
+
+import pytest
+import os
+import json
+import tempfile
+import shutil
+import sys
+import duckdb
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from table_updates.table_updater import TableUpdater
+
+
+class TestChangeLog:
+    """Test class for change log recording and rollback"""
+
+    @pytest.fixture
+    def temp_dir(self):
+        """Create a temporary directory for testing"""
+        temp_dir = tempfile.mkdtemp()
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    @pytest.fixture
+    def db_path(self, temp_dir):
+        """Create a database with product_item and matrix tables"""
+        db_path = os.path.join(temp_dir, "working.duckdb")
+        conn = duckdb.connect(db_path)
+        conn.execute('CREATE TABLE product_item ("group" VARCHAR, item VARCHAR, description VARCHAR)')
+        conn.execute('''INSERT INTO product_item VALUES ('7777', '000', 'Old'), ('7777', '001', 'Old 1'),
+            ('8888', '001', 'Dup A'), ('8888', '001', 'Dup B')''')
+        conn.execute('CREATE TABLE matrix (geocode VARCHAR, rate_value DOUBLE, effective DATE)')
+        conn.execute("INSERT INTO matrix VALUES ('US01', 0.01, '2025-01-01')")
+        conn.close()
+        return db_path
+
+    @pytest.fixture
+    def updater(self):
+        """Create TableUpdater instance with sample filtering criteria"""
+        updater = TableUpdater()
+        updater.filtering_criteria = {
+            "product_item": {"filter_fields": ["group", "item"]}
+        }
+        return updater
+
+    def write_csv(self, temp_dir, filename, content):
+        csv_path = os.path.join(temp_dir, filename)
+        with open(csv_path, 'w') as f:
+            f.write(content)
+        return csv_path
+
+    def read_change_log(self, temp_dir, name):
+        path = os.path.join(temp_dir, "change_logs", f"{name}.parquet")
+        return duckdb.sql(f"SELECT * FROM '{path}'").fetchall()
+
+    def read_index(self, temp_dir):
+        with open(os.path.join(temp_dir, "change_logs", "change_log.json"), 'r') as f:
+            return json.load(f)
+
+    def test_update_before_and_after_images(self, updater, db_path, temp_dir):
+        """Test that updated rows are logged with both images and appended keys once"""
+        csv_path = self.write_csv(temp_dir, "product_item_update_1.csv",
+                                  "group,item,description\n7777,000,Updated\n7777,009,New\n"
+                                  "7777,009,New again\n8888,001,Ambiguous\n,,No filter\n7777,001,Old 1\n")
+
+        updater.process_update_job(csv_path, "product_item", db_path, ["group", "item"])
+
+        assert self.read_change_log(temp_dir, "product_item_update_1") == [
+            ('update', 'before', 1, '7777', '000', 'Old'),
+            ('update', 'after', 1, '7777', '000', 'Updated'),
+            ('insert', 'after', 2, '7777', '009', 'New again'),
+        ]
+        entry = self.read_index(temp_dir)["files"][0]
+        assert entry["table"] == "product_item"
+        assert entry["rows_updated"] == 1
+        assert entry["rows_inserted"] == 1
+
+    def test_append_logs_inserted_rows(self, updater, db_path, temp_dir):
+        """Test that every appended row is logged with its converted values"""
+        csv_path = self.write_csv(temp_dir, "matrix_append_1.csv",
+                                  "geocode,rate_value,effective\nUS02,0.05,7/1/2025\nUS03,0.06,7/1/2025\n")
+
+        updater.process_append_job(csv_path, "matrix", db_path)
+
+        rows = self.read_change_log(temp_dir, "matrix_append_1")
+        assert [(row[0], row[2], row[3], row[4], str(row[5])) for row in rows] == [
+            ('insert', 1, 'US02', 0.05, '2025-07-01'),
+            ('insert', 2, 'US03', 0.06, '2025-07-01'),
+        ]
+
+    def test_files_listed_in_applied_order(self, updater, db_path, temp_dir):
+        """Test that the index lists the applied files in order"""
+        update_path = self.write_csv(temp_dir, "product_item_update_1.csv", "group,item,description\n7777,000,Updated\n")
+        append_path = self.write_csv(temp_dir, "matrix_append_1.csv", "geocode,rate_value,effective\nUS02,0.05,7/1/2025\n")
+
+        updater.process_update_job(update_path, "product_item", db_path, ["group", "item"])
+        updater.process_append_job(append_path, "matrix", db_path)
+
+        index = self.read_index(temp_dir)
+        assert [(f["file"], f["job_type"]) for f in index["files"]] == [
+            ("product_item_update_1.csv", "update"), ("matrix_append_1.csv", "append")
+        ]
+
+    def test_change_log_disabled(self, updater, db_path, temp_dir):
+        """Test that nothing is recorded when change logs are turned off"""
+        csv_path = self.write_csv(temp_dir, "product_item_update_1.csv", "group,item,description\n7777,000,Updated\n")
+        updater.change_log_enabled = False
+
+        updater.process_update_job(csv_path, "product_item", db_path, ["group", "item"])
+
+        assert not os.path.exists(os.path.join(temp_dir, "change_logs"))
+
+    @pytest.fixture
+    def job_folder(self, temp_dir, db_path):
+        """Create a job folder whose database copy is the test database"""
+        job_folder = os.path.join(temp_dir, "250801_update")
+        os.makedirs(job_folder)
+        shutil.copy2(db_path, os.path.join(job_folder, "tax_db_250801.duckdb"))
+        return job_folder
+
+    def table_rows(self, job_folder, table_name):
+        conn = duckdb.connect(os.path.join(job_folder, "tax_db_250801.duckdb"))
+        rows = conn.execute(f'SELECT * FROM "{table_name}" ORDER BY ALL').fetchall()
+        conn.close()
+        return rows
+
+    def apply_files(self, updater, job_folder):
+        db_path = os.path.join(job_folder, "tax_db_250801.duckdb")
+        update_path = self.write_csv(job_folder, "product_item_update_1.csv",
+                                     "group,item,description\n7777,000,Updated\n7777,009,New\n8888,001,Ambiguous\n")
+        append_path = self.write_csv(job_folder, "matrix_append_1.csv",
+                                     "geocode,rate_value,effective\nUS01,0.01,1/1/2025\nUS02,0.05,7/1/2025\n")
+        updater.process_update_job(update_path, "product_item", db_path, ["group", "item"])
+        updater.process_append_job(append_path, "matrix", db_path)
+
+    def test_rollback_folder_restores_database(self, updater, job_folder):
+        """Test that rolling back every file restores the original rows"""
+        original = {table: self.table_rows(job_folder, table) for table in ("product_item", "matrix")}
+        self.apply_files(updater, job_folder)
+
+        report = updater.rollback_job_folder(job_folder)
+
+        assert report["status"] == "completed"
+        assert [(f["file"], f["rows_restored"], f["rows_deleted"]) for f in report["files"]] == [
+            ("matrix_append_1.csv", 0, 2), ("product_item_update_1.csv", 1, 1)
+        ]
+        assert {table: self.table_rows(job_folder, table) for table in original} == original
+        assert all(f["rolled_back_at"] for f in self.read_index(job_folder)["files"])
+
+    def test_rollback_single_file(self, updater, job_folder):
+        """Test that one file can be rolled back and is not rolled back twice"""
+        original_matrix = self.table_rows(job_folder, "matrix")
+        self.apply_files(updater, job_folder)
+
+        updater.rollback_job_folder(job_folder, "matrix_append_1.csv")
+
+        assert self.table_rows(job_folder, "matrix") == original_matrix
+        assert ('7777', '000', 'Updated') in self.table_rows(job_folder, "product_item")
+        with pytest.raises(ValueError):
+            updater.rollback_job_folder(job_folder, "matrix_append_1.csv")
+
+    def test_rollback_stops_on_conflicts(self, updater, job_folder):
+        """Test that rows changed after the file was applied are reported and nothing is reverted"""
+        self.apply_files(updater, job_folder)
+        conn = duckdb.connect(os.path.join(job_folder, "tax_db_250801.duckdb"))
+        conn.execute("UPDATE product_item SET description = 'Edited' WHERE item = '009'")
+        conn.close()
+        before_rollback = self.table_rows(job_folder, "product_item")
+
+        report = updater.rollback_job_folder(job_folder, "product_item_update_1.csv")
+
+        assert report["status"] == "conflicts"
+        assert report["files"][0]["conflict_csv_rows"] == [2]
+        assert self.table_rows(job_folder, "product_item") == before_rollback
+        assert not self.read_index(job_folder)["files"][0].get("rolled_back_at")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -9,6 +9,7 @@ import tempfile
 import shutil
 from unittest.mock import patch, MagicMock, call
 import sys
+import duckdb
 import pandas as pd
 
 # Add parent directory to path for imports
@@ -330,6 +331,36 @@ US123,04,01,Test Tax Entry"""
         execute_calls = mock_conn.execute.call_args_list
         assert any("INSERT INTO product_item" in str(call) for call in execute_calls)
     
+    def test_update_operation_excel_date_filter(self, updater_with_temp_dir, temp_dir):
+        """Test that an Excel formatted date in a filter field matches the DATE column"""
+        updater = updater_with_temp_dir
+        db_path = os.path.join(temp_dir, "test.duckdb")
+        conn = duckdb.connect(db_path)
+        conn.execute("""
+            CREATE TABLE detail (geocode VARCHAR, tax_type VARCHAR, tax_cat VARCHAR, tax_auth_id BIGINT,
+                                 effective DATE, description VARCHAR, tax_rate DOUBLE, fee DOUBLE)
+        """)
+        conn.execute("INSERT INTO detail VALUES ('US0800000000', '18', 'FF', 12005, DATE '2025-07-01', "
+                     "'RETAIL DELIVERY FEE', 0, 0.28)")
+        conn.close()
+        
+        # Create update CSV with the date as Excel saves it
+        csv_content = ("geocode,tax_type,tax_cat,tax_auth_id,effective,description,tax_rate,fee\n"
+                       "US0800000000,18,FF,12005,7/1/2025,RETAIL DELIVERY FEE,0,0.29")
+        csv_path = os.path.join(temp_dir, "detail_update_1.csv")
+        with open(csv_path, 'w') as f:
+            f.write(csv_content)
+        
+        updater.process_update_job(csv_path, "detail", db_path, updater.filtering_criteria["detail"]["filter_fields"])
+        
+        # The existing row is updated, not appended to or failed
+        conn = duckdb.connect(db_path)
+        rows = conn.execute("SELECT CAST(effective AS VARCHAR), fee FROM detail").fetchall()
+        conn.close()
+        assert rows == [("2025-07-01", 0.29)]
+        assert updater.run_counts["rows_updated"] == 1
+        assert not os.path.exists(os.path.join(temp_dir, "errors.json"))
+    
     @patch('duckdb.connect')
     def test_row_insertion_helper(self, mock_connect, updater_with_temp_dir):
         """Test the _insert_row helper method"""
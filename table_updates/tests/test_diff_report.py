@@ -0,0 +1,105 @@
+"""
+Test the diff report of output rows against the current database rows
+"""
+
+import pytest
+import os
+import tempfile
+import shutil
+import sys
+import duckdb
+import pandas as pd
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src import logger
+from src.db_handler import get_output_diff
+from src.main import write_diff_report
+
+
+class TestDiffReport:
+    """Test class for --diff-report"""
+
+    @pytest.fixture
+    def temp_dir(self):
+        """Create a temporary directory for testing"""
+        temp_dir = tempfile.mkdtemp()
+        logger.clear_logs()
+        yield temp_dir
+        logger.clear_logs()
+        shutil.rmtree(temp_dir)
+
+    @pytest.fixture
+    def conn(self, temp_dir):
+        """A detail table with two versions of one tax and a tax without a pass_flag"""
+        conn = duckdb.connect(os.path.join(temp_dir, "tax_rates.duckdb"))
+        conn.execute("""
+            CREATE TABLE detail (geocode VARCHAR, tax_type VARCHAR, tax_cat VARCHAR, tax_auth_id VARCHAR,
+                                 effective DATE, description VARCHAR, pass_flag VARCHAR, tier INTEGER,
+                                 tax_rate DECIMAL(13,12), fee DECIMAL(11,8))
+        """)
+        conn.execute("""
+            INSERT INTO detail VALUES
+                ('US1', '04', '01', '100', '2024-01-01', 'CITY SALES TAX', '01', 0, 0.04, 0),
+                ('US1', '04', '01', '100', '2025-01-01', 'CITY SALES TAX', '01', 0, 0.05, 0),
+                ('US2', '04', '01', '100', '2025-01-01', 'CITY SALES TAX', NULL, 0, 0.05, 0)
+        """)
+        yield conn
+        conn.close()
+
+    def output_rows(self, rows):
+        columns = ["status", "geocode", "tax_type", "tax_cat", "tax_auth_id", "effective", "description",
+                   "pass_flag", "tier", "tax_rate", "fee"]
+        return pd.DataFrame(rows, columns=columns)
+
+    def test_detail_diff(self, conn):
+        """Test changed numeric and text columns, NULL and empty values, versions and added rows"""
+        output_df = self.output_rows([
+            # Rate and pass_flag changed from the 2025 version; fee equal once cast to DECIMAL
+            ["Success", "US1", "04", "01", "100", "2025-07-01", "CITY SALES TAX", "02", 0, 0.06, 0.0],
+            # Compared with the 2024 version, which is the one in force on its date
+            ["Success", "US1", "04", "01", "100", "2024-06-01", "CITY SALES TAX", "01", 0, 0.04, 0.0],
+            # An empty pass_flag is the NULL of the database
+            ["Success", "US2", "04", "01", "100", "2025-07-01", "CITY SALES TAX", "", 0, 0.05, 0.0],
+            # No version at or before the date, and a tax that doesn't exist
+            ["Success", "US2", "04", "01", "100", "2024-06-01", "CITY SALES TAX", "", 0, 0.05, 0.0],
+            ["Success", "US3", "04", "01", "100", "2025-07-01", "CITY SALES TAX", "01", 0, 0.05, 0.0],
+        ])
+
+        diff = get_output_diff(conn, output_df, "detail",
+                               ["geocode", "tax_type", "tax_cat", "tax_auth_id", "description", "tier"],
+                               version_field="effective")
+
+        rows = diff[["output_row", "change_type", "column_name", "old_value", "new_value"]]
+        assert rows.astype(object).where(rows.notna(), None).values.tolist() == [
+            [1, "modified", "effective", "2025-01-01", "2025-07-01"],
+            [1, "modified", "pass_flag", "01", "02"],
+            [1, "modified", "tax_rate", "0.050000000000", "0.060000000000"],
+            [2, "modified", "effective", "2024-01-01", "2024-06-01"],
+            [3, "modified", "effective", "2025-01-01", "2025-07-01"],
+            [4, "added", None, None, None],
+            [5, "added", None, None, None],
+        ]
+        assert diff.loc[0, "geocode"] == "US1"
+
+    def test_write_diff_report(self, conn, temp_dir):
+        """Test the diff file of a job and that an invalid comparison writes no file"""
+        output_df = self.output_rows([
+            ["Success", "US2", "04", "01", "100", "2025-07-01", "CITY SALES TAX", "01", 0, 0.05, 0.0],
+        ])
+
+        path = write_diff_report(conn, output_df, temp_dir, "rate_update")
+
+        assert os.path.basename(path) == "rate_update_diff.csv"
+        diff = pd.read_csv(path, dtype=str, keep_default_na=False)
+        assert diff[["column_name", "old_value", "new_value"]].values.tolist() == [
+            ["effective", "2025-01-01", "2025-07-01"], ["pass_flag", "", "01"]
+        ]
+
+        assert write_diff_report(conn, output_df, temp_dir, "new_authority") is None
+        assert any("tax_authority" in log["message"] for log in logger.get_logs())
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,191 @@
+"""
+Test predictive dry run against a read-only source database
+"""
+
+import pytest
+import os
+import json
+import tempfile
+import shutil
+from unittest.mock import patch
+import sys
+import duckdb
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from table_updates.table_updater import TableUpdater
+
+
+class TestDryRunPrediction:
+    """Test class for predictive dry run functionality"""
+
+    @pytest.fixture
+    def temp_dir(self):
+        """Create a temporary directory for testing"""
+        temp_dir = tempfile.mkdtemp()
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    @pytest.fixture
+    def source_db(self, temp_dir):
+        """Create a small source database with product_item and matrix tables"""
+        db_path = os.path.join(temp_dir, "source.duckdb")
+        conn = duckdb.connect(db_path)
+        conn.execute('CREATE TABLE product_item ("group" VARCHAR, item VARCHAR, description VARCHAR)')
+        conn.execute("""INSERT INTO product_item VALUES
+            ('7777', '000', 'Existing'),
+            ('8888', '001', 'Duplicate A'),
+            ('8888', '001', 'Duplicate B')""")
+        conn.execute('''CREATE TABLE matrix (geocode VARCHAR, "group" VARCHAR, item VARCHAR,
+            tax_type VARCHAR, tax_cat VARCHAR, customer VARCHAR, provider VARCHAR,
+            rate_value DOUBLE, effective DATE)''')
+        conn.execute("""INSERT INTO matrix VALUES
+            ('US0800000000', '1000', '001', '04', '01', 'C', 'P', 0.01, '2025-07-01')""")
+        conn.close()
+        return db_path
+
+    @pytest.fixture
+    def job_folder(self, temp_dir):
+        """Create an empty job folder"""
+        folder = os.path.join(temp_dir, "250801_update")
+        os.mkdir(folder)
+        return folder
+
+    @pytest.fixture
+    def updater(self):
+        """Create TableUpdater instance with sample filtering criteria"""
+        updater = TableUpdater()
+        updater.filtering_criteria = {
+            "product_item": {"filter_fields": ["group", "item"]},
+            "matrix": {"filter_fields": ["geocode", "group", "item", "tax_type", "tax_cat", "customer", "provider", "effective"]}
+        }
+        return updater
+
+    def write_csv(self, folder, filename, content):
+        with open(os.path.join(folder, filename), 'w') as f:
+            f.write(content)
+
+    def test_prediction_counts_updates_appends_and_errors(self, updater, source_db, job_folder, capsys):
+        """Test that each row is classified the way process_update_job would treat it"""
+        self.write_csv(job_folder, "product_item_update_1.csv", """group,item,description
+7777,000,Updated
+7777,009,New
+8888,001,Ambiguous
+,,No filter
+""")
+
+        report = updater.predict_csv_files(job_folder, source_db)
+
+        file_report = report["files"][0]
+        assert file_report["would_update"] == 1
+        assert file_report["would_append"] == 1
+        assert file_report["would_error"] == 2
+
+        errors = {error["row"]: error for error in file_report["errors"]}
+        assert errors[3]["error"] == "Multiple matching records found"
+        assert errors[3]["match_count"] == 2
+        assert errors[3]["filter_values"] == {"group": "8888", "item": "001"}
+        assert errors[4]["error"] == "No valid filter conditions found in row"
+
+        captured = capsys.readouterr()
+        assert "DRY RUN: Would update 1 rows and append 1 rows in product_item" in captured.out
+        assert "Row 3: Multiple matching records found" in captured.out
+
+    def test_repeated_new_key_appends_once(self, updater, source_db, job_folder):
+        """Test that a repeated key with no match is appended once, then updated"""
+        self.write_csv(job_folder, "product_item_update_1.csv", """group,item,description
+9999,001,First
+9999,001,Second
+""")
+
+        report = updater.predict_csv_files(job_folder, source_db)
+
+        assert report["files"][0]["would_append"] == 1
+        assert report["files"][0]["would_update"] == 1
+
+    def test_files_see_rows_appended_by_earlier_files(self, updater, source_db, job_folder):
+        """Test that an update file matches the rows that files before it would append"""
+        self.write_csv(job_folder, "product_item_append_1.csv", "group,item,description\n5555,001,A\n5555,002,B\n")
+        self.write_csv(job_folder, "product_item_update_2.csv", """group,item,description
+5555,001,Updated
+6666,001,New
+5555,,Ambiguous
+""")
+        self.write_csv(job_folder, "product_item_update_3.csv", "group,item,description\n6666,001,Updated\n7777,000,Updated\n")
+
+        # Files are predicted in the order they are processed
+        listdir = os.listdir
+        with patch("table_updates.table_updater.os.listdir", lambda path: sorted(listdir(path))):
+            report = updater.predict_csv_files(job_folder, source_db)
+
+        outcomes = [(f["file"], f["would_update"], f["would_append"], f["would_error"]) for f in report["files"]]
+        assert outcomes == [
+            ("product_item_append_1.csv", 0, 2, 0),
+            ("product_item_update_2.csv", 1, 1, 1),
+            ("product_item_update_3.csv", 2, 0, 0),
+        ]
+        assert report["files"][1]["errors"][0]["match_count"] == 2
+        conn = duckdb.connect(source_db, read_only=True)
+        assert conn.execute("SELECT COUNT(*) FROM product_item").fetchone()[0] == 3
+        conn.close()
+
+    def test_excel_dates_in_filter_fields(self, updater, source_db, job_folder):
+        """Test that Excel formatted dates match DATE columns"""
+        self.write_csv(job_folder, "matrix_update_1.csv", """geocode,group,item,tax_type,tax_cat,customer,provider,rate_value,effective
+US0800000000,1000,001,04,01,C,P,0.05,7/1/2025
+US0800000000,1000,001,04,01,C,P,0.05,8/1/2025
+""")
+
+        report = updater.predict_csv_files(job_folder, source_db)
+
+        assert report["files"][0]["would_update"] == 1
+        assert report["files"][0]["would_append"] == 1
+
+    def test_append_row_count(self, updater, source_db, job_folder, capsys):
+        """Test that append files report their row count"""
+        self.write_csv(job_folder, "product_item_append_1.csv", "group,item,description\n1,001,A\n1,002,B\n")
+
+        updater.predict_csv_files(job_folder, source_db)
+
+        captured = capsys.readouterr()
+        assert "DRY RUN: Would append 2 rows to product_item" in captured.out
+
+    def test_schema_mismatch_is_reported(self, updater, source_db, job_folder):
+        """Test that schema validation runs against the source database"""
+        self.write_csv(job_folder, "product_item_update_1.csv", "group,item,bogus\n1,001,A\n")
+
+        report = updater.predict_csv_files(job_folder, source_db)
+
+        assert report["files"][0]["skipped"] == "Schema validation failed"
+        with open(os.path.join(job_folder, "errors.json"), 'r') as f:
+            assert json.load(f)["errors"][0]["error"] == "CSV schema validation failed"
+
+    def test_prediction_does_not_modify_database(self, updater, source_db, job_folder):
+        """Test that the source database is opened read-only and never copied"""
+        self.write_csv(job_folder, "product_item_update_1.csv", "group,item,description\n7777,000,Updated\n")
+        original_mtime = os.path.getmtime(source_db)
+
+        with patch.object(updater, 'duplicate_database') as mock_duplicate:
+            updater.predict_csv_files(job_folder, source_db)
+            mock_duplicate.assert_not_called()
+
+        assert os.path.getmtime(source_db) == original_mtime
+        conn = duckdb.connect(source_db, read_only=True)
+        assert conn.execute("SELECT description FROM product_item WHERE item = '000'").fetchone()[0] == "Existing"
+        conn.close()
+
+    def test_report_file_written(self, updater, source_db, job_folder):
+        """Test that dry_run_report.json is written with totals"""
+        self.write_csv(job_folder, "product_item_update_1.csv", "group,item,description\n7777,000,Updated\n")
+
+        updater.predict_csv_files(job_folder, source_db)
+
+        with open(os.path.join(job_folder, "dry_run_report.json"), 'r') as f:
+            report = json.load(f)
+
+        assert report["totals"] == {"rows": 1, "would_update": 1, "would_append": 0, "would_error": 0}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,92 @@
+"""
+Test the DuckDB resource settings applied to every connection
+"""
+
+import pytest
+import argparse
+import os
+import tempfile
+import shutil
+import sys
+import duckdb
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from table_updates.table_updater import TableUpdater
+from src import config, duckdb_resources
+from src.db_handler import connect_to_duckdb
+
+
+class TestDuckDBResources:
+    """Test class for the DuckDB connection factory"""
+
+    @pytest.fixture
+    def temp_dir(self, monkeypatch):
+        """Create a temporary directory for testing, with no settings in the environment"""
+        temp_dir = tempfile.mkdtemp()
+        monkeypatch.setattr(config, "METRICS_DB_PATH", os.path.join(temp_dir, "run_history.sqlite"))
+        for env_name in duckdb_resources.SETTINGS.values():
+            monkeypatch.delenv(env_name, raising=False)
+        yield temp_dir
+        duckdb_resources.set_resource_limits()
+        shutil.rmtree(temp_dir)
+
+    def current_settings(self, conn):
+        return conn.execute("""
+            SELECT current_setting('threads'), current_setting('memory_limit'),
+                   current_setting('temp_directory'), current_setting('preserve_insertion_order')
+        """).fetchone()
+
+    def test_precedence(self, temp_dir, monkeypatch):
+        """Test that the command line wins over the environment, and the environment over config.py"""
+        monkeypatch.setattr(config, "DUCKDB_THREADS", 3)
+        monkeypatch.setattr(config, "DUCKDB_MEMORY_LIMIT", "2GB")
+        monkeypatch.setenv("DUCKDB_THREADS", "2")
+        monkeypatch.setenv("DUCKDB_PRESERVE_INSERTION_ORDER", "false")
+        assert duckdb_resources.connection_settings() == {
+            "threads": 2, "memory_limit": "2GB", "preserve_insertion_order": False
+        }
+
+        parser = argparse.ArgumentParser()
+        duckdb_resources.add_resource_arguments(parser)
+        duckdb_resources.apply_resource_arguments(parser.parse_args(["--threads", "1", "--temp-directory", "spill"]))
+        assert duckdb_resources.connection_settings() == {
+            "threads": 1, "memory_limit": "2GB", "temp_directory": os.path.abspath("spill"),
+            "preserve_insertion_order": False
+        }
+
+        monkeypatch.setenv("DUCKDB_PRESERVE_INSERTION_ORDER", "sometimes")
+        with pytest.raises(ValueError, match="DUCKDB_PRESERVE_INSERTION_ORDER"):
+            duckdb_resources.connection_settings()
+
+    def test_settings_applied_to_connections(self, temp_dir):
+        """Test that db_handler and the table updater open their connections with the settings"""
+        db_path = os.path.join(temp_dir, "tax_rates.duckdb")
+        spill_dir = os.path.join(temp_dir, "spill")
+        duckdb.connect(db_path).close()
+
+        duckdb_resources.set_resource_limits(threads=1, memory_limit="256MB", temp_directory=spill_dir,
+                                             preserve_insertion_order=False)
+        conn = connect_to_duckdb(db_path, read_only=True)
+        threads, memory_limit, temp_directory, preserve_insertion_order = self.current_settings(conn)
+        conn.close()
+        assert (threads, temp_directory, preserve_insertion_order) == (1, spill_dir, False)
+        assert memory_limit.endswith("MiB")
+
+        with duckdb_resources.connect(db_path) as conn:
+            conn.execute('CREATE TABLE product_item ("group" VARCHAR, item VARCHAR, description VARCHAR)')
+        schema = TableUpdater()._get_table_schema("product_item", db_path)
+        assert list(schema) == ["group", "item", "description"]
+
+    def test_defaults_unchanged(self, temp_dir):
+        """Test that without settings connections are opened exactly as before"""
+        assert duckdb_resources.connection_settings() == {}
+        assert duckdb_resources.describe_settings() == "DuckDB defaults"
+        conn = duckdb_resources.connect(":memory:")
+        assert self.current_settings(conn)[3] is True
+        conn.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
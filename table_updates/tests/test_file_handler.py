@@ -0,0 +1,89 @@
+"""
+Test output directory creation and the parallel writing of CSV files
+"""
+
+import pytest
+import os
+import datetime
+import tempfile
+import shutil
+import sys
+import types
+import pandas as pd
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src import file_handler, logger
+from src.file_handler import create_output_directory, write_dataframes_to_csv
+
+
+class FrozenDatetime(datetime.datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2025, 6, 27, 11, 55, 30)
+
+
+class TestFileHandler:
+    """Test class for output files"""
+
+    @pytest.fixture
+    def temp_dir(self):
+        """Create a temporary directory for testing"""
+        temp_dir = tempfile.mkdtemp()
+        logger.clear_logs()
+        yield temp_dir
+        logger.clear_logs()
+        shutil.rmtree(temp_dir)
+
+    def partitions(self, temp_dir, folder):
+        """Three partitions, one of them empty, with columns out of schema order"""
+        os.makedirs(os.path.join(temp_dir, folder))
+        df = pd.DataFrame({
+            "tax_rate": [0.0725, 0.08, None, 0.1],
+            "geocode": ["US1", "US2", "US3", "US4"],
+            "description": ["CITY SALES TAX", "COUNTY, \"SPECIAL\" TAX", "", None],
+        })
+        return [(os.path.join(temp_dir, folder, f"{name}.csv"), part)
+                for name, part in (("a", df.iloc[:3]), ("b", df.iloc[3:]), ("c", df.iloc[:0]))]
+
+    def test_same_second_directories_get_suffix(self, temp_dir, monkeypatch):
+        """Test that jobs started within the same second get their own directory"""
+        monkeypatch.setattr(file_handler, "datetime", types.SimpleNamespace(datetime=FrozenDatetime))
+        base_folder = os.path.join(temp_dir, "output")
+
+        paths = [create_output_directory(base_folder) for _ in range(3)]
+        fanout_path = create_output_directory(base_folder, "fanout")
+
+        assert [os.path.basename(path) for path in paths] == \
+            ["250627-115530_job", "250627-115530_job_2", "250627-115530_job_3"]
+        assert os.path.basename(fanout_path) == "250627-115530_fanout"
+        assert all(os.path.isdir(path) for path in paths + [fanout_path])
+
+    def test_parallel_write_matches_serial(self, temp_dir):
+        """Test that files written by the process pool are byte-identical to the serial ones"""
+        columns = ["geocode", "description", "tax_rate"]
+
+        serial_counts = write_dataframes_to_csv(self.partitions(temp_dir, "serial"), columns, max_workers=1)
+        parallel_counts = write_dataframes_to_csv(self.partitions(temp_dir, "parallel"), columns, max_workers=2)
+
+        assert serial_counts == parallel_counts == [3, 1, 0]
+        for name in ("a", "b", "c"):
+            with open(os.path.join(temp_dir, "serial", f"{name}.csv"), 'rb') as f, \
+                    open(os.path.join(temp_dir, "parallel", f"{name}.csv"), 'rb') as g:
+                assert f.read() == g.read(), name
+        with open(os.path.join(temp_dir, "parallel", "c.csv")) as f:
+            assert f.read() == "geocode,description,tax_rate\n"
+
+    def test_missing_column(self, temp_dir):
+        """Test that a column missing from the data is a critical error and nothing is written"""
+        partitions = self.partitions(temp_dir, "output")
+
+        with pytest.raises(SystemExit):
+            write_dataframes_to_csv(partitions, ["geocode", "fee"], max_workers=2)
+        assert os.listdir(os.path.join(temp_dir, "output")) == []
+        assert "Error writing partitioned CSV files" in logger.get_logs()[0]["message"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,175 @@
+"""
+Test the folder watcher: file signatures, settling, re-queueing and the bounded job queue
+"""
+
+import pytest
+import os
+import tempfile
+import shutil
+import sys
+import types
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src import config, folder_watcher
+from src.folder_watcher import FolderWatcher, build_request_options, parse_args
+
+
+class FakeService:
+    """Stands in for JobService: records the requests instead of running them"""
+
+    def __init__(self, table_updates_folder):
+        self.table_updater = types.SimpleNamespace(table_updates_folder=table_updates_folder)
+        self.requests = []
+
+    def submit(self, request):
+        if request["job_type"] == "new_tax" and not request.get("effective_date"):
+            raise ValueError("effective_date is required, in MM/DD/YYYY format")
+        self.requests.append(request)
+        return {"status": "completed", "job_type": request["job_type"], "summary": {}}
+
+
+class TestFolderWatcher:
+    """Test class for watch mode"""
+
+    @pytest.fixture
+    def temp_dir(self, monkeypatch):
+        """Create the job and table update folders, and a clock the test moves forward"""
+        temp_dir = tempfile.mkdtemp()
+        for folder in ("job", "table_updates"):
+            os.makedirs(os.path.join(temp_dir, folder))
+        monkeypatch.setattr(config, "JOB_FOLDER", os.path.join(temp_dir, "job"))
+        self.now = 0.0
+        monkeypatch.setattr(folder_watcher, "time", types.SimpleNamespace(monotonic=lambda: self.now))
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    def create_watcher(self, temp_dir, **kwargs):
+        service = FakeService(os.path.join(temp_dir, "table_updates"))
+        return FolderWatcher(service, {"effective_date": "07/01/2025"}, settle_seconds=5, **kwargs)
+
+    def write_file(self, path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+
+    def queued_paths(self, watcher):
+        paths = []
+        while not watcher.jobs.empty():
+            paths.append(watcher.jobs.get_nowait()[0])
+        return paths
+
+    def test_signature(self, temp_dir):
+        """Test the signature of a job file and of the CSV files of an update folder"""
+        watcher = self.create_watcher(temp_dir)
+        job_file = os.path.join(temp_dir, "job", "rate_update_250701.csv")
+        update_folder = os.path.join(temp_dir, "table_updates", "250701_update")
+        self.write_file(job_file, "state,county\n")
+        self.write_file(os.path.join(update_folder, "detail_append.csv"), "geocode\n")
+        self.write_file(os.path.join(update_folder, "notes.txt"), "not a table")
+
+        assert watcher._signature(job_file)[0][:2] == ("rate_update_250701.csv", 13)
+        assert [entry[0] for entry in watcher._signature(update_folder)] == ["detail_append.csv"]
+
+        signature = watcher._signature(update_folder)
+        self.write_file(os.path.join(update_folder, "notes.txt"), "still not a table")
+        assert watcher._signature(update_folder) == signature
+        self.write_file(os.path.join(update_folder, "detail_append.csv"), "geocode\nUS1\n")
+        assert watcher._signature(update_folder) != signature
+
+        assert watcher._signature(os.path.join(temp_dir, "job", "missing.csv")) is None
+
+    def test_queued_once_settled(self, temp_dir):
+        """Test that a job is queued once its signature is unchanged for the settle time, and only once"""
+        watcher = self.create_watcher(temp_dir)
+        job_file = os.path.join(temp_dir, "job", "rate_update_250701.csv")
+        self.write_file(job_file, "state,county\n")
+        self.write_file(os.path.join(temp_dir, "job", "rate_update_notes.csv"), "not a job file")
+
+        assert watcher.poll() == 0  # First seen
+        self.now = 4.9
+        assert watcher.poll() == 0  # Not settled yet
+        self.now = 5.0
+        assert watcher.poll() == 1
+        assert watcher.jobs.get_nowait() == (job_file, {"effective_date": "07/01/2025", "job_type": "rate_update",
+                                                        "job_file": job_file})
+        self.now = 20.0
+        assert watcher.poll() == 0
+        assert watcher.pending == {}
+
+    def test_change_restarts_settling(self, temp_dir):
+        """Test that a file still being written is not queued until it stops changing"""
+        watcher = self.create_watcher(temp_dir)
+        job_file = os.path.join(temp_dir, "job", "new_tax_250701.csv")
+        self.write_file(job_file, "state")
+        watcher.poll()
+
+        self.now = 4.0
+        self.write_file(job_file, "state,county\nCA,KERN\n")
+        assert watcher.poll() == 0
+        self.now = 8.0
+        assert watcher.poll() == 0  # Unchanged for 4 seconds only
+        self.now = 9.0
+        assert watcher.poll() == 1
+
+    def test_changed_file_requeued(self, temp_dir):
+        """Test that a processed file is queued again when it changes, and existing files are skipped"""
+        existing_file = os.path.join(temp_dir, "job", "rate_update_250601.csv")
+        self.write_file(existing_file, "state,county\n")
+        watcher = self.create_watcher(temp_dir)
+        assert self.create_watcher(temp_dir, process_existing=True).poll() == 0  # Only pending
+
+        watcher.poll()
+        self.now = 10.0
+        assert watcher.poll() == 0
+
+        self.write_file(existing_file, "state,county\nCA,KERN\n")
+        watcher.poll()
+        self.now = 20.0
+        assert watcher.poll() == 1
+        assert self.queued_paths(watcher) == [existing_file]
+
+    def test_bounded_queue(self, temp_dir):
+        """Test that jobs beyond the queue size stay pending until a slot frees up"""
+        watcher = self.create_watcher(temp_dir, queue_size=1)
+        job_file = os.path.join(temp_dir, "job", "rate_update_250701.csv")
+        update_folder = os.path.join(temp_dir, "table_updates", "250701_update")
+        self.write_file(job_file, "state,county\n")
+        self.write_file(os.path.join(update_folder, "detail_append.csv"), "geocode\n")
+
+        watcher.poll()
+        self.now = 5.0
+        assert watcher.poll() == 1
+        assert list(watcher.pending) == [update_folder]
+        assert watcher.poll() == 0
+
+        assert self.queued_paths(watcher) == [job_file]
+        assert watcher.poll() == 1
+        assert watcher.jobs.get_nowait() == (update_folder, {"effective_date": "07/01/2025",
+                                                             "job_type": "table_update",
+                                                             "job_folder": update_folder})
+
+    def test_run_job(self, temp_dir):
+        """Test that 'today' is resolved when the job runs and a rejected request is reported"""
+        watcher = self.create_watcher(temp_dir)
+
+        result = watcher.run_job("new_tax_250701.csv", {"job_type": "new_tax", "effective_date": "today"})
+        assert result["status"] == "completed"
+        assert result["path"] == "new_tax_250701.csv"
+        assert watcher.service.requests[0]["effective_date"] != "today"
+
+        result = watcher.run_job("new_tax_250701.csv", {"job_type": "new_tax"})
+        assert (result["status"], result["job_type"]) == ("rejected", "new_tax")
+
+    def test_request_options(self):
+        """Test the request fields built from the command line"""
+        options = build_request_options(parse_args(["--effective-date", "today", "--as-of", "--dry-run"]))
+        assert options == {"effective_date": "today", "as_of": "effective", "dry_run": True}
+        assert build_request_options(parse_args(["--conflicts", "error"])) == {"conflicts": "error"}
+        with pytest.raises(ValueError):
+            build_request_options(parse_args(["--effective-date", "2025-07-01"]))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,190 @@
+"""
+Test the local job service and its HTTP interface
+"""
+
+import pytest
+import os
+import json
+import tempfile
+import shutil
+import sys
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+import duckdb
+import pandas as pd
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src import config, logger
+from src.job_service import JobRequestHandler, JobService, parse_args
+
+
+class TestJobService:
+    """Test class for the job service"""
+
+    @pytest.fixture
+    def temp_dir(self, monkeypatch):
+        """Create a temporary directory for testing, holding the database, job and output folders"""
+        temp_dir = tempfile.mkdtemp()
+        for folder in ("job", "output"):
+            os.makedirs(os.path.join(temp_dir, folder))
+        monkeypatch.setattr(config, "JOB_FOLDER", os.path.join(temp_dir, "job"))
+        monkeypatch.setattr(config, "OUTPUT_FOLDER", os.path.join(temp_dir, "output"))
+        monkeypatch.setattr(config, "ROW_CACHE_PATH", os.path.join(temp_dir, "output", "row_cache.sqlite"))
+        monkeypatch.setattr(config, "METRICS_DB_PATH", os.path.join(temp_dir, "output", "run_history.sqlite"))
+        logger.clear_logs()
+        yield temp_dir
+        logger.clear_logs()
+        shutil.rmtree(temp_dir)
+
+    @pytest.fixture
+    def service(self, temp_dir, monkeypatch):
+        """A job service on a database with two cities in KERN county"""
+        db_path = os.path.join(temp_dir, "tax_rates.duckdb")
+        monkeypatch.setattr(config, "DATABASE_PATH", db_path)
+        conn = duckdb.connect(db_path)
+        conn.execute("""
+            CREATE TABLE geocode (status VARCHAR, country VARCHAR, state VARCHAR, county VARCHAR, city VARCHAR,
+                                  tax_district VARCHAR, geocode VARCHAR, gnis VARCHAR)
+        """)
+        conn.execute("""
+            INSERT INTO geocode VALUES (NULL, 'US', 'CA', 'KERN', 'TEHACHAPI', NULL, 'US0602900000', '0'),
+                                       (NULL, 'US', 'CA', 'KERN', 'CALIFORNIA CITY', NULL, 'US0602900001', '1')
+        """)
+        conn.execute("CREATE TABLE tax_authority (tax_auth_id VARCHAR, state VARCHAR, authority_name VARCHAR)")
+        conn.execute("CREATE TABLE detail (geocode VARCHAR, tax_auth_id VARCHAR, effective TIMESTAMP)")
+        conn.close()
+
+        service = JobService(db_path)
+        yield service
+        service.close()
+
+    @pytest.fixture
+    def port(self, service, monkeypatch):
+        """Serve the job service on a free localhost port"""
+        monkeypatch.setattr(JobRequestHandler, "service", service)
+        monkeypatch.setattr(JobRequestHandler, "log_message", lambda *args: None)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), JobRequestHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield server.server_address[1]
+        server.shutdown()
+        server.server_close()
+
+    def write_job_file(self, temp_dir, filename, content):
+        with open(os.path.join(temp_dir, "job", filename), 'w') as f:
+            f.write(content)
+
+    def request(self, port, method, path, body=None):
+        """Send a request to the service and return the status code and the JSON body"""
+        http_request = urllib.request.Request(f"http://127.0.0.1:{port}{path}", data=body, method=method)
+        try:
+            with urllib.request.urlopen(http_request) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    def test_invalid_requests_rejected(self, service, temp_dir):
+        """Test that invalid requests raise ValueError before anything runs"""
+        invalid_requests = [
+            ({"job_type": "delete"}, "job_type must be one of"),
+            ({"job_type": "rate_update"}, "effective_date is required"),
+            ({"job_type": "new_tax", "effective_date": "2025-07-01"}, "effective_date is required"),
+            ({"job_type": "rate_update", "effective_date": "07/01/2025", "job_file": "missing.csv"},
+             "Job file not found"),
+            ({"job_type": "rate_update", "effective_date": "07/01/2025", "unchanged_rows": "skip"},
+             "unchanged_rows must be one of"),
+            ({"job_type": "rate_update", "effective_date": "07/01/2025", "conflicts": "any"},
+             "conflicts must be one of"),
+            ({"job_type": "rate_update", "effective_date": "07/01/2025", "as_of": "2025"}, "as_of"),
+            ({"job_type": "table_update", "job_folder": os.path.join(temp_dir, "missing")},
+             "Job folder not found"),
+            ({"job_type": "table_update", "export_parquet": "some"}, "export_parquet must be one of"),
+        ]
+        for request, message in invalid_requests:
+            with pytest.raises(ValueError, match=message):
+                service.submit(request)
+
+        assert service.jobs_run == 0
+        assert service.connection is None
+
+    def test_small_job(self, service, temp_dir):
+        """Test a jurisdiction update run through the service, and the service state after it"""
+        self.write_job_file(temp_dir, "jurisdiction_update_251001.csv",
+                            "state,county,city,tax_district,new_name,new_county,new_city\nCA,KERN,,,KERNVILLE,,\n")
+
+        result = service.submit({"job_type": "jurisdiction_update", "effective_date": "10/01/2025"})
+
+        assert result["status"] == "completed"
+        assert result["job_type"] == "jurisdiction_update"
+        assert result["summary"]["rows_processed"] == 1
+        output = pd.read_csv(result["summary"]["output_file"], dtype=str, keep_default_na=False)
+        assert output["geocode"].tolist() == ["US0602900000", "US0602900001"]
+        assert output["county"].tolist() == ["KERNVILLE", "KERNVILLE"]
+
+        status = service.status()
+        assert status["connected"] is True
+        assert status["jobs_run"] == 1
+        assert status["current_job"] is None
+        assert status["last_job"]["status"] == "completed"
+
+    def test_failed_job(self, service, temp_dir):
+        """Test that a job stopped by a critical error is reported as failed, with its errors file"""
+        self.write_job_file(temp_dir, "jurisdiction_update_251001.csv", "")
+
+        result = service.submit({"job_type": "jurisdiction_update", "effective_date": "10/01/2025"})
+
+        assert result["status"] == "failed"
+        assert "Error reading CSV file" in result["error"]
+        assert os.path.exists(result["errors_file"])
+        assert service.last_job["status"] == "failed"
+        assert logger.get_logs() == []
+
+    def test_http_interface(self, temp_dir, port):
+        """Test the status codes of /status and /jobs"""
+        code, status = self.request(port, "GET", "/status")
+        assert code == 200
+        assert (status["connected"], status["jobs_run"]) == (False, 0)
+
+        assert self.request(port, "GET", "/jobs")[0] == 404
+        code, result = self.request(port, "POST", "/jobs", b"not json")
+        assert code == 400 and result["status"] == "rejected"
+        code, result = self.request(port, "POST", "/jobs", b"[]")
+        assert (code, result["error"]) == (400, "Request body must be a JSON object")
+        code, result = self.request(port, "POST", "/jobs", json.dumps({"job_type": "rate_update"}).encode())
+        assert code == 400 and "effective_date" in result["error"]
+
+        job_file = "jurisdiction_update_251001.csv"
+        request = json.dumps({"job_type": "jurisdiction_update", "effective_date": "10/01/2025",
+                              "job_file": job_file}).encode()
+        self.write_job_file(temp_dir, job_file, "")
+        code, result = self.request(port, "POST", "/jobs", request)
+        assert (code, result["status"]) == (500, "failed")
+
+        self.write_job_file(temp_dir, job_file,
+                            "state,county,city,tax_district,new_name,new_county,new_city\nCA,KERN,,,KERNVILLE,,\n")
+        code, result = self.request(port, "POST", "/jobs", request)
+        assert (code, result["status"]) == (200, "completed")
+
+        code, status = self.request(port, "GET", "/status/")
+        assert (code, status["jobs_run"]) == (200, 2)
+        assert status["last_job"]["job_type"] == "jurisdiction_update"
+
+    def test_submit_options(self):
+        """Test the submit command line"""
+        args = parse_args(["submit", "rate_update", "--effective-date", "07/01/2025", "--as-of"])
+        assert (args.command, args.job_type, args.effective_date, args.as_of) == \
+            ("submit", "rate_update", "07/01/2025", "effective")
+        assert parse_args(["submit", "rate_update", "--conflicts", "specific"]).conflicts == "specific"
+        assert parse_args(["submit", "rate_update"]).conflicts is None
+        with pytest.raises(SystemExit):
+            parse_args(["submit", "delete"])
+        with pytest.raises(SystemExit):
+            parse_args(["submit", "rate_update", "--conflicts", "last"])
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
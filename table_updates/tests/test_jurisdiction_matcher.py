@@ -0,0 +1,114 @@
+"""
+Test the matching of misspelled jurisdiction names in job rows
+"""
+
+import pytest
+import os
+import datetime
+import tempfile
+import shutil
+import sys
+import duckdb
+import pandas as pd
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src import config, logger
+from src.jurisdiction_matcher import JurisdictionMatcher, normalize_name
+from src.main import process_rate_update_job
+
+
+class TestJurisdictionMatcher:
+    """Test class for the jurisdiction name index"""
+
+    @pytest.fixture
+    def conn(self):
+        """A database with counties and cities of two states, and a tax of each city"""
+        temp_dir = tempfile.mkdtemp()
+        conn = duckdb.connect(os.path.join(temp_dir, "tax_rates.duckdb"))
+        conn.execute("""
+            CREATE TABLE geocode AS SELECT * FROM (VALUES
+                ('CA', 'LOS ANGELES', 'SANTA MONICA', NULL, 'US0603770000'),
+                ('CA', 'LOS ANGELES', 'SANTA CLARITA', NULL, 'US0603769088'),
+                ('CA', 'KERN', 'CALIFORNIA CITY', NULL, 'US0602909780'),
+                ('TX', 'HARRIS', 'HOUSTON', NULL, 'US4820135000'),
+                ('TX', 'HARDIN', 'SILSBEE', NULL, 'US4819967856'),
+                ('TX', 'ST. MARY', 'BALDWIN', NULL, 'US4819900001')
+            ) t(state, county, city, tax_district, geocode)
+        """)
+        conn.execute("""
+            CREATE TABLE detail AS
+            SELECT geocode, '04' AS tax_type, '01' AS tax_cat, '300' AS tax_auth_id, DATE '2024-01-01' AS effective,
+                   'CITY SALES TAX' AS description, CAST(0 AS INTEGER) AS tier,
+                   CAST(0.01 AS DECIMAL(13,12)) AS tax_rate, CAST(0 AS DECIMAL(11,8)) AS fee
+            FROM geocode
+        """)
+        logger.clear_logs()
+        yield conn
+        conn.close()
+        logger.clear_logs()
+        shutil.rmtree(temp_dir)
+
+    def resolve(self, conn, **criteria):
+        return JurisdictionMatcher(conn).resolve(pd.Series(criteria), ['state', 'county', 'city'])
+
+    def test_normalize_name(self):
+        """Test that case, punctuation, affixes and abbreviations don't change the key"""
+        assert normalize_name("Harris County", "county") == normalize_name("HARRIS", "county") == "HARRIS"
+        assert normalize_name("County of Los Angeles", "county") == "LOS ANGELES"
+        assert normalize_name("Saint Mary Parish", "county") == normalize_name("ST. MARY", "county") == "ST MARY"
+        assert normalize_name("City of Santa Monica", "city") == normalize_name("SANTA MONICA, CITY OF", "city")
+        assert normalize_name("County", "county") == "COUNTY"
+
+    def test_near_misses_resolved(self, conn):
+        """Test that names differing in case, affixes or a typo are replaced with a warning"""
+        resolved, warnings, problem = self.resolve(conn, state="tx", county="Harris County", city="Huston")
+        assert resolved[["state", "county", "city"]].tolist() == ["TX", "HARRIS", "HOUSTON"]
+        assert warnings == ["Warning: matched county 'Harris County' to 'HARRIS'",
+                            "Warning: matched city 'Huston' to 'HOUSTON'"]
+        assert problem is None
+
+        # Case alone is no near-miss
+        resolved, warnings, problem = self.resolve(conn, state="ca", city="santa monica")
+        assert resolved[["state", "city"]].tolist() == ["CA", "SANTA MONICA"] and warnings == []
+
+    def test_ambiguous_names_suggested(self, conn):
+        """Test that names close to several jurisdictions, or to none, are not resolved"""
+        resolved, warnings, problem = self.resolve(conn, state="TX", county="HARDIS")
+        assert resolved is None
+        assert problem == "county 'HARDIS' not found in TX (did you mean 'HARDIN', 'HARRIS'?)"
+
+        # The only close name is in another state
+        resolved, warnings, problem = self.resolve(conn, state="TX", city="SANTA MONIKA")
+        assert resolved is None and problem == "city 'SANTA MONIKA' not found in TX"
+
+        # Two edits are too many for a 6 letter name
+        assert self.resolve(conn, state="TX", county="HARIZZ")[0] is None
+
+    def test_rate_update_job(self, conn, monkeypatch):
+        """Test that rate update rows with near-misses are updated with a warning status"""
+        job_df = pd.DataFrame({
+            "state": ["ca", "CA", "TX"], "county": ["County of Los Angeles", None, "HARDIS"],
+            "city": ["Santa Monica", "Californa City", None], "tax_type": ["04"] * 3, "tax_cat": ["01"] * 3,
+            "description": [None] * 3, "old_rate": [1.0] * 3, "new_rate": [1.5] * 3,
+            "old_fee": [0] * 3, "new_fee": [0] * 3
+        })
+        output = process_rate_update_job(conn, job_df, datetime.datetime(2025, 7, 1)).to_dataframe()
+
+        assert output["geocode"].tolist() == ["US0603770000", "US0602909780"]
+        assert output["status"].tolist() == [
+            "Warning: matched county 'County of Los Angeles' to 'LOS ANGELES'",
+            "Warning: matched city 'Californa City' to 'CALIFORNIA CITY'"
+        ]
+        errors = [log["message"] for log in logger.get_logs() if log["level"] == "ERROR"]
+        assert errors == ["Row 3: No geocodes found for criteria: county 'HARDIS' not found in TX "
+                          "(did you mean 'HARDIN', 'HARRIS'?). Skipping."]
+
+        logger.clear_logs()
+        monkeypatch.setattr(config, "JURISDICTION_MATCHING", False)
+        assert len(process_rate_update_job(conn, job_df, datetime.datetime(2025, 7, 1))) == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
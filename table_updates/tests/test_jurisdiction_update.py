@@ -0,0 +1,126 @@
+"""
+Test the Jurisdiction Update job type
+"""
+
+import pytest
+import os
+import datetime
+import tempfile
+import shutil
+import sys
+import duckdb
+import pandas as pd
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src import logger
+from src.main import process_jurisdiction_update_job
+
+
+class TestJurisdictionUpdate:
+    """Test class for renames and re-parentings of jurisdictions"""
+
+    @pytest.fixture
+    def conn(self):
+        """A database with two counties, a city with a tax district, and their taxes"""
+        temp_dir = tempfile.mkdtemp()
+        conn = duckdb.connect(os.path.join(temp_dir, "tax_rates.duckdb"))
+        conn.execute("""
+            CREATE TABLE geocode AS SELECT * FROM (VALUES
+                ('US', 'CA', 'LOS ANGELES', 'SANTA MONICA', NULL, 'US0603770000', '1'),
+                ('US', 'CA', 'LOS ANGELES', 'SANTA MONICA', 'DOWNTOWN', 'US0603770001', '2'),
+                ('US', 'CA', 'KERN', 'CALIFORNIA CITY', NULL, 'US0602909780', '3'),
+                ('US', 'CA', 'KERN', 'TEHACHAPI', NULL, 'US0602978120', '4')
+            ) t(country, state, county, city, tax_district, geocode, gnis)
+        """)
+        conn.execute("""
+            CREATE TABLE tax_authority AS SELECT * FROM (VALUES
+                ('200', 'US', 'CA', 'KERN, COUNTY OF', '2'),
+                ('201', 'US', 'CA', 'LOS ANGELES, COUNTY OF', '2'),
+                ('300', 'US', 'CA', 'CITY OF SANTA MONICA, DOWNTOWN', '4')
+            ) t(tax_auth_id, country, state, authority_name, tax_auth_type)
+        """)
+        conn.execute("""
+            CREATE TABLE detail AS
+            SELECT geocode, '04' AS tax_type, '01' AS tax_cat, tax_auth_id, TIMESTAMP '2024-01-01' AS effective,
+                   'COUNTY SALES TAX' AS description, CAST(0 AS INTEGER) AS tier,
+                   CAST(rate AS DECIMAL(13,12)) AS tax_rate, CAST(0 AS DECIMAL(11,8)) AS fee
+            FROM (VALUES ('US0603770000', '201', 0.0225), ('US0603770001', '201', 0.0225),
+                         ('US0602909780', '200', 0.01), ('US0602978120', '200', 0.01)) t(geocode, tax_auth_id, rate)
+        """)
+        logger.clear_logs()
+        yield conn
+        conn.close()
+        logger.clear_logs()
+        shutil.rmtree(temp_dir)
+
+    def run_job(self, conn, rows):
+        job_df = pd.DataFrame(rows, columns=["state", "county", "city", "tax_district",
+                                             "new_name", "new_county", "new_city"])
+        geocode_rows, related_rows = process_jurisdiction_update_job(conn, job_df, datetime.datetime(2025, 7, 1))
+        return (geocode_rows.to_dataframe(), related_rows["tax_authority"].to_dataframe(),
+                related_rows["detail"].to_dataframe())
+
+    def test_county_rename(self, conn):
+        """Test that a county rename changes all its geocodes and the county's authority"""
+        geocodes, authorities, detail = self.run_job(conn, [["ca", "Kern", None, None, "Kernville", None, None]])
+
+        assert sorted(geocodes["geocode"]) == ["US0602909780", "US0602978120"]
+        assert set(geocodes["county"]) == {"KERNVILLE"} and set(geocodes["status"]) == {"Success"}
+        assert geocodes["_job_row"].tolist() == [1, 1]
+        assert authorities[["tax_auth_id", "authority_name", "status"]].values.tolist() == \
+            [["200", "KERNVILLE, COUNTY OF", "Success"]]
+        assert detail.empty
+
+    def test_city_moved_to_other_county(self, conn):
+        """Test that a re-parented city ends the former county's taxes and gets the new county's taxes"""
+        geocodes, authorities, detail = self.run_job(
+            conn, [["CA", "LOS ANGELES", "SANTA MONICA", None, None, "KERN", None]]
+        )
+
+        assert set(geocodes["county"]) == {"KERN"} and len(geocodes) == 2
+        assert set(geocodes["status"]) == {"Success"}
+        # The district authority is named after the city, which keeps its name
+        assert authorities.empty
+
+        ended = detail[detail["tax_auth_id"] == "201"]
+        added = detail[detail["tax_auth_id"] == "200"]
+        assert sorted(ended["geocode"]) == sorted(added["geocode"]) == ["US0603770000", "US0603770001"]
+        assert (ended["tax_rate"] == 0).all()
+        assert set(ended["status"]) == {"Warning: tax of former county LOS ANGELES ended"}
+        assert (added["tax_rate"] == 0.01).all() and set(added["status"]) == {"Success"}
+        assert set(detail["effective"]) == {"2025-07-01"}
+
+    def test_combined_changes_warnings_and_errors(self, conn):
+        """Test rows that change different fields of a geocode, merges, conflicts and invalid rows"""
+        geocodes, authorities, detail = self.run_job(conn, [
+            ["CA", None, "SANTA MONICA", None, "VENICE", None, None],
+            ["CA", None, "SANTA MONICA", "DOWNTOWN", "MIDTOWN", None, None],
+            ["CA", "KERN", "TEHACHAPI", None, "CALIFORNIA CITY", None, None],
+            ["CA", "KERN", None, None, "INYO", None, None],
+            ["CA", "KERN", None, None, "MONO", None, None],
+            [None, "KERN", None, None, "INYO", None, None],
+            ["CA", "ORANGE", None, None, "IRVINE", None, None],
+            ["CA", "KERN", None, None, None, "INYO", None],
+        ])
+
+        by_geocode = geocodes.set_index("geocode")
+        assert by_geocode.loc["US0603770001", ["city", "tax_district"]].tolist() == ["VENICE", "MIDTOWN"]
+        assert by_geocode.loc["US0603770000", "city"] == "VENICE"
+        # Rows 3-5 all change the KERN geocodes, rows 4 and 5 to different county names
+        assert "US0602909780" not in by_geocode.index and "US0602978120" not in by_geocode.index
+        assert authorities[["tax_auth_id", "authority_name"]].values.tolist() == \
+            [["300", "CITY OF VENICE, MIDTOWN"]]
+
+        errors = {log["context"]["row_number"]: log["message"] for log in logger.get_logs() if log["level"] == "ERROR"}
+        assert "changed differently by row(s) 3, 5" in errors[4]
+        assert "Missing required field 'state'" in errors[6]
+        assert "No geocodes found" in errors[7]
+        assert "new_county only applies to a city or tax_district" in errors[8]
+        warnings = [log["message"] for log in logger.get_logs() if log["level"] == "WARNING"]
+        assert "Row 3: city CALIFORNIA CITY already exists, jurisdictions are merged" in warnings
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,116 @@
+"""
+Test lookup index building and index-narrowed update lookups
+"""
+
+import pytest
+import os
+import tempfile
+import shutil
+import sys
+import duckdb
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from table_updates.table_updater import TableUpdater
+
+
+class TestLookupIndexes:
+    """Test class for lookup index functionality"""
+
+    @pytest.fixture
+    def temp_dir(self):
+        """Create a temporary directory for testing"""
+        temp_dir = tempfile.mkdtemp()
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    @pytest.fixture
+    def db_path(self, temp_dir):
+        """Create a database with a product_item table"""
+        db_path = os.path.join(temp_dir, "working.duckdb")
+        conn = duckdb.connect(db_path)
+        conn.execute('''CREATE TABLE product_item AS
+            SELECT (1000 + i % 5)::VARCHAR AS "group", lpad(i::VARCHAR, 4, '0') AS item, 'Item ' || i AS description
+            FROM range(500) t(i)''')
+        conn.execute('''INSERT INTO product_item VALUES ('1000', '9999', 'Duplicate A'), ('1000', '9999', 'Duplicate B')''')
+        conn.close()
+        return db_path
+
+    @pytest.fixture
+    def updater(self):
+        """Create TableUpdater instance with sample filtering criteria"""
+        updater = TableUpdater()
+        updater.filtering_criteria = {
+            "product_item": {"filter_fields": ["group", "item"]}
+        }
+        return updater
+
+    def write_update_csv(self, temp_dir):
+        csv_path = os.path.join(temp_dir, "product_item_update_1.csv")
+        with open(csv_path, 'w') as f:
+            f.write("group,item,description\n1000,0000,Updated\n1002,0007,Updated\n1001,0601,New\n1000,9999,Ambiguous\n")
+        return csv_path
+
+    def table_rows(self, db_path):
+        conn = duckdb.connect(db_path, read_only=True)
+        try:
+            return conn.execute("SELECT rowid, * FROM product_item ORDER BY rowid").fetchall()
+        finally:
+            conn.close()
+
+    def test_build_indexes_most_selective_column(self, updater, db_path):
+        """Test that the column with the most distinct values is indexed and used"""
+        report = updater.build_lookup_indexes(db_path)
+
+        entry = next(e for e in report if e["table"] == "product_item")
+        assert entry["column"] == "item"
+        assert entry["index"] == "lookup_product_item_item"
+        assert entry["used"] is True
+        assert updater.lookup_indexes == {"product_item": "item"}
+
+    def test_missing_tables_are_skipped(self, updater, db_path):
+        """Test that patterns for tables not in the database are ignored"""
+        report = updater.build_lookup_indexes(db_path)
+
+        assert [e["table"] for e in report] == ["product_item"]
+
+    def test_indexed_update_matches_plain_update(self, updater, db_path, temp_dir):
+        """Test that index lookups produce the same rows, rowids and errors as plain lookups"""
+        plain_path = os.path.join(temp_dir, "plain.duckdb")
+        shutil.copy2(db_path, plain_path)
+        csv_path = self.write_update_csv(temp_dir)
+
+        updater.process_update_job(csv_path, "product_item", plain_path, ["group", "item"])
+        updater.build_lookup_indexes(db_path)
+        updater.process_update_job(csv_path, "product_item", db_path, ["group", "item"])
+
+        assert self.table_rows(db_path) == self.table_rows(plain_path)
+
+    def test_index_lookups_reported(self, updater, db_path, temp_dir, capsys):
+        """Test that the update summary reports the index lookups"""
+        csv_path = self.write_update_csv(temp_dir)
+        updater.build_lookup_indexes(db_path)
+
+        updater.process_update_job(csv_path, "product_item", db_path, ["group", "item"])
+
+        captured = capsys.readouterr()
+        assert "Updated: 2, Appended: 1, Errors: 1" in captured.out
+        assert "Index lookups on item: 4" in captured.out
+
+    def test_load_and_drop_indexes(self, updater, db_path):
+        """Test that existing lookup indexes are picked up and can be dropped"""
+        updater.build_lookup_indexes(db_path)
+
+        other_updater = TableUpdater()
+        assert other_updater.load_lookup_indexes(db_path) == {"product_item": "item"}
+
+        assert other_updater.drop_lookup_indexes(db_path) == 1
+        assert other_updater.lookup_indexes == {}
+        conn = duckdb.connect(db_path, read_only=True)
+        assert conn.execute("SELECT COUNT(*) FROM duckdb_indexes()").fetchone()[0] == 0
+        conn.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,85 @@
+"""
+Test the memory report of job stages
+"""
+
+import pytest
+import os
+import json
+import tempfile
+import shutil
+import sys
+import duckdb
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from table_updates.table_updater import TableUpdater
+from src import config
+from src.memory_tracker import MemoryTracker, start_memory_tracker
+
+
+class TestMemoryTracker:
+    """Test class for the --memory-report output"""
+
+    @pytest.fixture
+    def temp_dir(self, monkeypatch):
+        """Create a temporary directory for testing"""
+        temp_dir = tempfile.mkdtemp()
+        monkeypatch.setattr(config, "METRICS_DB_PATH", os.path.join(temp_dir, "run_history.sqlite"))
+        # Deep tracebacks make every allocation slower; the test code is at most a few frames up
+        monkeypatch.setattr(config, "MEMORY_TRACE_FRAMES", 4)
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    def test_nested_stages(self, temp_dir):
+        """Test peak and retained memory of nested stages and the line that retained it"""
+        tracker = MemoryTracker()
+        tracker.start()
+        with tracker.stage("outer"):
+            with tracker.stage("inner"):
+                kept = [bytearray(1024) for _ in range(4096)]  # About 4 MB, kept
+                temporary = bytearray(8 * 1024 * 1024)
+                del temporary
+        report = tracker.finish(temp_dir)
+
+        outer, inner = report["stages"]
+        assert (outer["stage"], outer["depth"], inner["stage"], inner["depth"]) == ("outer", 0, "inner", 1)
+        assert inner["traced_peak_increase_mb"] >= 12
+        assert outer["traced_peak_increase_mb"] >= inner["traced_peak_increase_mb"]
+        assert 4 <= inner["traced_retained_mb"] < 5
+        assert inner["retained_by"][0]["site"].startswith(os.path.join("table_updates", "tests", "test_memory_tracker.py:"))
+        assert report["traced_peak_mb"] >= 12
+        with open(os.path.join(temp_dir, "memory_report.json"), 'r') as f:
+            assert len(json.load(f)["stages"]) == 2
+        assert len(kept) == 4096
+
+    def test_table_update_memory_report(self, temp_dir):
+        """Test that a table update run reports its stages and the stages of each file"""
+        db_path = os.path.join(temp_dir, "tax_rates.duckdb")
+        conn = duckdb.connect(db_path)
+        conn.execute('CREATE TABLE product_item ("group" VARCHAR, item VARCHAR, description VARCHAR)')
+        conn.close()
+        job_folder = os.path.join(temp_dir, "250801_update")
+        os.makedirs(job_folder)
+        with open(os.path.join(job_folder, "product_item_update_1.csv"), 'w') as f:
+            f.write("group,item,description\n7777,000,New\n")
+
+        updater = TableUpdater()
+        updater.filtering_criteria = {"product_item": {"filter_fields": ["group", "item"]}}
+        updater.memory_tracker = start_memory_tracker(True)
+        updater.run_job_folder(job_folder, db_path)
+        report = updater.memory_tracker.finish(job_folder)
+
+        stages = [(stage["stage"], stage["depth"]) for stage in report["stages"]]
+        assert stages[:3] == [("preflight", 0), ("copy", 0), ("indexes", 0)]
+        assert ("process", 0) in stages
+        assert ("product_item_update_1.csv: apply", 1) in stages
+        assert os.path.exists(os.path.join(job_folder, "memory_report.json"))
+
+    def test_disabled(self):
+        """Test that no tracker is started unless asked for"""
+        assert start_memory_tracker(False) is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,130 @@
+"""
+Test that output rows collected column by column give the same output as a list of row dicts
+"""
+
+import pytest
+import os
+import tempfile
+import shutil
+import sys
+import datetime
+from decimal import Decimal
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src.file_handler import write_dataframe_to_csv
+from src.output_builder import OutputBuilder
+
+
+class TestOutputBuilder:
+    """Test class for the column-wise output row accumulator"""
+
+    @pytest.fixture
+    def temp_dir(self):
+        """Create a temporary directory for testing"""
+        temp_dir = tempfile.mkdtemp()
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    def rows(self):
+        """Rows with missing values, a column first seen in a later row and categories seen late"""
+        return [
+            {"status": "Success", "geocode": "US1", "effective": "2025-07-01", "tax_rate": 0.06, "tier": 0},
+            {"status": None, "geocode": "US2", "effective": np.nan, "tax_rate": np.nan, "tier": None},
+            {"status": "Warning: rate mismatch", "geocode": "US3", "effective": "2025-07-01", "tax_rate": 0.07,
+             "tier": 1, "description": "CITY SALES TAX"},
+            {"status": "Success\nWarning: fee mismatch", "geocode": None, "tax_rate": 0.0,
+             "description": np.nan},
+        ]
+
+    def test_same_dataframe_as_row_dicts(self):
+        """Test that values, missing values and column order match pd.DataFrame(rows)"""
+        builder = OutputBuilder(["status", "effective"])
+        builder.extend(self.rows()[:2])
+        for row in self.rows()[2:]:
+            builder.append(row)
+        result = builder.to_dataframe()
+        expected = pd.DataFrame(self.rows())
+
+        assert len(builder) == 4
+        assert list(result.columns) == list(expected.columns)
+        assert isinstance(result["status"].dtype, pd.CategoricalDtype)
+        assert list(result["status"].cat.categories) == ["Success", "Warning: rate mismatch",
+                                                         "Success\nWarning: fee mismatch"]
+        for column in expected.columns:
+            assert result[column].isna().tolist() == expected[column].isna().tolist(), column
+            assert result[column].dropna().astype(object).tolist() == \
+                expected[column].dropna().astype(object).tolist(), column
+
+    def test_same_csv_as_row_dicts(self, temp_dir):
+        """Test that the CSV written is byte-identical to the one written from the row dicts"""
+        builder = OutputBuilder(["status", "effective"])
+        builder.extend(self.rows())
+        columns = ["status", "geocode", "effective", "description", "tax_rate", "tier"]
+        builder_path = os.path.join(temp_dir, "builder.csv")
+        dicts_path = os.path.join(temp_dir, "dicts.csv")
+
+        write_dataframe_to_csv(builder_path, builder.to_dataframe(), columns)
+        write_dataframe_to_csv(dicts_path, pd.DataFrame(self.rows()), columns)
+
+        with open(builder_path, 'rb') as f, open(dicts_path, 'rb') as g:
+            assert f.read() == g.read()
+
+    def detail_rows(self):
+        """Rows as fetched from the detail table: nullable integers, decimals and timestamps"""
+        return [
+            {"geocode": "US1", "effective": datetime.datetime(2025, 1, 1), "report_to": None, "tier": 0,
+             "tax_rate": Decimal("0.060000000000"), "status": "Success", "_job_row": 1},
+            {"geocode": "US2", "effective": datetime.datetime(2025, 1, 1), "report_to": 3, "tier": 1,
+             "tax_rate": None, "status": "Warning: rate mismatch", "_job_row": 1},
+            {"geocode": None, "effective": None, "report_to": None, "tier": 2,
+             "tax_rate": Decimal("0.070000000000"), "status": "Success", "_job_row": 2},
+        ]
+
+    def test_arrow_tables_same_csv_as_row_dicts(self, temp_dir):
+        """Test that output rows added as Arrow tables write the same CSV as the same rows as dicts"""
+        columns = ["status", "geocode", "effective", "report_to", "tier", "tax_rate"]
+        rows = self.detail_rows()
+        table_builder = OutputBuilder(["status", "effective"])
+        table_builder.extend(pa.Table.from_pylist(rows[:2]))
+        table_builder.extend(pa.Table.from_pylist(rows[2:]))
+        dict_builder = OutputBuilder(["status", "effective"])
+        dict_builder.extend(self.detail_rows())
+
+        result = table_builder.to_dataframe()
+        assert len(table_builder) == 3
+        assert list(result.columns) == list(rows[0])
+        assert list(result["status"].cat.categories) == ["Success", "Warning: rate mismatch"]
+        assert result["report_to"].isna().tolist() == [True, False, True]
+        assert result["_job_row"].tolist() == [1, 1, 2]
+
+        table_path = os.path.join(temp_dir, "tables.csv")
+        dicts_path = os.path.join(temp_dir, "dicts.csv")
+        write_dataframe_to_csv(table_path, result, columns)
+        write_dataframe_to_csv(dicts_path, dict_builder.to_dataframe(), columns)
+        with open(table_path, 'rb') as f, open(dicts_path, 'rb') as g:
+            assert f.read() == g.read()
+
+    def test_row_dicts_and_tables_not_mixed(self):
+        """Test that a builder holds either row dicts or Arrow tables"""
+        builder = OutputBuilder(["status"])
+        builder.extend(pa.Table.from_pylist(self.detail_rows()))
+        with pytest.raises(ValueError):
+            builder.append(self.detail_rows()[0])
+
+        builder = OutputBuilder(["status"])
+        builder.extend(self.detail_rows())
+        with pytest.raises(ValueError):
+            builder.extend(pa.Table.from_pylist(self.detail_rows()))
+
+    def test_empty(self):
+        """Test that no rows give an empty DataFrame"""
+        assert OutputBuilder(["status"]).to_dataframe().empty
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,108 @@
+"""
+Test the Parquet export of the database copy
+"""
+
+import pytest
+import os
+import json
+import tempfile
+import shutil
+import sys
+import duckdb
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+import table_updates.table_updater as table_updater
+from table_updates.table_updater import TableUpdater
+
+
+class TestParquetExport:
+    """Test class for exporting the database copy to Parquet"""
+
+    @pytest.fixture
+    def temp_dir(self):
+        """Create a temporary directory for testing"""
+        temp_dir = tempfile.mkdtemp()
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    @pytest.fixture
+    def source_db(self, temp_dir):
+        """Create a source database with geocode, detail and product_item tables"""
+        db_path = os.path.join(temp_dir, "tax_rates.duckdb")
+        conn = duckdb.connect(db_path)
+        conn.execute("CREATE TABLE geocode (state VARCHAR, geocode VARCHAR)")
+        conn.execute("INSERT INTO geocode VALUES ('CA', 'US06000001'), ('TX', 'US48000001'), (NULL, 'US99000001')")
+        conn.execute("CREATE TABLE detail (geocode VARCHAR, tax_type VARCHAR, tax_rate DECIMAL(13,12))")
+        conn.execute("""INSERT INTO detail VALUES ('US06000001', '01', 0.0725), ('US48000001', '01', 0.0625),
+            ('US48000002', '04', 0.01), ('US77000001', '01', 0.05)""")
+        conn.execute('CREATE TABLE product_item ("group" VARCHAR, item VARCHAR, description VARCHAR)')
+        conn.execute("INSERT INTO product_item VALUES ('7777', '000', 'Old')")
+        conn.close()
+        return db_path
+
+    @pytest.fixture
+    def job_folder(self, temp_dir):
+        job_folder = os.path.join(temp_dir, "250801_update")
+        os.makedirs(job_folder)
+        return job_folder
+
+    @pytest.fixture
+    def db_path(self, source_db, job_folder):
+        return TableUpdater().duplicate_database(source_db, job_folder, "250801")
+
+    def read_rows(self, pattern):
+        return duckdb.sql(f"SELECT * FROM read_parquet('{pattern}', hive_partitioning = false) ORDER BY ALL").fetchall()
+
+    def table_rows(self, db_path, table_name):
+        conn = duckdb.connect(db_path, read_only=True)
+        rows = conn.execute(f'SELECT * FROM "{table_name}" ORDER BY ALL').fetchall()
+        conn.close()
+        return rows
+
+    def test_export_all_tables(self, db_path, job_folder):
+        """Test that every table is exported with its rows and listed in the manifest"""
+        manifest = TableUpdater().export_parquet(db_path, job_folder)
+
+        export_dir = os.path.join(job_folder, "tax_db_250801_parquet")
+        assert sorted(manifest["tables"]) == ["detail", "geocode", "product_item"]
+        for table_name, table in manifest["tables"].items():
+            assert table["files"] == [f"{table_name}.parquet"]
+            assert self.read_rows(os.path.join(export_dir, table["path"])) == self.table_rows(db_path, table_name)
+        assert manifest["tables"]["detail"]["rows"] == 4
+        with open(os.path.join(export_dir, "manifest.json"), 'r') as f:
+            assert json.load(f)["tables"]["detail"]["checksum"] == manifest["tables"]["detail"]["checksum"]
+
+    def test_export_changed_tables_only(self, source_db, db_path, job_folder):
+        """Test that only tables that differ from the source are exported"""
+        conn = duckdb.connect(db_path)
+        conn.execute("UPDATE product_item SET description = 'New'")
+        conn.close()
+
+        manifest = TableUpdater().export_parquet(db_path, job_folder, source_db)
+
+        assert list(manifest["tables"]) == ["product_item"]
+        assert not os.path.exists(os.path.join(job_folder, "tax_db_250801_parquet", "detail.parquet"))
+
+    def test_export_partitioned_by_state(self, db_path, job_folder, monkeypatch):
+        """Test that large tables are split by state, derived from the geocode when needed"""
+        monkeypatch.setattr(table_updater, "PARQUET_EXPORT_PARTITION_MIN_ROWS", 2)
+
+        manifest = TableUpdater().export_parquet(db_path, job_folder, partition_by="state")
+
+        export_dir = os.path.join(job_folder, "tax_db_250801_parquet")
+        detail = manifest["tables"]["detail"]
+        assert detail["partition_column"] == "state"
+        assert sorted(os.path.dirname(file) for file in detail["files"]) == [
+            "detail/state=CA", "detail/state=TX", "detail/state=UNKNOWN"
+        ]
+        assert {value: p["row_count"] for value, p in detail["partitions"].items()} == {"CA": 1, "TX": 2, "UNKNOWN": 1}
+        assert self.read_rows(os.path.join(export_dir, "detail", "*", "*.parquet")) == self.table_rows(db_path, "detail")
+        # Tables with the column keep it in the files, NULLs included
+        assert self.read_rows(os.path.join(export_dir, "geocode", "*", "*.parquet")) == self.table_rows(db_path, "geocode")
+        assert manifest["tables"]["product_item"]["partition_column"] is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
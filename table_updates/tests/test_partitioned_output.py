@@ -0,0 +1,116 @@
+"""
+Test the output split into one file per state (or other column) with its manifest
+"""
+
+import pytest
+import os
+import json
+import tempfile
+import shutil
+import sys
+import duckdb
+import pandas as pd
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src import config
+from src.main import write_partitioned_output
+
+
+class TestPartitionedOutput:
+    """Test class for --partition-by"""
+
+    @pytest.fixture
+    def temp_dir(self):
+        """Create a temporary directory for testing"""
+        temp_dir = tempfile.mkdtemp()
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    @pytest.fixture
+    def conn(self, temp_dir):
+        """A geocode table with California and Texas geocodes"""
+        conn = duckdb.connect(os.path.join(temp_dir, "tax_rates.duckdb"))
+        conn.execute("""
+            CREATE TABLE geocode AS SELECT * FROM (VALUES
+                ('CA', 'US0602900000'), ('CA', 'US0603700000'), ('TX', 'US4811300000')
+            ) t(state, geocode)
+        """)
+        yield conn
+        conn.close()
+
+    def detail_output(self):
+        """Detail output rows: two states, a prefix not in the geocode table and missing geocodes"""
+        return pd.DataFrame({
+            "status": ["Success"] * 6,
+            "geocode": ["US0602900000", "US4811300000", "US0603700000", "US9900000000", None, ""],
+            "tax_rate": [0.01, 0.02, 0.03, 0.04, 0.05, 0.06],
+        })
+
+    def read_manifest(self, path):
+        with open(path) as f:
+            return json.load(f)
+
+    def test_state_from_geocode(self, conn, temp_dir):
+        """Test the files and row counts of a detail output partitioned by state"""
+        schema = ["status", "geocode", "tax_rate"]
+
+        path = write_partitioned_output(conn, self.detail_output(), schema, temp_dir, "rate_update", "state")
+
+        assert path == os.path.join(temp_dir, "rate_update_output_by_state", "manifest.json")
+        manifest = self.read_manifest(path)
+        assert (manifest["job_type"], manifest["partition_by"], manifest["total_rows"]) == \
+            ("rate_update", "state", 6)
+        assert manifest["partitions"] == [
+            {"value": "CA", "file": "rate_update_output_CA.csv", "rows": 2},
+            {"value": "TX", "file": "rate_update_output_TX.csv", "rows": 1},
+            {"value": "UNKNOWN", "file": "rate_update_output_UNKNOWN.csv", "rows": 2},
+            {"value": "US99", "file": "rate_update_output_US99.csv", "rows": 1},
+        ]
+        assert sum(p["rows"] for p in manifest["partitions"]) == manifest["total_rows"]
+        california = pd.read_csv(os.path.join(os.path.dirname(path), "rate_update_output_CA.csv"), dtype=str)
+        assert list(california.columns) == schema
+        assert california["geocode"].tolist() == ["US0602900000", "US0603700000"]
+
+    def test_column_values(self, conn, temp_dir):
+        """Test partitioning by an output column: blank values, file name clashes and a missing column"""
+        output_df = pd.DataFrame({
+            "status": ["Success"] * 5,
+            "state": ["CA", " ", None, "A B", "A_B"],
+            "geocode": ["US1", "US2", "US3", "US4", "US5"],
+        })
+
+        manifest = self.read_manifest(
+            write_partitioned_output(conn, output_df, ["status", "geocode"], temp_dir, "jurisdiction_update", "state")
+        )
+
+        assert [(p["value"], p["file"], p["rows"]) for p in manifest["partitions"]] == [
+            ("A B", "jurisdiction_update_output_A_B.csv", 1),
+            ("A_B", "jurisdiction_update_output_A_B_2.csv", 1),
+            ("CA", "jurisdiction_update_output_CA.csv", 1),
+            ("UNKNOWN", "jurisdiction_update_output_UNKNOWN.csv", 2),
+        ]
+        assert write_partitioned_output(conn, output_df, ["status"], temp_dir, "jurisdiction_update",
+                                        "county") is None
+
+    def test_parallel_matches_serial(self, conn, temp_dir, monkeypatch):
+        """Test that partition files written by a process pool are identical to the serial ones"""
+        schema = ["status", "geocode", "tax_rate"]
+        monkeypatch.setattr(config, "OUTPUT_PARTITION_PARALLEL_MIN_ROWS", 0)
+        manifests = {}
+        for workers in (1, 2):
+            monkeypatch.setattr(config, "OUTPUT_PARTITION_WORKERS", workers)
+            output_dir = os.path.join(temp_dir, f"workers_{workers}")
+            manifests[workers] = write_partitioned_output(conn, self.detail_output(), schema, output_dir,
+                                                          "rate_update", "state")
+
+        assert self.read_manifest(manifests[1]) == self.read_manifest(manifests[2])
+        for partition in self.read_manifest(manifests[1])["partitions"]:
+            with open(os.path.join(os.path.dirname(manifests[1]), partition["file"]), 'rb') as f, \
+                    open(os.path.join(os.path.dirname(manifests[2]), partition["file"]), 'rb') as g:
+                assert f.read() == g.read(), partition["file"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
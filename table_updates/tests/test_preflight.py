@@ -0,0 +1,153 @@
+"""
+Test preflight validation of table update job folders
+"""
+
+import pytest
+import os
+import json
+import tempfile
+import shutil
+import sys
+import duckdb
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from table_updates.table_updater import TableUpdater
+
+
+class TestPreflight:
+    """Test class for preflight validation"""
+
+    @pytest.fixture
+    def temp_dir(self):
+        """Create a temporary directory for testing"""
+        temp_dir = tempfile.mkdtemp()
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    @pytest.fixture
+    def source_db(self, temp_dir):
+        """Create a source database with typed columns"""
+        db_path = os.path.join(temp_dir, "source.duckdb")
+        conn = duckdb.connect(db_path)
+        conn.execute('CREATE TABLE product_item ("group" VARCHAR, item VARCHAR, description VARCHAR)')
+        conn.execute('''CREATE TABLE matrix (geocode VARCHAR, "group" VARCHAR, item VARCHAR,
+            rate_value DOUBLE, tier INTEGER, effective DATE)''')
+        conn.close()
+        return db_path
+
+    @pytest.fixture
+    def job_folder(self, temp_dir):
+        """Create an empty job folder"""
+        folder = os.path.join(temp_dir, "250801_update")
+        os.mkdir(folder)
+        return folder
+
+    @pytest.fixture
+    def updater(self):
+        """Create TableUpdater instance with sample filtering criteria"""
+        updater = TableUpdater()
+        updater.filtering_criteria = {
+            "product_item": {"filter_fields": ["group", "item"]},
+            "matrix": {"filter_fields": ["geocode", "group", "item"]}
+        }
+        return updater
+
+    def write_csv(self, folder, filename, content):
+        with open(os.path.join(folder, filename), 'w') as f:
+            f.write(content)
+
+    def issues(self, report, filename, level):
+        file_report = next(f for f in report["files"] if f["file"] == filename)
+        return file_report[level]
+
+    def test_valid_folder_passes(self, updater, source_db, job_folder):
+        """Test that clean files pass without errors or warnings"""
+        self.write_csv(job_folder, "product_item_update_1.csv", "group,item,description\n7777,001,A\n7777,002,B\n")
+        self.write_csv(job_folder, "matrix_append_1.csv", "geocode,group,item,rate_value,tier,effective\nUS1,1,001,0.5,1,7/1/2025\n")
+
+        report = updater.preflight_job_folder(job_folder, source_db)
+
+        assert report["passed"] is True
+        assert report["total_errors"] == 0
+        assert report["total_warnings"] == 0
+        assert [f["rows"] for f in report["files"]] == [1, 2]
+
+    def test_schema_mismatch(self, updater, source_db, job_folder):
+        """Test that unknown CSV columns are reported"""
+        self.write_csv(job_folder, "product_item_update_1.csv", "group,item,bogus\n7777,001,A\n")
+
+        report = updater.preflight_job_folder(job_folder, source_db)
+
+        errors = self.issues(report, "product_item_update_1.csv", "errors")
+        assert report["passed"] is False
+        assert errors[0]["check"] == "schema"
+        assert errors[0]["columns"] == ["bogus"]
+
+    def test_uncastable_values(self, updater, source_db, job_folder):
+        """Test that every value is checked against its column type"""
+        self.write_csv(job_folder, "matrix_append_1.csv", """geocode,group,item,rate_value,tier,effective
+US1,1,001,abc,1,7/1/2025
+US2,1,001,0.5,1.5x,7/1/2025
+US3,1,001,0.5,2,13/45/2025
+""")
+
+        report = updater.preflight_job_folder(job_folder, source_db)
+
+        errors = self.issues(report, "matrix_append_1.csv", "errors")
+        assert [(e["row"], e["column"]) for e in errors] == [(1, "rate_value"), (2, "tier"), (3, "effective")]
+
+    def test_empty_filter_fields(self, updater, source_db, job_folder):
+        """Test that partially empty keys warn and fully empty keys fail"""
+        self.write_csv(job_folder, "product_item_update_1.csv", "group,item,description\n7777,,A\n,,B\n")
+
+        report = updater.preflight_job_folder(job_folder, source_db)
+
+        warnings = self.issues(report, "product_item_update_1.csv", "warnings")
+        errors = self.issues(report, "product_item_update_1.csv", "errors")
+        assert warnings[0]["row"] == 1
+        assert warnings[0]["columns"] == ["item"]
+        assert errors[0]["row"] == 2
+        assert errors[0]["check"] == "empty_filter"
+
+    def test_duplicate_filter_keys(self, updater, source_db, job_folder):
+        """Test that repeated filter-key tuples within a file are reported"""
+        self.write_csv(job_folder, "product_item_update_1.csv", "group,item,description\n7777,001,A\n7777,002,B\n7777,001,C\n")
+
+        report = updater.preflight_job_folder(job_folder, source_db)
+
+        warnings = self.issues(report, "product_item_update_1.csv", "warnings")
+        assert report["passed"] is True
+        assert warnings[0]["check"] == "duplicate_key"
+        assert warnings[0]["rows"] == [1, 3]
+        assert warnings[0]["filter_values"] == {"group": "7777", "item": "001"}
+
+    def test_invalid_filename_and_missing_criteria(self, updater, source_db, job_folder):
+        """Test that file-level problems are part of the consolidated report"""
+        self.write_csv(job_folder, "invalid.csv", "a,b\n1,2\n")
+        self.write_csv(job_folder, "unknown_table_update_1.csv", "a,b\n1,2\n")
+
+        report = updater.preflight_job_folder(job_folder, source_db)
+
+        assert self.issues(report, "invalid.csv", "errors")[0]["check"] == "filename"
+        assert self.issues(report, "unknown_table_update_1.csv", "errors")[0]["check"] == "filter_criteria"
+        assert report["total_errors"] == 2
+
+    def test_consolidated_report_file(self, updater, source_db, job_folder):
+        """Test that one report is written for the whole folder"""
+        self.write_csv(job_folder, "product_item_update_1.csv", "group,item,description\n7777,001,A\n")
+        self.write_csv(job_folder, "product_item_update_2.csv", "group,item,bogus\n7777,001,A\n")
+
+        updater.preflight_job_folder(job_folder, source_db, max_workers=2)
+
+        with open(os.path.join(job_folder, "preflight_report.json"), 'r') as f:
+            report = json.load(f)
+
+        assert [f["file"] for f in report["files"]] == ["product_item_update_1.csv", "product_item_update_2.csv"]
+        assert report["passed"] is False
+        assert not os.path.exists(os.path.join(job_folder, "errors.json"))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,93 @@
+"""
+Test the job profiler output
+"""
+
+import pytest
+import os
+import tempfile
+import shutil
+import sys
+import time
+import duckdb
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from table_updates.table_updater import TableUpdater
+from src import config
+from src.profiler import JobProfiler, start_profiler
+
+
+def busy_wait(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class TestProfiler:
+    """Test class for the --profile output"""
+
+    @pytest.fixture
+    def temp_dir(self, monkeypatch):
+        """Create a temporary directory for testing"""
+        temp_dir = tempfile.mkdtemp()
+        monkeypatch.setattr(config, "METRICS_DB_PATH", os.path.join(temp_dir, "run_history.sqlite"))
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    def read_collapsed(self, path):
+        """Return (frames, weight) for each line of a collapsed-stack file"""
+        with open(path, 'r', encoding='utf-8') as f:
+            return [(stack.split(";"), int(weight)) for stack, weight in
+                    (line.rstrip("\n").rsplit(" ", 1) for line in f)]
+
+    def test_deterministic_profile_of_table_update(self, temp_dir):
+        """Test that a profiled table update run writes its stacks, hotspots and pstats file"""
+        db_path = os.path.join(temp_dir, "tax_rates.duckdb")
+        conn = duckdb.connect(db_path)
+        conn.execute('CREATE TABLE product_item ("group" VARCHAR, item VARCHAR, description VARCHAR)')
+        conn.close()
+        job_folder = os.path.join(temp_dir, "250801_update")
+        os.makedirs(job_folder)
+        with open(os.path.join(job_folder, "product_item_append_1.csv"), 'w') as f:
+            f.write("group,item,description\n7777,000,New\n")
+
+        profiler = start_profiler("deterministic")
+        TableUpdater().run_job_folder(job_folder, db_path)
+        paths = profiler.finish(job_folder)
+
+        assert paths == {
+            "collapsed": os.path.join(job_folder, "profile.collapsed"),
+            "hotspots": os.path.join(job_folder, "profile_hotspots.txt"),
+            "pstats": os.path.join(job_folder, "profile.prof")
+        }
+        stacks = self.read_collapsed(paths["collapsed"])
+        assert all(weight > 0 for frames, weight in stacks)
+        assert any(frames[0].startswith("run_job_folder (table_updater.py:") and
+                   any(frame.startswith("process_append_job ") for frame in frames)
+                   for frames, weight in stacks)
+        with open(paths["hotspots"], 'r') as f:
+            assert "run_job_folder (table_updater.py:" in f.read()
+
+    def test_sampling_profile(self, temp_dir):
+        """Test that the sampled stacks attribute the time to the busy function"""
+        profiler = JobProfiler("sampling", interval=0.001)
+        profiler.start()
+        busy_wait(0.2)
+        paths = profiler.finish(temp_dir, "sampled")
+
+        stacks = self.read_collapsed(paths["collapsed"])
+        busy_samples = sum(weight for frames, weight in stacks if frames[-1].startswith("busy_wait "))
+        assert busy_samples >= sum(weight for frames, weight in stacks) / 2
+        assert profiler.hotspots()[0]["function"].startswith("busy_wait (test_profiler.py:")
+        assert "pstats" not in paths
+
+    def test_unknown_mode(self):
+        """Test that no profiler is started without a mode, and unknown modes are rejected"""
+        assert start_profiler(None) is None
+        with pytest.raises(ValueError):
+            JobProfiler("tracing")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
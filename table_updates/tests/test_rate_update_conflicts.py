@@ -0,0 +1,85 @@
+"""
+Test the detection of rate update job rows that update the same tax
+"""
+
+import pytest
+import os
+import sys
+import pandas as pd
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src import config, logger
+from src.main import resolve_conflicting_rows
+
+
+class TestRateUpdateConflicts:
+    """Test class for conflicting rate update rows"""
+
+    @pytest.fixture
+    def job_df(self):
+        """A county row, a city row it covers and a duplicate of the county row"""
+        logger.clear_logs()
+        yield pd.DataFrame({
+            "geocode": [None, None, None],
+            "state": ["CA", "CA", "CA"],
+            "county": ["LOS ANGELES", "LOS ANGELES", "LOS ANGELES"],
+            "city": [None, "SANTA MONICA", None]
+        })
+        logger.clear_logs()
+
+    def output_rows(self, rows):
+        """Output rows of (job row, geocode); the other tax fields are equal"""
+        return pd.DataFrame({
+            "_job_row": [job_row for job_row, geocode in rows],
+            "geocode": [geocode for job_row, geocode in rows],
+            "tax_type": "04", "tax_cat": "01", "tax_auth_id": 1, "description": None, "tier": float("nan")
+        })
+
+    def test_report_keeps_all_rows(self, job_df):
+        """Test that the default rule keeps every output row and reports each job row involved"""
+        output_df = self.output_rows([(1, "US1"), (1, "US2"), (2, "US2"), (3, "US1"), (3, "US3")])
+        result = resolve_conflicting_rows(output_df, job_df, config.RATE_UPDATE_CONFLICTS)
+
+        assert config.RATE_UPDATE_CONFLICTS == "report"
+        assert result is output_df
+        warnings = [log["context"] for log in logger.get_logs() if log["level"] == "WARNING"]
+        assert [(w["row_number"], w["conflicts_with"], w["conflicting_rows"]) for w in warnings] == \
+            [(1, [2, 3], 2), (2, [1], 1), (3, [1], 1)]
+        assert "Kept" in logger.get_logs()[0]["message"]
+
+    def test_first_wins(self, job_df):
+        """Test that the first job row keeps the shared taxes and the others are logged with their conflicts"""
+        output_df = self.output_rows([(1, "US1"), (1, "US2"), (2, "US2"), (3, "US1"), (3, "US2")])
+        result = resolve_conflicting_rows(output_df, job_df, "first")
+
+        assert list(zip(result["_job_row"], result["geocode"])) == [(1, "US1"), (1, "US2")]
+        warnings = [log["context"] for log in logger.get_logs() if log["level"] == "WARNING"]
+        assert [(w["row_number"], w["conflicts_with"], w["dropped_rows"]) for w in warnings] == \
+            [(2, [1, 3], 1), (3, [1, 2], 2)]
+
+    def test_most_specific_wins(self, job_df):
+        """Test that the city row wins over the county rows covering it"""
+        output_df = self.output_rows([(1, "US1"), (1, "US2"), (2, "US2"), (3, "US1"), (3, "US2")])
+        result = resolve_conflicting_rows(output_df, job_df, "specific")
+
+        assert list(zip(result["_job_row"], result["geocode"])) == [(1, "US1"), (2, "US2")]
+
+    def test_error_drops_all_conflicting_rows(self, job_df):
+        """Test that rule 'error' drops the shared taxes of every job row involved"""
+        output_df = self.output_rows([(1, "US1"), (1, "US2"), (2, "US2"), (2, "US3")])
+        result = resolve_conflicting_rows(output_df, job_df, "error")
+
+        assert list(zip(result["_job_row"], result["geocode"])) == [(1, "US1"), (2, "US3")]
+        assert sorted(log["context"]["row_number"] for log in logger.get_logs() if log["level"] == "ERROR") == [1, 2]
+
+    def test_versions_of_one_row_are_not_conflicts(self, job_df):
+        """Test that several versions of a tax updated by the same job row are kept"""
+        output_df = self.output_rows([(1, "US1"), (1, "US1")])
+        assert len(resolve_conflicting_rows(output_df, job_df, "error")) == 2
+        assert logger.get_logs() == []
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,162 @@
+"""
+Test the persistent cache of per-row job results
+"""
+
+import pytest
+import os
+import itertools
+import tempfile
+import shutil
+import sys
+import datetime
+import duckdb
+import pandas as pd
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src import config, logger, row_cache
+from src.main import process_new_tax_job, process_rate_update_job
+from src.row_cache import RowCache
+
+
+class TestRowCache:
+    """Test class for the row result cache"""
+
+    @pytest.fixture
+    def temp_dir(self, monkeypatch):
+        """Create a temporary directory with a database file and a code file of its own"""
+        temp_dir = tempfile.mkdtemp()
+        for filename in ("tax_rates.duckdb", "main.py"):
+            with open(os.path.join(temp_dir, filename), 'w') as f:
+                f.write("v1")
+        monkeypatch.setattr(row_cache, "_CODE_FILES", [os.path.join(temp_dir, "main.py")])
+        # One second per call, so entries are used in a well-defined order
+        clock = itertools.count(1000)
+        monkeypatch.setattr(row_cache.time, "time", lambda: float(next(clock)))
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    def open_cache(self, temp_dir, max_bytes=1024 * 1024):
+        return RowCache(os.path.join(temp_dir, "cache", "row_cache.sqlite"),
+                        os.path.join(temp_dir, "tax_rates.duckdb"), max_bytes)
+
+    def job_row(self, **values):
+        return pd.Series({"state": "CA", "county": "KERN", "new_rate": 1.5, **values})
+
+    def test_hit_and_miss(self, temp_dir):
+        """Test that the same job row hits and a changed one, or another scope, misses"""
+        cache = self.open_cache(temp_dir)
+        scope = {"job_type": "rate_update", "effective_date": "2025-07-01"}
+        key = cache.make_key(scope, self.job_row())
+        assert cache.get(key, 1) is None
+        cache.put(key, [{"geocode": "US1", "status": "Success"}], [])
+
+        # Whitespace and missing values are normalized
+        assert cache.make_key(scope, self.job_row(county=" KERN ")) == key
+        assert cache.get(key, 1) == ([{"geocode": "US1", "status": "Success"}], [])
+        assert cache.make_key(scope, self.job_row(new_rate=2.0)) != key
+        assert cache.make_key({**scope, "effective_date": "2025-08-01"}, self.job_row()) != key
+        assert (cache.hits, cache.misses) == (1, 1)
+        cache.close()
+
+        # Entries persist across runs
+        cache = self.open_cache(temp_dir)
+        assert cache.get(key, 1) is not None
+        cache.close()
+
+    def test_invalidated_by_database_and_code_changes(self, temp_dir):
+        """Test that a write to the database file or an edit of a code file changes every key"""
+        cache = self.open_cache(temp_dir)
+        key = cache.make_key({}, self.job_row())
+        cache.close()
+
+        db_path = os.path.join(temp_dir, "tax_rates.duckdb")
+        with open(db_path, 'w') as f:
+            f.write("v2")
+        os.utime(db_path, (2000000000, 2000000000))
+        cache = self.open_cache(temp_dir)
+        db_changed_key = cache.make_key({}, self.job_row())
+        cache.close()
+        assert db_changed_key != key
+
+        with open(os.path.join(temp_dir, "main.py"), 'w') as f:
+            f.write("v2")
+        cache = self.open_cache(temp_dir)
+        assert cache.make_key({}, self.job_row()) not in (key, db_changed_key)
+        cache.close()
+
+    def test_least_recently_used_evicted(self, temp_dir):
+        """Test that eviction removes the least recently used entries beyond the size limit"""
+        cache = self.open_cache(temp_dir)
+        rows = [{"description": "x" * 1000}]
+        for key in ("a", "b", "c"):
+            cache.put(key, rows, [])
+        cache.get("a", 1)  # Now b is the least recently used
+        size = cache.conn.execute("SELECT MAX(size) FROM row_cache").fetchone()[0]
+
+        cache.max_bytes = 2 * size
+        assert cache.evict() == 1
+        assert cache.get("b", 1) is None
+        assert cache.get("a", 1) is not None and cache.get("c", 1) is not None
+
+        cache.max_bytes = 0
+        cache.close()
+        cache = self.open_cache(temp_dir)
+        assert cache.conn.execute("SELECT COUNT(*) FROM row_cache").fetchone()[0] == 0
+        cache.close()
+
+    def test_logs_renumbered(self, temp_dir):
+        """Test that cached log entries are replayed with the row's position in the rerun file"""
+        cache = self.open_cache(temp_dir)
+        logs = [
+            {"level": "WARNING", "message": "Row 3: Rate mismatch for geocode US1. Row 3 again",
+             "context": {"row_number": 3, "geocode": "US1"}},
+            {"level": "ERROR", "message": "Error querying geocodes from database", "context": {}},
+        ]
+        cache.put("key", [], logs)
+
+        _, replayed = cache.get("key", 7)
+        assert replayed[0]["message"] == "Row 7: Rate mismatch for geocode US1. Row 3 again"
+        assert replayed[0]["context"] == {"row_number": 7, "geocode": "US1"}
+        assert replayed[1] == logs[1]
+        assert logs[0]["context"]["row_number"] == 3
+        cache.close()
+
+    def test_settings_in_scope(self, temp_dir, monkeypatch):
+        """Test that rerunning a job with a setting changed at runtime misses the cache"""
+        db_path = os.path.join(temp_dir, "jobs.duckdb")
+        conn = duckdb.connect(db_path)
+        conn.execute("CREATE TABLE geocode AS SELECT 'CA' AS state, 'KERN' AS county, 'US1' AS geocode")
+        conn.execute("""
+            CREATE TABLE detail AS SELECT 'US1' AS geocode, '04' AS tax_type, '01' AS tax_cat, '200' AS tax_auth_id,
+                DATE '2025-01-01' AS effective, 'COUNTY SALES TAX' AS description, 0.04 AS tax_rate, 0.0 AS fee
+        """)
+        cache = RowCache(os.path.join(temp_dir, "cache", "row_cache.sqlite"), db_path, 1024 * 1024)
+        rate_job = pd.DataFrame({"state": ["CA"], "county": ["KERN"], "tax_type": ["04"], "tax_cat": ["01"],
+                                 "new_rate": [5], "old_fee": [0], "new_fee": [0]})
+        new_tax_job = pd.DataFrame({"state": ["CA"], "county": ["KERN"], "tax_type": ["04"], "tax_rate": [1],
+                                    "tax_auth_id": ["300"], "description": ["CITY SALES TAX"]})
+        effective_date = datetime.datetime(2025, 7, 1)
+        logger.clear_logs()
+
+        for run_job in (lambda: process_rate_update_job(conn, rate_job, effective_date, cache),
+                        lambda: process_new_tax_job(conn, new_tax_job, effective_date, cache)):
+            monkeypatch.setattr(config, "JURISDICTION_MATCHING", True)
+            run_job()
+            run_job()
+            hits = cache.hits
+            monkeypatch.setattr(config, "JURISDICTION_MATCHING", False)
+            run_job()
+            assert cache.hits == hits
+
+        monkeypatch.setitem(config.NEW_TAX_DEFAULTS, "pass_flag", "02")
+        process_new_tax_job(conn, new_tax_job, effective_date, cache)
+        assert (cache.hits, cache.misses) == (2, 5)
+        cache.close()
+        conn.close()
+        logger.clear_logs()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
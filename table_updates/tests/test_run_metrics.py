@@ -0,0 +1,108 @@
+"""
+Test the run history recorded for table update runs
+"""
+
+import pytest
+import os
+import tempfile
+import shutil
+import sys
+import duckdb
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from table_updates.table_updater import TableUpdater
+from src import config
+from src.metrics import RunMetrics, load_runs, summarize_trend
+
+
+class TestRunMetrics:
+    """Test class for the run history"""
+
+    @pytest.fixture
+    def temp_dir(self):
+        """Create a temporary directory for testing"""
+        temp_dir = tempfile.mkdtemp()
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    @pytest.fixture
+    def metrics_path(self, temp_dir, monkeypatch):
+        metrics_path = os.path.join(temp_dir, "output", "run_history.sqlite")
+        monkeypatch.setattr(config, "METRICS_DB_PATH", metrics_path)
+        return metrics_path
+
+    @pytest.fixture
+    def source_db(self, temp_dir):
+        """Create a source database with a product_item table"""
+        db_path = os.path.join(temp_dir, "tax_rates.duckdb")
+        conn = duckdb.connect(db_path)
+        conn.execute('CREATE TABLE product_item ("group" VARCHAR, item VARCHAR, description VARCHAR)')
+        conn.execute("INSERT INTO product_item VALUES ('7777', '000', 'Old')")
+        conn.close()
+        return db_path
+
+    @pytest.fixture
+    def job_folder(self, temp_dir):
+        """Create a job folder with one update file"""
+        job_folder = os.path.join(temp_dir, "250801_update")
+        os.makedirs(job_folder)
+        with open(os.path.join(job_folder, "product_item_update_1.csv"), 'w') as f:
+            f.write("group,item,description\n7777,000,Updated\n7777,001,New\n")
+        return job_folder
+
+    @pytest.fixture
+    def updater(self):
+        updater = TableUpdater()
+        updater.filtering_criteria = {"product_item": {"filter_fields": ["group", "item"]}}
+        return updater
+
+    def test_table_update_run_recorded(self, updater, source_db, job_folder, metrics_path):
+        """Test that a table update run records its counts and stage timings"""
+        updater.run_job_folder(job_folder, source_db)
+
+        runs = load_runs()
+        assert len(runs) == 1
+        run = runs[0]
+        assert run["job_type"] == "table_update"
+        assert run["status"] == "completed"
+        assert run["job_input"] == job_folder
+        assert run["database"] == source_db
+        assert (run["input_rows"], run["output_rows"], run["errors"]) == (2, 2, 0)
+        assert list(run["stages"]) == ["preflight", "copy", "indexes", "process"]
+        assert run["wall_seconds"] > 0
+
+    def test_dry_run_and_failed_run_status(self, updater, source_db, job_folder, metrics_path):
+        """Test that dry runs and failed runs are recorded with their own status"""
+        updater.run_job_folder(job_folder, source_db, dry_run=True)
+        with pytest.raises(FileNotFoundError):
+            updater.run_job_folder(job_folder, os.path.join(job_folder, "missing.duckdb"), skip_preflight=True)
+
+        assert [run["status"] for run in load_runs()] == ["failed", "dry_run"]
+
+    def test_trend_groups_completed_runs(self, metrics_path):
+        """Test that the trend reports the median throughput of completed runs per period"""
+        for status, input_rows in (("completed", 100), ("completed", 300), ("failed", 5)):
+            metrics = RunMetrics("rate_update")
+            with metrics.stage("process"):
+                pass
+            metrics.finish(status, input_rows=input_rows, output_rows=input_rows)
+
+        trend = summarize_trend(load_runs("rate_update"))
+
+        assert len(trend) == 1
+        assert trend[0]["runs"] == 2
+        assert trend[0]["input_rows"] == 200
+        assert list(trend[0]["stages"]) == ["process"]
+
+    def test_metrics_disabled(self, metrics_path, monkeypatch):
+        """Test that nothing is written when the run history is turned off"""
+        monkeypatch.setattr(config, "METRICS_ENABLED", False)
+
+        assert RunMetrics("new_tax").finish("completed") is None
+        assert not os.path.exists(metrics_path)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,157 @@
+"""
+Test running one job against several database snapshots
+"""
+
+import pytest
+import os
+import datetime
+import tempfile
+import shutil
+import sys
+import json
+import duckdb
+import pandas as pd
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src import config, main
+from src.snapshot_fanout import compare_outputs, parse_args, run_fanout, run_snapshot_job, snapshot_labels
+
+
+class TestSnapshotFanout:
+    """Test class for the snapshot fan-out"""
+
+    @pytest.fixture
+    def temp_dir(self, monkeypatch):
+        """Create a temporary directory for testing, holding the job, output and snapshot folders"""
+        temp_dir = tempfile.mkdtemp()
+        for folder in ("job", "output"):
+            os.makedirs(os.path.join(temp_dir, folder))
+        monkeypatch.setattr(config, "JOB_FOLDER", os.path.join(temp_dir, "job"))
+        monkeypatch.setattr(config, "OUTPUT_FOLDER", os.path.join(temp_dir, "output"))
+        monkeypatch.setattr(config, "ROW_CACHE_PATH", os.path.join(temp_dir, "output", "row_cache.sqlite"))
+        monkeypatch.setattr(config, "METRICS_DB_PATH", os.path.join(temp_dir, "output", "run_history.sqlite"))
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    def create_snapshot(self, temp_dir, label, kern_cities):
+        """A snapshot database in its own folder, with the given cities in KERN county"""
+        os.makedirs(os.path.join(temp_dir, label))
+        db_path = os.path.join(temp_dir, label, "tax_rates.duckdb")
+        conn = duckdb.connect(db_path)
+        conn.execute("""
+            CREATE TABLE geocode (status VARCHAR, country VARCHAR, state VARCHAR, county VARCHAR, city VARCHAR,
+                                  tax_district VARCHAR, geocode VARCHAR, gnis VARCHAR)
+        """)
+        for i, city in enumerate(kern_cities):
+            conn.execute("INSERT INTO geocode VALUES (NULL, 'US', 'CA', 'KERN', ?, NULL, ?, ?)",
+                         [city, f"US06029{i:05d}", str(i)])
+        conn.execute("""
+            CREATE TABLE tax_authority AS
+            SELECT '200' AS tax_auth_id, 'US' AS country, 'CA' AS state, 'KERN, COUNTY OF' AS authority_name,
+                   '2' AS tax_auth_type
+        """)
+        conn.execute("""
+            CREATE TABLE detail AS
+            SELECT geocode, '04' AS tax_type, '01' AS tax_cat, '200' AS tax_auth_id, TIMESTAMP '2024-01-01' AS effective,
+                   'COUNTY SALES TAX' AS description, CAST(0 AS INTEGER) AS tier,
+                   CAST(0.01 AS DECIMAL(13,12)) AS tax_rate, CAST(0 AS DECIMAL(11,8)) AS fee
+            FROM geocode
+        """)
+        conn.close()
+        return db_path
+
+    def test_jurisdiction_update_fanout(self, temp_dir):
+        """Test that a jurisdiction update runs against each snapshot with its effective date"""
+        db_paths = [self.create_snapshot(temp_dir, "20250601", ["TEHACHAPI"]),
+                    self.create_snapshot(temp_dir, "20250701", ["TEHACHAPI", "CALIFORNIA CITY"])]
+        job_file = os.path.join(temp_dir, "job", "jurisdiction_update_251001.csv")
+        with open(job_file, 'w') as f:
+            f.write("state,county,city,tax_district,new_name,new_county,new_city\nCA,KERN,,,KERNVILLE,,\n")
+
+        with pytest.raises(ValueError, match="effective date is required"):
+            run_fanout("jurisdiction_update", db_paths, job_file)
+
+        summary = run_fanout("jurisdiction_update", db_paths, job_file,
+                             effective_date=datetime.datetime(2025, 10, 1), max_workers=1)
+
+        assert [result["status"] for result in summary["snapshots"]] == ["completed", "completed"]
+        assert summary["effective_date"] == "2025-10-01"
+        comparison = pd.read_csv(summary["comparison_file"], dtype=str, keep_default_na=False)
+        assert comparison["geocode"].tolist() == ["US0602900000", "US0602900001"]
+        assert comparison["differences"].tolist() == ["", "missing in 20250601"]
+        assert (summary["rows_compared"], summary["rows_differing"]) == (2, 1)
+        with open(os.path.join(summary["output_dir"], "fanout_summary.json")) as f:
+            saved = json.load(f)
+        assert [result["label"] for result in saved["snapshots"]] == ["20250601", "20250701"]
+        assert saved["comparison_file"] == summary["comparison_file"]
+
+    def test_detail_job_options(self, temp_dir, monkeypatch):
+        """Test that the command line options reach the job run against each snapshot"""
+        db_path = self.create_snapshot(temp_dir, "20250701", ["TEHACHAPI"])
+        args = parse_args(["rate_update", "--databases", db_path, "--conflicts", "specific", "--unchanged-rows",
+                           "drop"])
+        run_options = []
+        monkeypatch.setattr(main, "execute_job", lambda conn, job_type, job_file, effective_date, options:
+                            run_options.append(options) or {"status": "completed"})
+        task = {"label": "20250701", "db_path": db_path, "job_type": "rate_update", "job_file": None,
+                "effective_date": datetime.datetime(2025, 7, 1), "output_folder": os.path.join(temp_dir, "output"),
+                "diff_report": args.diff_report, "unchanged_rows": args.unchanged_rows, "conflicts": args.conflicts,
+                "as_of": args.as_of, "partition_by": args.partition_by}
+
+        assert run_snapshot_job(task)["status"] == "completed"
+        assert (run_options[0].conflicts, run_options[0].unchanged_rows) == ("specific", "drop")
+
+        run_snapshot_job({**task, "conflicts": None})
+        assert run_options[1].conflicts == config.RATE_UPDATE_CONFLICTS
+
+    def test_snapshot_labels(self):
+        """Test labels from the folder names, then the file names, then numbered"""
+        assert snapshot_labels([os.path.join("db", "20250601", "tax_rates.duckdb"),
+                                os.path.join("db", "20250701", "tax_rates.duckdb")]) == ["20250601", "20250701"]
+        assert snapshot_labels([os.path.join("db", "june.duckdb"), os.path.join("db", "july.duckdb")]) == \
+            ["june", "july"]
+        assert snapshot_labels([os.path.join("a", "tax_rates.duckdb"), os.path.join("b", "tax_rates.duckdb"),
+                                os.path.join("a", "tax_rates.duckdb")]) == \
+            ["tax_rates_1", "tax_rates_2", "tax_rates_3"]
+
+    def test_compare_outputs(self, temp_dir):
+        """Test that rows are lined up by key and occurrence, with missing rows and differing columns"""
+        columns = ["status", "geocode", "tax_type", "tax_cat", "tax_auth_id", "description", "tier", "effective",
+                   "tax_rate", "fee"]
+        outputs = {
+            "june": [["Success", "US1", "04", "01", "100", "CITY TAX", "0", "2025-07-01", "0.01", "0"],
+                     ["Success", "US1", "04", "01", "100", "CITY TAX", "0", "2025-07-01", "0.02", "0"],
+                     ["Success", "US2", "04", "01", "100", "CITY TAX", "0", "2025-07-01", "0.01", ""]],
+            "july": [["Success", "US1", "04", "01", "100", "CITY TAX", "0", "2025-07-01", "0.01", "0"],
+                     ["Warning: rate mismatch", "US1", "04", "01", "100", "CITY TAX", "0", "2025-07-01", "0.03", "0"],
+                     ["Success", "US3", "04", "01", "100", "CITY TAX", "0", "2025-07-01", "0.01", "0"]],
+            "august": [["Success", "US2", "04", "01", "100", "CITY TAX", "0", "2025-07-01", "0.01", "0.25"]],
+        }
+        results = []
+        for label, rows in outputs.items():
+            output_file = os.path.join(temp_dir, "output", f"{label}.csv")
+            pd.DataFrame(rows, columns=columns).to_csv(output_file, index=False)
+            results.append({"label": label, "summary": {"output_file": output_file}})
+        results.append({"label": "september", "status": "failed", "summary": None})
+
+        comparison = compare_outputs(results, "rate_update")
+
+        assert list(comparison.columns) == ["geocode", "tax_type", "tax_cat", "tax_auth_id", "description", "tier",
+                                            "occurrence", "june_status", "july_status", "august_status",
+                                            "differences"]
+        assert comparison[["geocode", "occurrence"]].values.tolist() == [["US1", 1], ["US1", 2], ["US2", 1],
+                                                                          ["US3", 1]]
+        assert comparison["differences"].tolist() == [
+            "missing in august",
+            "missing in august; status; tax_rate",
+            "missing in july; fee",
+            "missing in june; missing in august",
+        ]
+        assert comparison["july_status"].isna().tolist() == [False, False, True, False]
+        assert compare_outputs(results[3:], "rate_update") is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
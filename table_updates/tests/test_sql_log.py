@@ -0,0 +1,87 @@
+"""
+Test the SQL statement log of table update runs
+"""
+
+import pytest
+import os
+import json
+import tempfile
+import shutil
+import sys
+import duckdb
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from table_updates.table_updater import TableUpdater
+from src import config
+from src.sql_log import LoggedConnection, StatementLog, normalize_statement
+
+
+class TestSqlLog:
+    """Test class for the SQL statement log"""
+
+    @pytest.fixture
+    def temp_dir(self, monkeypatch):
+        """Create a temporary directory for testing"""
+        temp_dir = tempfile.mkdtemp()
+        monkeypatch.setattr(config, "METRICS_DB_PATH", os.path.join(temp_dir, "run_history.sqlite"))
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    def test_normalize_statement(self):
+        """Test that literals and IN lists are normalized away, identifiers are kept"""
+        assert normalize_statement("""SELECT * FROM detail_2
+            WHERE geocode IN (?, ?, ?) AND tax_rate > 0.05 AND "group" = 'it''s';""") == \
+            'SELECT * FROM detail_2 WHERE geocode IN (?...) AND tax_rate > ? AND "group" = ?'
+        assert normalize_statement("SELECT 1 WHERE a IN (?)") == normalize_statement("SELECT 2 WHERE a IN (?, ?)")
+
+    def test_logged_connection(self):
+        """Test the count, rows and plan recorded for each statement shape"""
+        log = StatementLog()
+        conn = LoggedConnection(duckdb.connect(), log)
+        conn.execute("CREATE TABLE geocode AS SELECT 'US' || i AS geocode, i AS n FROM range(100) r(i)")
+        for n in (1, 2, 3):
+            conn.execute("SELECT * FROM geocode WHERE n < ?", [n]).fetchall()
+        assert conn.execute("SELECT COUNT(*) FROM geocode").fetchone() == (100,)
+
+        report = log.report(conn.unwrap(), explain_top=5)
+        conn.close()
+
+        shapes = {shape["shape"]: shape for shape in report["shapes"]}
+        lookup = shapes["SELECT * FROM geocode WHERE n < ?"]
+        assert (lookup["count"], lookup["rows"]) == (3, 1 + 2 + 3)
+        assert lookup["plan"]["mode"] == "explain_analyze"
+        assert lookup["plan"]["tables"] == ["memory.main.geocode"]
+        assert lookup["plan"]["scans"] == ["Sequential Scan"] and not lookup["plan"]["uses_index"]
+        assert shapes["CREATE TABLE geocode AS SELECT ? || i AS geocode, i AS n FROM range(?) r(i)"]["plan"]["mode"] == "explain"
+        assert report["executions"] == 5
+
+    def test_table_update_sql_log(self, temp_dir):
+        """Test that a table update run writes sql_log.json with its update lookups"""
+        db_path = os.path.join(temp_dir, "tax_rates.duckdb")
+        conn = duckdb.connect(db_path)
+        conn.execute('CREATE TABLE product_item ("group" VARCHAR, item VARCHAR, description VARCHAR)')
+        conn.execute("INSERT INTO product_item VALUES ('7777', '000', 'Old'), ('7777', '001', 'Old')")
+        conn.close()
+        job_folder = os.path.join(temp_dir, "250801_update")
+        os.makedirs(job_folder)
+        with open(os.path.join(job_folder, "product_item_update_1.csv"), 'w') as f:
+            f.write("group,item,description\n7777,000,New\n7777,001,New\n7777,002,New\n")
+
+        updater = TableUpdater()
+        updater.filtering_criteria = {"product_item": {"filter_fields": ["group", "item"]}}
+        updater.sql_log = StatementLog()
+        summary = updater.run_job_folder(job_folder, db_path)
+
+        assert summary["sql_log"] == os.path.join(job_folder, "sql_log.json")
+        with open(summary["sql_log"], 'r') as f:
+            report = json.load(f)
+        shapes = {shape["shape"]: shape for shape in report["shapes"]}
+        lookup = shapes['SELECT COUNT(*) as count FROM product_item WHERE "group" = ? AND "item" = ?']
+        assert (lookup["count"], lookup["rows"]) == (3, 3)
+        assert sum("plan" in shape for shape in report["shapes"]) == min(len(shapes), config.SQL_LOG_EXPLAIN_TOP)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
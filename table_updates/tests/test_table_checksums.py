@@ -0,0 +1,103 @@
+"""
+Test the per-table checksums used to verify database copies
+"""
+
+import pytest
+import os
+import json
+import tempfile
+import shutil
+import sys
+import duckdb
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from table_updates.table_updater import TableUpdater
+from src.table_checksums import compute_checksums, get_cache_path
+
+
+class TestTableChecksums:
+    """Test class for table checksums and the tables changed report"""
+
+    @pytest.fixture
+    def temp_dir(self):
+        """Create a temporary directory for testing"""
+        temp_dir = tempfile.mkdtemp()
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    @pytest.fixture
+    def source_db(self, temp_dir):
+        """Create a source database with geocode and detail tables"""
+        db_path = os.path.join(temp_dir, "tax_rates.duckdb")
+        conn = duckdb.connect(db_path)
+        conn.execute("CREATE TABLE geocode (state VARCHAR, geocode VARCHAR)")
+        conn.execute("INSERT INTO geocode VALUES ('CA', 'US06000001'), ('TX', 'US48000001')")
+        conn.execute("CREATE TABLE detail (geocode VARCHAR, tax_type VARCHAR, tax_rate DECIMAL(13,12))")
+        conn.execute("""INSERT INTO detail VALUES ('US06000001', '01', 0.0725), ('US48000001', '01', 0.0625),
+            ('US48000001', '04', 0.01)""")
+        conn.close()
+        return db_path
+
+    @pytest.fixture
+    def job_folder(self, temp_dir):
+        job_folder = os.path.join(temp_dir, "250801_update")
+        os.makedirs(job_folder)
+        return job_folder
+
+    def execute(self, db_path, query):
+        conn = duckdb.connect(db_path)
+        conn.execute(query)
+        conn.close()
+
+    def test_checksum_is_order_independent(self, source_db, temp_dir):
+        """Test that the same rows in another order have the same checksum"""
+        reordered_db = os.path.join(temp_dir, "reordered.duckdb")
+        self.execute(reordered_db, f"""
+            ATTACH '{source_db}' AS source (READ_ONLY);
+            CREATE TABLE detail AS SELECT * FROM source.detail ORDER BY geocode DESC, tax_type DESC
+        """)
+
+        source = compute_checksums(source_db)["tables"]["detail"]
+        reordered = compute_checksums(reordered_db)["tables"]["detail"]
+
+        assert source["row_count"] == 3
+        assert source["checksum"] == reordered["checksum"]
+
+    def test_only_changed_tables_recomputed(self, source_db):
+        """Test that cached checksums are reused until a table is written"""
+        first = compute_checksums(source_db)
+        assert first["recomputed"] == ["detail", "geocode"]
+        assert os.path.exists(get_cache_path(source_db))
+
+        assert compute_checksums(source_db)["recomputed"] == []
+
+        self.execute(source_db, "DELETE FROM detail WHERE tax_type = '04'")
+        changed = compute_checksums(source_db)
+        assert changed["recomputed"] == ["detail"]
+        assert changed["tables"]["detail"]["row_count"] == 2
+        assert changed["tables"]["detail"]["checksum"] == compute_checksums(source_db, full=True)["tables"]["detail"]["checksum"]
+
+    def test_verify_database_copy(self, source_db, job_folder):
+        """Test the tables changed report of a database copy, with per-state partitions"""
+        updater = TableUpdater()
+        compute_checksums(source_db, "state")
+        db_path = updater.duplicate_database(source_db, job_folder, "250801")
+        assert os.path.exists(get_cache_path(db_path))
+        self.execute(db_path, "UPDATE detail SET tax_rate = 0.0825 WHERE geocode = 'US48000001' AND tax_type = '01'")
+
+        report = updater.verify_database_copy(source_db, db_path, job_folder)
+
+        statuses = {entry["table"]: entry for entry in report["tables"]}
+        assert statuses["geocode"]["status"] == "unchanged"
+        assert statuses["detail"]["status"] == "changed"
+        assert statuses["detail"]["changed_partitions"] == ["TX"]
+        assert report["tables_changed"] == 1
+        assert report["recomputed"] == {"source": [], "copy": ["detail"]}
+        with open(os.path.join(job_folder, "tables_changed.json"), 'r') as f:
+            assert json.load(f)["tables_changed"] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,73 @@
+"""
+Test the handling of rate update rows that change neither rate nor fee
+"""
+
+import pytest
+import os
+import sys
+import pandas as pd
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+
+from src import config, logger
+from src.main import parse_args, suppress_unchanged_rows
+
+
+class TestUnchangedRows:
+    """Test class for --unchanged-rows"""
+
+    @pytest.fixture
+    def output_df(self):
+        """Output rows of two job rows: unchanged, rate changed, unchanged with a warning, fee changed"""
+        logger.clear_logs()
+        yield pd.DataFrame({
+            "status": pd.Categorical(["Success", "Success", "Warning: rate mismatch", "Success"]),
+            "geocode": ["US1", "US2", "US3", "US4"],
+            "tax_rate": [0.0725, 0.08, 0.0725, 0.0725],
+            "_old_tax_rate": [0.0725, 0.0725, 0.072500000000, 0.0725],
+            "fee": [0.25, 0.25, 0.0, 0.5],
+            "_old_fee": [0.25, 0.25, 0.0, 0.25],
+            "_job_row": [1, 1, 2, 2]
+        })
+        logger.clear_logs()
+
+    def test_keep(self, output_df):
+        """Test that mode 'keep' returns the rows untouched and logs nothing"""
+        result = suppress_unchanged_rows(output_df, "keep")
+
+        assert result is output_df
+        assert logger.get_logs() == []
+
+    def test_flag(self, output_df):
+        """Test that mode 'flag' adds the warning to the status of the unchanged rows only"""
+        result = suppress_unchanged_rows(output_df, "flag")
+
+        assert result["status"].tolist() == [
+            "Warning: rate and fee unchanged", "Success",
+            "Warning: rate mismatch\nWarning: rate and fee unchanged", "Success"
+        ]
+        assert output_df["status"].tolist()[0] == "Success"
+        assert [(log["context"]["row_number"], log["context"]["unchanged_rows"]) for log in logger.get_logs()] == \
+            [(1, 1), (2, 1)]
+        assert logger.get_logs()[0]["message"] == \
+            "Row 1: 1 of 2 output rows already have the new rate and fee. Flagged as unchanged."
+
+    def test_drop(self, output_df):
+        """Test that mode 'drop' removes the unchanged rows"""
+        result = suppress_unchanged_rows(output_df, "drop")
+
+        assert result["geocode"].tolist() == ["US2", "US4"]
+        assert list(result.index) == [0, 1]
+        assert "Dropped as unchanged" in logger.get_logs()[1]["message"]
+
+    def test_option(self):
+        """Test the command line option and its default"""
+        assert parse_args([]).unchanged_rows == config.RATE_UPDATE_UNCHANGED_ROWS == "keep"
+        assert parse_args(["--unchanged-rows", "drop"]).unchanged_rows == "drop"
+        with pytest.raises(SystemExit):
+            parse_args(["--unchanged-rows", "skip"])
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])